@@ -0,0 +1,13 @@
+"""
+Offline benchmarks of the backend.
+
+Includes:
+- App configs: Synthetic app configs of a given number of entities, fields, pages, zones and rows
+- Engine: Flow and message throughput and latency with a fake LLM (python -m benchmarks.engine)
+- Fake LLM: Schema-based fixtures replacing the model layer of StepExecutor
+- Flows: Representative create, edit decision and partial edit flows
+- Report: Latency percentiles, resource usage and JSON results
+- Tool calls: Time and memory scaling of the ToolCallModule tools (python -m benchmarks.tool_calls)
+- WebSocket fan-out: Delivery latency, drops and memory per connection of /ws/projects/{id}
+  (python -m benchmarks.websocket_fanout, server side in benchmarks.websocket_server)
+"""
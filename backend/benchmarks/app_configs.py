@@ -0,0 +1,185 @@
+import json
+import random
+from typing import Dict, Any, List, Tuple
+
+FIELD_TYPES = ("text", "number", "boolean", "date", "reference")
+ROLES = ("admin", "manager", "user")
+ACTIONS = ("create", "read", "update", "delete")
+COMPONENT_TYPES = ("table", "form", "chart", "stat", "text")
+
+def _value(field: Dict[str, Any], row: int) -> Any:
+    kind = field["type"]
+    if kind == "number":
+        return row * 10
+    if kind == "boolean":
+        return row % 2 == 0
+    if kind == "date":
+        return f"2024-01-{row % 28 + 1:02d}"
+    if kind == "reference":
+        return f"{field['reference']}_{row % 5 + 1}"
+    return f"{field['fieldName']} {row}"
+
+def generate_app(
+    entities: int = 10,
+    fields: int = 8,
+    pages: int = 5,
+    zones: int = 3,
+    rows: int = 20,
+    components: int = 3,
+    use_cases: int = None,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Synthetic outputs of the create app flow steps, of a given size
+
+    The result is the input of ToolCallModule.finalize_config_output.
+    Entities reference a random earlier entity (so the foreign keys form a
+    tree), and pages show components bound to the entities. The same
+    arguments always give the same app.
+
+    Args:
+        entities: Number of entities
+        fields: Fields per entity
+        pages: Number of pages
+        zones: Zones per page
+        rows: Data rows per entity
+        components: Components per zone
+        use_cases: Number of use cases (defaults to the number of entities)
+        seed: Seed of the random references
+
+    Returns:
+        Dictionary with metadata, authConfig, useCaseDetails, entities,
+        entityAssets, pageSchema and pageDetails
+    """
+    rng = random.Random(seed)
+    names = [f"Entity{index + 1}" for index in range(entities)]
+
+    entity_list = []
+    for index, name in enumerate(names):
+        entity_fields = [{"fieldName": "id", "type": "text", "required": True}]
+        for number in range(1, fields):
+            kind = FIELD_TYPES[number % len(FIELD_TYPES)]
+            field = {"fieldName": f"field{number}", "type": kind, "required": number % 3 == 0}
+            if kind == "reference":
+                if index == 0:
+                    field["type"] = "text"
+                else:
+                    field["reference"] = names[rng.randrange(index)]
+            entity_fields.append(field)
+        entity_list.append({"id": name, "entityName": name, "fields": entity_fields})
+
+    entity_assets = []
+    for entity in entity_list:
+        field_order = [field["fieldName"] for field in entity["fields"]]
+        entity_assets.append({
+            "id": entity["entityName"],
+            "entityName": entity["entityName"],
+            "actions": list(ACTIONS),
+            "permissions": [
+                {"role": role, "allowedActions": list(ACTIONS[:len(ACTIONS) - number])}
+                for number, role in enumerate(ROLES)
+            ],
+            "fieldOrder": field_order,
+            "dataRows": [[_value(field, row) for field in entity["fields"]] for row in range(rows)],
+        })
+
+    page_schema = [
+        {
+            "id": f"page{index + 1}",
+            "title": f"Page {index + 1}",
+            "path": f"/page-{index + 1}",
+            "icon": "list",
+            "showInSidebar": True,
+            "sidebarOrder": index + 1,
+            "roleAccess": list(ROLES),
+            "layoutType": "dashboard",
+        }
+        for index in range(pages)
+    ]
+    page_details = []
+    for index, page in enumerate(page_schema):
+        page_zones = []
+        for zone in range(zones):
+            page_zones.append({
+                "name": f"zone{zone + 1}",
+                "components": [
+                    {
+                        "type": COMPONENT_TYPES[(zone + number) % len(COMPONENT_TYPES)],
+                        "title": f"Component {number + 1}",
+                        "resource": names[(index + zone + number) % len(names)] if names else None,
+                        "fields": ["id", "field1", "field2"],
+                    }
+                    for number in range(components)
+                ],
+            })
+        page_details.append({"id": page["id"], "zones": page_zones})
+
+    use_case_count = entities if use_cases is None else use_cases
+    use_case_list = [
+        {
+            "id": f"uc{index + 1}",
+            "name": f"Use case {index + 1}",
+            "description": f"Manage {names[index % len(names)] if names else 'data'}",
+            "actors": ["user"],
+            "steps": [f"Step {step + 1}" for step in range(3)],
+        }
+        for index in range(use_case_count)
+    ]
+
+    return {
+        "metadata": {"appName": "Synthetic app", "appDescription": "Generated for benchmarks", "version": 1},
+        "authConfig": {"roles": list(ROLES), "default_role": "user"},
+        "useCaseDetails": use_case_list,
+        "entities": entity_list,
+        "entityAssets": entity_assets,
+        "pageSchema": page_schema,
+        "pageDetails": page_details,
+    }
+
+def edit_app(app: Dict[str, Any], fraction: float = 0.25) -> Tuple[Dict[str, Any], Dict[str, List[Dict[str, str]]]]:
+    """
+    Edited copy of a synthetic app and the edit plan that produced it
+
+    Every 1/fraction-th use case, entity and page is edited, and as many new
+    ones are added, so the size of the edit grows with the app.
+
+    Args:
+        app: Result of generate_app
+        fraction: Share of the items to edit
+
+    Returns:
+        Tuple of (updated items per step output, edit plan with the
+        useCases, entities and pages lists of {id, action})
+    """
+    step = max(1, round(1 / fraction)) if fraction > 0 else None
+    updated = json.loads(json.dumps(app))
+    plan: Dict[str, List[Dict[str, str]]] = {"useCases": [], "entities": [], "pages": []}
+
+    def edit(items: List[Dict[str, Any]], key: str, label: str, plan_key: str) -> List[Dict[str, Any]]:
+        chosen = items[::step] if step else []
+        changed = []
+        for item in chosen:
+            item = dict(item, **{label: f"{item[label]} (edited)"})
+            changed.append(item)
+            plan[plan_key].append({"id": item[key], "action": "edit"})
+        for number, item in enumerate(chosen):
+            added = json.loads(json.dumps(item))
+            added[key] = f"{item[key]}_new{number + 1}"
+            changed.append(added)
+            plan[plan_key].append({"id": added[key], "action": "add"})
+        return changed
+
+    updated["useCaseDetails"] = edit(updated["useCaseDetails"], "id", "name", "useCases")
+    updated["entities"] = edit(updated["entities"], "id", "entityName", "entities")
+    # Assets and page details follow the edited entities and pages
+    assets = {asset["id"]: asset for asset in app["entityAssets"]}
+    updated["entityAssets"] = [
+        dict(assets[entity["id"].split("_new")[0]], id=entity["id"], entityName=entity["entityName"])
+        for entity in updated["entities"]
+    ]
+    updated["pageSchema"] = edit(updated["pageSchema"], "id", "title", "pages")
+    details = {detail["id"]: detail for detail in app["pageDetails"]}
+    updated["pageDetails"] = [
+        dict(details[page["id"].split("_new")[0]], id=page["id"]) for page in updated["pageSchema"]
+    ]
+    return updated, plan
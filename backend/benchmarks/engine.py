@@ -0,0 +1,306 @@
+"""
+Offline benchmark of the flow engine.
+
+Seeds the benchmark flows (see benchmarks.flows) into a temporary SQLite
+database, replaces the model layer with FakeLLM and drives FlowRunner and
+AgentRouter.handle_message at a configurable concurrency. No API calls are
+made, so the results measure the engine: DB access, prompt rendering,
+executor scheduling, tool calls and message dispatch.
+
+Run from the backend directory:
+
+    python -m benchmarks.engine --iterations 50 --concurrency 8 --latency 0.2 --output engine.json
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+from benchmarks.report import format_seconds, peak_memory_mb, print_table, summarize, write_results
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = (
+    "flow:create_app_flow",
+    "flow:edit_decision_flow",
+    "flow:edit_partial_flow",
+    "message:create",
+    "message:edit",
+)
+
+CREATE_REQUEST = (
+    "Build an inventory management app for a small warehouse with suppliers, products, "
+    "purchase orders and a dashboard of stock levels"
+)
+EDIT_REQUEST = "Add a delivery date to purchase orders and show late orders on the dashboard page"
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the flow engine with a fake LLM")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=20, help="Timed operations per scenario")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Operations running at the same time")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per fake LLM call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Fraction the latency varies by (e.g. 0.2)")
+    parser.add_argument("--items", type=int, default=4, help="Elements of generated arrays (entities, pages, ...)")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="Override LLM_MAX_CONCURRENCY")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default=None, help="SQLite file to use (a temporary one by default)")
+    parser.add_argument("--trace-memory", action="store_true", help="Report the peak of Python allocations (slower)")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+class _Scenario:
+    """Untimed setup of each operation, and the timed operation"""
+
+    def __init__(
+        self,
+        setup: Callable[[int], Awaitable[Any]],
+        operation: Callable[[Any], Awaitable[bool]],
+        overrides: Dict[str, Dict[str, Any]]
+    ):
+        self.setup = setup
+        self.operation = operation
+        self.overrides = overrides
+
+async def _build_scenarios(flow_ids: Dict[str, str]) -> Dict[str, _Scenario]:
+    from core.agent_router import AgentRouter
+    from core.flow_runner import FlowRunner
+    from benchmarks.fake_llm import FakeLLM
+    from benchmarks.flows import LOOP_OVERRIDES, SCHEMAS
+
+    create_decision = dict(LOOP_OVERRIDES, MainDecision={
+        "action": "start_create_flow",
+        "prompt": "Create the inventory app",
+        "projectTitle": "Inventory",
+        "projectDescription": "Warehouse inventory management",
+    })
+    edit_decision = dict(
+        LOOP_OVERRIDES,
+        MainDecision={"action": "start_edit_flow", "prompt": "Edit the purchase orders"},
+        EditDecision={"action": "start_partial_edit_flow"},
+    )
+
+    # An app to edit, created once
+    FakeLLM.overrides = create_decision
+    project_id = await AgentRouter.start_project("Benchmark base app")
+    await AgentRouter.handle_message(project_id, CREATE_REQUEST)
+    base_app = (await AgentRouter.get_latest_app_version(project_id))["config_json"]
+    history = [
+        {"role": "user", "content": CREATE_REQUEST},
+        {"role": "assistant", "content": "I created the inventory app."},
+        {"role": "user", "content": EDIT_REQUEST},
+    ]
+    edit_plan = FakeLLM.respond(SCHEMAS["EditDecision"])["editPlan"]
+    metadata = {"projectId": project_id, "appName": "Inventory", "appDescription": "Warehouse inventory", "version": 2}
+
+    flow_inputs = {
+        "create_app_flow": {
+            "user_request": CREATE_REQUEST,
+            "main_agent_prompt": "Create the inventory app",
+            "main_agent_reason": "New app",
+            "project_metadata": dict(metadata, version=1),
+        },
+        "edit_decision_flow": {
+            "user_request": EDIT_REQUEST,
+            "main_agent_prompt": "Edit the purchase orders",
+            "main_agent_reason": "Edit",
+            "app_config": base_app,
+            "filtered_message_history": history,
+            "project_metadata": metadata,
+        },
+        "edit_partial_flow": {
+            "user_request": EDIT_REQUEST,
+            "main_agent_prompt": "Edit the purchase orders",
+            "main_agent_reason": "Edit",
+            "app_config": base_app,
+            "edit_plan": edit_plan,
+            "project_metadata": metadata,
+        },
+    }
+
+    async def new_project(index: int) -> str:
+        return await AgentRouter.start_project(f"Benchmark project {index}")
+
+    def flow_scenario(flow_name: str) -> _Scenario:
+        async def run(project_id: str) -> bool:
+            flow_run_id = await FlowRunner.start_flow_run(flow_ids[flow_name], project_id, dict(flow_inputs[flow_name]))
+            return bool(flow_run_id)
+        return _Scenario(new_project, run, edit_decision if flow_name != "create_app_flow" else create_decision)
+
+    async def create_message(project_id: str) -> bool:
+        result = await AgentRouter.handle_message(project_id, CREATE_REQUEST)
+        return result.get("action") == "create_flow_started"
+
+    async def project_with_app(index: int) -> str:
+        project_id = await new_project(index)
+        overrides = FakeLLM.overrides
+        FakeLLM.overrides = create_decision
+        try:
+            await AgentRouter.handle_message(project_id, CREATE_REQUEST)
+        finally:
+            FakeLLM.overrides = overrides
+        return project_id
+
+    async def edit_message(project_id: str) -> bool:
+        result = await AgentRouter.handle_message(project_id, EDIT_REQUEST)
+        return result.get("action") == "edit_flow_started"
+
+    return {
+        "flow:create_app_flow": flow_scenario("create_app_flow"),
+        "flow:edit_decision_flow": flow_scenario("edit_decision_flow"),
+        "flow:edit_partial_flow": flow_scenario("edit_partial_flow"),
+        "message:create": _Scenario(new_project, create_message, create_decision),
+        "message:edit": _Scenario(project_with_app, edit_message, edit_decision),
+    }
+
+def _span_summary(spans: List[Any], name: str, label: str) -> Dict[str, Any]:
+    durations: Dict[str, List[float]] = {}
+    for span in spans:
+        if span.name == name:
+            durations.setdefault(str(span.attributes.get(label)), []).append(span.duration)
+    return {key: summarize(values) for key, values in sorted(durations.items())}
+
+async def _run_scenario(name: str, scenario: _Scenario, args: argparse.Namespace, spans: List[Any]) -> Dict[str, Any]:
+    from core.llm_usage import LLMUsage
+    from benchmarks.fake_llm import FakeLLM
+
+    slots = asyncio.Semaphore(max(1, args.concurrency))
+    latencies: List[float] = []
+
+    async def timed(context: Any) -> bool:
+        async with slots:
+            start = time.perf_counter()
+            try:
+                return await scenario.operation(context)
+            except Exception as e:
+                logger.error(f"{name} operation failed: {e}")
+                return False
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+    # Projects and other state are prepared before timing
+    contexts = [await scenario.setup(index) for index in range(args.warmup + args.iterations)]
+    FakeLLM.overrides = scenario.overrides
+    await asyncio.gather(*(timed(context) for context in contexts[:args.warmup]))
+
+    latencies.clear()
+    spans.clear()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with LLMUsage.track() as usage:
+        outcomes = await asyncio.gather(*(timed(context) for context in contexts[args.warmup:]))
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+
+    flow_spans = [span for span in spans if span.name == "flow.run"]
+    step_spans = [span for span in spans if span.name == "step.run"]
+    return {
+        "operations": len(outcomes),
+        "errors": outcomes.count(False),
+        "flow_errors": sum(1 for span in flow_spans if span.attributes.get("status") != "complete"),
+        "wall_time": wall_time,
+        "throughput": len(outcomes) / wall_time if wall_time else None,
+        "flows_per_second": len(flow_spans) / wall_time if wall_time else None,
+        "steps_per_second": len(step_spans) / wall_time if wall_time else None,
+        "cpu_time": cpu_time,
+        "cpu_time_per_operation": cpu_time / len(outcomes) if outcomes else None,
+        "peak_rss_mb": peak_memory_mb(),
+        "python_peak_mb": tracemalloc.get_traced_memory()[1] / (1024 * 1024) if tracemalloc.is_tracing() else None,
+        "llm_calls": usage["calls"],
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "operation_latency": summarize(latencies),
+        "flow_latency": _span_summary(spans, "flow.run", "flow"),
+        "step_latency": dict(
+            _span_summary(spans, "step.run", "step"),
+            all=summarize([span.duration for span in step_spans])
+        ),
+        "llm_latency": summarize([span.duration for span in spans if span.name == "llm.generate"]),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected scenarios and return their results by name"""
+    from db.database import init_db, close_db_connection
+    from core.step_executor import StepExecutor
+    from core.tracing import Tracer
+    from benchmarks.fake_llm import FakeLLM
+    from benchmarks.flows import seed_flows
+
+    # Step and flow latencies are read from the tracing spans
+    spans: List[Any] = []
+    Tracer.register_exporter("benchmark", spans.append)
+    Tracer.enabled = True
+    Tracer.exporters = ["benchmark"]
+    if args.llm_concurrency:
+        StepExecutor.llm_concurrency = args.llm_concurrency
+
+    FakeLLM.configure(latency=args.latency, jitter=args.jitter, items=args.items, seed=args.seed)
+    await init_db()
+    try:
+        with FakeLLM.installed():
+            flow_ids = await seed_flows()
+            scenarios = await _build_scenarios(flow_ids)
+            results = {}
+            for name in args.scenarios:
+                logger.warning(f"Running {name}")
+                results[name] = await _run_scenario(name, scenarios[name], args, spans)
+        return results
+    finally:
+        await close_db_connection()
+
+def print_results(results: Dict[str, Any]) -> None:
+    rows = []
+    for name, result in results.items():
+        latency = result["operation_latency"]
+        rows.append([
+            name,
+            result["operations"],
+            result["errors"] + result["flow_errors"],
+            f"{result['throughput']:.2f}/s",
+            format_seconds(latency["p50"]),
+            format_seconds(latency["p95"]),
+            format_seconds(latency["p99"]),
+            format_seconds(result["step_latency"]["all"]["p95"]),
+            f"{result['cpu_time']:.2f}s",
+            f"{result['peak_rss_mb']:.0f}MB" if result["peak_rss_mb"] else "-",
+        ])
+    print_table(["scenario", "ops", "errors", "throughput", "p50", "p95", "p99", "step p95", "cpu", "peak rss"], rows)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    directory = None
+    if args.db is None:
+        directory = tempfile.TemporaryDirectory(prefix="engine-benchmark-")
+        args.db = os.path.join(directory.name, "benchmark.db")
+    # The database module reads DB_URL when it is first imported
+    os.environ["DB_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    if "db.database" in sys.modules:
+        logger.warning("db.database was imported before the benchmark, it may not use the benchmark database")
+
+    import db.database  # noqa: F401  (configures logging)
+    logging.getLogger().setLevel(args.log_level.upper())
+    if args.trace_memory:
+        tracemalloc.start()
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if directory is not None:
+            directory.cleanup()
+
+    print_results(results)
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "db", "log_level")}
+        write_results(args.output, "engine", config, results)
+    return 0 if all(result["errors"] + result["flow_errors"] == 0 for result in results.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
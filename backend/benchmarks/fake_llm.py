@@ -0,0 +1,189 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, Optional, Union
+
+from pydantic import BaseModel
+
+from core.llm_usage import LLMUsage
+from core.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+def _resolve(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    ref = schema.get("$ref")
+    if not ref or not ref.startswith("#/"):
+        return schema
+    node = root
+    for part in ref[2:].split("/"):
+        node = node[part]
+    return _resolve(node, root)
+
+def fixture_from_schema(
+    schema: Dict[str, Any],
+    items: int = 3,
+    name: str = "value",
+    root: Optional[Dict[str, Any]] = None,
+    suffix: str = ""
+) -> Any:
+    """
+    Deterministic instance of a JSON schema
+
+    Objects get all their properties, arrays `items` elements (within
+    minItems/maxItems), enums and consts their first value, strings the
+    property name and the array indexes above it (e.g. "id_2" for the id of
+    the second element), so IDs are unique within a list.
+
+    Args:
+        schema: JSON schema (local $refs are resolved)
+        items: Number of elements of arrays
+        name: Name used for generated strings
+        root: Schema the $refs point into (defaults to schema)
+        suffix: Array indexes of the value
+
+    Returns:
+        Instance of the schema
+    """
+    root = root if root is not None else schema
+    schema = _resolve(schema, root)
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if schema.get(key):
+            options = [option for option in schema[key] if _resolve(option, root).get("type") != "null"]
+            return fixture_from_schema((options or schema[key])[0], items, name, root, suffix)
+
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((option for option in kind if option != "null"), "null")
+    if kind is None:
+        kind = "object" if "properties" in schema else "array" if "items" in schema else "string"
+
+    if kind == "object":
+        return {
+            key: fixture_from_schema(value, items, key, root, suffix)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        count = max(schema.get("minItems", 0), min(items, schema.get("maxItems", items)))
+        element = schema.get("items", {"type": "string"})
+        return [fixture_from_schema(element, items, name, root, f"{suffix}_{index + 1}") for index in range(count)]
+    if kind == "integer":
+        return int(schema.get("minimum", 1))
+    if kind == "number":
+        return float(schema.get("minimum", 1))
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    return f"{name}{suffix}"
+
+class FakeModel:
+    """Stand-in for the Outlines OpenAI model"""
+
+    def __init__(self, model_name: str):
+        self.config = type("Config", (), {"model": model_name})()
+
+class FakeLLM:
+    """
+    Offline replacement of the model layer of StepExecutor.
+
+    Structured generation returns fixtures built from the output schema
+    (see fixture_from_schema), after a configurable latency spent in the
+    worker thread like a real API call. Usage is reported for every call,
+    so token accounting and metrics behave as with the provider.
+
+    Fields of a fixture can be fixed per schema title, e.g. to choose the
+    action of the main agent:
+
+        FakeLLM.overrides["MainDecision"] = {"action": "start_create_flow"}
+
+    An override can also be a function of the prompt returning the fields.
+    """
+
+    # Seconds per call, and the +/- fraction it varies by
+    latency: float = 0.0
+    jitter: float = 0.0
+
+    # Number of elements of generated arrays
+    items: int = 3
+
+    # Schema title -> fields replacing those of the generated fixture
+    overrides: Dict[str, Union[Dict[str, Any], Callable[[str], Dict[str, Any]]]] = {}
+
+    model_name: str = "fake-llm"
+
+    _random = random.Random(0)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def configure(latency: float = 0.0, jitter: float = 0.0, items: int = 3, seed: int = 0) -> None:
+        FakeLLM.latency = latency
+        FakeLLM.jitter = jitter
+        FakeLLM.items = items
+        FakeLLM.overrides = {}
+        FakeLLM._random = random.Random(seed)
+
+    @staticmethod
+    def respond(schema: Dict[str, Any], prompt: str = "") -> Dict[str, Any]:
+        """Fixture for an output schema, with the overrides of its title applied"""
+        result = fixture_from_schema(schema, FakeLLM.items)
+        override = FakeLLM.overrides.get(schema.get("title"))
+        if callable(override):
+            override = override(prompt)
+        if override and isinstance(result, dict):
+            result.update(json.loads(json.dumps(override)))
+        return result
+
+    @staticmethod
+    def _delay() -> float:
+        if not FakeLLM.latency:
+            return 0.0
+        with FakeLLM._lock:
+            factor = 1 + FakeLLM._random.uniform(-FakeLLM.jitter, FakeLLM.jitter)
+        return max(0.0, FakeLLM.latency * factor)
+
+    @staticmethod
+    def generate_json(model, schema):
+        """Replacement of outlines.generate.json"""
+        model_class = schema if isinstance(schema, type) and issubclass(schema, BaseModel) else None
+        if model_class is not None:
+            schema_json = model_class.model_json_schema()
+        else:
+            schema_json = json.loads(schema) if isinstance(schema, str) else schema
+
+        def generator(prompt: str):
+            time.sleep(FakeLLM._delay())
+            result = FakeLLM.respond(schema_json, prompt)
+            LLMUsage.record_call({
+                "prompt_tokens": count_tokens(prompt),
+                "completion_tokens": count_tokens(json.dumps(result)),
+            })
+            return model_class.model_validate(result) if model_class is not None else result
+
+        return generator
+
+    @staticmethod
+    @contextmanager
+    def installed() -> Iterator[None]:
+        """Use the fake model layer in StepExecutor for the block"""
+        import core.step_executor as step_executor
+        from core.step_executor import StepExecutor
+
+        async def init_openai_model(model_name: Optional[str] = None):
+            return FakeModel(model_name or FakeLLM.model_name)
+
+        original_generate = step_executor.generate_json
+        original_init = StepExecutor.__dict__["init_openai_model"]
+        step_executor.generate_json = FakeLLM.generate_json
+        StepExecutor.init_openai_model = staticmethod(init_openai_model)
+        try:
+            yield
+        finally:
+            step_executor.generate_json = original_generate
+            StepExecutor.init_openai_model = original_init
@@ -0,0 +1,398 @@
+import re
+from typing import Dict, Any, Callable, List
+
+from core.flow_registry import FlowRegistry
+from core.prompt_schema_store import PromptSchemaStore
+
+def _string_array() -> Dict[str, Any]:
+    return {"type": "array", "items": {"type": "string"}}
+
+def _plan_items() -> Dict[str, Any]:
+    return {
+        "type": "array",
+        "minItems": 1,
+        "items": {
+            "type": "object",
+            "properties": {"id": {"type": "string"}, "action": {"type": "string", "enum": ["edit", "add", "delete"]}},
+            "required": ["id", "action"],
+        },
+    }
+
+# Output schemas of the benchmark flows, shaped like those of the app builder
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "MainDecision": {
+        "title": "MainDecision",
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": [
+                "start_create_flow", "start_edit_flow", "ask_for_clarification", "respond_with_info", "reject"
+            ]},
+            "reason": {"type": "string"},
+            "prompt": {"type": "string"},
+            "projectTitle": {"type": "string"},
+            "projectDescription": {"type": "string"},
+        },
+        "required": ["action", "reason", "prompt"],
+    },
+    "AuthConfig": {
+        "title": "AuthConfig",
+        "type": "object",
+        "properties": {
+            "roles": {"type": "array", "minItems": 1, "items": {"type": "string"}},
+            "default_role": {"type": "string"},
+        },
+        "required": ["roles", "default_role"],
+    },
+    "UseCases": {
+        "title": "UseCases",
+        "type": "object",
+        "properties": {
+            "useCases": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "name": {"type": "string"},
+                        "description": {"type": "string"},
+                        "actors": _string_array(),
+                        "steps": _string_array(),
+                    },
+                    "required": ["id", "name", "description"],
+                },
+            },
+        },
+        "required": ["useCases"],
+    },
+    "Entities": {
+        "title": "Entities",
+        "type": "object",
+        "properties": {
+            "entities": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "entityName": {"type": "string"},
+                        "description": {"type": "string"},
+                        "fields": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "fieldName": {"type": "string"},
+                                    "type": {"type": "string", "enum": ["text", "number", "date", "boolean", "reference"]},
+                                    "required": {"type": "boolean"},
+                                },
+                                "required": ["fieldName", "type"],
+                            },
+                        },
+                    },
+                    "required": ["entityName", "fields"],
+                },
+            },
+        },
+        "required": ["entities"],
+    },
+    "EntityAssets": {
+        "title": "EntityAssets",
+        "type": "object",
+        "properties": {
+            "id": {"type": "string"},
+            "entityName": {"type": "string"},
+            "actions": _string_array(),
+            "permissions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"role": {"type": "string"}, "allowedActions": _string_array()},
+                    "required": ["role", "allowedActions"],
+                },
+            },
+            "fieldOrder": _string_array(),
+            "dataRows": {"type": "array", "items": _string_array()},
+        },
+        "required": ["entityName", "actions", "permissions", "fieldOrder", "dataRows"],
+    },
+    "PageSchema": {
+        "title": "PageSchema",
+        "type": "object",
+        "properties": {
+            "pages": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "title": {"type": "string"},
+                        "path": {"type": "string"},
+                        "icon": {"type": "string"},
+                        "showInSidebar": {"type": "boolean"},
+                        "sidebarOrder": {"type": "integer"},
+                        "roleAccess": _string_array(),
+                        "layoutType": {"type": "string", "enum": ["dashboard", "list", "detail", "form"]},
+                    },
+                    "required": ["id", "title", "path", "icon", "showInSidebar", "sidebarOrder", "roleAccess", "layoutType"],
+                },
+            },
+        },
+        "required": ["pages"],
+    },
+    "PageDetails": {
+        "title": "PageDetails",
+        "type": "object",
+        "properties": {
+            "id": {"type": "string"},
+            "zones": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "components": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "type": {"type": "string", "enum": ["table", "form", "chart", "metric"]},
+                                    "title": {"type": "string"},
+                                    "resource": {"type": "string"},
+                                },
+                                "required": ["type"],
+                            },
+                        },
+                    },
+                    "required": ["name", "components"],
+                },
+            },
+        },
+        "required": ["id", "zones"],
+    },
+    "EditDecision": {
+        "title": "EditDecision",
+        "type": "object",
+        "properties": {
+            "action": {"type": "string", "enum": [
+                "start_partial_edit_flow", "start_create_app_flow", "ask_for_clarification", "reject"
+            ]},
+            "reason": {"type": "string"},
+            "editPlan": {
+                "type": "object",
+                "properties": {"useCases": _plan_items(), "entities": _plan_items(), "pages": _plan_items()},
+                "required": ["useCases", "entities", "pages"],
+            },
+        },
+        "required": ["action", "reason", "editPlan"],
+    },
+}
+
+# Flow name -> steps, each with a schema title (AI steps) or tool_name, the
+# input_map and the prompt template. Tool call steps get a template rendering
+# their inputs as JSON (see _tool_template).
+FLOWS: Dict[str, List[Dict[str, Any]]] = {
+    "main_agent_flow": [
+        {
+            "name": "main_decision",
+            "schema": "MainDecision",
+            "input_map": {
+                "user_request": "user_request",
+                "message_history": "filtered_message_history",
+                "app_config": "app_config",
+                "has_existing_app": "has_existing_app",
+            },
+            "template": (
+                "Conversation so far:\n{{ message_history | json }}\n\n"
+                "{% if has_existing_app %}Current app:\n{{ app_config | json }}\n\n{% endif %}"
+                "Decide how to handle the request: {{ user_request }}"
+            ),
+        },
+    ],
+    "create_app_flow": [
+        {
+            "name": "use_cases",
+            "schema": "UseCases",
+            "input_map": {"user_request": "user_request", "prompt": "main_agent_prompt"},
+            "template": "List the use cases of this app.\nRequest: {{ user_request }}\nNotes: {{ prompt }}",
+        },
+        {
+            "name": "auth_config",
+            "schema": "AuthConfig",
+            "input_map": {"user_request": "user_request", "use_cases": "use_cases.useCases"},
+            "template": "Define the user roles for these use cases:\n{{ use_cases | json }}\nRequest: {{ user_request }}",
+        },
+        {
+            "name": "entities",
+            "schema": "Entities",
+            "input_map": {"user_request": "user_request", "use_cases": "use_cases.useCases"},
+            "template": "Design the data entities for these use cases:\n{{ use_cases | json }}\nRequest: {{ user_request }}",
+        },
+        {
+            "name": "entity_assets_loop",
+            "step_type": "ai_loop",
+            "loop_key": "entities",
+            "schema": "EntityAssets",
+            "input_map": {"entities": "entities.entities", "use_cases": "use_cases.useCases"},
+            "template": (
+                "Create actions, permissions and sample data for the entity:\n{{ current_item | json }}\n"
+                "Use cases:\n{{ use_cases | json }}"
+            ),
+        },
+        {
+            "name": "page_schema",
+            "schema": "PageSchema",
+            "input_map": {"use_cases": "use_cases.useCases", "entities": "entities.entities"},
+            "template": "Plan the pages of the app.\nUse cases:\n{{ use_cases | json }}\nEntities:\n{{ entities | json }}",
+        },
+        {
+            "name": "page_details_loop",
+            "step_type": "ai_loop",
+            "loop_key": "pages",
+            "schema": "PageDetails",
+            "input_map": {"pages": "page_schema.pages", "entities": "entities.entities"},
+            "template": "Lay out the zones and components of the page:\n{{ current_item | json }}\nEntities:\n{{ entities | json }}",
+        },
+        {
+            "name": "finalize_config",
+            "tool_name": "finalize_config_output",
+            "input_map": {
+                "metadata": "project_metadata",
+                "authConfig": "auth_config",
+                "useCaseDetails": "use_cases.useCases",
+                "entities": "entities.entities",
+                "entityAssets": "entity_assets_loop.results",
+                "pageSchema": "page_schema.pages",
+                "pageDetails": "page_details_loop.results",
+            },
+        },
+    ],
+    "edit_decision_flow": [
+        {
+            "name": "edit_decision_step",
+            "schema": "EditDecision",
+            "input_map": {
+                "user_request": "user_request",
+                "app_config": "app_config",
+                "message_history": "filtered_message_history",
+            },
+            "template": (
+                "Current app:\n{{ app_config | json }}\n\nConversation:\n{{ message_history | json }}\n\n"
+                "Plan the edits for: {{ user_request }}"
+            ),
+        },
+    ],
+    "edit_partial_flow": [
+        {
+            "name": "edit_use_cases",
+            "schema": "UseCases",
+            "input_map": {"user_request": "user_request", "plan": "edit_plan.useCases", "use_cases": "app_config.useCases"},
+            "template": "Apply the plan {{ plan | json }} to the use cases:\n{{ use_cases | json }}\nRequest: {{ user_request }}",
+        },
+        {
+            "name": "merge_use_cases",
+            "tool_name": "merge_use_cases",
+            "input_map": {
+                "oldUseCases": "app_config.useCases",
+                "updatedUseCases": "edit_use_cases.useCases",
+                "editPlanUseCases": "edit_plan.useCases",
+            },
+        },
+        {
+            "name": "edit_page_schema",
+            "schema": "PageSchema",
+            "input_map": {"plan": "edit_plan.pages", "pages": "app_config.pages"},
+            "template": "Apply the plan {{ plan | json }} to the pages:\n{{ pages | json }}",
+        },
+        {
+            "name": "merge_page_schema",
+            "tool_name": "merge_page_schema",
+            "input_map": {
+                "oldPageSchema": "app_config.pages",
+                "updatedPageSchema": "edit_page_schema.pages",
+                "editPlanPages": "edit_plan.pages",
+            },
+        },
+        {
+            "name": "edit_page_details_loop",
+            "step_type": "ai_loop",
+            "loop_key": "pages",
+            "schema": "PageDetails",
+            "input_map": {"pages": "merge_page_schema.merged_page_schema", "resources": "app_config.resources"},
+            "template": "Lay out the zones and components of the page:\n{{ current_item | json }}\nResources:\n{{ resources | json }}",
+        },
+        {
+            "name": "merge_page_details",
+            "tool_name": "merge_page_details",
+            "input_map": {
+                "oldPageDetails": "app_config.pages",
+                "updatedPageDetails": "edit_page_details_loop.results",
+                "editPlanPages": "edit_plan.pages",
+            },
+        },
+        {
+            "name": "merge_config",
+            "tool_name": "merge_config_outputs",
+            "input_map": {
+                "originalAppConfig": "app_config",
+                "editPlan": "edit_plan",
+                "metadata": "project_metadata",
+                "useCaseDetails": "merge_use_cases.merged_use_cases",
+                "pageDetails": "merge_page_details.merged_page_details",
+            },
+        },
+    ],
+}
+
+def _item_field(field: str) -> Callable[[str], Dict[str, Any]]:
+    pattern = re.compile(rf'"{field}":\s*"([^"]*)"')
+
+    def override(prompt: str) -> Dict[str, Any]:
+        # The loop templates start with the current item
+        match = pattern.search(prompt)
+        return {field: match.group(1)} if match else {}
+    return override
+
+# FakeLLM overrides linking the output of loop iterations to their item,
+# as the tools merge them by entity name and page ID
+LOOP_OVERRIDES = {
+    "EntityAssets": _item_field("entityName"),
+    "PageDetails": _item_field("id"),
+}
+
+def _tool_template(input_map: Dict[str, str]) -> str:
+    return "{" + ", ".join(f'"{key}": {{{{ {key} | json }}}}' for key in input_map) + "}"
+
+async def seed_flows() -> Dict[str, str]:
+    """
+    Create the benchmark flows in the current database
+
+    Returns:
+        Dict of flow name -> flow ID
+    """
+    schema_ids = {
+        title: await PromptSchemaStore.create_schema(f"benchmark_{title}", schema)
+        for title, schema in SCHEMAS.items()
+    }
+    tool_schema_id = await PromptSchemaStore.create_schema("benchmark_tool_output", {"type": "object"})
+
+    flow_ids = {}
+    for flow_name, steps in FLOWS.items():
+        flow_id = await FlowRegistry.create_flow(flow_name, description="Benchmark flow")
+        for order, step in enumerate(steps, start=1):
+            tool_name = step.get("tool_name")
+            template = step.get("template") or _tool_template(step["input_map"])
+            prompt_id = await PromptSchemaStore.create_prompt(f"benchmark_{step['name']}", template)
+            await FlowRegistry.create_step(
+                flow_id=flow_id,
+                name=step["name"],
+                step_type="tool_call" if tool_name else step.get("step_type", "ai_single"),
+                order=order,
+                input_map=step["input_map"],
+                system_message="" if tool_name else f"You are the {step['name']} step of an app builder.",
+                prompt_template_id=prompt_id,
+                output_schema_id=tool_schema_id if tool_name else schema_ids[step["schema"]],
+                tool_name=tool_name,
+                loop_key=step.get("loop_key")
+            )
+        flow_ids[flow_name] = flow_id
+    return flow_ids
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # resource is not available on Windows, peak memory is not reported there
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """q-th percentile (0-100) with linear interpolation, None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(values: Sequence[float]) -> Dict[str, Any]:
+    """Count, mean, p50, p95, p99 and max of durations in seconds"""
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of the process in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def current_memory_mb() -> Optional[float]:
+    """Current resident memory of the process in MB (Linux only)"""
+    try:
+        with open("/proc/self/statm") as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+def environment() -> Dict[str, Any]:
+    """Commit, interpreter and machine the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def write_results(path: str, suite: str, config: Dict[str, Any], results: Dict[str, Any]) -> None:
+    """
+    Write benchmark results as JSON for comparison between commits
+
+    Args:
+        path: Output file
+        suite: Name of the benchmark suite
+        config: Settings the suite ran with
+        results: Results of the suite
+    """
+    document = {"suite": suite, "environment": environment(), "config": config, "results": results}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+    logger.info(f"Wrote benchmark results to {path}")
+
+def format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return f"{value * 1000:.1f}ms" if value < 1 else f"{value:.2f}s"
+
+def print_table(headers: List[str], rows: List[List[Any]]) -> None:
+    """Print rows as an aligned text table"""
+    cells = [[str(cell) for cell in row] for row in [headers] + rows]
+    widths = [max(len(row[index]) for row in cells) for index in range(len(headers))]
+    for number, row in enumerate(cells):
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if number == 0:
+            print("  ".join("-" * width for width in widths))
@@ -0,0 +1,260 @@
+"""
+Scaling benchmark of the ToolCallModule tools on synthetic app configs.
+
+Generates apps of growing size (see benchmarks.app_configs), scaling the
+chosen dimensions together, and measures the time and peak Python memory
+of each tool on every size. The exponent of the fitted power law
+(time ~ scale^k) shows the asymptotic behavior: ~1 is linear, ~2 quadratic.
+The tail exponent is measured between the two largest sizes only.
+
+Run from the backend directory:
+
+    python -m benchmarks.tool_calls --vary entities pages --scales 1 2 4 8 16 32 --output tools.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import math
+import sys
+import time
+import tracemalloc
+from typing import Dict, Any, List, Optional, Sequence
+
+from benchmarks.app_configs import edit_app, generate_app
+from benchmarks.report import format_seconds, percentile, print_table, write_results
+from core.tool_call_module import ToolCallModule
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("entities", "fields", "pages", "zones", "rows", "components")
+
+TOOLS = (
+    "reorganize_entities_fk",
+    "validate_and_merge",
+    "merge_use_cases",
+    "merge_use_case_details",
+    "merge_entities",
+    "merge_entity_assets",
+    "merge_page_schema",
+    "merge_page_details",
+    "finalize_config_output",
+    "merge_config_outputs",
+)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the tool_call steps on synthetic app configs")
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=list(TOOLS))
+    parser.add_argument("--vary", nargs="+", choices=DIMENSIONS, default=["entities", "pages"],
+                        help="Dimensions multiplied by each scale")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--entities", type=int, default=10, help="Entities at scale 1")
+    parser.add_argument("--fields", type=int, default=8, help="Fields per entity at scale 1")
+    parser.add_argument("--pages", type=int, default=5, help="Pages at scale 1")
+    parser.add_argument("--zones", type=int, default=3, help="Zones per page at scale 1")
+    parser.add_argument("--rows", type=int, default=20, help="Data rows per entity at scale 1")
+    parser.add_argument("--components", type=int, default=3, help="Components per zone at scale 1")
+    parser.add_argument("--edit-fraction", type=float, default=0.25, help="Share of the items the edit plan changes")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per tool and size")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--log-level", default="ERROR")
+    return parser.parse_args(argv)
+
+def app_size(args: argparse.Namespace, scale: int) -> Dict[str, int]:
+    """Sizes of the app at a scale, with the varied dimensions multiplied"""
+    return {
+        dimension: getattr(args, dimension) * (scale if dimension in args.vary else 1)
+        for dimension in DIMENSIONS
+    }
+
+async def build_inputs(app: Dict[str, Any], fraction: float = 0.25) -> Dict[str, Dict[str, Any]]:
+    """
+    Input of each tool for a synthetic app, shaped like in the flows
+
+    The create flow tools get the step outputs of the app; the edit flow
+    tools get its final config as the old values and an edited copy (see
+    edit_app) as the updated ones.
+
+    Args:
+        app: Result of generate_app
+        fraction: Share of the items the edit plan changes
+
+    Returns:
+        Dictionary of tool name -> input data
+    """
+    updated, plan = edit_app(app, fraction)
+    final = (await ToolCallModule.finalize_config_output(app))["final_app_config"]
+
+    inputs: Dict[str, Dict[str, Any]] = {
+        "reorganize_entities_fk": {"entities": [
+            {
+                "name": entity["entityName"],
+                "fields": [
+                    {
+                        "name": field["fieldName"],
+                        "type": "FK" if field.get("reference") else field["type"],
+                        "target_entity": field.get("reference"),
+                    }
+                    for field in entity["fields"]
+                ],
+            }
+            for entity in app["entities"]
+        ]},
+        "merge_use_cases": {
+            "oldUseCases": app["useCaseDetails"],
+            "updatedUseCases": updated["useCaseDetails"],
+            "editPlanUseCases": plan["useCases"],
+        },
+        "merge_use_case_details": {
+            "oldUseCaseDetail": app["useCaseDetails"],
+            "updatedUseCaseDetail": updated["useCaseDetails"],
+            "editPlanUseCases": plan["useCases"],
+        },
+        "merge_entities": {
+            "oldEntities": final["resources"],
+            "updatedEntities": updated["entities"],
+            "editPlanEntities": plan["entities"],
+        },
+        "merge_entity_assets": {
+            "oldEntityAssets": {
+                asset["id"]: ToolCallModule.convert_asset_to_internal(asset) for asset in app["entityAssets"]
+            },
+            "updatedEntityAssets": updated["entityAssets"],
+            "editPlanEntities": plan["entities"],
+        },
+        "merge_page_schema": {
+            "oldPageSchema": app["pageSchema"],
+            "updatedPageSchema": updated["pageSchema"],
+            "editPlanPages": plan["pages"],
+        },
+        "merge_page_details": {
+            "oldPageDetails": final["pages"],
+            "updatedPageDetails": updated["pageDetails"],
+            "editPlanPages": plan["pages"],
+        },
+        "finalize_config_output": app,
+    }
+
+    # The generic merge gets the same changes as dotted and indexed paths
+    new_values = json.loads(json.dumps(final))
+    edit_plan = {"useCases[*]": "edit"}
+    new_values["useCases"] = updated["useCaseDetails"]
+    for entity in updated["entities"]:
+        new_values["resources"][entity["id"]] = ToolCallModule.convert_entity_to_resource(entity)
+    for edit in plan["entities"]:
+        edit_plan[f"resources.{edit['id']}"] = edit["action"]
+    page_index = {page["id"]: index for index, page in enumerate(final["pages"])}
+    for edit in plan["pages"]:
+        if edit["id"] in page_index:
+            index = page_index[edit["id"]]
+            new_values["pages"][index]["title"] += " (edited)"
+            edit_plan[f"pages[{index}]"] = "edit"
+    inputs["validate_and_merge"] = {"old_values": final, "new_values": new_values, "edit_plan": edit_plan}
+
+    merged_entities = await ToolCallModule.merge_entities(inputs["merge_entities"])
+    merged_pages = await ToolCallModule.merge_page_details(inputs["merge_page_details"])
+    inputs["merge_config_outputs"] = {
+        "originalAppConfig": final,
+        "editPlan": plan,
+        "metadata": app["metadata"],
+        "useCaseDetails": updated["useCaseDetails"],
+        "entities": merged_entities["merged_entities"],
+        "pageDetails": merged_pages["merged_page_details"],
+    }
+    return inputs
+
+async def measure(tool: str, input_data: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    """Time of `repeat` runs of a tool and the peak memory of one more run"""
+    method = getattr(ToolCallModule, tool)
+    durations = []
+    gc.collect()
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        await method(input_data)
+        durations.append(time.perf_counter() - start)
+
+    # Tracing allocations slows the tool down, so memory is measured apart
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = await method(input_data)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "min": min(durations),
+        "median": percentile(durations, 50),
+        "max": max(durations),
+        "peak_memory_kb": peak / 1024,
+    }
+
+def fit_exponent(scales: Sequence[float], values: Sequence[float]) -> Optional[float]:
+    """Exponent k of the least squares fit of values ~ scale^k on a log-log scale"""
+    points = [(math.log(scale), math.log(value)) for scale, value in zip(scales, values) if scale > 0 and value > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Measure the selected tools at every scale"""
+    points: Dict[str, List[Dict[str, Any]]] = {tool: [] for tool in args.tools}
+    sizes = []
+    for scale in args.scales:
+        size = app_size(args, scale)
+        app = generate_app(**size)
+        inputs = await build_inputs(app, args.edit_fraction)
+        sizes.append(dict(size, scale=scale, config_bytes=len(json.dumps(inputs["validate_and_merge"]["old_values"]))))
+        logger.warning(f"Scale {scale}: {size}")
+        for tool in args.tools:
+            points[tool].append(dict(await measure(tool, inputs[tool], args.repeat), scale=scale))
+
+    tools = {}
+    for tool, measurements in points.items():
+        scales = [point["scale"] for point in measurements]
+        times = [point["median"] for point in measurements]
+        tools[tool] = {
+            "points": measurements,
+            "time_exponent": fit_exponent(scales, times),
+            # Fixed costs dominate small sizes, the largest ones show the asymptote
+            "tail_time_exponent": fit_exponent(scales[-2:], times[-2:]),
+            "memory_exponent": fit_exponent(scales, [point["peak_memory_kb"] for point in measurements]),
+        }
+    return {"sizes": sizes, "tools": tools}
+
+def print_results(results: Dict[str, Any]) -> None:
+    scales = [size["scale"] for size in results["sizes"]]
+    rows = []
+    for tool, result in results["tools"].items():
+        exponents = [result["time_exponent"], result["tail_time_exponent"], result["memory_exponent"]]
+        rows.append(
+            [tool]
+            + [format_seconds(point["median"]) for point in result["points"]]
+            + [f"{result['points'][-1]['peak_memory_kb']:.0f}KB"]
+            + [f"{exponent:.2f}" if exponent is not None else "-" for exponent in exponents]
+        )
+    headers = (
+        ["tool"] + [f"x{scale}" for scale in scales]
+        + [f"peak mem x{scales[-1]}", "time k", "tail time k", "memory k"]
+    )
+    print_table(headers, rows)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    results = asyncio.run(run(args))
+    print_results(results)
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "log_level")}
+        write_results(args.output, "tool_calls", config, results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+WebSocket fan-out load test.
+
+Starts benchmarks.websocket_server in a subprocess (or uses --server-url),
+opens connections to /ws/projects/{id} across many projects, some of which
+read slowly, and sends message bursts through dispatch_message in the
+server. Reports the end-to-end delivery latency of fast and slow readers,
+dropped messages and connections, dispatch time and the server memory per
+connection.
+
+Run from the backend directory:
+
+    python -m benchmarks.websocket_fanout --projects 200 --connections-per-project 10 --slow-fraction 0.1 --output ws.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import websockets
+
+from benchmarks.report import format_seconds, print_table, summarize, write_results
+
+try:
+    import resource
+except ImportError:  # resource is not available on Windows, the descriptor limit is not checked there
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="WebSocket fan-out load test of /ws/projects/{id}")
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--connections-per-project", type=int, default=10)
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="Share of the connections reading slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Seconds a slow reader waits after each message")
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-messages", type=int, default=20, help="Messages per project and burst")
+    parser.add_argument("--burst-interval", type=float, default=1.0, help="Seconds between the start of bursts")
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    parser.add_argument("--save-messages", action="store_true", help="Also store the messages in the database")
+    parser.add_argument("--max-queue", type=int, default=16, help="Messages a client buffers before applying backpressure")
+    parser.add_argument("--connect-concurrency", type=int, default=200, help="Connections opened at the same time")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="Seconds to wait for late messages")
+    parser.add_argument("--server-url", default=None, help="Use a running benchmarks.websocket_server")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+class _Client:
+    """One connection: counts the messages of each burst and their latency"""
+
+    def __init__(self, project_id: str, slow_delay: float):
+        self.project_id = project_id
+        self.slow_delay = slow_delay
+        self.websocket = None
+        self.connect_time: Optional[float] = None
+        self.received: Set[Tuple[int, int]] = set()
+        self.latencies: List[float] = []
+        self.closed_by_server = False
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self, url: str, max_queue: int) -> bool:
+        start = time.perf_counter()
+        try:
+            self.websocket = await websockets.connect(
+                f"{url}/ws/projects/{self.project_id}", ping_interval=None, max_queue=max_queue, open_timeout=30
+            )
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+            logger.debug(f"Connection to {self.project_id} failed: {e}")
+            return False
+        self.connect_time = time.perf_counter() - start
+        self._reader = asyncio.create_task(self._read())
+        return True
+
+    async def _read(self):
+        try:
+            async for raw in self.websocket:
+                received = time.time()
+                message = json.loads(raw)
+                if message.get("type") != "message":
+                    continue
+                burst, sequence, sent, _ = message["data"]["content"].split(":", 3)
+                self.received.add((int(burst), int(sequence)))
+                self.latencies.append(received - float(sent))
+                if self.slow_delay:
+                    await asyncio.sleep(self.slow_delay)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        self.closed_by_server = True
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self.websocket is not None:
+            try:
+                await asyncio.wait_for(self.websocket.close(), 5)
+            except (asyncio.TimeoutError, websockets.exceptions.WebSocketException, OSError):
+                pass
+
+def _is_slow(index: int, fraction: float) -> bool:
+    # Spreads the slow readers evenly over the connections (and projects)
+    return int((index + 1) * fraction) > int(index * fraction)
+
+def _request(url: str, payload: Optional[Dict[str, Any]] = None, timeout: float = 600) -> Dict[str, Any]:
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+async def _server_stats(url: str) -> Dict[str, Any]:
+    return await asyncio.to_thread(_request, f"{url}/benchmark/stats")
+
+def _start_server(database_path: str) -> Tuple[subprocess.Popen, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, DB_URL=f"sqlite:///{database_path}")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.websocket_server", "--port", str(port)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Benchmark server exited with code {process.returncode}")
+        try:
+            _request(f"{url}/benchmark/stats", timeout=1)
+            return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Benchmark server did not start within 60 seconds")
+
+def _check_descriptor_limit(connections: int) -> None:
+    if resource is None:
+        return
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < connections + 100:
+        logger.warning(f"The open file limit ({soft}) is below the number of connections, raise it with ulimit -n")
+
+async def run(args: argparse.Namespace, url: str) -> Dict[str, Any]:
+    """Connect the clients, send the bursts and collect the results"""
+    http_url = url.rstrip("/")
+    ws_url = http_url.replace("http", "ws", 1)
+    project_ids = [f"benchmark-project-{index + 1}" for index in range(args.projects)]
+    clients = [
+        _Client(project_id, args.slow_delay if _is_slow(index, args.slow_fraction) else 0.0)
+        for index, (project_id, _) in enumerate(
+            (project_id, number) for project_id in project_ids for number in range(args.connections_per_project)
+        )
+    ]
+
+    idle = await _server_stats(http_url)
+    slots = asyncio.Semaphore(max(1, args.connect_concurrency))
+
+    async def connect(client: _Client) -> bool:
+        async with slots:
+            return await client.connect(ws_url, args.max_queue)
+
+    start = time.perf_counter()
+    opened = await asyncio.gather(*(connect(client) for client in clients))
+    connect_duration = time.perf_counter() - start
+    connected = [client for client, ok in zip(clients, opened) if ok]
+    await asyncio.sleep(0.5)
+    loaded = await _server_stats(http_url)
+
+    dispatch_durations: List[float] = []
+    burst_durations: List[float] = []
+    for burst in range(args.bursts):
+        burst_start = time.perf_counter()
+        response = await asyncio.to_thread(_request, f"{http_url}/benchmark/dispatch", {
+            "project_ids": project_ids,
+            "burst": burst,
+            "messages": args.burst_messages,
+            "payload_bytes": args.payload_bytes,
+            "save": args.save_messages,
+        })
+        dispatch_durations.extend(response["dispatch_durations"])
+        burst_durations.append(response["duration"])
+        remaining = args.burst_interval - (time.perf_counter() - burst_start)
+        if remaining > 0 and burst < args.bursts - 1:
+            await asyncio.sleep(remaining)
+
+    # Slow readers are still working through their queues
+    expected = args.bursts * args.burst_messages
+    deadline = time.perf_counter() + args.drain_timeout
+    while time.perf_counter() < deadline:
+        if all(len(client.received) >= expected or client.closed_by_server for client in connected):
+            break
+        await asyncio.sleep(0.1)
+    final = await _server_stats(http_url)
+    for client in clients:
+        await client.close()
+
+    fast = [latency for client in connected if not client.slow_delay for latency in client.latencies]
+    slow = [latency for client in connected if client.slow_delay for latency in client.latencies]
+    delivered = sum(len(client.received) for client in connected)
+    expected_total = expected * len(connected)
+    memory_per_connection = None
+    if idle["rss_mb"] is not None and loaded["rss_mb"] is not None and connected:
+        memory_per_connection = (loaded["rss_mb"] - idle["rss_mb"]) * 1024 / len(connected)
+
+    return {
+        "connections": {
+            "requested": len(clients),
+            "opened": len(connected),
+            "failed": len(clients) - len(connected),
+            "slow": sum(1 for client in connected if client.slow_delay),
+            "closed_by_server": sum(1 for client in connected if client.closed_by_server),
+            "connect_duration": connect_duration,
+            "connect_latency": summarize([client.connect_time for client in connected]),
+        },
+        "delivery": {
+            "expected": expected_total,
+            "delivered": delivered,
+            "dropped": expected_total - delivered,
+            "drop_rate": (expected_total - delivered) / expected_total if expected_total else None,
+            "latency": summarize(fast + slow),
+            "fast_reader_latency": summarize(fast),
+            "slow_reader_latency": summarize(slow),
+        },
+        "dispatch": {
+            "messages": len(dispatch_durations),
+            "latency": summarize(dispatch_durations),
+            "burst_duration": summarize(burst_durations),
+        },
+        "server": {
+            "idle_rss_mb": idle["rss_mb"],
+            "connected_rss_mb": loaded["rss_mb"],
+            "final_rss_mb": final["rss_mb"],
+            "peak_rss_mb": final["peak_rss_mb"],
+            "memory_per_connection_kb": memory_per_connection,
+            "connections_at_end": final["connections"],
+        },
+    }
+
+def print_results(results: Dict[str, Any]) -> None:
+    connections, delivery = results["connections"], results["delivery"]
+    dispatch, server = results["dispatch"], results["server"]
+
+    def latency(summary: Dict[str, Any]) -> str:
+        return " / ".join(format_seconds(summary[key]) for key in ("p50", "p95", "p99", "max"))
+
+    rows = [
+        ["connections opened", f"{connections['opened']} of {connections['requested']} ({connections['slow']} slow)"],
+        ["closed by server", connections["closed_by_server"]],
+        ["connect p50 / p95 / p99 / max", latency(connections["connect_latency"])],
+        ["messages delivered", f"{delivery['delivered']} of {delivery['expected']}"],
+        ["dropped", f"{delivery['dropped']} ({(delivery['drop_rate'] or 0) * 100:.2f}%)"],
+        ["delivery p50 / p95 / p99 / max", latency(delivery["latency"])],
+        ["fast readers", latency(delivery["fast_reader_latency"])],
+        ["slow readers", latency(delivery["slow_reader_latency"])],
+        ["dispatch p50 / p95 / p99 / max", latency(dispatch["latency"])],
+        ["burst duration p50 / max", f"{format_seconds(dispatch['burst_duration']['p50'])} / "
+                                     f"{format_seconds(dispatch['burst_duration']['max'])}"],
+        ["server memory per connection", f"{server['memory_per_connection_kb']:.1f}KB"
+                                         if server["memory_per_connection_kb"] is not None else "-"],
+        ["server peak rss", f"{server['peak_rss_mb']:.0f}MB" if server["peak_rss_mb"] else "-"],
+    ]
+    print_table(["metric", "value"], rows)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    _check_descriptor_limit(args.projects * args.connections_per_project)
+
+    process = None
+    directory = None
+    url = args.server_url
+    if url is None:
+        directory = tempfile.TemporaryDirectory(prefix="websocket-benchmark-")
+        process, url = _start_server(os.path.join(directory.name, "benchmark.db"))
+    try:
+        results = asyncio.run(run(args, url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if directory is not None:
+            directory.cleanup()
+
+    print_results(results)
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "server_url", "log_level")}
+        write_results(args.output, "websocket_fanout", config, results)
+    return 0 if results["delivery"]["dropped"] == 0 and results["connections"]["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
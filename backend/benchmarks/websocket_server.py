@@ -0,0 +1,111 @@
+"""
+Server side of the WebSocket fan-out benchmark (see benchmarks.websocket_fanout).
+
+Serves the /ws/projects/{id} endpoint with the application's ConnectionManager,
+plus benchmark-only routes that dispatch message bursts through
+dispatch_message inside the server process and report its memory and open
+connections. Started by the load generator, or by hand to load it from
+other machines:
+
+    python -m benchmarks.websocket_server --host 0.0.0.0 --port 8100
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import uvicorn
+from fastapi import APIRouter, FastAPI
+from pydantic import BaseModel, Field
+
+from benchmarks.report import current_memory_mb, peak_memory_mb
+from core.message_dispatcher import dispatch_message
+from core.websocket_manager import manager
+from db.database import close_db_connection, init_db
+from routers import websockets
+
+logger = logging.getLogger(__name__)
+
+# Sequence, burst and send time are parsed by the clients to count drops and latency
+MESSAGE_TEMPLATE = "{{ burst }}:{{ sequence }}:{{ sent }}:{{ padding }}"
+
+class DispatchRequest(BaseModel):
+    project_ids: List[str]
+    burst: int = 0
+    messages: int = Field(10, ge=1, description="Messages per project")
+    payload_bytes: int = Field(0, ge=0, description="Padding added to each message")
+    save: bool = Field(False, description="Also store the messages like flow messages (db destination)")
+
+class DispatchResponse(BaseModel):
+    dispatched: int
+    duration: float
+    dispatch_durations: List[float]
+
+class StatsResponse(BaseModel):
+    rss_mb: Optional[float]
+    peak_rss_mb: Optional[float]
+    connections: int
+    projects: int
+
+router = APIRouter()
+
+@router.post("/dispatch", response_model=DispatchResponse)
+async def dispatch(request: DispatchRequest):
+    """Send a burst of messages to every project, the projects in parallel"""
+    destination = ["websocket", "db"] if request.save else ["websocket"]
+    padding = "x" * request.payload_bytes
+    durations: List[float] = []
+
+    async def burst(project_id: str):
+        for sequence in range(request.messages):
+            start = time.perf_counter()
+            context = {"burst": request.burst, "sequence": sequence, "sent": time.time(), "padding": padding}
+            await dispatch_message(MESSAGE_TEMPLATE, context, "end_step", "system", project_id, destination)
+            durations.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(burst(project_id) for project_id in request.project_ids))
+    return DispatchResponse(
+        dispatched=len(durations),
+        duration=time.perf_counter() - start,
+        dispatch_durations=durations
+    )
+
+@router.get("/stats", response_model=StatsResponse)
+async def stats():
+    return StatsResponse(
+        rss_mb=current_memory_mb(),
+        peak_rss_mb=peak_memory_mb(),
+        connections=sum(len(connections) for connections in manager.active_connections.values()),
+        projects=len(manager.active_connections),
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Only needed when the messages are saved
+    await init_db()
+    yield
+    await close_db_connection()
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="WebSocket benchmark server", lifespan=lifespan)
+    app.include_router(websockets.router, prefix="/ws", tags=["websockets"])
+    app.include_router(router, prefix="/benchmark", tags=["benchmark"])
+    return app
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="WebSocket endpoint with benchmark dispatch routes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level=args.log_level.lower(), backlog=4096)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
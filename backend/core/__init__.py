@@ -10,24 +10,64 @@ Includes:
 - Prompt Schema Store: Manages prompts, schemas, and one-shot examples
 - Message Dispatcher: Handles message delivery
 - Replay Engine: Re-runs steps with original or modified inputs
+- Definition Cache: In-process cache of flows, steps and step assets
+- Blob Store: Compressed, deduplicated storage for large JSON and prompt values
+- App Version Store: Snapshot + delta storage of app versions
+- Code Exporter: Streams and caches generated code archives
+- App Code Generator: Renders the pages and routes of generated apps
+- Decision Classifier: Fast path and decision cache in front of the main agent
+- Conversation Memory: Summarized, token-budgeted message history for prompts
+- Prompt Budget: Token counting and compaction of step prompts
+- Loop Context: Previous-output modes of ai_loop steps
+- LLM Usage: Provider-reported token usage, including cached prompt tokens
+- LLM Response Cache: Cache of structured generation results
+- Metrics: Prometheus-style metrics served on /metrics
+- Tracing: OpenTelemetry-compatible spans of the flow execution path
+- Import Profile: Import-time profile of the API process (python -m core.import_profile)
+- Warmup: Startup warm-up of the flow, asset and template caches (GET /ready)
+- Output Validator: Validation and local repair of structured outputs against their JSON schema
 """
 
-from .agent_router import AgentRouter
-from .flow_registry import FlowRegistry
-from .flow_runner import FlowRunner
-from .step_executor import StepExecutor
-from .tool_call_module import ToolCallModule
-from .prompt_schema_store import PromptSchemaStore
-from .message_dispatcher import dispatch_message
-from .replay_engine import ReplayEngine
+import importlib
 
-__all__ = [
-    "AgentRouter",
-    "FlowRegistry", 
-    "FlowRunner",
-    "StepExecutor",
-    "ToolCallModule",
-    "PromptSchemaStore",
-    "dispatch_message",
-    "ReplayEngine"
-] 
\ No newline at end of file
+# Exported name -> module defining it. The modules are imported on first
+# access, so importing one core module does not import all the others (and
+# their dependencies) with it.
+_EXPORTS = {
+    "AgentRouter": ".agent_router",
+    "FlowRegistry": ".flow_registry",
+    "FlowRunner": ".flow_runner",
+    "StepExecutor": ".step_executor",
+    "ToolCallModule": ".tool_call_module",
+    "PromptSchemaStore": ".prompt_schema_store",
+    "dispatch_message": ".message_dispatcher",
+    "ReplayEngine": ".replay_engine",
+    "DefinitionCache": ".definition_cache",
+    "BlobStore": ".blob_store",
+    "AppVersionStore": ".app_version_store",
+    "CodeExporter": ".code_export",
+    "AppCodeGenerator": ".app_code_generator",
+    "DecisionClassifier": ".decision_classifier",
+    "ConversationMemory": ".conversation_memory",
+    "PromptBudget": ".token_budget",
+    "LoopContext": ".loop_context",
+    "LLMUsage": ".llm_usage",
+    "LLMResponseCache": ".llm_cache",
+    "Metrics": ".metrics",
+    "Tracer": ".tracing",
+    "ImportProfile": ".import_profile",
+    "Warmup": ".warmup",
+    "OutputValidator": ".output_validator",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,5 +1,4 @@
 import logging
-import json
 import uuid
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
@@ -11,6 +10,10 @@ from core.flow_runner import FlowRunner
 from core.step_executor import StepExecutor
 from core.prompt_schema_store import PromptSchemaStore
 from core.message_dispatcher import dispatch_message
+from core.app_version_store import AppVersionStore
+from core.decision_classifier import DecisionClassifier
+from core.conversation_memory import ConversationMemory
+from core.tracing import Tracer
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +34,11 @@ class AgentRouter:
         Returns:
             Dictionary with the result of message handling
         """
+        with Tracer.span("agent.handle_message", project_id=project_id):
+            return await AgentRouter._handle_message(project_id, message_content)
+    
+    @staticmethod
+    async def _handle_message(project_id: str, message_content: str) -> Dict[str, Any]:
         # Save the user message
         await AgentRouter.save_message(project_id, "user", message_content)
         
@@ -96,7 +104,7 @@ class AgentRouter:
             
             # Get the latest app version
             latest_app_version = await AgentRouter.get_latest_app_version(project_id)
-            json_app_config = json.loads(latest_app_version["config_json"]) if latest_app_version else None
+            json_app_config = latest_app_version["config_json"] if latest_app_version else None
             if not json_app_config:
                 # No app version found, respond with error
                 await dispatch_message(
@@ -258,11 +266,11 @@ class AgentRouter:
         action = edit_decision.get("edit_decision_step").get("action")
         reason = edit_decision.get("edit_decision_step").get("reason")
         edit_plan = edit_decision.get("edit_decision_step").get("editPlan")
-        print(f"edit_decision: {edit_decision}")
+        logger.debug("edit_decision: %s", edit_decision)
         
         # Get latest app config
         latest_app_version = await AgentRouter.get_latest_app_version(project_id)
-        json_app_config = json.loads(latest_app_version["config_json"]) if latest_app_version else None
+        json_app_config = latest_app_version["config_json"] if latest_app_version else None
         
         if action == "start_create_app_flow":
             # Changes are too large, need to regenerate the app
@@ -433,7 +441,22 @@ class AgentRouter:
         
         # Get the latest app version (if any)
         latest_app_version = await AgentRouter.get_latest_app_version(project_id)
-        json_app_config = json.loads(latest_app_version["config_json"]) if latest_app_version else None
+        json_app_config = latest_app_version["config_json"] if latest_app_version else None
+        version_id = latest_app_version["id"] if latest_app_version else None
+
+        # Skip the LLM call for messages the classifiers are confident about
+        decision = DecisionClassifier.classify(message_content, {
+            "has_existing_app": json_app_config is not None,
+            "message_history": message_history
+        })
+        if decision:
+            return decision
+
+        # Reuse the decision for a repeated message in the same project state
+        decision = DecisionClassifier.get_cached(project_id, version_id, message_content)
+        if decision:
+            logger.info(f"Using memoized main agent decision for project {project_id}")
+            return decision
 
         try:
             # Prepare input data for the flow
@@ -455,7 +478,9 @@ class AgentRouter:
             flow_run = await FlowRunner.get_flow_run(flow_run_id)
             
             if flow_run and flow_run.get("status") == "complete":
-                return flow_run.get("output", {})
+                decision = flow_run.get("output", {})
+                DecisionClassifier.remember(project_id, version_id, message_content, decision)
+                return decision
             else:
                 # Return a basic decision in case of error
                 return {
@@ -491,6 +516,10 @@ class AgentRouter:
     @staticmethod
     async def get_message_history(project_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Get message history for a project"""
+        # Summarized, token-budgeted history maintained as messages are saved
+        if ConversationMemory.enabled:
+            return await ConversationMemory.get_history(project_id)
+        
         # Exclude system messages from history
         query = Message.__table__.select().where(
             (Message.project_id == project_id) & 
@@ -507,30 +536,23 @@ class AgentRouter:
     
     @staticmethod
     async def get_latest_app_version(project_id: str) -> Optional[Dict[str, Any]]:
-        """Get the latest app version for a project"""
-        query = """
-        SELECT * FROM app_versions
-        WHERE project_id = :project_id
-        ORDER BY version_number DESC
-        LIMIT 1
-        """
-        result = await database.fetch_one(query=query, values={"project_id": project_id})
-        if result:
-            return dict(result)
-        return None
+        """Get the latest app version for a project, with its full config"""
+        return await AppVersionStore.get_latest_version(project_id)
     
     @staticmethod
     async def save_message(project_id: str, role: str, content: str) -> str:
         """Save a message to the database"""
         message_id = str(uuid.uuid4())
-        query = Message.__table__.insert().values(
-            id=message_id,
-            project_id=project_id,
-            role=role,
-            content=content,
-            created_at=datetime.utcnow()
-        )
+        values = {
+            "id": message_id,
+            "project_id": project_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.utcnow()
+        }
+        query = Message.__table__.insert().values(**values)
         await database.execute(query)
+        ConversationMemory.append(values)
         return message_id
     
     @staticmethod
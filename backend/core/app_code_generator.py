@@ -0,0 +1,463 @@
+import logging
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple
+
+import jinja2
+
+logger = logging.getLogger(__name__)
+
+def _props_json(value: Any) -> str:
+    return json.dumps(value, indent=2)
+
+# JSX uses curly braces, so the templates use [[ ]] / [% %] delimiters
+_env = jinja2.Environment(
+    autoescape=False,
+    keep_trailing_newline=True,
+    variable_start_string="[[",
+    variable_end_string="]]",
+    block_start_string="[%",
+    block_end_string="%]",
+    comment_start_string="[#",
+    comment_end_string="#]",
+)
+_env.filters["props_json"] = _props_json
+
+# Templates are compiled once at import time
+COMPONENT_TEMPLATE = _env.from_string("<[[ type ]] {...[[ props | props_json ]]} />")
+
+ZONE_TEMPLATE = _env.from_string('''<div className="zone-[[ name ]]">
+        <h2 className="text-xl font-semibold mb-3">[[ name ]]</h2>
+        <div className="space-y-4">
+          [[ components | join("\\n          ") ]]
+        </div>
+      </div>''')
+
+ZONE_PAGE_TEMPLATE = _env.from_string('''import React from 'react'
+import { useApp } from '../context/AppContext'
+[[ imports | join("\\n") ]]
+
+export default function [[ page_id ]]() {
+  const { config, currentUser } = useApp()
+  
+  return (
+    <div className="container mx-auto p-4">
+      <h1 className="text-2xl font-bold mb-4">[[ page_title ]]</h1>
+      [[ zones | join("\\n") ]]
+    </div>
+  )
+}
+''')
+
+RESOURCE_PAGE_TEMPLATE = _env.from_string('''import React from 'react'
+import { useApp } from '../context/AppContext'
+[[ imports | join("\\n") ]]
+
+export default function [[ page_name ]]() {
+  const { config, currentUser } = useApp()
+  
+  return (
+    <div className="container mx-auto p-4">
+      <h1 className="text-2xl font-bold mb-4">[[ page_name ]]</h1>
+      <div className="space-y-4">
+        [[ components | join("\\n") ]]
+      </div>
+    </div>
+  )
+}
+''')
+
+ROUTES_TEMPLATE = _env.from_string('''import React from 'react'
+import { BrowserRouter, Routes, Route, Navigate } from 'react-router-dom'
+import { AppProvider } from './context/AppContext'
+import Layout from './components/Layout'
+import Login from './pages/Login'
+import Register from './pages/Register'
+import Dashboard from './pages/Dashboard'
+[% for route in routes %][[ "\\n" if not loop.first ]]import [[ route.component ]] from './pages/[[ route.component ]]'[% endfor %]
+
+export default function AppRoutes() {
+  return (
+    <BrowserRouter>
+      <AppProvider>
+        <Routes>
+          <Route path="/auth/login" element={<Login />} />
+          <Route path="/auth/register" element={<Register />} />
+          
+          <Route path="/" element={<Layout />}>
+            <Route index element={<Dashboard />} />
+            [% for route in routes %][[ "\\n            " if not loop.first ]]{ path: "[[ route.path ]]", element: <[[ route.component ]] /> }[% endfor %]
+          </Route>
+          
+          <Route path="*" element={<Navigate to="/" replace />} />
+        </Routes>
+      </AppProvider>
+    </BrowserRouter>
+  )
+}
+''')
+
+README_TEMPLATE = _env.from_string('''# [[ app_name ]]
+
+This application was generated by AI ERP Generator.
+
+## Getting Started
+
+1. Install dependencies:
+
+```bash
+npm install
+```
+
+2. Start the development server:
+
+```bash
+npm run dev
+```
+
+3. Open your browser and navigate to:
+
+```
+http://localhost:5173/
+```
+
+## Project Structure
+
+- `src/` - Source code
+  - `components/` - Reusable components
+  - `pages/` - Page components
+  - `context/` - React Context providers
+  - `lib/` - Utility functions
+  - `types/` - TypeScript types
+  - `config.json` - Application configuration
+
+## Features
+
+- Authentication (Login/Register)
+- Dashboard
+- Dynamic forms and tables
+- Mock API for data operations
+
+## Customization
+
+You can modify any file to customize the application. The main configuration is stored in `src/config.json`.
+''')
+
+STATIC_APP_CONTEXT = '''import type React from "react"
+import { createContext, useContext, useEffect, useState } from "react"
+import { useNavigate, useLocation, useSearchParams } from "react-router-dom"
+import config from "../config.json"
+import { initMockApi } from "../lib/mockApi"
+import type { AppConfig } from "../types/config"
+
+type AppContextType = {
+  config: AppConfig | null
+  loading: boolean
+  error: string | null
+  currentUser: any | null
+  login: (email: string, password: string) => Promise<boolean>
+  logout: () => void
+  register: (name: string, email: string, password: string, role: string) => Promise<boolean>
+}
+
+const AppContext = createContext<AppContextType>({
+  config: null,
+  loading: true,
+  error: null,
+  currentUser: null,
+  login: async () => false,
+  logout: () => {},
+  register: async () => false,
+})
+
+export const useApp = () => useContext(AppContext)
+
+export function AppProvider({ children }: { children: React.ReactNode }) {
+  const [loading, setLoading] = useState(true)
+  const [error, setError] = useState<string | null>(null)
+  const [currentUser, setCurrentUser] = useState<any | null>(null)
+  const [initialized, setInitialized] = useState(false)
+  const navigate = useNavigate()
+  const location = useLocation()
+
+  /* Initialize the app */
+  useEffect(() => {
+    const init = async () => {
+      if (initialized) return
+
+      try {
+        /* Initialize the mock API with the configuration */
+        initMockApi(config)
+
+        /* Check if there's a stored session */
+        if (typeof window !== "undefined") {
+          const storedUser = localStorage.getItem("currentUser")
+          if (storedUser) {
+            setCurrentUser(JSON.parse(storedUser))
+          }
+        }
+
+        setInitialized(true)
+      } catch (err) {
+        console.error("Failed to initialize app:", err)
+        setError("Failed to load application configuration")
+      } finally {
+        setLoading(false)
+      }
+    }
+
+    init()
+  }, [initialized])
+
+  /* Handle automatic redirects based on auth state */
+  useEffect(() => {
+    if (loading || !initialized) return
+
+    const isAuthPage = location.pathname.startsWith("/auth/")
+
+    /* Don't redirect if we're already on an auth page or the root page */
+    if (isAuthPage || location.pathname === "/") return
+
+    /* If no user and not on an auth page, redirect to login */
+    if (!currentUser && !isAuthPage) {
+      navigate("/auth/login")
+    }
+  }, [currentUser, loading, location.pathname, navigate, initialized])
+
+  const register = async (name: string, email: string, password: string, role: string): Promise<boolean> => {
+    if (!config) return false
+
+    /* Check if email already exists */
+    const userExists = config.auth.users.some((u) => u.email === email)
+    if (userExists) {
+      return false
+    }
+
+    /* Create a new user */
+    const newUser = {
+      id: `${Date.now()}`,
+      name,
+      email,
+      password,
+      role,
+    }
+
+    /* Add the user to the config */
+    config.auth.users.push(newUser)
+
+    /* Create a simplified user object without the password */
+    const loggedInUser = {
+      id: newUser.id,
+      name: newUser.name,
+      email: newUser.email,
+      role: newUser.role,
+    }
+
+    setCurrentUser(loggedInUser)
+    localStorage.setItem("currentUser", JSON.stringify(loggedInUser))
+    return true
+  }
+
+  const login = async (email: string, password: string): Promise<boolean> => {
+    if (!config) return false
+
+    /* Find the user in the config */
+    const user = config.auth.users.find((u) => u.email === email && u.password === password)
+
+    if (user) {
+      /* Create a simplified user object without the password */
+      const loggedInUser = {
+        id: user.id,
+        name: user.name,
+        email: user.email,
+        role: user.role,
+      }
+
+      setCurrentUser(loggedInUser)
+      localStorage.setItem("currentUser", JSON.stringify(loggedInUser))
+      return true
+    }
+
+    return false
+  }
+
+  const logout = () => {
+    setCurrentUser(null)
+    localStorage.removeItem("currentUser")
+    navigate("/auth/login")
+  }
+
+  return (
+    <AppContext.Provider
+      value={{
+        config,
+        loading,
+        error,
+        currentUser,
+        login,
+        logout,
+        register,
+      }}
+    >
+      {children}
+    </AppContext.Provider>
+  )
+}
+'''
+
+class AppCodeGenerator:
+    """
+    Generates the source files of a standalone app from its app config.
+
+    Pages are rendered from precompiled templates. Rendered pages are cached
+    by a hash of their config, so pages that did not change since the
+    previous version are not rendered again.
+    """
+
+    # Number of rendered pages kept in memory
+    cache_size: int = int(os.getenv("CODEGEN_PAGE_CACHE_SIZE", "2048"))
+
+    # page hash -> rendered content (LRU)
+    _page_cache: "OrderedDict[str, str]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def render_zone_page(page_id: str, page_title: str, zones: List[Dict[str, Any]]) -> str:
+        """
+        Render a page component from the zones structure of a top-level page
+
+        Args:
+            page_id: Component name of the page
+            page_title: Title shown on the page
+            zones: Zones with their components
+
+        Returns:
+            Page component source
+        """
+        # Ordered de-duplication keeps the output stable between builds
+        imports: Dict[str, None] = {}
+        zones_jsx = []
+
+        for zone in zones:
+            zone_name = zone.get("name", "content")
+            component_jsx = []
+            for component in zone.get("components", []):
+                component_type = component.get("type")
+                imports[f"import {component_type} from '../components/{component_type}'"] = None
+                component_jsx.append(COMPONENT_TEMPLATE.render(type=component_type, props=component.get("props", {})))
+
+            if component_jsx:
+                zones_jsx.append(ZONE_TEMPLATE.render(name=zone_name, components=component_jsx))
+
+        return ZONE_PAGE_TEMPLATE.render(imports=list(imports), page_id=page_id, page_title=page_title, zones=zones_jsx)
+
+    @staticmethod
+    def render_resource_page(page_name: str, page_config: Dict[str, Any]) -> str:
+        """
+        Render a page component of a resource
+
+        Args:
+            page_name: Component name of the page
+            page_config: Page configuration with its components
+
+        Returns:
+            Page component source
+        """
+        imports = []
+        components = []
+        for component in page_config.get("components", []):
+            component_type = component.get("type")
+            imports.append(f"import {component_type} from '../components/{component_type}'")
+            components.append(COMPONENT_TEMPLATE.render(type=component_type, props=component.get("props", {})))
+
+        return RESOURCE_PAGE_TEMPLATE.render(imports=imports, page_name=page_name, components=components)
+
+    @staticmethod
+    def render_routes(routes: List[Dict[str, str]]) -> str:
+        """
+        Render routes.tsx
+
+        Args:
+            routes: List of {"component": ..., "path": ...}
+
+        Returns:
+            Routes file source
+        """
+        return ROUTES_TEMPLATE.render(routes=routes)
+
+    @staticmethod
+    def render_readme(app_config: Dict[str, Any]) -> str:
+        """Render the README of the generated app"""
+        return README_TEMPLATE.render(app_name=app_config.get("app", {}).get("name", "Generated App"))
+
+    @staticmethod
+    def _render_page(job: Tuple[str, Tuple[Any, ...]]) -> str:
+        kind, args = job
+        key = hashlib.sha256(json.dumps([kind, args], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+        with AppCodeGenerator._cache_lock:
+            cached = AppCodeGenerator._page_cache.get(key)
+            if cached is not None:
+                AppCodeGenerator._page_cache.move_to_end(key)
+                return cached
+
+        if kind == "zone_page":
+            content = AppCodeGenerator.render_zone_page(*args)
+        else:
+            content = AppCodeGenerator.render_resource_page(*args)
+
+        with AppCodeGenerator._cache_lock:
+            AppCodeGenerator._page_cache[key] = content
+            while len(AppCodeGenerator._page_cache) > AppCodeGenerator.cache_size:
+                AppCodeGenerator._page_cache.popitem(last=False)
+        return content
+
+    @staticmethod
+    def generate_files(app_config: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Generate the application files based on the configuration
+
+        Args:
+            app_config: Full app configuration
+
+        Returns:
+            Dict mapping paths relative to the app root to file contents. These files
+            are added to (or replace) the baseApp files.
+        """
+        files = {
+            # Save the config as a static file
+            "src/config.json": json.dumps(app_config, indent=2),
+            # Static AppContext.tsx without dynamic loading, also replacing the main AppContext
+            "src/context/StaticAppContext.tsx": STATIC_APP_CONTEXT,
+            "src/context/AppContext.tsx": STATIC_APP_CONTEXT,
+        }
+
+        paths: List[str] = []
+        jobs: List[Tuple[str, Tuple[Any, ...]]] = []
+        routes: List[Dict[str, str]] = []
+
+        # Top-level pages with zones/components
+        for page in app_config.get("pages", []):
+            page_id = page.get("id", "").capitalize()
+            paths.append(f"src/pages/{page_id}.tsx")
+            jobs.append(("zone_page", (page_id, page.get("title", page_id), page.get("zones", []))))
+            routes.append({"component": page_id, "path": page.get("path", f"/{page_id.lower()}")})
+
+        # Resource-specific pages
+        for resource_key, resource in app_config.get("resources", {}).items():
+            for page_key, page in resource.get("pages", {}).items():
+                page_name = f"{resource_key.capitalize()}{page_key.capitalize()}"
+                paths.append(f"src/pages/{page_name}.tsx")
+                jobs.append(("resource_page", (page_name, page)))
+                routes.append({"component": page_name, "path": page.get("path", f"/{resource_key}/{page_key}")})
+
+        # Rendering is pure-Python CPU work: threads do not speed it up under the GIL
+        files.update(zip(paths, (AppCodeGenerator._render_page(job) for job in jobs)))
+
+        files["src/routes.tsx"] = AppCodeGenerator.render_routes(routes)
+        files["README.md"] = AppCodeGenerator.render_readme(app_config)
+
+        return files
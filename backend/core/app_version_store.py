@@ -0,0 +1,275 @@
+import logging
+import json
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from db.database import database
+from db.models import AppVersion
+from core.blob_store import BlobStore
+from core import config_delta
+from core.template_renderer import DateTimeEncoder
+
+logger = logging.getLogger(__name__)
+
+class AppVersionStore:
+    """
+    Stores app versions as periodic full snapshots plus JSON deltas.
+
+    Every `snapshot_interval`-th version of a project stores the full config;
+    the versions in between store the patch operations against the previous
+    version (base_version_id). Reconstructed configs are kept in an LRU cache,
+    so reading the latest version usually only applies the newest delta.
+    """
+
+    # A full snapshot is stored every N versions (1 = always store full configs)
+    snapshot_interval: int = max(1, int(os.getenv("APP_VERSION_SNAPSHOT_INTERVAL", "10")))
+
+    # Number of reconstructed configs kept in memory
+    cache_size: int = int(os.getenv("APP_VERSION_CACHE_SIZE", "128"))
+
+    # version id -> serialized config (LRU). Configs are parsed on every read
+    # so that callers can modify them freely.
+    _configs: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def _cache_put(version_id: str, serialized: str) -> None:
+        AppVersionStore._configs[version_id] = serialized
+        AppVersionStore._configs.move_to_end(version_id)
+        while len(AppVersionStore._configs) > AppVersionStore.cache_size:
+            AppVersionStore._configs.popitem(last=False)
+
+    @staticmethod
+    async def _decode_stored(row: Dict[str, Any]) -> Any:
+        """Return the stored config_json (snapshot or delta) of a row as a Python value"""
+        row = await BlobStore.unpack_row(dict(row), json_fields=["config_json"])
+        stored = row["config_json"]
+        if isinstance(stored, str):
+            stored = json.loads(stored)
+        return stored
+
+    @staticmethod
+    async def create_version(project_id: str, flow_run_id: str, config_json: Dict[str, Any]) -> str:
+        """
+        Create a new app version, stored as a delta against the previous version
+        unless a snapshot is due
+
+        Args:
+            project_id: ID of the project
+            flow_run_id: ID of the flow run that generated the config
+            config_json: Full app configuration JSON
+
+        Returns:
+            ID of the created app version
+        """
+        # Normalize to plain JSON types so that the delta matches what is read back
+        serialized = json.dumps(config_json, cls=DateTimeEncoder)
+        config = json.loads(serialized)
+
+        query = """
+        SELECT id, version_number FROM app_versions
+        WHERE project_id = :project_id
+        ORDER BY version_number DESC
+        LIMIT 1
+        """
+        latest = await database.fetch_one(query=query, values={"project_id": project_id})
+        version_number = latest["version_number"] + 1 if latest else 1
+
+        stored: Any = config
+        base_version_id = None
+        if latest and (version_number - 1) % AppVersionStore.snapshot_interval != 0:
+            try:
+                previous = await AppVersionStore.get_config(latest["id"])
+                delta = config_delta.diff(previous, config)
+                # Fall back to a snapshot when the edit rewrote most of the config
+                if len(json.dumps(delta)) < len(serialized) // 2:
+                    stored = delta
+                    base_version_id = latest["id"]
+            except Exception as e:
+                logger.warning(f"Could not compute delta against version {latest['id']}, storing snapshot: {e}")
+
+        app_version_id = str(uuid.uuid4())
+        query = AppVersion.__table__.insert().values(
+            id=app_version_id,
+            project_id=project_id,
+            flow_run_id=flow_run_id,
+            version_number=version_number,
+            config_json=await BlobStore.pack_json(stored),
+            base_version_id=base_version_id,
+            created_at=datetime.utcnow()
+        )
+        await database.execute(query)
+
+        AppVersionStore._cache_put(app_version_id, serialized)
+        return app_version_id
+
+    @staticmethod
+    async def get_config(version_id: str, row: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Reconstruct the full config of an app version
+
+        Args:
+            version_id: ID of the app version
+            row: Already loaded app_versions row (with config_json and base_version_id), if any
+
+        Returns:
+            Full app configuration
+
+        Raises:
+            ValueError: If the version or one of its base versions does not exist
+        """
+        cached = AppVersionStore._configs.get(version_id)
+        if cached is not None:
+            AppVersionStore._configs.move_to_end(version_id)
+            return json.loads(cached)
+
+        # Walk back to the nearest cached version or snapshot
+        chain: List[Dict[str, Any]] = []
+        config: Any = None
+        current_id, current_row = version_id, row
+        while True:
+            cached = AppVersionStore._configs.get(current_id)
+            if cached is not None:
+                config = json.loads(cached)
+                break
+
+            if current_row is None or "base_version_id" not in current_row:
+                current_row = await database.fetch_one(
+                    query="SELECT id, config_json, base_version_id FROM app_versions WHERE id = :id",
+                    values={"id": current_id}
+                )
+                if not current_row:
+                    raise ValueError(f"App version {current_id} not found")
+                current_row = dict(current_row)
+
+            chain.append(current_row)
+            if not current_row["base_version_id"]:
+                break
+            current_id, current_row = current_row["base_version_id"], None
+
+        # Replay snapshot and deltas from the oldest to the requested version
+        for chain_row in reversed(chain):
+            stored = await AppVersionStore._decode_stored(chain_row)
+            config = config_delta.apply(config, stored) if chain_row["base_version_id"] else stored
+            AppVersionStore._cache_put(chain_row["id"], json.dumps(config))
+
+        return config
+
+    @staticmethod
+    async def _with_config(row: Any) -> Dict[str, Any]:
+        version = dict(row)
+        version["config_json"] = await AppVersionStore.get_config(version["id"], version)
+        return version
+
+    @staticmethod
+    async def get_version(version_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get an app version with its full config
+
+        Args:
+            version_id: ID of the app version
+
+        Returns:
+            App version data or None if not found
+        """
+        query = """
+        SELECT * FROM app_versions
+        WHERE id = :version_id
+        """
+        result = await database.fetch_one(query=query, values={"version_id": version_id})
+        if not result:
+            return None
+        return await AppVersionStore._with_config(result)
+
+    @staticmethod
+    async def get_latest_version(project_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the latest app version of a project with its full config
+
+        Args:
+            project_id: ID of the project
+
+        Returns:
+            App version data or None if the project has no versions
+        """
+        query = """
+        SELECT * FROM app_versions
+        WHERE project_id = :project_id
+        ORDER BY version_number DESC
+        LIMIT 1
+        """
+        result = await database.fetch_one(query=query, values={"project_id": project_id})
+        if not result:
+            return None
+        return await AppVersionStore._with_config(result)
+
+    @staticmethod
+    async def get_latest_version_id(project_id: str) -> Optional[str]:
+        """
+        Get the ID of the latest app version of a project, without loading its config
+
+        Args:
+            project_id: ID of the project
+
+        Returns:
+            App version ID or None if the project has no versions
+        """
+        query = """
+        SELECT id FROM app_versions
+        WHERE project_id = :project_id
+        ORDER BY version_number DESC
+        LIMIT 1
+        """
+        result = await database.fetch_one(query=query, values={"project_id": project_id})
+        return result["id"] if result else None
+
+    @staticmethod
+    async def diff_versions(version_id: str, against_version_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Structural diff between two app versions
+
+        Args:
+            version_id: ID of the newer app version
+            against_version_id: ID of the version to compare with. Defaults to the
+                                previous version of the same project.
+
+        Returns:
+            Dict with both version IDs and the list of changes, or None if a version
+            does not exist
+        """
+        query = """
+        SELECT id, project_id, version_number, config_json, base_version_id FROM app_versions
+        WHERE id = :version_id
+        """
+        version = await database.fetch_one(query=query, values={"version_id": version_id})
+        if not version:
+            return None
+        version = dict(version)
+
+        if against_version_id is None:
+            query = """
+            SELECT id FROM app_versions
+            WHERE project_id = :project_id AND version_number < :version_number
+            ORDER BY version_number DESC
+            LIMIT 1
+            """
+            previous = await database.fetch_one(
+                query=query,
+                values={"project_id": version["project_id"], "version_number": version["version_number"]}
+            )
+            against_version_id = previous["id"] if previous else None
+        elif not await database.fetch_one(
+            query="SELECT id FROM app_versions WHERE id = :id", values={"id": against_version_id}
+        ):
+            return None
+
+        new_config = await AppVersionStore.get_config(version_id, version)
+        old_config = await AppVersionStore.get_config(against_version_id) if against_version_id else {}
+
+        return {
+            "version_id": version_id,
+            "against_version_id": against_version_id,
+            "changes": config_delta.diff(old_config, new_config, include_old=True)
+        }
@@ -1,18 +1,24 @@
 import os
 from fastapi import Depends, HTTPException, Header
 from typing import Optional, Any
-from supabase import create_client, Client
-import jwt
-from jwt.exceptions import InvalidTokenError
 
-# Initialize Supabase client only in cloud mode
-supabase: Optional[Client] = None
-print("CLOUD_MODE", os.environ.get("CLOUD_MODE"))
-if os.environ.get("CLOUD_MODE") == "true":
-    supabase_url = os.environ.get("SUPABASE_URL")
-    supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-    if supabase_url and supabase_key:
-        supabase = create_client(supabase_url, supabase_key)
+# Supabase client, created on first use and only in cloud mode
+_supabase: Optional[Any] = None
+
+def get_supabase() -> Optional[Any]:
+    """
+    Supabase client of the cloud mode, or None in open source mode or
+    without SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY. The supabase package
+    is imported here so that it does not slow down the start of the API.
+    """
+    global _supabase
+    if _supabase is None and os.environ.get("CLOUD_MODE") == "true":
+        supabase_url = os.environ.get("SUPABASE_URL")
+        supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        if supabase_url and supabase_key:
+            from supabase import create_client
+            _supabase = create_client(supabase_url, supabase_key)
+    return _supabase
 
 async def get_authenticated_user(authorization: Optional[str] = Header(None)) -> Optional[dict]:
     """
@@ -26,6 +32,9 @@ async def get_authenticated_user(authorization: Optional[str] = Header(None)) ->
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header is missing")
     
+    import jwt
+    from jwt.exceptions import InvalidTokenError
+
     try:
         scheme, token = authorization.split()
         if scheme.lower() != "bearer":
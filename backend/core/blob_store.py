@@ -0,0 +1,402 @@
+import logging
+import json
+import hashlib
+import os
+import re
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Set, Tuple
+
+from db.database import database
+from db.models import Blob, FlowRun, StepRun, AppVersion
+from core.template_renderer import DateTimeEncoder
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Key of a JSON blob reference: {"$blob": "<sha256>"}
+BLOB_REF_KEY = "$blob"
+
+# Prefix of a text blob reference: "blob:sha256:<sha256>"
+TEXT_REF_PREFIX = "blob:sha256:"
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+class BlobStore:
+    """
+    Content-addressed, compressed storage for large JSON and text values.
+
+    Large values are stored once in the blobs table, keyed by the SHA-256 of
+    their serialized form, and the row columns only keep a small reference.
+    JSON columns are packed per top-level key so that sub-documents repeated
+    across rows (e.g. the app config passed into every edit step) share one blob.
+    """
+
+    enabled: bool = os.getenv("BLOB_STORE_ENABLED", "true").lower() == "true"
+
+    # Values whose serialized size is below this many bytes are stored inline
+    min_size: int = int(os.getenv("BLOB_MIN_SIZE", "2048"))
+
+    # Number of decoded blobs kept in memory
+    cache_size: int = int(os.getenv("BLOB_CACHE_SIZE", "512"))
+
+    # Number of blob hashes remembered as stored, to skip the existence check on writes
+    known_hashes_size: int = int(os.getenv("BLOB_KNOWN_HASHES_SIZE", "4096"))
+
+    codec: str = "zstd" if zstandard is not None else "zlib"
+
+    # hash -> (kind, decompressed text) (LRU). Values are decoded on every read
+    # so that callers can mutate what they get back without touching the cache.
+    _cache: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+
+    # Hashes known to exist in the blobs table (LRU)
+    _known_hashes: "OrderedDict[str, None]" = OrderedDict()
+
+    @staticmethod
+    def _compress(data: bytes) -> Tuple[str, bytes]:
+        if BlobStore.codec == "zstd":
+            return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+        return "zlib", zlib.compress(data, 6)
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Blob is zstd-compressed but the zstandard package is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == "zlib":
+            return zlib.decompress(data)
+        raise ValueError(f"Unknown blob codec: {codec}")
+
+    @staticmethod
+    def _cache_put(blob_hash: str, entry: Tuple[str, str]) -> None:
+        BlobStore._cache[blob_hash] = entry
+        BlobStore._cache.move_to_end(blob_hash)
+        while len(BlobStore._cache) > BlobStore.cache_size:
+            BlobStore._cache.popitem(last=False)
+
+    @staticmethod
+    def _remember(blob_hash: str) -> None:
+        BlobStore._known_hashes[blob_hash] = None
+        BlobStore._known_hashes.move_to_end(blob_hash)
+        while len(BlobStore._known_hashes) > BlobStore.known_hashes_size:
+            BlobStore._known_hashes.popitem(last=False)
+
+    @staticmethod
+    async def _put_raw(raw: bytes, kind: str) -> str:
+        blob_hash = hashlib.sha256(raw).hexdigest()
+        if blob_hash in BlobStore._known_hashes:
+            BlobStore._known_hashes.move_to_end(blob_hash)
+            return blob_hash
+
+        exists = await database.fetch_one(
+            query="SELECT hash FROM blobs WHERE hash = :hash",
+            values={"hash": blob_hash}
+        )
+        if not exists:
+            codec, data = BlobStore._compress(raw)
+            try:
+                await database.execute(Blob.__table__.insert().values(
+                    hash=blob_hash,
+                    kind=kind,
+                    codec=codec,
+                    size=len(raw),
+                    data=data,
+                    created_at=datetime.utcnow()
+                ))
+            except Exception as e:
+                # Another writer may have stored the same blob concurrently
+                logger.debug(f"Blob {blob_hash} insert skipped: {e}")
+
+        BlobStore._remember(blob_hash)
+        BlobStore._cache_put(blob_hash, (kind, raw.decode("utf-8")))
+        return blob_hash
+
+    @staticmethod
+    async def get_many(hashes: Iterable[str]) -> Dict[str, Any]:
+        """
+        Load and decode blobs, using the in-memory cache where possible
+
+        Args:
+            hashes: Blob hashes to load
+
+        Returns:
+            Dict mapping hash to decoded value (JSON value or string)
+        """
+        entries = await BlobStore._load_many(hashes)
+        return {blob_hash: BlobStore._decode(entry) for blob_hash, entry in entries.items()}
+
+    @staticmethod
+    def _decode(entry: Tuple[str, str]) -> Any:
+        kind, text = entry
+        return json.loads(text) if kind == "json" else text
+
+    @staticmethod
+    async def _load_many(hashes: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        found: Dict[str, Tuple[str, str]] = {}
+        missing: List[str] = []
+        for blob_hash in set(hashes):
+            if blob_hash in BlobStore._cache:
+                BlobStore._cache.move_to_end(blob_hash)
+                found[blob_hash] = BlobStore._cache[blob_hash]
+            else:
+                missing.append(blob_hash)
+
+        if missing:
+            rows = await database.fetch_all(
+                Blob.__table__.select().where(Blob.hash.in_(missing))
+            )
+            for row in rows:
+                entry = (row["kind"], BlobStore._decompress(row["codec"], row["data"]).decode("utf-8"))
+                found[row["hash"]] = entry
+                BlobStore._remember(row["hash"])
+                BlobStore._cache_put(row["hash"], entry)
+
+            not_found = set(missing) - set(found)
+            if not_found:
+                logger.error(f"Missing blobs: {', '.join(sorted(not_found))}")
+
+        return found
+
+    @staticmethod
+    def _is_json_ref(value: Any) -> bool:
+        return (
+            isinstance(value, dict)
+            and len(value) == 1
+            and isinstance(value.get(BLOB_REF_KEY), str)
+            and _HASH_RE.match(value[BLOB_REF_KEY]) is not None
+        )
+
+    @staticmethod
+    def _is_text_ref(value: Any) -> bool:
+        return (
+            isinstance(value, str)
+            and value.startswith(TEXT_REF_PREFIX)
+            and _HASH_RE.match(value[len(TEXT_REF_PREFIX):]) is not None
+        )
+
+    @staticmethod
+    async def pack_json(value: Any) -> Any:
+        """
+        Replace large top-level values of a JSON document with blob references
+
+        Args:
+            value: Value to be written to a JSON column
+
+        Returns:
+            Value with large parts replaced by {"$blob": hash} references
+        """
+        if not BlobStore.enabled or value is None:
+            return value
+
+        if isinstance(value, dict):
+            packed = {}
+            for key, item in value.items():
+                packed[key] = await BlobStore._pack_item(item)
+            return packed
+
+        return await BlobStore._pack_item(value)
+
+    @staticmethod
+    async def _pack_item(item: Any) -> Any:
+        if not isinstance(item, (dict, list, str)) or BlobStore._is_json_ref(item):
+            return item
+
+        raw = json.dumps(item, cls=DateTimeEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if len(raw) < BlobStore.min_size:
+            return item
+
+        blob_hash = await BlobStore._put_raw(raw, "json")
+        return {BLOB_REF_KEY: blob_hash}
+
+    @staticmethod
+    async def pack_text(value: Optional[str]) -> Optional[str]:
+        """
+        Replace a large text value with a blob reference
+
+        Args:
+            value: Value to be written to a text column
+
+        Returns:
+            The value itself or a "blob:sha256:<hash>" reference
+        """
+        if not BlobStore.enabled or not isinstance(value, str) or BlobStore._is_text_ref(value):
+            return value
+
+        raw = value.encode("utf-8")
+        if len(raw) < BlobStore.min_size:
+            return value
+
+        blob_hash = await BlobStore._put_raw(raw, "text")
+        return TEXT_REF_PREFIX + blob_hash
+
+    @staticmethod
+    def _collect_refs(value: Any, refs: Set[str]) -> None:
+        if BlobStore._is_json_ref(value):
+            refs.add(value[BLOB_REF_KEY])
+        elif isinstance(value, dict):
+            for item in value.values():
+                BlobStore._collect_refs(item, refs)
+        elif isinstance(value, list):
+            for item in value:
+                BlobStore._collect_refs(item, refs)
+
+    @staticmethod
+    def _resolve(value: Any, blobs: Dict[str, Tuple[str, str]]) -> Any:
+        if BlobStore._is_json_ref(value):
+            entry = blobs.get(value[BLOB_REF_KEY])
+            return BlobStore._decode(entry) if entry else None
+        if isinstance(value, dict):
+            return {k: BlobStore._resolve(v, blobs) for k, v in value.items()}
+        if isinstance(value, list):
+            return [BlobStore._resolve(v, blobs) for v in value]
+        return value
+
+    @staticmethod
+    def _parse_packed(value: Any) -> Tuple[Any, bool]:
+        """Parse a JSON column value returned as a string by raw queries"""
+        if isinstance(value, str):
+            if BLOB_REF_KEY not in value:
+                return value, False
+            try:
+                return json.loads(value), True
+            except json.JSONDecodeError:
+                return value, False
+        return value, False
+
+    @staticmethod
+    async def unpack_rows(
+        rows: List[Dict[str, Any]],
+        json_fields: Iterable[str] = (),
+        text_fields: Iterable[str] = ()
+    ) -> List[Dict[str, Any]]:
+        """
+        Resolve blob references in the given columns of a list of rows, in place.
+        All referenced blobs are loaded with a single query.
+
+        JSON columns keep the type they were read with: raw SQL queries return
+        JSON columns as strings and these are returned as strings again.
+
+        Args:
+            rows: Rows as dicts
+            json_fields: Names of JSON columns
+            text_fields: Names of text columns
+
+        Returns:
+            The same rows with references resolved
+        """
+        json_fields = list(json_fields)
+        text_fields = list(text_fields)
+
+        refs: Set[str] = set()
+        parsed: Dict[Tuple[int, str], Tuple[Any, bool]] = {}
+        for index, row in enumerate(rows):
+            for field in json_fields:
+                if row.get(field) is None:
+                    continue
+                value, was_string = BlobStore._parse_packed(row[field])
+                if was_string or not isinstance(value, str):
+                    parsed[(index, field)] = (value, was_string)
+                    BlobStore._collect_refs(value, refs)
+            for field in text_fields:
+                if BlobStore._is_text_ref(row.get(field)):
+                    refs.add(row[field][len(TEXT_REF_PREFIX):])
+
+        if not refs:
+            return rows
+
+        blobs = await BlobStore._load_many(refs)
+        for (index, field), (value, was_string) in parsed.items():
+            resolved = BlobStore._resolve(value, blobs)
+            rows[index][field] = json.dumps(resolved) if was_string else resolved
+        for row in rows:
+            for field in text_fields:
+                if BlobStore._is_text_ref(row.get(field)):
+                    entry = blobs.get(row[field][len(TEXT_REF_PREFIX):])
+                    row[field] = entry[1] if entry else None
+
+        return rows
+
+    @staticmethod
+    async def unpack_row(
+        row: Dict[str, Any],
+        json_fields: Iterable[str] = (),
+        text_fields: Iterable[str] = ()
+    ) -> Dict[str, Any]:
+        """Resolve blob references in a single row, in place (see unpack_rows)"""
+        await BlobStore.unpack_rows([row], json_fields, text_fields)
+        return row
+
+    @staticmethod
+    async def migrate_existing_rows(batch_size: int = 200) -> Dict[str, int]:
+        """
+        Move large values of existing rows into the blob store.
+        Rows that are already packed are left unchanged, so the migration can be re-run.
+        SQLite only returns the freed pages to the OS after a VACUUM.
+
+        Args:
+            batch_size: Number of rows read per query
+
+        Returns:
+            Dict mapping table name to the number of updated rows
+        """
+        targets = [
+            (FlowRun, ["output"], []),
+            (StepRun, ["input_data", "output_data"], ["rendered_prompt"]),
+            (AppVersion, ["config_json"], []),
+        ]
+        updated: Dict[str, int] = {}
+
+        for model, json_fields, text_fields in targets:
+            table = model.__table__
+            count = 0
+            last_id = ""
+            while True:
+                rows = await database.fetch_all(
+                    table.select()
+                    .with_only_columns(table.c.id, *[table.c[f] for f in json_fields + text_fields])
+                    .where(table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                )
+                if not rows:
+                    break
+
+                for row in rows:
+                    row = dict(row)
+                    values = {}
+                    for field in json_fields:
+                        packed = await BlobStore.pack_json(row[field])
+                        if packed != row[field]:
+                            values[field] = packed
+                    for field in text_fields:
+                        packed = await BlobStore.pack_text(row[field])
+                        if packed != row[field]:
+                            values[field] = packed
+                    if values:
+                        await database.execute(table.update().where(table.c.id == row["id"]).values(**values))
+                        count += 1
+                    last_id = row["id"]
+
+            updated[table.name] = count
+            logger.info(f"Blob migration: packed {count} rows of {table.name}")
+
+        return updated
+
+if __name__ == "__main__":
+    import asyncio
+    from db.database import init_db, close_db_connection
+
+    async def _main():
+        await init_db()
+        try:
+            print(await BlobStore.migrate_existing_rows())
+        finally:
+            await close_db_connection()
+
+    asyncio.run(_main())
@@ -0,0 +1,252 @@
+import logging
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, AsyncIterator, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when the code generator output changes, so that cached exports are rebuilt
+GENERATOR_VERSION = "2"
+
+# ThreadPoolExecutor for building zip archives off the event loop
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("CODE_EXPORT_WORKERS", "2")))
+
+class _StreamSink:
+    """
+    Unseekable file-like object that receives the zip archive. Data is written
+    to the cache file and handed to the response in chunks of `chunk_size` bytes.
+    """
+
+    def __init__(self, file, emit: Callable[[bytes], None], chunk_size: int = 64 * 1024):
+        self._file = file
+        self._emit = emit
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._file.write(data)
+        self._buffer += data
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+
+class CodeExporter:
+    """
+    Builds the downloadable source code archive of a generated app.
+
+    The static baseApp files are read once and kept in memory until the baseApp
+    tree changes. Generated files are written straight into the zip stream, which
+    is sent to the client while it is being built and stored in a disk cache keyed
+    by app version, so repeated downloads are served from the cached file.
+    """
+
+    base_app_path: str = os.getenv(
+        "BASE_APP_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "baseApp")
+    )
+
+    cache_dir: str = os.getenv("CODE_EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "code_export_cache"))
+
+    # Maximum number of cached archives kept on disk
+    cache_size: int = int(os.getenv("CODE_EXPORT_CACHE_SIZE", "50"))
+
+    # Top-level baseApp entries that are not part of the export
+    excluded: Tuple[str, ...] = ("node_modules", ".git", "dist")
+
+    # Seconds for which the baseApp fingerprint is reused before the tree is scanned again
+    fingerprint_ttl: float = float(os.getenv("CODE_EXPORT_FINGERPRINT_TTL", "5"))
+
+    # Pre-packaged baseApp: fingerprint, time of the last scan and list of (archive name, content, mtime)
+    _base_fingerprint: Optional[str] = None
+    _base_checked: float = 0.0
+    _base_files: List[Tuple[str, bytes, float]] = []
+    _base_lock = threading.Lock()
+
+    @staticmethod
+    def _scan_base_app() -> List[Tuple[str, str, os.stat_result]]:
+        entries = []
+        for item in sorted(os.listdir(CodeExporter.base_app_path)):
+            if item in CodeExporter.excluded:
+                continue
+            src_path = os.path.join(CodeExporter.base_app_path, item)
+            if os.path.isdir(src_path):
+                for root, dirs, files in os.walk(src_path):
+                    dirs.sort()
+                    for file in sorted(files):
+                        file_path = os.path.join(root, file)
+                        arc_name = os.path.relpath(file_path, CodeExporter.base_app_path).replace(os.sep, "/")
+                        entries.append((arc_name, file_path, os.stat(file_path)))
+            else:
+                entries.append((item, src_path, os.stat(src_path)))
+        return entries
+
+    @staticmethod
+    def load_base_app() -> Tuple[str, List[Tuple[str, bytes, float]]]:
+        """
+        Return the pre-packaged baseApp files, reloading them if the tree changed
+
+        Returns:
+            Tuple of (fingerprint, list of (archive name, content, mtime))
+        """
+        entries = CodeExporter._scan_base_app()
+        digest = hashlib.sha256()
+        for arc_name, _, stat in entries:
+            digest.update(f"{arc_name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+        fingerprint = digest.hexdigest()
+
+        with CodeExporter._base_lock:
+            if fingerprint != CodeExporter._base_fingerprint:
+                files = []
+                for arc_name, file_path, stat in entries:
+                    with open(file_path, "rb") as f:
+                        files.append((arc_name, f.read(), stat.st_mtime))
+                CodeExporter._base_files = files
+                CodeExporter._base_fingerprint = fingerprint
+                logger.info(f"Loaded {len(files)} baseApp files for code export")
+            CodeExporter._base_checked = time.monotonic()
+            return CodeExporter._base_fingerprint, CodeExporter._base_files
+
+    @staticmethod
+    async def etag(version_id: str) -> str:
+        """
+        ETag of the export of an app version. Changes when the baseApp or the generator changes.
+
+        The baseApp tree is scanned in a worker thread, at most once per
+        `fingerprint_ttl` seconds.
+
+        Args:
+            version_id: ID of the app version
+
+        Returns:
+            Quoted ETag value
+        """
+        base_fingerprint = CodeExporter._base_fingerprint
+        if base_fingerprint is None or time.monotonic() - CodeExporter._base_checked >= CodeExporter.fingerprint_ttl:
+            base_fingerprint, _ = await asyncio.to_thread(CodeExporter.load_base_app)
+        key = f"{version_id}:{base_fingerprint}:{GENERATOR_VERSION}"
+        return f'"{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}"'
+
+    @staticmethod
+    def _cache_path(etag: str) -> str:
+        return os.path.join(CodeExporter.cache_dir, f"{etag.strip(chr(34))}.zip")
+
+    @staticmethod
+    def get_cached(etag: str) -> Optional[str]:
+        """
+        Path of the cached archive for an ETag, if it exists
+
+        Args:
+            etag: ETag returned by CodeExporter.etag
+
+        Returns:
+            File path or None
+        """
+        path = CodeExporter._cache_path(etag)
+        if os.path.exists(path):
+            # Touch so that pruning keeps recently downloaded archives
+            os.utime(path)
+            return path
+        return None
+
+    @staticmethod
+    def _prune_cache() -> None:
+        try:
+            archives = [
+                os.path.join(CodeExporter.cache_dir, name)
+                for name in os.listdir(CodeExporter.cache_dir)
+                if name.endswith(".zip")
+            ]
+            archives.sort(key=os.path.getmtime, reverse=True)
+            for path in archives[CodeExporter.cache_size:]:
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"Error pruning code export cache: {e}")
+
+    @staticmethod
+    def _write_archive(sink: _StreamSink, generated_files: Dict[str, str]) -> None:
+        _, base_files = CodeExporter.load_base_app()
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+            for arc_name, content, mtime in base_files:
+                # Generated files replace the baseApp file with the same path
+                if arc_name in generated_files:
+                    continue
+                info = zipfile.ZipInfo(arc_name, date_time=time.localtime(max(mtime, 315532800))[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, content)
+
+            date_time = time.localtime()[:6]
+            for arc_name, content in generated_files.items():
+                info = zipfile.ZipInfo(arc_name, date_time=date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                zf.writestr(info, content)
+        sink.flush()
+
+    @staticmethod
+    async def stream_archive(etag: str, build_files: Callable[[], Dict[str, str]]) -> AsyncIterator[bytes]:
+        """
+        Build the archive in a worker thread and yield it while it is being written.
+        The complete archive is stored in the disk cache under the ETag.
+
+        Args:
+            etag: ETag returned by CodeExporter.etag
+            build_files: Returns the generated files (archive path -> content);
+                         called in the worker thread
+
+        Yields:
+            Chunks of the zip archive
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        # Bounds the number of chunks waiting to be sent to the client
+        slots = threading.Semaphore(8)
+        cancelled = threading.Event()
+        done = object()
+
+        def emit(chunk: bytes) -> None:
+            while not slots.acquire(timeout=0.5):
+                if cancelled.is_set():
+                    raise ConnectionError("Client disconnected")
+            loop.call_soon_threadsafe(queue.put_nowait, chunk)
+
+        def produce() -> None:
+            os.makedirs(CodeExporter.cache_dir, exist_ok=True)
+            final_path = CodeExporter._cache_path(etag)
+            tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    CodeExporter._write_archive(_StreamSink(f, emit), build_files())
+                os.replace(tmp_path, final_path)
+                CodeExporter._prune_cache()
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except BaseException as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        loop.run_in_executor(executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    logger.error(f"Error generating code archive: {item}")
+                    raise item
+                slots.release()
+                yield item
+        finally:
+            cancelled.set()
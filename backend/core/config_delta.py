@@ -0,0 +1,129 @@
+"""
+Structural diff and patch for JSON documents such as app configs.
+
+Deltas are lists of JSON Patch (RFC 6902) style operations using JSON Pointer
+paths, e.g. {"op": "replace", "path": "/pages/2/title", "value": "Orders"}.
+Lists are compared index by index; items added or removed at the end become
+add/remove operations.
+"""
+
+import copy
+from typing import Any, Dict, List
+
+def _escape(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+def _changed(old: Any, new: Any) -> bool:
+    # Compare types too, since True == 1 and 1 == 1.0 in Python
+    return type(old) is not type(new) or old != new
+
+def diff(old: Any, new: Any, include_old: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compute the operations that turn `old` into `new`
+
+    Args:
+        old: Original document
+        new: Updated document
+        include_old: Whether to add the previous value ("old_value") to replace
+                     and remove operations, for display purposes
+
+    Returns:
+        List of patch operations (empty if the documents are equal)
+    """
+    ops: List[Dict[str, Any]] = []
+    _diff(old, new, "", ops, include_old)
+    return ops
+
+def _diff(old: Any, new: Any, path: str, ops: List[Dict[str, Any]], include_old: bool) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                op = {"op": "remove", "path": f"{path}/{_escape(key)}"}
+                if include_old:
+                    op["old_value"] = old[key]
+                ops.append(op)
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                _diff(old[key], value, child, ops, include_old)
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        for index in range(common):
+            _diff(old[index], new[index], f"{path}/{index}", ops, include_old)
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        # Remove from the end so that indexes stay valid while applying
+        for index in range(len(old) - 1, common - 1, -1):
+            op = {"op": "remove", "path": f"{path}/{index}"}
+            if include_old:
+                op["old_value"] = old[index]
+            ops.append(op)
+        return
+
+    if _changed(old, new):
+        op = {"op": "replace", "path": path, "value": new}
+        if include_old:
+            op["old_value"] = old
+        ops.append(op)
+
+def apply(document: Any, ops: List[Dict[str, Any]]) -> Any:
+    """
+    Apply patch operations created by diff()
+
+    Args:
+        document: Document to patch (not modified)
+        ops: Patch operations
+
+    Returns:
+        Patched copy of the document
+
+    Raises:
+        ValueError: If an operation does not match the document
+    """
+    result = copy.deepcopy(document)
+
+    for op in ops:
+        path = op["path"]
+        if path == "":
+            if op["op"] == "remove":
+                raise ValueError("Cannot remove the document root")
+            result = copy.deepcopy(op["value"])
+            continue
+
+        tokens = [_unescape(token) for token in path.split("/")[1:]]
+        parent = result
+        try:
+            for token in tokens[:-1]:
+                parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise ValueError(f"Invalid patch path: {path}")
+
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = int(last)
+            if op["op"] == "add" and index <= len(parent):
+                parent.insert(index, copy.deepcopy(op["value"]))
+            elif op["op"] == "remove" and index < len(parent):
+                del parent[index]
+            elif op["op"] == "replace" and index < len(parent):
+                parent[index] = copy.deepcopy(op["value"])
+            else:
+                raise ValueError(f"Invalid patch path: {path}")
+        elif isinstance(parent, dict):
+            if op["op"] == "remove":
+                if last not in parent:
+                    raise ValueError(f"Invalid patch path: {path}")
+                del parent[last]
+            else:
+                parent[last] = copy.deepcopy(op["value"])
+        else:
+            raise ValueError(f"Invalid patch path: {path}")
+
+    return result
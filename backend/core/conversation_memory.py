@@ -0,0 +1,181 @@
+import logging
+import os
+import re
+from collections import OrderedDict, deque
+from typing import Dict, Any, Deque, List, Optional
+
+from sqlalchemy import select
+
+from db.database import database
+from db.models import Message
+from core.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+class _Conversation:
+    """In-memory history of one project: a rolling summary and the recent messages"""
+
+    def __init__(self):
+        self.summary_lines: Deque[str] = deque()
+        self.summary_tokens = 0
+        self.omitted = 0
+        self.window: Deque[Dict[str, Any]] = deque()
+        self.window_tokens = 0
+
+class ConversationMemory:
+    """
+    Per-project message history for agent prompts.
+
+    Recent messages are kept verbatim up to a token budget. Older messages are
+    condensed into a rolling summary, which itself is capped. The history is
+    loaded from the database once per project and then updated as messages are
+    saved, so building a prompt does not read the messages again. Before a
+    cached history is used, the ID of the newest message in the database is
+    compared with the newest cached one, so messages saved by another process
+    (worker) cause a reload.
+    """
+
+    enabled: bool = os.getenv("CONVERSATION_MEMORY_ENABLED", "true").lower() == "true"
+
+    # Token budget of the verbatim recent messages
+    window_tokens: int = int(os.getenv("CONVERSATION_WINDOW_TOKENS", "2000"))
+
+    # Token budget of the summary of older messages
+    summary_tokens: int = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "500"))
+
+    # Number of projects whose history is kept in memory
+    cache_size: int = int(os.getenv("CONVERSATION_CACHE_SIZE", "256"))
+
+    # Check the newest message before using a cached history; can be turned
+    # off when a single process saves all messages
+    revalidate: bool = os.getenv("CONVERSATION_MEMORY_REVALIDATE", "true").lower() == "true"
+
+    # Messages loaded from the database when a project is not cached
+    load_limit: int = 50
+
+    # Characters of a message kept in its summary line
+    summary_line_chars: int = 200
+
+    # project id -> conversation (LRU)
+    _conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+
+    @staticmethod
+    def _message_tokens(message: Dict[str, Any]) -> int:
+        return count_tokens(f"{message.get('role', '')}: {message.get('content') or ''}")
+
+    @staticmethod
+    def _summarize(message: Dict[str, Any]) -> str:
+        content = re.sub(r"\s+", " ", message.get("content") or "").strip()
+        if len(content) > ConversationMemory.summary_line_chars:
+            content = content[:ConversationMemory.summary_line_chars].rstrip() + "..."
+        return f"{message.get('role')}: {content}"
+
+    @staticmethod
+    def _add(conversation: _Conversation, message: Dict[str, Any]) -> None:
+        conversation.window.append(message)
+        conversation.window_tokens += ConversationMemory._message_tokens(message)
+
+        # Move the oldest messages into the summary, always keeping the newest one
+        while conversation.window_tokens > ConversationMemory.window_tokens and len(conversation.window) > 1:
+            oldest = conversation.window.popleft()
+            conversation.window_tokens -= ConversationMemory._message_tokens(oldest)
+            line = ConversationMemory._summarize(oldest)
+            conversation.summary_lines.append(line)
+            conversation.summary_tokens += count_tokens(line)
+
+        while conversation.summary_tokens > ConversationMemory.summary_tokens and conversation.summary_lines:
+            line = conversation.summary_lines.popleft()
+            conversation.summary_tokens -= count_tokens(line)
+            conversation.omitted += 1
+
+    @staticmethod
+    async def _newest_id(project_id: str) -> Optional[str]:
+        query = select(Message.id).where(
+            (Message.project_id == project_id) &
+            (Message.role != "system")
+        ).order_by(Message.created_at.desc(), Message.id.desc()).limit(1)
+        result = await database.fetch_one(query)
+        return result["id"] if result else None
+
+    @staticmethod
+    async def _load(project_id: str) -> _Conversation:
+        query = Message.__table__.select().where(
+            (Message.project_id == project_id) &
+            (Message.role != "system")
+        ).order_by(Message.created_at.desc(), Message.id.desc()).limit(ConversationMemory.load_limit)
+        results = await database.fetch_all(query)
+
+        conversation = _Conversation()
+        for result in reversed(results):
+            ConversationMemory._add(conversation, dict(result))
+        return conversation
+
+    @staticmethod
+    async def get_history(project_id: str) -> List[Dict[str, Any]]:
+        """
+        Message history of a project for agent prompts
+
+        Args:
+            project_id: ID of the project
+
+        Returns:
+            Recent messages in chronological order. If older messages were
+            condensed, the list starts with a message with role "summary".
+        """
+        conversation = ConversationMemory._conversations.get(project_id)
+        if conversation is not None and ConversationMemory.revalidate:
+            # Saved by another process since the history was cached
+            cached_newest = conversation.window[-1].get("id") if conversation.window else None
+            if await ConversationMemory._newest_id(project_id) != cached_newest:
+                conversation = None
+        if conversation is None:
+            conversation = await ConversationMemory._load(project_id)
+            ConversationMemory._conversations[project_id] = conversation
+            while len(ConversationMemory._conversations) > ConversationMemory.cache_size:
+                ConversationMemory._conversations.popitem(last=False)
+        ConversationMemory._conversations.move_to_end(project_id)
+
+        history = [dict(message) for message in conversation.window]
+        if conversation.summary_lines or conversation.omitted:
+            lines = list(conversation.summary_lines)
+            if conversation.omitted:
+                lines.insert(0, f"({conversation.omitted} earlier messages omitted)")
+            history.insert(0, {
+                "id": None,
+                "project_id": project_id,
+                "role": "summary",
+                "content": "Summary of the earlier conversation:\n" + "\n".join(lines),
+                "created_at": None
+            })
+        return history
+
+    @staticmethod
+    def append(message: Dict[str, Any]) -> None:
+        """
+        Add a saved message to the cached history of its project
+
+        Args:
+            message: Message row (id, project_id, role, content, created_at)
+        """
+        if message.get("role") == "system":
+            return
+        conversation = ConversationMemory._conversations.get(message["project_id"])
+        if conversation is None:
+            # Not cached: the message is read from the database on the next load
+            return
+        if any(cached.get("id") == message.get("id") for cached in conversation.window):
+            return
+        ConversationMemory._add(conversation, message)
+
+    @staticmethod
+    def invalidate(project_id: Optional[str] = None) -> None:
+        """
+        Drop the cached history of a project, or of all projects
+
+        Args:
+            project_id: ID of the project, or None for all projects
+        """
+        if project_id is None:
+            ConversationMemory._conversations.clear()
+        else:
+            ConversationMemory._conversations.pop(project_id, None)
@@ -0,0 +1,190 @@
+import logging
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A classifier gets the user message and a context dict ("has_existing_app",
+# "message_history") and returns (main_decision, confidence) or None
+Classifier = Callable[[str, Dict[str, Any]], Optional[Tuple[Dict[str, Any], float]]]
+
+# Actions whose decision only depends on the message and the app state, not on
+# the conversation, and can therefore be reused for a repeated message
+CACHEABLE_ACTIONS = ("start_create_flow", "start_edit_flow", "reject")
+
+_GREETINGS = {"hi", "hello", "hey", "hi there", "hello there", "hey there", "good morning", "good afternoon", "good evening"}
+_THANKS = {"thanks", "thank you", "thx", "thanks a lot", "thank you very much", "great thanks", "ok thanks", "perfect thanks"}
+
+_EDIT_VERB_RE = re.compile(r"^(add|remove|delete|rename|change|update|replace|move) (a |an |the )?\w+")
+
+def normalize_message(message: str) -> str:
+    """Lowercase the message and collapse whitespace and trailing punctuation"""
+    return re.sub(r"\s+", " ", message).strip().lower().rstrip("!.?, ")
+
+def rules_classifier(message: str, context: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], float]]:
+    """
+    Keyword rules for messages that do not need the main agent.
+
+    Greetings and thanks are answered directly. Short imperative edit requests
+    ("add a status field to orders") are routed to the edit flow with a lower
+    confidence, so they only take the fast path when the threshold allows it.
+    """
+    text = normalize_message(message)
+    has_existing_app = context.get("has_existing_app", False)
+
+    if text in _GREETINGS:
+        reply = (
+            "Hi! Tell me what you would like to change in your app."
+            if has_existing_app else
+            "Hi! Describe the app you would like to build and I will generate it for you."
+        )
+        return {"action": "respond_with_info", "reason": "Greeting", "prompt": reply}, 0.95
+
+    if text in _THANKS:
+        return {
+            "action": "respond_with_info",
+            "reason": "Thanks",
+            "prompt": "You're welcome! Let me know if you would like any other changes."
+        }, 0.95
+
+    if has_existing_app and "?" not in message and len(text.split()) <= 20 and _EDIT_VERB_RE.match(text):
+        return {"action": "start_edit_flow", "reason": "Edit request", "prompt": message.strip()}, 0.8
+
+    return None
+
+class DecisionClassifier:
+    """
+    Fast path in front of the main agent flow.
+
+    Registered classifiers are tried in order and the first decision with a
+    confidence of at least `min_confidence` is used without calling the LLM.
+    Main agent decisions for create/edit/reject are memoized per project, app
+    version and normalized message, so a repeated message skips the LLM too.
+    """
+
+    enabled: bool = os.getenv("DECISION_CLASSIFIER_ENABLED", "true").lower() == "true"
+
+    # Minimum confidence of a classifier decision to skip the main agent
+    min_confidence: float = float(os.getenv("DECISION_CLASSIFIER_MIN_CONFIDENCE", "0.9"))
+
+    cache_enabled: bool = os.getenv("DECISION_CACHE_ENABLED", "true").lower() == "true"
+
+    # Seconds a memoized decision stays valid
+    cache_ttl: float = float(os.getenv("DECISION_CACHE_TTL", "600"))
+
+    # Maximum number of memoized decisions
+    cache_size: int = int(os.getenv("DECISION_CACHE_SIZE", "1024"))
+
+    _classifiers: List[Classifier] = [rules_classifier]
+
+    # key -> (expiry timestamp, main_decision) (LRU)
+    _decisions: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def register(classifier: Classifier, first: bool = False) -> None:
+        """
+        Add a classifier, e.g. a small local model
+
+        Args:
+            classifier: Callable returning (main_decision, confidence) or None
+            first: Whether to try it before the registered classifiers
+        """
+        if first:
+            DecisionClassifier._classifiers.insert(0, classifier)
+        else:
+            DecisionClassifier._classifiers.append(classifier)
+
+    @staticmethod
+    def classify(message: str, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Try to decide on a message without the main agent
+
+        Args:
+            message: Content of the user message
+            context: Dict with "has_existing_app" and "message_history"
+
+        Returns:
+            Decision in the main agent output format ({"main_decision": {...}}) or None
+        """
+        if not DecisionClassifier.enabled:
+            return None
+
+        for classifier in DecisionClassifier._classifiers:
+            try:
+                result = classifier(message, context)
+            except Exception as e:
+                logger.warning(f"Decision classifier {getattr(classifier, '__name__', classifier)} failed: {e}")
+                continue
+            if result is None:
+                continue
+            decision, confidence = result
+            if confidence >= DecisionClassifier.min_confidence:
+                logger.info(f"Fast-path decision {decision.get('action')} (confidence {confidence})")
+                return {"main_decision": decision}
+        return None
+
+    @staticmethod
+    def _cache_key(project_id: str, version_id: Optional[str], message: str) -> str:
+        normalized = normalize_message(message)
+        return hashlib.sha256(f"{project_id}\n{version_id or ''}\n{normalized}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_cached(project_id: str, version_id: Optional[str], message: str) -> Optional[Dict[str, Any]]:
+        """
+        Memoized main agent decision for a message
+
+        Args:
+            project_id: ID of the project
+            version_id: ID of the latest app version (None if the project has no app yet)
+            message: Content of the user message
+
+        Returns:
+            Decision in the main agent output format or None
+        """
+        if not DecisionClassifier.cache_enabled:
+            return None
+
+        key = DecisionClassifier._cache_key(project_id, version_id, message)
+        entry = DecisionClassifier._decisions.get(key)
+        if entry is None:
+            return None
+        expires_at, decision = entry
+        if expires_at < time.monotonic():
+            DecisionClassifier._decisions.pop(key, None)
+            return None
+        DecisionClassifier._decisions.move_to_end(key)
+        return {"main_decision": dict(decision)}
+
+    @staticmethod
+    def remember(project_id: str, version_id: Optional[str], message: str, decision: Dict[str, Any]) -> None:
+        """
+        Memoize a main agent decision if its action does not depend on the conversation
+
+        Args:
+            project_id: ID of the project
+            version_id: ID of the latest app version (None if the project has no app yet)
+            message: Content of the user message
+            decision: Output of the main agent flow
+        """
+        main_decision = decision.get("main_decision") if isinstance(decision, dict) else None
+        if (
+            not DecisionClassifier.cache_enabled
+            or not isinstance(main_decision, dict)
+            or main_decision.get("action") not in CACHEABLE_ACTIONS
+        ):
+            return
+
+        key = DecisionClassifier._cache_key(project_id, version_id, message)
+        DecisionClassifier._decisions[key] = (time.monotonic() + DecisionClassifier.cache_ttl, dict(main_decision))
+        DecisionClassifier._decisions.move_to_end(key)
+        while len(DecisionClassifier._decisions) > DecisionClassifier.cache_size:
+            DecisionClassifier._decisions.popitem(last=False)
+
+    @staticmethod
+    def clear() -> None:
+        """Drop all memoized decisions"""
+        DecisionClassifier._decisions.clear()
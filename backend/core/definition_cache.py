@@ -0,0 +1,110 @@
+import copy
+import logging
+import os
+import time
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, Hashable
+
+logger = logging.getLogger(__name__)
+
+class DefinitionCache:
+    """
+    Versioned in-process cache for flow definitions, steps and step assets.
+    Definitions only change when an admin edits them, so entries live until
+    the cache is invalidated or (optionally) their TTL expires.
+
+    Values are deep-copied in and out: rows hold nested JSON (input maps,
+    schemas, one-shot examples) that callers may modify.
+    """
+
+    # key -> (version, stored_at, value)
+    _entries: Dict[Hashable, Tuple[int, float, Any]] = {}
+
+    # Bumped on every invalidation; entries loaded under an older version are discarded
+    _version: int = 0
+
+    # Optional TTL in seconds, useful when several processes share the database
+    ttl: Optional[float] = float(os.getenv("DEFINITION_CACHE_TTL", "0")) or None
+
+    enabled: bool = os.getenv("DEFINITION_CACHE_ENABLED", "true").lower() == "true"
+
+    @staticmethod
+    def version() -> int:
+        """Current cache version"""
+        return DefinitionCache._version
+
+    @staticmethod
+    def get(key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a cached value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (hit, copy of the value)
+        """
+        if not DefinitionCache.enabled:
+            return False, None
+
+        entry = DefinitionCache._entries.get(key)
+        if entry is None:
+            return False, None
+
+        version, stored_at, value = entry
+        if version != DefinitionCache._version:
+            DefinitionCache._entries.pop(key, None)
+            return False, None
+
+        if DefinitionCache.ttl is not None and time.monotonic() - stored_at > DefinitionCache.ttl:
+            DefinitionCache._entries.pop(key, None)
+            return False, None
+
+        return True, copy.deepcopy(value)
+
+    @staticmethod
+    def set(key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        """
+        Store a value in the cache
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            version: Cache version observed before the value was loaded. If the cache
+                     was invalidated in the meantime the value is stale and is not stored.
+        """
+        if not DefinitionCache.enabled:
+            return
+
+        if version is not None and version != DefinitionCache._version:
+            return
+
+        DefinitionCache._entries[key] = (DefinitionCache._version, time.monotonic(), copy.deepcopy(value))
+
+    @staticmethod
+    async def get_or_load(key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return a cached value, loading and caching it on a miss
+
+        Args:
+            key: Cache key
+            loader: Coroutine function that loads the value from the database
+
+        Returns:
+            Copy of the cached value, or the freshly loaded value (None results are not cached)
+        """
+        hit, value = DefinitionCache.get(key)
+        if hit:
+            return value
+
+        version = DefinitionCache._version
+        value = await loader()
+        if value is not None:
+            DefinitionCache.set(key, value, version)
+        return value
+
+    @staticmethod
+    def invalidate() -> None:
+        """Drop all cached definitions, e.g. after a flow or step was edited"""
+        DefinitionCache._version += 1
+        DefinitionCache._entries.clear()
+        logger.info(f"Definition cache invalidated (version {DefinitionCache._version})")
@@ -4,6 +4,7 @@ import uuid
 
 from db.database import database
 from db.models import AgentFlow, AgentStep
+from core.definition_cache import DefinitionCache
 
 logger = logging.getLogger(__name__)
 
@@ -24,11 +25,14 @@ class FlowRegistry:
         Returns:
             Flow data or None if not found
         """
-        query = AgentFlow.__table__.select().where(AgentFlow.id == flow_id)
-        result = await database.fetch_one(query)
-        if result:
-            return dict(result)
-        return None
+        async def load():
+            query = AgentFlow.__table__.select().where(AgentFlow.id == flow_id)
+            result = await database.fetch_one(query)
+            if result:
+                return dict(result)
+            return None
+        
+        return await DefinitionCache.get_or_load(("flow", flow_id), load)
     
     @staticmethod
     async def get_flow_by_name(name: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
@@ -42,23 +46,22 @@ class FlowRegistry:
         Returns:
             Flow data or None if not found
         """
-        if version is not None:
-            query = AgentFlow.__table__.select().where(
-                (AgentFlow.name == name) & (AgentFlow.version == version)
-            )
+        async def load():
+            if version is not None:
+                query = AgentFlow.__table__.select().where(
+                    (AgentFlow.name == name) & (AgentFlow.version == version)
+                )
+            else:
+                # Get the latest version
+                query = AgentFlow.__table__.select().where(
+                    AgentFlow.name == name
+                ).order_by(AgentFlow.version.desc())
             result = await database.fetch_one(query)
             if result:
                 return dict(result)
             return None
         
-        # Get the latest version
-        query = AgentFlow.__table__.select().where(
-            AgentFlow.name == name
-        ).order_by(AgentFlow.version.desc())
-        result = await database.fetch_one(query)
-        if result:
-            return dict(result)
-        return None
+        return await DefinitionCache.get_or_load(("flow_by_name", name, version), load)
     
     @staticmethod
     async def get_steps_by_flow_id(flow_id: str) -> List[Dict[str, Any]]:
@@ -71,11 +74,15 @@ class FlowRegistry:
         Returns:
             List of step data
         """
-        query = AgentStep.__table__.select().where(
-            AgentStep.flow_id == flow_id
-        ).order_by(AgentStep.order)
-        results = await database.fetch_all(query)
-        return [dict(result) for result in results]
+        async def load():
+            query = AgentStep.__table__.select().where(
+                AgentStep.flow_id == flow_id
+            ).order_by(AgentStep.order)
+            results = await database.fetch_all(query)
+            return [dict(result) for result in results]
+        
+        # The cache hands out copies, which callers may sort and annotate
+        return await DefinitionCache.get_or_load(("flow_steps", flow_id), load)
     
     @staticmethod
     async def get_flow_with_steps(flow_id: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
@@ -126,6 +133,7 @@ class FlowRegistry:
             complete_message=complete_message
         )
         await database.execute(query)
+        DefinitionCache.invalidate()
         return flow_id
     
     @staticmethod
@@ -142,7 +150,10 @@ class FlowRegistry:
         tool_name: Optional[str] = None,
         loop_key: Optional[str] = None,
         start_message: Optional[str] = None,
-        complete_message: Optional[str] = None
+        complete_message: Optional[str] = None,
+        prompt_token_budget: Optional[int] = None,
+        loop_context: Optional[str] = None,
+        prompt_layout: Optional[str] = None
     ) -> str:
         """
         Create a new step for a flow
@@ -161,6 +172,9 @@ class FlowRegistry:
             loop_key: Optional key to iterate over (for ai_loop)
             start_message: Optional template message when step starts
             complete_message: Optional template message when step completes
+            prompt_token_budget: Optional maximum number of prompt tokens
+            loop_context: Optional previous-output mode for ai_loop (all, none, last:K, digest, custom:name)
+            prompt_layout: Optional prompt layout (legacy, prefix_stable)
             
         Returns:
             ID of the created step
@@ -180,9 +194,13 @@ class FlowRegistry:
             output_schema_id=output_schema_id,
             one_shot_id=one_shot_id,
             start_message=start_message,
-            complete_message=complete_message
+            complete_message=complete_message,
+            prompt_token_budget=prompt_token_budget,
+            loop_context=loop_context,
+            prompt_layout=prompt_layout
         )
         await database.execute(query)
+        DefinitionCache.invalidate()
         return step_id
     
     @staticmethod
@@ -221,7 +239,7 @@ class FlowRegistry:
             update_fields = {k: v for k, v in step_data.items() if v is not None and k != 'id'}
             
             # Handle empty string values (convert to None for optional fields)
-            for field in ['tool_name', 'loop_key', 'one_shot_id', 'start_message', 'complete_message']:
+            for field in ['tool_name', 'loop_key', 'one_shot_id', 'start_message', 'complete_message', 'loop_context', 'prompt_layout']:
                 if field in update_fields and update_fields[field] == '':
                     update_fields[field] = None
                     
@@ -230,6 +248,7 @@ class FlowRegistry:
             ).values(**update_fields)
             
             await database.execute(query)
+            DefinitionCache.invalidate()
             return True
         except Exception as e:
             logger.error(f"Error updating step {step_id}: {e}")
@@ -1,14 +1,20 @@
 import logging
+import time
 import uuid
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 from db.database import database
-from db.models import FlowRun, AppVersion, StepRun
+from db.models import FlowRun, StepRun
 from core.flow_registry import FlowRegistry
 from core.step_executor import StepExecutor
+from core.prompt_schema_store import PromptSchemaStore
 from core.message_dispatcher import dispatch_message
+from core.blob_store import BlobStore
+from core.app_version_store import AppVersionStore
 from core.websocket_manager import manager
+from core.metrics import Metrics
+from core.tracing import Tracer
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +37,11 @@ class FlowRunner:
         Returns:
             ID of the created flow run
         """
+        with Tracer.span("flow.run", flow_id=flow_id, project_id=project_id):
+            return await FlowRunner._start_flow_run(flow_id, project_id, initial_inputs)
+    
+    @staticmethod
+    async def _start_flow_run(flow_id: str, project_id: str, initial_inputs: Optional[Dict[str, Any]]) -> str:
         # Get flow details
         flow = await FlowRegistry.get_flow_by_id(flow_id)
         if not flow:
@@ -39,14 +50,17 @@ class FlowRunner:
         flow_name = flow["name"]
         flow_version = flow["version"]
         
-        # Create a flow run record
+        # Create a flow run record, linked to the trace of the run
         flow_run_id = str(uuid.uuid4())
+        Tracer.set_attribute("flow", flow_name)
+        Tracer.set_attribute("flow_run_id", flow_run_id)
         query = FlowRun.__table__.insert().values(
             id=flow_run_id,
             project_id=project_id,
             flow_id=flow_id,
             status="running",
-            started_at=datetime.utcnow()
+            started_at=datetime.utcnow(),
+            trace_id=Tracer.current_trace_id()
         )
         await database.execute(query)
         
@@ -66,6 +80,8 @@ class FlowRunner:
         )
         
         # Start the flow execution asynchronously
+        start = time.perf_counter()
+        status = "error"
         try:
             # Run the flow steps
             status, output = await FlowRunner.run_flow_steps(
@@ -106,6 +122,7 @@ class FlowRunner:
             
         except Exception as e:
             logger.error(f"Error running flow {flow_name}: {e}")
+            status = "error"
             
             # Update flow run with error
             await FlowRunner.update_flow_run(
@@ -122,6 +139,8 @@ class FlowRunner:
                 project_id=project_id
             )
         finally:
+            Metrics.flow_duration.observe(time.perf_counter() - start, flow=flow_name, status=status)
+            Tracer.set_attribute("status", status)
             # Set flow running status to enable chat input after flow completes
             await manager.set_flow_running(project_id, False)
         
@@ -154,6 +173,9 @@ class FlowRunner:
         # Sort steps by order
         steps.sort(key=lambda x: x["order"])
         
+        # Load prompts, schemas and one-shot examples for all steps in one batch
+        await PromptSchemaStore.preload_step_assets(steps)
+        
         # Initialize flow state with initial inputs
         flow_state = initial_inputs.copy()
         
@@ -198,11 +220,12 @@ class FlowRunner:
         
         if status in ["complete", "error"]:
             values["ended_at"] = datetime.utcnow()
+            values.update(await FlowRunner.summarize_usage(flow_run_id))
         
         if output is not None:
             # Convert datetime objects to ISO format strings for JSON serialization
             serialized_output = FlowRunner._serialize_for_json(output)
-            values["output"] = serialized_output
+            values["output"] = await BlobStore.pack_json(serialized_output)
         
         # Update the flow run
         query = FlowRun.__table__.update().where(
@@ -211,6 +234,27 @@ class FlowRunner:
         
         await database.execute(query)
     
+    @staticmethod
+    async def summarize_usage(flow_run_id: str) -> Dict[str, Any]:
+        """
+        Sum the LLM usage of the step runs of a flow run
+        
+        Returns:
+            Dict with prompt_tokens, completion_tokens, cached_prompt_tokens,
+            llm_calls and cost_usd (None if no step made LLM calls)
+        """
+        query = """
+        SELECT SUM(prompt_tokens) AS prompt_tokens,
+               SUM(completion_tokens) AS completion_tokens,
+               SUM(cached_prompt_tokens) AS cached_prompt_tokens,
+               SUM(llm_calls) AS llm_calls,
+               SUM(cost_usd) AS cost_usd
+        FROM step_runs
+        WHERE flow_run_id = :flow_run_id
+        """
+        result = await database.fetch_one(query=query, values={"flow_run_id": flow_run_id})
+        return dict(result) if result else {}
+    
     @staticmethod
     def _serialize_for_json(obj):
         """Convert data structures with datetime objects to JSON serializable format"""
@@ -237,7 +281,7 @@ class FlowRunner:
         query = FlowRun.__table__.select().where(FlowRun.id == flow_run_id)
         result = await database.fetch_one(query)
         if result:
-            return dict(result)
+            return await BlobStore.unpack_row(dict(result), json_fields=["output"])
         return None
     
     @staticmethod
@@ -253,27 +297,5 @@ class FlowRunner:
         Returns:
             ID of the created app version
         """
-        # Get the current highest version number for this project
-        query = """
-        SELECT MAX(version_number) as max_version 
-        FROM app_versions 
-        WHERE project_id = :project_id
-        """
-        result = await database.fetch_one(query=query, values={"project_id": project_id})
-        version_number = 1
-        if result and result["max_version"] is not None:
-            version_number = result["max_version"] + 1
-        
-        # Create the app version
-        app_version_id = str(uuid.uuid4())
-        query = AppVersion.__table__.insert().values(
-            id=app_version_id,
-            project_id=project_id,
-            flow_run_id=flow_run_id,
-            version_number=version_number,
-            config_json=config_json,
-            created_at=datetime.utcnow()
-        )
-        await database.execute(query)
-        
-        return app_version_id 
\ No newline at end of file
+        # Stored as a delta against the previous version unless a snapshot is due
+        return await AppVersionStore.create_version(project_id, flow_run_id, config_json) 
\ No newline at end of file
@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class ImportProfile:
+    """
+    Import-time profile of the API process, from `python -X importtime`.
+
+    Shows which modules and third-party packages the cold start of a
+    process spends its time on:
+
+        python -m core.import_profile            # profiles `import main`
+        python -X importtime main.py 2> imports.log
+        python -m core.import_profile --file imports.log
+    """
+
+    # Log the profile once at startup (IMPORT_PROFILE_ON_STARTUP=true)
+    on_startup: bool = os.getenv("IMPORT_PROFILE_ON_STARTUP", "false").lower() == "true"
+
+    _task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def parse(text: str) -> List[Dict[str, Any]]:
+        """
+        Parse the output of -X importtime
+
+        Returns:
+            Imports in output order, with module, depth (0 for imports of
+            the profiled code), self_ms and cumulative_ms
+        """
+        entries = []
+        for line in text.splitlines():
+            match = _LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                entries.append({
+                    "module": module,
+                    "depth": len(indent) // 2,
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                })
+        return entries
+
+    @staticmethod
+    def measure(module: str = "main") -> Dict[str, Any]:
+        """
+        Import a module in a new interpreter with -X importtime
+
+        Args:
+            module: Module to import, from the backend directory
+
+        Returns:
+            Dictionary with wall_ms (interpreter start included) and entries
+            (see parse)
+        """
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        )
+        wall_ms = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1:] or ["unknown error"]
+            raise RuntimeError(f"Importing {module} failed: {error[0]}")
+        return {"wall_ms": wall_ms, "entries": ImportProfile.parse(result.stderr)}
+
+    @staticmethod
+    def summarize(entries: List[Dict[str, Any]], top: int = 20) -> Dict[str, Any]:
+        """
+        Slowest imports and the time spent per top-level package
+
+        Args:
+            entries: Result of parse
+            top: Number of modules and packages to keep
+
+        Returns:
+            Dictionary with total_ms, modules (slowest by cumulative time)
+            and packages (self time summed per top-level package)
+        """
+        packages: Dict[str, float] = {}
+        for entry in entries:
+            package = entry["module"].split(".")[0]
+            packages[package] = packages.get(package, 0.0) + entry["self_ms"]
+        slowest = sorted(entries, key=lambda entry: entry["cumulative_ms"], reverse=True)
+        return {
+            "total_ms": sum(entry["self_ms"] for entry in entries),
+            "modules": slowest[:top],
+            "packages": [
+                {"package": package, "self_ms": self_ms}
+                for package, self_ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+            ],
+        }
+
+    @staticmethod
+    def report(summary: Dict[str, Any]) -> str:
+        """Text report of a summary"""
+        lines = [f"Imports: {summary['total_ms']:.0f}ms", "", "Slowest imports (cumulative):"]
+        lines += [f"  {entry['cumulative_ms']:8.1f}ms  {entry['module']}" for entry in summary["modules"]]
+        lines += ["", "Packages (self time):"]
+        lines += [f"  {entry['self_ms']:8.1f}ms  {entry['package']}" for entry in summary["packages"]]
+        return "\n".join(lines)
+
+    @staticmethod
+    def log_startup_profile(module: str = "main", top: int = 15) -> None:
+        """Log the import profile of a fresh process (startup diagnostic, runs a subprocess)"""
+        try:
+            profile = ImportProfile.measure(module)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Import profile failed: {e}")
+            return
+        summary = ImportProfile.summarize(profile["entries"], top)
+        logger.info(f"Import profile of {module} ({profile['wall_ms']:.0f}ms wall):\n{ImportProfile.report(summary)}")
+
+    @staticmethod
+    def start() -> None:
+        """Log the startup profile in the background of the running event loop, if enabled"""
+        if ImportProfile.on_startup:
+            ImportProfile._task = asyncio.create_task(asyncio.to_thread(ImportProfile.log_startup_profile))
+
+    @staticmethod
+    def stop() -> None:
+        """Cancel a startup profile still running at shutdown"""
+        if ImportProfile._task is not None and not ImportProfile._task.done():
+            ImportProfile._task.cancel()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time profile of the API process")
+    parser.add_argument("--module", default="main", help="Module to profile (default: main)")
+    parser.add_argument("--file", default=None, help="Read the output of a `python -X importtime` run instead")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as file:
+            entries = ImportProfile.parse(file.read())
+        wall_ms = None
+    else:
+        profile = ImportProfile.measure(args.module)
+        entries, wall_ms = profile["entries"], profile["wall_ms"]
+
+    summary = ImportProfile.summarize(entries, args.top)
+    if args.json:
+        print(json.dumps(dict(summary, wall_ms=wall_ms), indent=2))
+    else:
+        if wall_ms is not None:
+            print(f"Process: {wall_ms:.0f}ms")
+        print(ImportProfile.report(summary))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from core.template_renderer import DateTimeEncoder
+
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """
+    In-process cache of structured generation results, keyed by model, prompt
+    and output schema.
+
+    Flow steps only use it when LLM_RESPONSE_CACHE_ENABLED is set, since the
+    same prompt may be expected to produce a fresh answer. Batch replays can
+    opt in per request, so re-running a prompt variant over the same runs
+    does not pay for identical calls twice.
+    """
+
+    enabled: bool = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+
+    # Seconds an entry is kept
+    ttl: float = float(os.getenv("LLM_RESPONSE_CACHE_TTL", "3600"))
+
+    # Maximum number of entries
+    size: int = int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "512"))
+
+    # key -> (stored_at, result), in LRU order
+    _entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(model_name: Optional[str], prompt: str, schema_json: Any) -> str:
+        """Cache key of a generation request"""
+        payload = json.dumps([model_name, prompt, schema_json], sort_keys=True, cls=DateTimeEncoder)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get(key: str) -> Tuple[bool, Any]:
+        """
+        Look up a cached result
+
+        Returns:
+            Tuple of (hit, copy of the result)
+        """
+        entry = LLMResponseCache._entries.get(key)
+        if entry is None:
+            return False, None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > LLMResponseCache.ttl:
+            LLMResponseCache._entries.pop(key, None)
+            return False, None
+        LLMResponseCache._entries.move_to_end(key)
+        return True, copy.deepcopy(result)
+
+    @staticmethod
+    def set(key: str, result: Any) -> None:
+        """Store a result, evicting the least recently used entries"""
+        LLMResponseCache._entries[key] = (time.monotonic(), copy.deepcopy(result))
+        LLMResponseCache._entries.move_to_end(key)
+        while len(LLMResponseCache._entries) > LLMResponseCache.size:
+            LLMResponseCache._entries.popitem(last=False)
+
+    @staticmethod
+    def clear() -> None:
+        """Drop all cached results"""
+        LLMResponseCache._entries.clear()
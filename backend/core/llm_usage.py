@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Token counters reported by the provider for one or more calls
+USAGE_KEYS = ("prompt_tokens", "completion_tokens", "cached_prompt_tokens")
+
+# USD per million tokens: (prompt, cached prompt, completion). Models are
+# matched by the longest prefix, so dated snapshots use the base price.
+DEFAULT_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "o3": (2.00, 0.50, 8.00),
+    "o4-mini": (1.10, 0.275, 4.40),
+}
+
+def _load_prices() -> Dict[str, Tuple[float, float, float]]:
+    prices = dict(DEFAULT_PRICES)
+    configured = os.getenv("LLM_PRICES")
+    if configured:
+        try:
+            prices.update({model: tuple(float(price) for price in values) for model, values in json.loads(configured).items()})
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid LLM_PRICES: {e}")
+    return prices
+
+def _field(value: Any, name: str) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+def parse_usage(usage: Any) -> Dict[str, int]:
+    """
+    Token counts of an API response usage object (or its dict form)
+
+    Returns:
+        Dictionary with prompt_tokens, completion_tokens and cached_prompt_tokens
+    """
+    details = _field(usage, "prompt_tokens_details")
+    return {
+        "prompt_tokens": _field(usage, "prompt_tokens") or 0,
+        "completion_tokens": _field(usage, "completion_tokens") or 0,
+        "cached_prompt_tokens": _field(details, "cached_tokens") or 0,
+    }
+
+class _Completions:
+    def __init__(self, completions):
+        self._completions = completions
+
+    async def create(self, *args, **kwargs):
+        response = await self._completions.create(*args, **kwargs)
+        LLMUsage.record_call(_field(response, "usage"))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+class _Chat:
+    def __init__(self, chat):
+        self._chat = chat
+        self.completions = _Completions(chat.completions)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+class UsageTrackingClient:
+    """OpenAI client wrapper recording the usage of chat completion responses"""
+
+    def __init__(self, client):
+        self._client = client
+        self.chat = _Chat(client.chat)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+class LLMUsage:
+    """
+    Collects the token usage reported by the provider, including prompt tokens
+    served from the provider's prompt cache.
+
+    Outlines drops the usage details of the responses, so the model client is
+    wrapped (see instrument) to record them. Generation runs in a worker
+    thread, hence calls are first collected per thread (see call) and then
+    added to the usage tracked by the current task (see track). Tracking
+    blocks can be nested, e.g. a step inside a batch of replays.
+    """
+
+    # Model -> USD per million (prompt, cached prompt, completion) tokens,
+    # DEFAULT_PRICES updated with the JSON object in LLM_PRICES
+    prices: Dict[str, Tuple[float, float, float]] = _load_prices()
+
+    _thread = threading.local()
+    _tracked: ContextVar[Tuple[Dict[str, int], ...]] = ContextVar("llm_usage", default=())
+
+    @staticmethod
+    def instrument(model):
+        """
+        Wrap the client of an Outlines OpenAI model so that usage is recorded
+
+        Args:
+            model: Outlines model with a `client` attribute
+
+        Returns:
+            The same model
+        """
+        client = getattr(model, "client", None)
+        if client is not None and not isinstance(client, UsageTrackingClient):
+            model.client = UsageTrackingClient(client)
+        return model
+
+    @staticmethod
+    def record_call(usage: Any) -> None:
+        """Record the usage of one API response for the calls of the current thread"""
+        calls = getattr(LLMUsage._thread, "calls", None)
+        if calls is not None and usage is not None:
+            calls.append(parse_usage(usage))
+
+    @staticmethod
+    def call(function: Callable[[], Any]) -> Tuple[Any, List[Dict[str, int]]]:
+        """
+        Run a function and collect the usage of the API calls it makes in this thread
+
+        Returns:
+            Tuple of (result, usage of each call). Responses served from the
+            Outlines cache make no call and report no usage.
+        """
+        previous = getattr(LLMUsage._thread, "calls", None)
+        LLMUsage._thread.calls = []
+        try:
+            result = function()
+            return result, LLMUsage._thread.calls
+        finally:
+            LLMUsage._thread.calls = previous
+
+    @staticmethod
+    def cost(usage: Dict[str, int], model: Optional[str]) -> Optional[float]:
+        """
+        Cost of an API call in USD
+
+        Args:
+            usage: Token counts of the call (see parse_usage)
+            model: Name of the model
+
+        Returns:
+            Cost in USD, or None if there is no price for the model
+        """
+        matches = [name for name in LLMUsage.prices if model and model.startswith(name)]
+        if not matches:
+            return None
+        prompt_price, cached_price, completion_price = LLMUsage.prices[max(matches, key=len)]
+        cached = usage.get("cached_prompt_tokens") or 0
+        uncached = max((usage.get("prompt_tokens") or 0) - cached, 0)
+        completion = usage.get("completion_tokens") or 0
+        return (uncached * prompt_price + cached * cached_price + completion * completion_price) / 1_000_000
+
+    @staticmethod
+    def add(calls: List[Dict[str, int]], model: Optional[str] = None) -> None:
+        """
+        Add the usage of API calls to the usage tracked by the current task
+
+        Args:
+            calls: Usage of each call (see call)
+            model: Model the calls were made with, to price them. Calls of
+                   models without a price add no cost.
+        """
+        costs = [LLMUsage.cost(usage, model) for usage in calls]
+        if calls and costs[0] is None:
+            logger.debug(f"No price configured for model {model}")
+        for tracked in LLMUsage._tracked.get():
+            for usage, cost in zip(calls, costs):
+                tracked["calls"] += 1
+                for key in USAGE_KEYS:
+                    tracked[key] += usage.get(key) or 0
+                tracked["cost_usd"] += cost or 0.0
+
+    @staticmethod
+    @contextmanager
+    def track() -> Iterator[Dict[str, int]]:
+        """
+        Track the usage of the API calls made inside the block
+
+        Yields:
+            Dictionary with calls, prompt_tokens, completion_tokens,
+            cached_prompt_tokens and cost_usd, updated as calls complete
+        """
+        tracked = dict(calls=0, cost_usd=0.0, **{key: 0 for key in USAGE_KEYS})
+        token = LLMUsage._tracked.set(LLMUsage._tracked.get() + (tracked,))
+        try:
+            yield tracked
+        finally:
+            LLMUsage._tracked.reset(token)
@@ -0,0 +1,144 @@
+import logging
+import os
+from collections import deque
+from typing import Dict, Any, Callable, Deque, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A reducer gets the outputs of the previous iterations and the current item and
+# returns the value passed to the prompt as previous_loop_outputs (None = omit it)
+Reducer = Callable[[List[Any], Any], Any]
+
+# Keys identifying an output in the "digest" mode
+DIGEST_KEYS = ("id", "key", "name", "title", "label", "type")
+
+def _digest(output: Any) -> Any:
+    if not isinstance(output, dict):
+        return output
+    digest = {key: output[key] for key in DIGEST_KEYS if isinstance(output.get(key), (str, int, float, bool))}
+    if digest:
+        return digest
+    # Outputs wrapped in a single object, e.g. {"entity": {"id": ..., ...}}
+    for key, value in output.items():
+        if isinstance(value, dict):
+            nested = {k: value[k] for k in DIGEST_KEYS if isinstance(value.get(k), (str, int, float, bool))}
+            if nested:
+                digest[key] = nested
+    return digest
+
+class LoopContext:
+    """
+    Controls how much of the previous iterations an ai_loop step sees.
+
+    The mode is set per step (agent_steps.loop_context) or globally with
+    LOOP_CONTEXT_MODE:
+        all       - every previous output (default)
+        none      - no previous outputs
+        last:K    - the last K outputs
+        digest    - identifying fields (id, name, ...) of every previous output
+        custom:N  - reducer registered under the name N
+    """
+
+    default_mode: str = os.getenv("LOOP_CONTEXT_MODE", "all")
+
+    # Number of iteration prompts stored in the step run's rendered_prompt
+    # (the first one and the most recent ones)
+    stored_prompts: int = max(1, int(os.getenv("LOOP_STORED_PROMPTS", "5")))
+
+    _reducers: Dict[str, Reducer] = {}
+
+    @staticmethod
+    def register_reducer(name: str, reducer: Reducer) -> None:
+        """
+        Register a custom reducer, used by steps with loop_context "custom:<name>"
+
+        Args:
+            name: Name of the reducer
+            reducer: Function of (previous outputs, current item) returning the
+                     previous_loop_outputs value, or None to omit it
+        """
+        LoopContext._reducers[name] = reducer
+
+    @staticmethod
+    def parse(mode: Optional[str]) -> Tuple[str, Any]:
+        """
+        Parse a loop context mode
+
+        Args:
+            mode: Mode string, None for the default mode
+
+        Returns:
+            Tuple of (kind, argument)
+
+        Raises:
+            ValueError: If the mode is invalid
+        """
+        mode = (mode or LoopContext.default_mode).strip()
+        kind, _, argument = mode.partition(":")
+        if kind in ("all", "none", "digest") and not argument:
+            return kind, None
+        if kind == "last":
+            try:
+                count = int(argument)
+            except ValueError:
+                count = -1
+            if count >= 0:
+                return kind, count
+        if kind == "custom" and argument:
+            if argument not in LoopContext._reducers:
+                raise ValueError(f"Unknown loop context reducer: {argument}")
+            return kind, LoopContext._reducers[argument]
+        raise ValueError(f"Invalid loop context mode: {mode}")
+
+    @staticmethod
+    def previous_outputs(mode: Tuple[str, Any], results: List[Any], item: Any) -> Optional[Any]:
+        """
+        Value of previous_loop_outputs for the next iteration
+
+        Args:
+            mode: Parsed mode (see LoopContext.parse)
+            results: Outputs of the previous iterations
+            item: Current loop item
+
+        Returns:
+            The value to pass, or None if previous_loop_outputs should be omitted
+        """
+        if not results:
+            return None
+        kind, argument = mode
+        if kind == "all":
+            return results
+        if kind == "last":
+            return results[-argument:] if argument else None
+        if kind == "digest":
+            return [_digest(output) for output in results]
+        if kind == "custom":
+            return argument(results, item)
+        return None
+
+class PromptLog:
+    """Keeps the first and the most recent iteration prompts of a loop"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit or LoopContext.stored_prompts
+        self.first: Optional[str] = None
+        self.recent: Deque[str] = deque(maxlen=max(0, self.limit - 1))
+        self.count = 0
+
+    def append(self, prompt: str) -> None:
+        self.count += 1
+        if self.first is None:
+            self.first = prompt
+        elif self.recent.maxlen:
+            self.recent.append(prompt)
+
+    def combined(self, separator: str) -> str:
+        """All kept prompts joined by the separator, with a note about omitted iterations"""
+        if self.first is None:
+            return ""
+        prompts = [self.first]
+        omitted = self.count - 1 - len(self.recent)
+        if omitted:
+            prompts.append(f"[{omitted} loop iterations omitted]")
+        prompts.extend(self.recent)
+        return separator.join(prompts)
@@ -8,6 +8,9 @@ from db.database import database
 from db.models import Message
 from core.websocket_manager import manager
 from core.template_renderer import TemplateRenderer, DateTimeEncoder
+from core.conversation_memory import ConversationMemory
+from core.metrics import Metrics
+from core.tracing import Tracer
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +54,17 @@ async def dispatch_message(
         project_id: Project ID to associate message with
         destination: Where to send (log, websocket, db) - default is all
     """
+    with Tracer.span("message.dispatch", type=fallback_type), Metrics.message_dispatch.time(type=fallback_type):
+        return await _dispatch_message(template, context, fallback_type, role, project_id, destination)
+
+async def _dispatch_message(
+    template: Optional[str],
+    context: Dict[str, Any],
+    fallback_type: str,
+    role: str,
+    project_id: str,
+    destination: Optional[List[str]]
+):
     # Ensure context is JSON-serializable
     safe_context = {}
     for key, value in context.items():
@@ -113,14 +127,16 @@ async def save_message_to_db(project_id: str, role: str, content: str):
     """Save a message to the database"""
     try:
         message_id = str(uuid.uuid4())
-        query = Message.__table__.insert().values(
-            id=message_id,
-            project_id=project_id,
-            role=role,
-            content=content,
-            created_at=datetime.now(UTC)
-        )
+        values = {
+            "id": message_id,
+            "project_id": project_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.now(UTC)
+        }
+        query = Message.__table__.insert().values(**values)
         await database.execute(query)
+        ConversationMemory.append(values)
         return message_id
     except Exception as e:
         logger.error(f"Error saving message to db: {e}")
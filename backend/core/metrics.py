@@ -0,0 +1,283 @@
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets in seconds, from fast DB queries to long LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+class Counter(_Metric):
+    """Monotonic counter"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if not Metrics.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+    ):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if not Metrics.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        if not Metrics.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                values = sorted(self.callback().items())
+            except Exception as e:
+                logger.warning(f"Error reading gauge {self.name}: {e}")
+                values = []
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(_Metric):
+    """Distribution of observed values (e.g. durations in seconds)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> (bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not Metrics.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Observe the duration of the block. Labels can be changed inside the
+        block through the yielded dict (e.g. to set the status).
+        """
+        labels = dict(labels)
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+# First table name of a raw SQL statement
+_TABLE_PATTERN = re.compile(r"\b(?:from|into|update|join)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+def statement_label(query: Any) -> str:
+    """
+    Low-cardinality label of a query: the statement type and the first table,
+    e.g. "select step_runs" or "update flow_runs"
+    """
+    table = getattr(query, "table", None)
+    if table is not None and getattr(query, "is_dml", False):
+        return f"{type(query).__name__.lower()} {getattr(table, 'name', table)}"
+    if not isinstance(query, str):
+        froms = getattr(query, "get_final_froms", None) or getattr(query, "froms", None)
+        try:
+            froms = froms() if callable(froms) else froms
+            name = next(iter(froms)).name if froms else None
+        except Exception:
+            name = None
+        return f"{getattr(query, '__visit_name__', 'query')} {name or 'unknown'}"
+    text = query.strip()
+    verb = text.split(None, 1)[0].lower() if text else "query"
+    match = _TABLE_PATTERN.search(text)
+    return f"{verb} {match.group(1).lower() if match else 'unknown'}"
+
+class Metrics:
+    """
+    Process-wide metrics in the Prometheus text format, served on /metrics.
+
+    The series are updated by FlowRunner, StepExecutor, TemplateRenderer,
+    dispatch_message, ConnectionManager and the instrumented database.
+    There is no dependency on prometheus_client; render() produces the
+    exposition format directly.
+    """
+
+    enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    flow_duration = Histogram("flow_duration_seconds", "Duration of flow runs", ("flow", "status"))
+    step_duration = Histogram("step_duration_seconds", "Duration of step runs", ("flow", "step", "step_type", "status"))
+    llm_duration = Histogram("llm_request_duration_seconds", "Latency of structured generation calls", ("model", "status"))
+    llm_tokens = Counter("llm_tokens_total", "Tokens reported by the provider", ("model", "kind"))
+    output_validation = Counter(
+        "llm_output_validation_total", "Structured outputs checked against their JSON schema", ("result",)
+    )
+    template_render = Histogram(
+        "template_render_seconds", "Time to render Jinja templates",
+        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+    )
+    db_duration = Histogram("db_query_duration_seconds", "Latency of database queries", ("statement",))
+    message_dispatch = Histogram("message_dispatch_seconds", "Time to log, broadcast and store a message", ("type",))
+    websocket_pending = Gauge("websocket_pending_sends", "WebSocket sends in progress")
+    executor_wait = Histogram(
+        "executor_queue_wait_seconds", "Time from submitting work to an executor until it starts", ("executor",)
+    )
+    websocket_connections = Gauge(
+        "websocket_connections", "Open WebSocket connections", callback=lambda: Metrics._websocket_connections()
+    )
+    websocket_projects = Gauge(
+        "websocket_projects", "Projects with open WebSocket connections", callback=lambda: Metrics._websocket_projects()
+    )
+
+    _registry: List[_Metric] = [
+        flow_duration, step_duration, llm_duration, llm_tokens, output_validation, template_render, db_duration,
+        message_dispatch, websocket_pending, websocket_connections, websocket_projects, executor_wait,
+    ]
+
+    @staticmethod
+    def _websocket_connections() -> Dict[Tuple[str, ...], float]:
+        from core.websocket_manager import manager
+        return {(): sum(len(connections) for connections in manager.active_connections.values())}
+
+    @staticmethod
+    def _websocket_projects() -> Dict[Tuple[str, ...], float]:
+        from core.websocket_manager import manager
+        return {(): len(manager.active_connections)}
+
+    @staticmethod
+    def register(metric: _Metric) -> _Metric:
+        """Add a metric to the /metrics output"""
+        Metrics._registry.append(metric)
+        return metric
+
+    @staticmethod
+    def render() -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in Metrics._registry:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def instrument_database(database) -> None:
+        """
+        Time the queries of a `databases.Database` instance by statement label
+
+        Args:
+            database: Database whose query methods are wrapped (once)
+        """
+        if getattr(database, "_metrics_instrumented", False):
+            return
+
+        def wrap(method):
+            @functools.wraps(method)
+            async def timed(query, *args, **kwargs):
+                if not Metrics.enabled:
+                    return await method(query, *args, **kwargs)
+                with Metrics.db_duration.time(statement=statement_label(query)):
+                    return await method(query, *args, **kwargs)
+            return timed
+
+        for name in ("execute", "execute_many", "fetch_all", "fetch_one", "fetch_val"):
+            setattr(database, name, wrap(getattr(database, name)))
+        database._metrics_instrumented = True
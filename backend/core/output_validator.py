@@ -0,0 +1,356 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from core.template_renderer import DateTimeEncoder
+
+logger = logging.getLogger(__name__)
+
+# check(value, path, errors, repair) -> value, repaired when repair is set
+Check = Callable[[Any, str, List[str], bool], Any]
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: (isinstance(value, int) and not isinstance(value, bool))
+        or (isinstance(value, float) and value.is_integer()),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+_INTEGER = re.compile(r"^\s*[-+]?\d+\s*$")
+_NUMBER = re.compile(r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$")
+
+_MISSING = object()
+
+def _accept(value: Any, path: str, errors: List[str], repair: bool) -> Any:
+    return value
+
+def _coerce(value: Any, types: List[str]) -> Any:
+    """Repair a scalar of the wrong type: stringified numbers and booleans, 3.0 for 3"""
+    if isinstance(value, str):
+        text = value.strip()
+        if "integer" in types and _INTEGER.match(text):
+            return int(text)
+        if "number" in types and _NUMBER.match(text):
+            number = float(text)
+            return int(number) if number.is_integer() and _INTEGER.match(text) else number
+        if "boolean" in types and text.lower() in ("true", "false"):
+            return text.lower() == "true"
+        if "null" in types and text.lower() in ("null", "none"):
+            return None
+    if "integer" in types and isinstance(value, float) and value.is_integer():
+        return int(value)
+    return _MISSING
+
+def _nullable(schema: Any) -> bool:
+    if not isinstance(schema, dict):
+        return False
+    types = schema.get("type")
+    if types == "null" or (isinstance(types, list) and "null" in types):
+        return True
+    return any(_nullable(branch) for branch in schema.get("anyOf", schema.get("oneOf", [])))
+
+def _missing_value(schema: Any) -> Any:
+    """Value a missing key can be filled with: the default, else None if allowed"""
+    if isinstance(schema, dict) and "default" in schema:
+        return schema["default"]
+    if _nullable(schema):
+        return None
+    return _MISSING
+
+class _Compiler:
+    """Compiles a JSON schema into nested check functions, resolving local $refs once"""
+
+    def __init__(self, root: Dict[str, Any]):
+        self.root = root
+        self.refs: Dict[str, Check] = {}
+
+    def ref(self, ref: str) -> Check:
+        if ref not in self.refs:
+            if not ref.startswith("#"):
+                logger.debug(f"Remote $ref {ref} is not validated")
+                return _accept
+            target: Any = self.root
+            for part in ref[1:].split("/")[1:] if ref != "#" else []:
+                target = target[part.replace("~1", "/").replace("~0", "~")]
+            # Placeholder for recursive schemas; calls look it up at run time
+            self.refs[ref] = _accept
+            self.refs[ref] = self.compile(target)
+        refs = self.refs
+        return lambda value, path, errors, repair: refs[ref](value, path, errors, repair)
+
+    def compile(self, schema: Any) -> Check:
+        if schema is True or schema == {} or not isinstance(schema, dict):
+            if schema is False:
+                return lambda value, path, errors, repair: errors.append(f"{path}: no value is allowed") or value
+            return _accept
+
+        checks: List[Check] = []
+        if "$ref" in schema:
+            checks.append(self.ref(schema["$ref"]))
+        for branch in schema.get("allOf", []):
+            checks.append(self.compile(branch))
+        for keyword in ("anyOf", "oneOf"):
+            if keyword in schema:
+                checks.append(self.any_of([self.compile(branch) for branch in schema[keyword]]))
+        if any(keyword in schema for keyword in ("type", "enum", "const", "properties", "items")):
+            checks.append(self.node(schema))
+
+        if not checks:
+            return _accept
+        if len(checks) == 1:
+            return checks[0]
+
+        def check_all(value, path, errors, repair):
+            for check in checks:
+                value = check(value, path, errors, repair)
+            return value
+        return check_all
+
+    def any_of(self, branches: List[Check]) -> Check:
+        def check(value, path, errors, repair):
+            # A branch that matches as is wins over one that needs a repair
+            for branch in branches:
+                branch_errors: List[str] = []
+                branch(value, path, branch_errors, False)
+                if not branch_errors:
+                    return value
+            if repair:
+                for branch in branches:
+                    branch_errors = []
+                    repaired = branch(value, path, branch_errors, True)
+                    if not branch_errors:
+                        return repaired
+            errors.append(f"{path}: does not match any of the allowed schemas")
+            return value
+        return check
+
+    def node(self, schema: Dict[str, Any]) -> Check:
+        types = schema.get("type")
+        types = [types] if isinstance(types, str) else list(types or [])
+        type_checks = [_TYPES[name] for name in types if name in _TYPES]
+        expected = " or ".join(types)
+
+        enum = schema.get("enum")
+        if "const" in schema:
+            enum = [schema["const"]]
+        enum_by_lower: Dict[str, Any] = {}
+        if enum is not None:
+            lowered = [value.lower() for value in enum if isinstance(value, str)]
+            enum_by_lower = {
+                value.lower(): value for value in enum
+                if isinstance(value, str) and lowered.count(value.lower()) == 1
+            }
+
+        object_check = self.object_node(schema) if "object" in types or "properties" in schema else None
+        array_check = self.array_node(schema) if "array" in types or "items" in schema else None
+        bounds = [(keyword, schema[keyword]) for keyword in ("minLength", "maxLength", "minimum", "maximum") if keyword in schema]
+
+        def check(value, path, errors, repair):
+            if type_checks and not any(type_check(value) for type_check in type_checks):
+                coerced = _coerce(value, types) if repair else _MISSING
+                if coerced is _MISSING:
+                    errors.append(f"{path}: expected {expected}, got {type(value).__name__}")
+                    return value
+                value = coerced
+            elif repair and "integer" in types and isinstance(value, float):
+                value = int(value)
+
+            if enum is not None and value not in enum:
+                canonical = enum_by_lower.get(value.strip().lower(), _MISSING) if repair and isinstance(value, str) else _MISSING
+                if canonical is _MISSING:
+                    errors.append(f"{path}: {value!r} is not one of {enum!r}")
+                    return value
+                value = canonical
+
+            if isinstance(value, dict) and object_check is not None:
+                return object_check(value, path, errors, repair)
+            if isinstance(value, list) and array_check is not None:
+                return array_check(value, path, errors, repair)
+            for keyword, limit in bounds:
+                if keyword.endswith("Length") and isinstance(value, str):
+                    if (len(value) < limit) if keyword == "minLength" else (len(value) > limit):
+                        errors.append(f"{path}: length {len(value)} is out of bounds ({keyword} {limit})")
+                elif not keyword.endswith("Length") and _TYPES["number"](value):
+                    if (value < limit) if keyword == "minimum" else (value > limit):
+                        errors.append(f"{path}: {value} is out of bounds ({keyword} {limit})")
+            return value
+        return check
+
+    def object_node(self, schema: Dict[str, Any]) -> Check:
+        properties = {name: self.compile(subschema) for name, subschema in schema.get("properties", {}).items()}
+        required = [name for name in schema.get("required", [])]
+        fills = {name: _missing_value(schema.get("properties", {}).get(name)) for name in required}
+        additional = schema.get("additionalProperties", True)
+        additional_check = self.compile(additional) if isinstance(additional, dict) else None
+
+        def check(value, path, errors, repair):
+            result = {} if repair else None
+            for key, item in value.items():
+                item_path = f"{path}.{key}"
+                if key in properties:
+                    item = properties[key](item, item_path, errors, repair)
+                elif additional is False:
+                    # Unknown keys are dropped by the repair
+                    if not repair:
+                        errors.append(f"{item_path}: unexpected property")
+                    continue
+                elif additional_check is not None:
+                    item = additional_check(item, item_path, errors, repair)
+                if repair:
+                    result[key] = item
+            for name in required:
+                if name not in value:
+                    fill = fills[name]
+                    if repair and fill is not _MISSING:
+                        result[name] = copy.deepcopy(fill)
+                    else:
+                        errors.append(f"{path}.{name}: required property is missing")
+            return result if repair else value
+        return check
+
+    def array_node(self, schema: Dict[str, Any]) -> Check:
+        items = self.compile(schema.get("items", True))
+        min_items = schema.get("minItems")
+        max_items = schema.get("maxItems")
+
+        def check(value, path, errors, repair):
+            if min_items is not None and len(value) < min_items:
+                errors.append(f"{path}: expected at least {min_items} items, got {len(value)}")
+            if max_items is not None and len(value) > max_items:
+                errors.append(f"{path}: expected at most {max_items} items, got {len(value)}")
+            if items is _accept:
+                return value
+            checked = [items(item, f"{path}[{index}]", errors, repair) for index, item in enumerate(value)]
+            return checked if repair else value
+        return check
+
+class OutputValidator:
+    """
+    Validation of structured generation outputs against their JSON schema.
+
+    Outputs generated from a Pydantic model are validated by the model; those
+    generated from a plain JSON schema are checked here before the following
+    steps consume them. Schemas are compiled once into check functions, cached
+    per schema ID. An invalid output gets a local repair pass first (missing
+    nullable or defaulted keys, enum values in the wrong case, stringified
+    numbers and booleans, unknown keys where none are allowed); the LLM call
+    is only retried when the repair fails.
+
+    The keywords used by the output schemas are supported: type, properties,
+    required, additionalProperties, items, enum, const, anyOf/oneOf, allOf,
+    local $refs, minItems/maxItems, minLength/maxLength and minimum/maximum.
+    Other keywords are not checked.
+    """
+
+    enabled: bool = os.getenv("OUTPUT_VALIDATION_ENABLED", "true").lower() == "true"
+
+    # LLM calls repeated for an output the repair pass cannot fix
+    retries: int = int(os.getenv("OUTPUT_VALIDATION_RETRIES", "1"))
+
+    # Maximum number of compiled schemas
+    size: int = int(os.getenv("OUTPUT_VALIDATION_CACHE_SIZE", "256"))
+
+    # schema ID (or schema hash) -> (schema, check), in LRU order
+    _validators: "OrderedDict[str, Tuple[Any, Check]]" = OrderedDict()
+
+    @staticmethod
+    def compile(schema: Any) -> Check:
+        """Compile a JSON schema (dict or JSON text) into a check function"""
+        if isinstance(schema, str):
+            schema = json.loads(schema)
+        try:
+            return _Compiler(schema).compile(schema)
+        except Exception as e:
+            # A schema the compiler does not understand must not stop generation
+            logger.warning(f"Output schema could not be compiled, outputs are not validated: {e}")
+            return _accept
+
+    @staticmethod
+    def get(schema: Any, schema_id: Optional[str] = None) -> Check:
+        """
+        Compiled check function of a schema, from the cache
+
+        Args:
+            schema: JSON schema
+            schema_id: ID of the stored schema; without it the schema is keyed by its hash
+
+        Returns:
+            Check function
+        """
+        key = schema_id or hashlib.sha256(
+            json.dumps(schema, sort_keys=True, cls=DateTimeEncoder).encode("utf-8")
+        ).hexdigest()
+        entry = OutputValidator._validators.get(key)
+        # A schema edited under the same ID is compiled again
+        if entry is not None and (entry[0] is schema or entry[0] == schema):
+            OutputValidator._validators.move_to_end(key)
+            return entry[1]
+
+        check = OutputValidator.compile(schema)
+        OutputValidator._validators[key] = (schema, check)
+        OutputValidator._validators.move_to_end(key)
+        while len(OutputValidator._validators) > OutputValidator.size:
+            OutputValidator._validators.popitem(last=False)
+        return check
+
+    @staticmethod
+    def validate(schema: Any, output: Any, schema_id: Optional[str] = None) -> List[str]:
+        """
+        Validate an output
+
+        Returns:
+            Errors, with the JSON path of the value ($ for the output); empty if valid
+        """
+        errors: List[str] = []
+        OutputValidator.get(schema, schema_id)(output, "$", errors, False)
+        return errors
+
+    @staticmethod
+    def repair(schema: Any, output: Any, schema_id: Optional[str] = None) -> Tuple[Any, List[str]]:
+        """
+        Repair an output locally
+
+        Returns:
+            Tuple of (repaired copy of the output, errors the repair could not fix)
+        """
+        errors: List[str] = []
+        repaired = OutputValidator.get(schema, schema_id)(output, "$", errors, True)
+        return repaired, errors
+
+    @staticmethod
+    def check(schema: Any, output: Any, schema_id: Optional[str] = None) -> Tuple[str, Any, List[str]]:
+        """
+        Validate an output and repair it if needed
+
+        Args:
+            schema: JSON schema of the output
+            output: Generated output
+            schema_id: ID of the stored schema, for the validator cache
+
+        Returns:
+            Tuple of (result, output, errors). The result is "valid" (output
+            unchanged), "repaired" (repaired copy) or "invalid" (output
+            unchanged, with the errors of the repaired version).
+        """
+        errors = OutputValidator.validate(schema, output, schema_id)
+        if not errors:
+            return "valid", output, []
+        repaired, remaining = OutputValidator.repair(schema, output, schema_id)
+        if not remaining:
+            logger.info(f"Repaired structured output: {'; '.join(errors[:5])}")
+            return "repaired", repaired, []
+        return "invalid", output, remaining
+
+    @staticmethod
+    def clear() -> None:
+        """Drop all compiled schemas"""
+        OutputValidator._validators.clear()
@@ -0,0 +1,172 @@
+import logging
+import gzip
+import json
+import os
+import re
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Vite bundle names end with an 8 character content hash, which may itself
+# contain "-" or "_", e.g. index-D077x2X2.js or index-DbE-2Ku2.css
+_HASHED_NAME_RE = re.compile(r"-(?=[A-Za-z0-9_-]{0,7}[0-9A-Z])[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+class PreviewShell:
+    """
+    HTML shell of the preview app.
+
+    index.html is read once and split at </head>, so a preview page is built
+    by joining the two halves around the script tag that sets the project ID.
+    """
+
+    path: str = os.getenv("PREVIEW_INDEX_PATH", "previewApp/index.html")
+
+    # Encoded HTML before and after the injection point
+    _parts: Optional[Tuple[bytes, bytes]] = None
+
+    @staticmethod
+    def load() -> None:
+        """Read index.html and prepare the injection point"""
+        with open(PreviewShell.path, "r") as f:
+            html_content = f.read()
+
+        head, marker, tail = html_content.partition("</head>")
+        if not marker:
+            raise ValueError(f"{PreviewShell.path} has no </head> tag")
+        PreviewShell._parts = (head.encode("utf-8"), (marker + tail).encode("utf-8"))
+        logger.info(f"Loaded preview shell from {PreviewShell.path}")
+
+    @staticmethod
+    def render(project_id: str) -> bytes:
+        """
+        Build the preview page of a project
+
+        Args:
+            project_id: ID of the project, exposed to the frontend as window.PROJECT_ID
+
+        Returns:
+            HTML document
+        """
+        if PreviewShell._parts is None:
+            PreviewShell.load()
+        head, tail = PreviewShell._parts
+
+        # The ID is user input: encode it as a JS string that cannot close the script tag
+        value = json.dumps(project_id).replace("<", "\\u003c")
+        script_tag = f"<script>window.PROJECT_ID = {value};</script>".encode("utf-8")
+        return b"".join((head, script_tag, tail))
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves gzip/brotli variants of text assets and sets
+    long-lived cache headers on content-hashed bundles.
+
+    Variants are taken from `<file>.br` / `<file>.gz` next to the asset when the
+    build produced them and compressed in memory by precompress() otherwise.
+    """
+
+    compressible: Tuple[str, ...] = (".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt")
+
+    # Files smaller than this are not worth compressing
+    min_size: int = 1024
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # absolute path -> {encoding: compressed content}
+        self._variants: Dict[str, Dict[str, bytes]] = {}
+
+    def precompress(self) -> None:
+        """Build the compressed variants of all compressible assets"""
+        variants: Dict[str, Dict[str, bytes]] = {}
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if not file.endswith(self.compressible):
+                    continue
+                full_path = os.path.realpath(os.path.join(root, file))
+                with open(full_path, "rb") as f:
+                    content = f.read()
+                if len(content) < self.min_size:
+                    continue
+
+                encoded = {}
+                for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                    if os.path.isfile(full_path + suffix):
+                        with open(full_path + suffix, "rb") as f:
+                            encoded[encoding] = f.read()
+                if "br" not in encoded and brotli is not None:
+                    encoded["br"] = brotli.compress(content, quality=11)
+                if "gzip" not in encoded:
+                    encoded["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+
+                variants[full_path] = {
+                    encoding: data for encoding, data in encoded.items() if len(data) < len(content)
+                }
+
+        self._variants = variants
+        logger.info(f"Precompressed {len(variants)} static assets in {self.directory}")
+
+    @staticmethod
+    def _accepted_encodings(header: str) -> Set[str]:
+        accepted = set()
+        for item in header.split(","):
+            encoding, _, params = item.strip().partition(";")
+            params = params.replace(" ", "")
+            if params.startswith("q="):
+                try:
+                    if float(params[2:]) <= 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(encoding.strip().lower())
+        return accepted
+
+    @staticmethod
+    def _encoded_etag(etag: str, encoding: str) -> str:
+        """ETag of a compressed representation, distinct from the identity one"""
+        if etag.endswith('"'):
+            return f'{etag[:-1]}-{encoding}"'
+        return f"{etag}-{encoding}"
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        name = os.path.basename(str(full_path))
+        is_hashed = _HASHED_NAME_RE.search(name) is not None
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if is_hashed else REVALIDATE_CACHE_CONTROL
+
+        variants = self._variants.get(os.path.realpath(full_path))
+        if variants:
+            response.headers["Vary"] = "Accept-Encoding"
+            accepted = self._accepted_encodings(request_headers.get("accept-encoding", ""))
+            encoding = next(
+                (encoding for encoding in ("br", "gzip") if encoding in variants and encoding in accepted), None
+            )
+            if encoding is not None and "range" not in request_headers:
+                headers = {
+                    key: value for key, value in response.headers.items()
+                    if key not in ("content-length", "accept-ranges")
+                }
+                headers["Content-Encoding"] = encoding
+                # Each encoding is its own representation with its own ETag
+                headers["etag"] = self._encoded_etag(response.headers["etag"], encoding)
+                response = Response(content=variants[encoding], status_code=status_code, headers=headers)
+
+        # Conditional requests are answered against the ETag of the chosen representation
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
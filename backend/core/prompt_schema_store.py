@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, Any, Optional, Tuple, Type
+from typing import Dict, Any, Optional, Tuple, Type, List, Iterable
 import json
 import uuid
 import os
@@ -7,6 +7,7 @@ import os
 from db.database import database
 from db.models import Prompt, Schema, OneShotExample, PydanticSchema
 from models.pydantic.base import PydanticModelLoader
+from core.definition_cache import DefinitionCache
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -17,8 +18,13 @@ class PromptSchemaStore:
     Used by Step Executor, Replay Tool, and Flow compiler.
     """
     
-    # Cache for loaded Pydantic model classes
-    _pydantic_model_cache: Dict[str, Type[BaseModel]] = {}
+    # Asset tables that can be batch-loaded: name -> (model, cache key prefix)
+    _ASSET_TABLES = {
+        "prompts": (Prompt, "prompt"),
+        "schemas": (Schema, "schema"),
+        "one_shots": (OneShotExample, "one_shot"),
+        "pydantic_schemas": (PydanticSchema, "pydantic_schema"),
+    }
     
     @staticmethod
     async def get_prompt_by_id(prompt_id: str) -> Optional[Dict[str, Any]]:
@@ -31,11 +37,14 @@ class PromptSchemaStore:
         Returns:
             Prompt template data or None if not found
         """
-        query = Prompt.__table__.select().where(Prompt.id == prompt_id)
-        result = await database.fetch_one(query)
-        if result:
-            return dict(result)
-        return None
+        async def load():
+            query = Prompt.__table__.select().where(Prompt.id == prompt_id)
+            result = await database.fetch_one(query)
+            if result:
+                return dict(result)
+            return None
+        
+        return await DefinitionCache.get_or_load(("prompt", prompt_id), load)
     
     @staticmethod
     async def get_schema_by_id(schema_id: str) -> Optional[Dict[str, Any]]:
@@ -48,11 +57,14 @@ class PromptSchemaStore:
         Returns:
             Schema data or None if not found
         """
-        query = Schema.__table__.select().where(Schema.id == schema_id)
-        result = await database.fetch_one(query)
-        if result:
-            return dict(result)
-        return None
+        async def load():
+            query = Schema.__table__.select().where(Schema.id == schema_id)
+            result = await database.fetch_one(query)
+            if result:
+                return dict(result)
+            return None
+        
+        return await DefinitionCache.get_or_load(("schema", schema_id), load)
     
     @staticmethod
     async def get_pydantic_schema_by_id(pydantic_schema_id: str) -> Optional[Dict[str, Any]]:
@@ -65,11 +77,14 @@ class PromptSchemaStore:
         Returns:
             Pydantic schema data or None if not found
         """
-        query = PydanticSchema.__table__.select().where(PydanticSchema.id == pydantic_schema_id)
-        result = await database.fetch_one(query)
-        if result:
-            return dict(result)
-        return None
+        async def load():
+            query = PydanticSchema.__table__.select().where(PydanticSchema.id == pydantic_schema_id)
+            result = await database.fetch_one(query)
+            if result:
+                return dict(result)
+            return None
+        
+        return await DefinitionCache.get_or_load(("pydantic_schema", pydantic_schema_id), load)
     
     @staticmethod
     async def get_one_shot_by_id(one_shot_id: str) -> Optional[Dict[str, Any]]:
@@ -82,11 +97,89 @@ class PromptSchemaStore:
         Returns:
             One-shot example data or None if not found
         """
-        query = OneShotExample.__table__.select().where(OneShotExample.id == one_shot_id)
-        result = await database.fetch_one(query)
-        if result:
-            return dict(result)
-        return None
+        async def load():
+            query = OneShotExample.__table__.select().where(OneShotExample.id == one_shot_id)
+            result = await database.fetch_one(query)
+            if result:
+                return dict(result)
+            return None
+        
+        return await DefinitionCache.get_or_load(("one_shot", one_shot_id), load)
+    
+    @staticmethod
+    async def get_assets_by_ids(
+        prompt_ids: Iterable[Optional[str]] = (),
+        schema_ids: Iterable[Optional[str]] = (),
+        one_shot_ids: Iterable[Optional[str]] = (),
+        pydantic_schema_ids: Iterable[Optional[str]] = ()
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Batch-load prompts, schemas, one-shot examples and Pydantic schemas.
+        Cached rows are served from the definition cache; the rest are fetched
+        with a single IN (...) query per asset table and cached.
+        
+        Args:
+            prompt_ids: IDs of prompt templates
+            schema_ids: IDs of output schemas
+            one_shot_ids: IDs of one-shot examples
+            pydantic_schema_ids: IDs of Pydantic schemas
+            
+        Returns:
+            Dict with "prompts", "schemas", "one_shots" and "pydantic_schemas",
+            each mapping asset ID to its row. Missing IDs are left out.
+        """
+        requested = {
+            "prompts": prompt_ids,
+            "schemas": schema_ids,
+            "one_shots": one_shot_ids,
+            "pydantic_schemas": pydantic_schema_ids,
+        }
+        
+        assets: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for table_name, ids in requested.items():
+            model, cache_prefix = PromptSchemaStore._ASSET_TABLES[table_name]
+            rows: Dict[str, Dict[str, Any]] = {}
+            missing: List[str] = []
+            
+            for asset_id in {asset_id for asset_id in ids if asset_id}:
+                hit, row = DefinitionCache.get((cache_prefix, asset_id))
+                if hit:
+                    rows[asset_id] = row
+                else:
+                    missing.append(asset_id)
+            
+            if missing:
+                version = DefinitionCache.version()
+                query = model.__table__.select().where(model.id.in_(missing))
+                results = await database.fetch_all(query)
+                for result in results:
+                    row = dict(result)
+                    # The cache stores its own copy
+                    DefinitionCache.set((cache_prefix, row["id"]), row, version)
+                    rows[row["id"]] = row
+            
+            assets[table_name] = rows
+        
+        return assets
+    
+    @staticmethod
+    async def preload_step_assets(steps: List[Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Load the assets of every step of a flow in one batch, so that the
+        per-step get_step_assets calls are served from the cache
+        
+        Args:
+            steps: List of step data
+            
+        Returns:
+            Batch-loaded asset rows, as returned by get_assets_by_ids
+        """
+        return await PromptSchemaStore.get_assets_by_ids(
+            prompt_ids=[step.get("prompt_template_id") for step in steps],
+            schema_ids=[step.get("output_schema_id") for step in steps],
+            one_shot_ids=[step.get("one_shot_id") for step in steps],
+            pydantic_schema_ids=[step.get("pydantic_schema_id") for step in steps]
+        )
     
     @staticmethod
     async def get_step_assets(
@@ -107,10 +200,16 @@ class PromptSchemaStore:
         Returns:
             Dict containing prompt_template, output_schema, and one_shot_example (if available)
         """
+        rows = await PromptSchemaStore.get_assets_by_ids(
+            prompt_ids=[prompt_id],
+            schema_ids=[schema_id],
+            one_shot_ids=[one_shot_id],
+            pydantic_schema_ids=[pydantic_schema_id]
+        )
         assets = {}
         
         # Get prompt template
-        prompt = await PromptSchemaStore.get_prompt_by_id(prompt_id)
+        prompt = rows["prompts"].get(prompt_id)
         if prompt:
             assets["prompt_template"] = prompt["template"]
         else:
@@ -118,17 +217,16 @@ class PromptSchemaStore:
         
         # Get output schema (first try pydantic schema if available)
         if pydantic_schema_id:
-            pydantic_schema = await PromptSchemaStore.get_pydantic_schema_by_id(pydantic_schema_id)
+            pydantic_schema = rows["pydantic_schemas"].get(pydantic_schema_id)
             if pydantic_schema:
                 # Try to load the Pydantic model
                 pydantic_model_class = await PromptSchemaStore.load_pydantic_model(
                     pydantic_schema["file_path"],
-                    pydantic_schema["model_class_name"],
-                    pydantic_schema_id
+                    pydantic_schema["model_class_name"]
                 )
                 
                 if pydantic_model_class:
-                    # Get the JSON schema and use it
+                    # Get the JSON schema (cached with the class) and use it
                     assets["output_schema"] = PydanticModelLoader.get_json_schema(pydantic_model_class)
                     assets["pydantic_model_class"] = pydantic_model_class
                 else:
@@ -136,7 +234,7 @@ class PromptSchemaStore:
         
         # Fallback to regular JSON schema if Pydantic schema wasn't loaded
         if "output_schema" not in assets:
-            schema = await PromptSchemaStore.get_schema_by_id(schema_id)
+            schema = rows["schemas"].get(schema_id)
             if schema:
                 assets["output_schema"] = schema["schema_json"]
             else:
@@ -144,7 +242,7 @@ class PromptSchemaStore:
         
         # Get one-shot example if provided
         if one_shot_id:
-            one_shot = await PromptSchemaStore.get_one_shot_by_id(one_shot_id)
+            one_shot = rows["one_shots"].get(one_shot_id)
             if one_shot:
                 assets["one_shot_example"] = {
                     "input": one_shot["input_json"],
@@ -156,32 +254,20 @@ class PromptSchemaStore:
     @staticmethod
     async def load_pydantic_model(
         file_path: str, 
-        model_class_name: str, 
-        cache_key: str
+        model_class_name: str
     ) -> Optional[Type[BaseModel]]:
         """
-        Load a Pydantic model from file and cache it
+        Load a Pydantic model from file. The class is cached by the loader and
+        reloaded when the file changes.
         
         Args:
             file_path: Path to the Python file with the model
             model_class_name: Name of the class to load
-            cache_key: Key to use for caching
             
         Returns:
             Loaded Pydantic model class or None if loading fails
         """
-        # Check cache first
-        if cache_key in PromptSchemaStore._pydantic_model_cache:
-            return PromptSchemaStore._pydantic_model_cache[cache_key]
-        
-        # Load the model
-        model_class = PydanticModelLoader.load_model_class(file_path, model_class_name)
-        
-        # Cache it if loaded successfully
-        if model_class:
-            PromptSchemaStore._pydantic_model_cache[cache_key] = model_class
-            
-        return model_class
+        return PydanticModelLoader.get_model_class(file_path, model_class_name)
     
     @staticmethod
     async def create_prompt(name: str, template: str) -> str:
@@ -1,21 +1,80 @@
+import asyncio
 import logging
 import json
-import uuid
-from typing import Dict, Any, Optional, Tuple, Type
+import os
+import statistics
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 from db.database import database
-from db.models import StepRun, AgentStep
 from core.step_executor import StepExecutor
+from core.flow_registry import FlowRegistry
 from core.prompt_schema_store import PromptSchemaStore
-from pydantic import BaseModel
+from core.blob_store import BlobStore
+from core.llm_usage import LLMUsage, USAGE_KEYS
 
 logger = logging.getLogger(__name__)
 
+# Default number of replays running at the same time in a batch
+BATCH_CONCURRENCY = max(1, int(os.getenv("REPLAY_BATCH_CONCURRENCY", "4")))
+
+# Maximum number of step runs selected by a batch filter
+BATCH_MAX_RUNS = int(os.getenv("REPLAY_BATCH_MAX_RUNS", "200"))
+
+# Maximum number of differences listed per replay
+DIFF_LIMIT = 20
+
+def diff_outputs(before: Any, after: Any, path: str = "$", limit: int = DIFF_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Structural differences between two JSON values
+
+    Returns:
+        Up to `limit` entries with path, change (added, removed, changed) and,
+        for scalar values, the before and after values
+    """
+    differences: List[Dict[str, Any]] = []
+
+    def entry(path: str, change: str, old: Any = None, new: Any = None) -> None:
+        item = {"path": path, "change": change}
+        if change != "added" and not isinstance(old, (dict, list)):
+            item["before"] = old
+        if change != "removed" and not isinstance(new, (dict, list)):
+            item["after"] = new
+        differences.append(item)
+
+    def visit(old: Any, new: Any, path: str) -> None:
+        if len(differences) >= limit:
+            return
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key in old:
+                if key not in new:
+                    entry(f"{path}.{key}", "removed", old=old[key])
+                else:
+                    visit(old[key], new[key], f"{path}.{key}")
+            for key in new:
+                if key not in old:
+                    entry(f"{path}.{key}", "added", new=new[key])
+        elif isinstance(old, list) and isinstance(new, list):
+            for index in range(max(len(old), len(new))):
+                if index >= len(new):
+                    entry(f"{path}[{index}]", "removed", old=old[index])
+                elif index >= len(old):
+                    entry(f"{path}[{index}]", "added", new=new[index])
+                else:
+                    visit(old[index], new[index], f"{path}[{index}]")
+        elif old != new:
+            entry(path, "changed", old=old, new=new)
+
+    visit(before, after, path)
+    return differences[:limit]
+
 class ReplayEngine:
     """
     Re-runs a single step with stored or modified inputs.
     Used for debugging, testing prompts, and improving step outputs.
+    
+    Replays go through StepExecutor.run_step, the same pipeline as flow
+    steps, with the replayed prompt, schema or model passed as overrides.
     """
     
     @staticmethod
@@ -31,11 +90,12 @@ class ReplayEngine:
         """
         # Get the step run record
         query = """
-        SELECT sr.*, s.name as step_name, s.step_type, s.tool_name, 
+        SELECT sr.*, s.name as step_name, s.step_type, s.tool_name, s.flow_id,
                s.prompt_template_id, s.output_schema_id, s.one_shot_id,
-               s.pydantic_schema_id, s.system_message
+               s.pydantic_schema_id, s.system_message, fr.project_id
         FROM step_runs sr
         JOIN agent_steps s ON sr.step_id = s.id
+        LEFT JOIN flow_runs fr ON sr.flow_run_id = fr.id
         WHERE sr.id = :step_run_id
         """
         result = await database.fetch_one(query=query, values={"step_run_id": step_run_id})
@@ -43,61 +103,42 @@ class ReplayEngine:
         if not result:
             raise ValueError(f"Step run with ID {step_run_id} not found")
         
-        # Convert to dict
-        step_run = dict(result)
+        # Convert to dict and resolve values moved to the blob store
+        step_run = await BlobStore.unpack_row(
+            dict(result),
+            json_fields=["input_data", "output_data"],
+            text_fields=["rendered_prompt"]
+        )
+        # Raw SQL returns JSON columns as strings
+        for field in ("input_data", "output_data"):
+            if isinstance(step_run.get(field), str):
+                step_run[field] = json.loads(step_run[field])
         
-        # Get the prompt template, output schema and one-shot example
-        if step_run["prompt_template_id"]:
-            prompt_query = """
-            SELECT * FROM prompts WHERE id = :prompt_id
-            """
-            prompt_result = await database.fetch_one(
-                query=prompt_query, 
-                values={"prompt_id": step_run["prompt_template_id"]}
-            )
-            
-            if prompt_result:
-                step_run["prompt_template"] = dict(prompt_result)["template"]
+        # Get the prompt template, output schema and one-shot example (cached)
+        assets = await PromptSchemaStore.get_assets_by_ids(
+            prompt_ids=[step_run["prompt_template_id"]],
+            schema_ids=[step_run["output_schema_id"]],
+            one_shot_ids=[step_run.get("one_shot_id")],
+            pydantic_schema_ids=[step_run.get("pydantic_schema_id")]
+        )
+        prompt = assets["prompts"].get(step_run["prompt_template_id"])
+        if prompt:
+            step_run["prompt_template"] = prompt["template"]
         
-        if step_run["output_schema_id"]:
-            schema_query = """
-            SELECT * FROM schemas WHERE id = :schema_id
-            """
-            schema_result = await database.fetch_one(
-                query=schema_query, 
-                values={"schema_id": step_run["output_schema_id"]}
-            )
-            
-            if schema_result:
-                step_run["output_schema"] = dict(schema_result)["schema_json"]
+        schema = assets["schemas"].get(step_run["output_schema_id"])
+        if schema:
+            step_run["output_schema"] = schema["schema_json"]
         
-        if step_run.get("pydantic_schema_id"):
-            pydantic_query = """
-            SELECT * FROM pydantic_schemas WHERE id = :pydantic_schema_id
-            """
-            pydantic_result = await database.fetch_one(
-                query=pydantic_query, 
-                values={"pydantic_schema_id": step_run["pydantic_schema_id"]}
-            )
-            
-            if pydantic_result:
-                step_run["pydantic_schema"] = dict(pydantic_result)
+        pydantic_schema = assets["pydantic_schemas"].get(step_run.get("pydantic_schema_id"))
+        if pydantic_schema:
+            step_run["pydantic_schema"] = pydantic_schema
         
-        if step_run.get("one_shot_id"):
-            one_shot_query = """
-            SELECT * FROM one_shot_examples WHERE id = :one_shot_id
-            """
-            one_shot_result = await database.fetch_one(
-                query=one_shot_query, 
-                values={"one_shot_id": step_run["one_shot_id"]}
-            )
-            
-            if one_shot_result:
-                one_shot_data = dict(one_shot_result)
-                step_run["one_shot_example"] = {
-                    "input": one_shot_data["input_json"],
-                    "output": one_shot_data["output_json"]
-                }
+        one_shot = assets["one_shots"].get(step_run.get("one_shot_id"))
+        if one_shot:
+            step_run["one_shot_example"] = {
+                "input": one_shot["input_json"],
+                "output": one_shot["output_json"]
+            }
         
         return step_run
     
@@ -106,7 +147,10 @@ class ReplayEngine:
         step_run_id: str, 
         modified_input: Optional[Dict[str, Any]] = None,
         modified_prompt: Optional[str] = None,
-        modified_schema: Optional[Dict[str, Any]] = None
+        modified_schema: Optional[Dict[str, Any]] = None,
+        modified_model: Optional[str] = None,
+        use_cache: bool = False,
+        dry_run: bool = True
     ) -> Dict[str, Any]:
         """
         Replay a step run with original or modified inputs
@@ -116,6 +160,11 @@ class ReplayEngine:
             modified_input: Optional modified input data
             modified_prompt: Optional modified prompt template
             modified_schema: Optional modified output schema
+            modified_model: Optional model name to use instead of OPENAI_MODEL_NAME
+            use_cache: Whether LLM results may be served from the response cache.
+                       When False, the Outlines response cache is skipped as well.
+            dry_run: Skip the step messages (WebSocket dispatch and message rows).
+                     The replay is always recorded as a new step run.
             
         Returns:
             Dict with replay results including input, output, and performance metrics
@@ -123,97 +172,52 @@ class ReplayEngine:
         start_time = datetime.utcnow()
         
         try:
-            # Get the step run and associated step details
+            # Get the step run, and the step from the definition cache
             step_run = await ReplayEngine.get_step_run_details(step_run_id)
+            steps = await FlowRegistry.get_steps_by_flow_id(step_run["flow_id"])
+            step = next((step for step in steps if step["id"] == step_run["step_id"]), None)
+            if step is None:
+                raise ValueError(f"Step with ID {step_run['step_id']} not found")
             
-            # we should fetch these details from the step table instead of step_runs table
-            query = """
-            SELECT * FROM agent_steps WHERE id = :step_id
-            """
-            step_result = await database.fetch_one(query=query, values={"step_id": step_run["step_id"]})
-            step = dict(step_result)
+            if step["step_type"] == "tool_call":
+                # Tool call steps require the full step context and can't be easily replayed
+                raise ValueError("Tool call steps cannot be replayed directly")
             
             # Override with modified values if provided
             input_data = modified_input if modified_input is not None else step_run["input_data"]
             
-            # Create a new step run record for the replay
-            replay_run_id = str(uuid.uuid4())
-            insert_query = StepRun.__table__.insert().values(
-                id=replay_run_id,
+            result = await StepExecutor.run_step(
+                step=step,
                 flow_run_id=step_run["flow_run_id"],
-                step_id=step_run["step_id"],
-                status="running",
+                project_id=step_run.get("project_id"),
+                flow_state={},
                 input_data=input_data,
-                started_at=datetime.utcnow()
-            )
-            await database.execute(insert_query)
-            
-            # Get associated assets
-            assets = await PromptSchemaStore.get_step_assets(
-                prompt_id=step["prompt_template_id"],
-                schema_id=step["output_schema_id"],
-                one_shot_id=step.get("one_shot_id"),
-                pydantic_schema_id=step.get("pydantic_schema_id")
+                overrides={
+                    "prompt_template": modified_prompt,
+                    "output_schema": modified_schema,
+                    "model": modified_model,
+                    "use_cache": use_cache
+                },
+                dry_run=dry_run
             )
             
-            # Override with modified values if provided
-            if modified_prompt is not None:
-                assets["prompt_template"] = modified_prompt
-                
-            if modified_schema is not None:
-                assets["output_schema"] = modified_schema
-            
-            # Execute based on step type
-            rendered_prompt = None
-            if step_run["step_type"] == "ai_single":
-                status, output = await ReplayEngine._execute_ai_single(
-                    step=step_run,
-                    input_data=input_data,
-                    assets=assets
-                )
-            elif step_run["step_type"] == "ai_loop":
-                status, output = await ReplayEngine._execute_ai_loop(
-                    step=step_run,
-                    input_data=input_data,
-                    assets=assets
-                )
-            elif step_run["step_type"] == "tool_call":
-                # Tool call steps require the full step context and can't be easily replayed
-                status = "error"
-                output = {"error": "Tool call steps cannot be replayed directly"}
-            else:
-                status = "error"
-                output = {"error": f"Unknown step type: {step_run['step_type']}"}
-            
-            # Update the replay run record
-            end_time = datetime.utcnow()
-            duration = (end_time - start_time).total_seconds()
-            
-            update_values = {
-                "status": status,
-                "output_data": output,
-                "ended_at": end_time
-            }
-            
-            if rendered_prompt:
-                update_values["rendered_prompt"] = f'{rendered_prompt[0]}\n\n{rendered_prompt[1]}'
-                
-            update_query = StepRun.__table__.update().where(
-                StepRun.id == replay_run_id
-            ).values(**update_values)
-            await database.execute(update_query)
+            duration = (datetime.utcnow() - start_time).total_seconds()
             
             # Return the replay results
             return {
-                "replay_run_id": replay_run_id,
+                "replay_run_id": result["step_run_id"],
                 "original_run_id": step_run_id,
                 "step_id": step_run["step_id"],
                 "step_name": step_run["step_name"],
-                "status": status,
+                "status": result["status"],
+                "error": result.get("error"),
                 "input_data": input_data,
-                "output_data": output,
+                "output_data": result["output_data"],
+                "original_output_data": step_run.get("output_data"),
                 "duration": duration,
-                "rendered_prompt": rendered_prompt
+                "rendered_prompt": result["rendered_prompt"],
+                "estimated_prompt_tokens": result["prompt_tokens"],
+                "usage": result["usage"]
             }
             
             
@@ -229,110 +233,135 @@ class ReplayEngine:
             }
     
     @staticmethod
-    async def _execute_ai_single(
-        step: Dict[str, Any], 
-        input_data: Dict[str, Any],
-        assets: Dict[str, Any]
-    ) -> Tuple[str, Dict[str, Any]]:
+    async def select_step_runs(
+        step_id: Optional[str] = None,
+        step_name: Optional[str] = None,
+        flow_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 20
+    ) -> List[str]:
         """
-        Execute a single AI step for replay
-        Similar to StepExecutor.execute_ai_single but uses provided assets
-        """
-        # Prepare the prompt
-        prompt_template = assets["prompt_template"]
-        output_schema = assets["output_schema"]
-        system_message = step["system_message"]
-        pydantic_model_class = assets.get("pydantic_model_class")
-        
-        # Build the full prompt with system message and input data
-        full_prompt = f"{system_message}\n\n"
+        IDs of the most recent step runs matching a filter
         
-        # Add one-shot example if available
-        if "one_shot_example" in assets:
-            one_shot = assets["one_shot_example"]
-            full_prompt += f"Example Input:\n{json.dumps(one_shot['input'], indent=2)}\n\n"
-            full_prompt += f"Example Output:\n{json.dumps(one_shot['output'], indent=2)}\n\n"
-        
-        # Add input data
-        full_prompt += f"Input:\n{json.dumps(input_data, indent=2)}\n\n"
-        
-        # Initialize OpenAI model and run structured generation
-        openai_model = await StepExecutor.init_openai_model()
-        output = await StepExecutor.run_structured_generation(
-            openai_model=openai_model,
-            prompt=full_prompt,
-            schema_json=output_schema,
-            pydantic_model_class=pydantic_model_class
-        )
+        Args:
+            step_id: Optional ID of the step
+            step_name: Optional name of the step
+            flow_id: Optional ID of the flow of the step
+            status: Optional status of the step run
+            limit: Maximum number of step runs (capped at REPLAY_BATCH_MAX_RUNS)
+            
+        Returns:
+            List of step run IDs, most recent first
+        """
+        conditions = []
+        values: Dict[str, Any] = {"limit": max(1, min(limit, BATCH_MAX_RUNS))}
+        for column, name, value in (
+            ("sr.step_id", "step_id", step_id),
+            ("s.name", "step_name", step_name),
+            ("s.flow_id", "flow_id", flow_id),
+            ("sr.status", "status", status),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = :{name}")
+                values[name] = value
         
-        return "success", output
+        query = f"""
+        SELECT sr.id
+        FROM step_runs sr
+        JOIN agent_steps s ON sr.step_id = s.id
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY sr.created_at DESC
+        LIMIT :limit
+        """
+        results = await database.fetch_all(query=query, values=values)
+        return [result["id"] for result in results]
     
     @staticmethod
-    async def _execute_ai_loop(
-        step: Dict[str, Any], 
-        input_data: Dict[str, Any],
-        assets: Dict[str, Any]
-    ) -> Tuple[str, Dict[str, Any]]:
-        """
-        Execute an AI loop step for replay
-        Similar to StepExecutor.execute_ai_loop but uses provided assets
+    async def replay_batch(
+        step_run_ids: List[str],
+        variants: Optional[List[Dict[str, Any]]] = None,
+        concurrency: Optional[int] = None,
+        use_cache: bool = False,
+        dry_run: bool = True
+    ) -> Dict[str, Any]:
         """
-        # Get loop key and items
-        loop_key = step.get("loop_key")
-        if not loop_key or loop_key not in input_data:
-            raise ValueError(f"Loop key '{loop_key}' not found in input data")
+        Replay step runs with one or more prompt, schema or model variants and
+        compare latency, token usage and outputs
         
-        loop_items = input_data[loop_key]
-        if not isinstance(loop_items, list):
-            raise ValueError(f"Loop key '{loop_key}' must point to a list")
+        Replays run concurrently, and their LLM calls share the limit of
+        LLM_MAX_CONCURRENCY with the flows being executed.
         
-        # Prepare step data
-        prompt_template = assets["prompt_template"]
-        output_schema = assets["output_schema"]
-        system_message = step["system_message"]
-        pydantic_model_class = assets.get("pydantic_model_class")
-        
-        # Initialize OpenAI model
-        openai_model = await StepExecutor.init_openai_model()
+        Args:
+            step_run_ids: IDs of the step runs to replay
+            variants: Variants with optional name, prompt_template, output_schema
+                      and model. Defaults to a single replay without changes.
+            concurrency: Number of replays running at the same time
+            use_cache: Whether LLM results may be served from the response cache.
+                       When False, the Outlines response cache is skipped as well.
+            dry_run: Skip the step messages of the replays (see replay_step)
+            
+        Returns:
+            Dict with "results" (one row per step run and variant, with the
+            differences to the original output) and "summary" (one row per variant)
+        """
+        variants = variants or [{}]
+        names = [variant.get("name") or (f"variant_{index + 1}" if len(variants) > 1 else "original")
+                 for index, variant in enumerate(variants)]
+        slots = asyncio.Semaphore(max(1, concurrency or BATCH_CONCURRENCY))
         
-        # Prepare system message
-        system_message = step["system_message"]
+        async def run(step_run_id: str, name: str, variant: Dict[str, Any]) -> Dict[str, Any]:
+            async with slots:
+                with LLMUsage.track() as usage:
+                    result = await ReplayEngine.replay_step(
+                        step_run_id=step_run_id,
+                        modified_prompt=variant.get("prompt_template"),
+                        modified_schema=variant.get("output_schema"),
+                        modified_model=variant.get("model"),
+                        use_cache=use_cache,
+                        dry_run=dry_run
+                    )
+            
+            row = {
+                "step_run_id": step_run_id,
+                "variant": name,
+                "replay_run_id": result.get("replay_run_id"),
+                "status": result["status"],
+                "error": result.get("error"),
+                "duration": result["duration"],
+                "estimated_prompt_tokens": result.get("estimated_prompt_tokens"),
+                "llm_calls": usage["calls"],
+                "cost_usd": usage["cost_usd"],
+            }
+            row.update({key: usage[key] for key in USAGE_KEYS})
+            if result["status"] == "success":
+                differences = diff_outputs(result.get("original_output_data"), result.get("output_data"))
+                row["output_changed"] = bool(differences)
+                row["differences"] = differences
+            return row
         
-        # Results will be collected here
-        results = []
+        rows = await asyncio.gather(*[
+            run(step_run_id, name, variant)
+            for step_run_id in step_run_ids
+            for name, variant in zip(names, variants)
+        ])
         
-        # Process each item in the loop
-        for item in loop_items:
-            # Create item-specific input data
-            item_input = input_data.copy()
-            item_input["current_item"] = item
-
-            # if previous loop runs have created an output_data, add it to the item_input
-            item_input["previous_loop_outputs"] = results
-
-            print(f"item_input-previous_loop_outputs: {item_input['previous_loop_outputs']}")
-            
-            # Build the full prompt
-            full_prompt = f"{system_message}\n\n"
-            
-            # Add one-shot example if available
-            if "one_shot_example" in assets:
-                one_shot = assets["one_shot_example"]
-                full_prompt += f"Example Input:\n{json.dumps(one_shot['input'], indent=2)}\n\n"
-                full_prompt += f"Example Output:\n{json.dumps(one_shot['output'], indent=2)}\n\n"
-            
-            # Add input data
-            full_prompt += f"Input:\n{json.dumps(item_input, indent=2)}\n\n"
-            
-            # Run structured generation
-            output = await StepExecutor.run_structured_generation(
-                openai_model=openai_model,
-                prompt=full_prompt,
-                schema_json=assets["output_schema"],
-                pydantic_model_class=pydantic_model_class
-            )
-            
-            # Add to results
-            results.append(output)
+        summary = []
+        for name in names:
+            variant_rows = [row for row in rows if row["variant"] == name]
+            durations = [row["duration"] for row in variant_rows]
+            item = {
+                "variant": name,
+                "runs": len(variant_rows),
+                "errors": sum(1 for row in variant_rows if row["status"] != "success"),
+                "changed": sum(1 for row in variant_rows if row.get("output_changed")),
+                "mean_duration": statistics.fmean(durations) if durations else None,
+                "p50_duration": statistics.median(durations) if durations else None,
+                "max_duration": max(durations) if durations else None,
+                "estimated_prompt_tokens": sum(row["estimated_prompt_tokens"] or 0 for row in variant_rows),
+                "llm_calls": sum(row["llm_calls"] for row in variant_rows),
+                "cost_usd": sum(row["cost_usd"] for row in variant_rows),
+            }
+            item.update({key: sum(row[key] for row in variant_rows) for key in USAGE_KEYS})
+            summary.append(item)
         
-        return "success", {"results": results} 
\ No newline at end of file
+        return {"results": list(rows), "summary": summary}
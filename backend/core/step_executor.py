@@ -1,20 +1,29 @@
 import logging
 import json
 import asyncio
+import random
+import time
 import uuid
 from typing import Dict, Any, List, Optional, Tuple, Type
 from datetime import datetime, date, timezone, UTC
 from concurrent.futures import ThreadPoolExecutor
 import os
-import outlines
-from outlines.generate import json as generate_json
 
 from db.database import database
 from db.models import StepRun
 from core.prompt_schema_store import PromptSchemaStore
 from core.template_renderer import TemplateRenderer, DateTimeEncoder
+from core.token_budget import PromptBudget
+from core.loop_context import LoopContext, PromptLog
+from core.llm_usage import LLMUsage, USAGE_KEYS
+from core.llm_cache import LLMResponseCache
+from core.output_validator import OutputValidator
+from core.metrics import Metrics
+from core.tracing import Tracer
+from core.flow_registry import FlowRegistry
 from core.tool_call_module import ToolCallModule
 from core.message_dispatcher import dispatch_message
+from core.blob_store import BlobStore
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -22,12 +31,35 @@ logger = logging.getLogger(__name__)
 # ThreadPoolExecutor for running Outlines generation in separate threads
 executor = ThreadPoolExecutor()
 
+def generate_json(model, schema):
+    """
+    outlines.generate.json, imported on first use. Importing Outlines loads
+    its local model backends (torch, transformers), which took most of the
+    start-up time of the API process.
+    """
+    from outlines.generate import json as outlines_generate_json
+    return outlines_generate_json(model, schema)
+
 class StepExecutor:
     """
     Executes a single step within a flow, based on its step_type.
     Handles AI-based steps (single or loop) and tool calls.
     """
     
+    # Maximum number of concurrent LLM calls, shared by flow steps and replays
+    llm_concurrency: int = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "16")))
+    
+    # (event loop, semaphore) limiting the LLM calls of the running loop
+    _llm_slots: Optional[Tuple[Any, asyncio.Semaphore]] = None
+    
+    @staticmethod
+    def llm_slots() -> asyncio.Semaphore:
+        """Semaphore limiting concurrent LLM calls on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if StepExecutor._llm_slots is None or StepExecutor._llm_slots[0] is not loop:
+            StepExecutor._llm_slots = (loop, asyncio.Semaphore(StepExecutor.llm_concurrency))
+        return StepExecutor._llm_slots[1]
+    
     @staticmethod
     def extract_input_data(step_input_map: Dict[str, str], flow_state: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -103,59 +135,147 @@ class StepExecutor:
             return str(value)
     
     @staticmethod
-    async def init_openai_model():
-        """Initialize the OpenAI model with API key from environment"""
+    async def init_openai_model(model_name: Optional[str] = None):
+        """
+        Initialize the OpenAI model with API key from environment
+        
+        Args:
+            model_name: Optional model name, defaults to OPENAI_MODEL_NAME
+        """
         OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY environment variable is not set")
         
-        model_name = os.getenv("OPENAI_MODEL_NAME", "gpt-4.1-nano")
+        model_name = model_name or os.getenv("OPENAI_MODEL_NAME", "gpt-4.1-nano")
+        import outlines
         
-        return outlines.models.openai(
+        # The client is wrapped to record the token usage of each response
+        return LLMUsage.instrument(outlines.models.openai(
             model_name,
             api_key=OPENAI_API_KEY
-        )
+        ))
+    
+    @staticmethod
+    def uncached_model(openai_model):
+        """
+        Copy of an Outlines OpenAI model whose calls are not answered from the
+        Outlines response cache
+        
+        Outlines caches API responses on disk by prompt and request config, so
+        repeating a request returns the first response without calling the
+        API. The copy sends a random seed, which makes the request (and its
+        cache key) unique without changing what the model is asked.
+        """
+        if not hasattr(openai_model, "new_with_replacements"):
+            return openai_model
+        return openai_model.new_with_replacements(seed=random.randrange(2 ** 31))
     
     @staticmethod
     async def run_structured_generation(
         openai_model, 
         prompt: str, 
         schema_json: Dict[str, Any], 
-        pydantic_model_class: Optional[Type[BaseModel]] = None
+        pydantic_model_class: Optional[Type[BaseModel]] = None,
+        use_cache: Optional[bool] = None,
+        schema_id: Optional[str] = None
     ):
         """
         Run structured generation using Outlines and OpenAI
         
+        Outputs of a JSON schema (without Pydantic model class) are validated
+        against it. An invalid output is repaired locally if possible, else
+        the generation is retried (OUTPUT_VALIDATION_RETRIES times) before
+        failing.
+        
         Args:
             openai_model: Initialized OpenAI model from Outlines
             prompt: Complete prompt text
             schema_json: JSON schema for structured output
             pydantic_model_class: Optional Pydantic model class for validation and parsing
+            use_cache: Whether to use the LLM response cache (None = LLM_RESPONSE_CACHE_ENABLED);
+                False also skips the Outlines response cache (see uncached_model)
+            schema_id: ID of the stored output schema, for the validator cache
             
         Returns:
             Structured output from the LLM
         """
+        model_name = getattr(getattr(openai_model, "config", None), "model", None)
+        bypass_cache = use_cache is False
+        use_cache = LLMResponseCache.enabled if use_cache is None else use_cache
+        cache_key = None
+        if use_cache:
+            cache_key = LLMResponseCache.key(
+                model_name,
+                prompt,
+                [schema_json, pydantic_model_class.__name__ if pydantic_model_class else None]
+            )
+            hit, result = LLMResponseCache.get(cache_key)
+            Tracer.set_attribute("llm.cache_hit", hit)
+            if hit:
+                logger.info("Structured generation served from the response cache")
+                return result
+        
         # if pydantic class is provided, pass it to the generator or pass the json schema instead
-        if pydantic_model_class:
-            generator = generate_json(openai_model, pydantic_model_class)
-        else:
-            # Pass the schema directly as a dict, not as a string
-            schema_str = json.dumps(schema_json, cls=DateTimeEncoder)
-            # Create the generator
-            generator = generate_json(openai_model, schema_str)
+        schema_object = pydantic_model_class or json.dumps(schema_json, cls=DateTimeEncoder)
+        generator = None
         # Run in a thread pool to avoid blocking the event loop
         loop = asyncio.get_event_loop()
+        model_label = model_name or "unknown"
+        validate = pydantic_model_class is None and OutputValidator.enabled
+        attempts = 1 + max(OutputValidator.retries, 0) if validate else 1
+        submitted = time.perf_counter()
+        
+        def generate():
+            Metrics.executor_wait.observe(time.perf_counter() - submitted, executor="llm")
+            return LLMUsage.call(lambda: generator(prompt))
+        
         try:
-            result = await loop.run_in_executor(
-                executor,
-                lambda: generator(prompt)
-            )
+            for attempt in range(1, attempts + 1):
+                # A retry of the same request would be answered from the Outlines cache
+                if bypass_cache or attempt > 1:
+                    model = StepExecutor.uncached_model(openai_model)
+                else:
+                    model = openai_model
+                generator = generate_json(model, schema_object)
+                submitted = time.perf_counter()
+                with Tracer.span("llm.generate", model=model_label) as span, \
+                     Metrics.llm_duration.time(model=model_label, status="error") as labels:
+                    async with StepExecutor.llm_slots():
+                        result, calls = await loop.run_in_executor(executor, generate)
+                    labels["status"] = "success"
+                    if span is not None:
+                        for key in USAGE_KEYS:
+                            span.set_attribute(key, sum(usage[key] for usage in calls))
+                LLMUsage.add(calls, model_name)
+                for usage in calls:
+                    for key in USAGE_KEYS:
+                        Metrics.llm_tokens.inc(usage[key], model=model_label, kind=key.replace("_tokens", ""))
 
-            # Check if the result is a Pydantic model instance
-            if isinstance(result, BaseModel):
-                # Convert Pydantic model to dictionary
-                result = result.model_dump()
-            logger.info(f"result: {result}")
+                # Check if the result is a Pydantic model instance
+                if isinstance(result, BaseModel):
+                    # Convert Pydantic model to dictionary
+                    result = result.model_dump()
+                logger.info(f"result: {result}")
+                if not validate:
+                    break
+                
+                # Catch schema violations here rather than as KeyErrors in later steps
+                outcome, result, errors = OutputValidator.check(schema_json, result, schema_id)
+                Metrics.output_validation.inc(result=outcome)
+                Tracer.set_attribute("llm.output_validation", outcome)
+                if outcome != "invalid":
+                    break
+                logger.warning(
+                    f"Structured output does not match the schema (attempt {attempt} of {attempts}): "
+                    f"{'; '.join(errors[:5])}"
+                )
+            else:
+                raise ValueError(
+                    f"Structured output does not match the schema after {attempts} attempts: {'; '.join(errors[:5])}"
+                )
+            
+            if cache_key is not None:
+                LLMResponseCache.set(cache_key, result)
             return result
         except Exception as e:
             logger.error(f"Error in structured generation: {e}")
@@ -180,26 +300,101 @@ class StepExecutor:
         Returns:
             Tuple of (status, output_data)
         """
-        step_id = step["id"]
+        result = await StepExecutor.run_step(step, flow_run_id, project_id, flow_state)
+        return result["status"], result["output_data"]
+    
+    @staticmethod
+    async def run_step(
+        step: Dict[str, Any],
+        flow_run_id: str,
+        project_id: Optional[str],
+        flow_state: Dict[str, Any],
+        input_data: Optional[Dict[str, Any]] = None,
+        overrides: Optional[Dict[str, Any]] = None,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Execute a step and record it as a step run. Flows and replays both
+        run steps through here.
+        
+        Args:
+            step: Step metadata
+            flow_run_id: ID of the flow run the step run belongs to
+            project_id: ID of the project (receives the step messages)
+            flow_state: Current state of the flow execution
+            input_data: Input data to use instead of extracting it from the flow state
+            overrides: Optional prompt_template, output_schema, model and use_cache
+                       replacing the step's assets and the LLM settings
+            dry_run: Skip the start/complete messages (no WebSocket dispatch or message rows)
+            
+        Returns:
+            Dict with step_run_id, status, output_data, rendered_prompt,
+            prompt_tokens and usage (provider-reported tokens)
+        """
+        start = time.perf_counter()
+        with Tracer.span("step.run", step=step["name"], step_type=step["step_type"], flow_run_id=flow_run_id) as span:
+            result = await StepExecutor._run_step(step, flow_run_id, project_id, flow_state, input_data, overrides, dry_run)
+            if span is not None:
+                span.set_attribute("status", result["status"])
+                if result["status"] == "error":
+                    span.status, span.status_message = "ERROR", result.get("error")
+        if Metrics.enabled:
+            Metrics.step_duration.observe(
+                time.perf_counter() - start,
+                flow=await StepExecutor._flow_name(step),
+                step=step["name"],
+                step_type=step["step_type"],
+                status=result["status"]
+            )
+        return result
+    
+    @staticmethod
+    async def _flow_name(step: Dict[str, Any]) -> str:
+        """Name of the flow of a step, for metric labels"""
+        if not step.get("flow_id"):
+            return "unknown"
+        try:
+            flow = await FlowRegistry.get_flow_by_id(step["flow_id"])
+        except Exception as e:
+            logger.debug(f"Could not load flow of step {step['name']}: {e}")
+            flow = None
+        return flow["name"] if flow else "unknown"
+    
+    @staticmethod
+    async def _run_step(
+        step: Dict[str, Any],
+        flow_run_id: str,
+        project_id: Optional[str],
+        flow_state: Dict[str, Any],
+        input_data: Optional[Dict[str, Any]],
+        overrides: Optional[Dict[str, Any]],
+        dry_run: bool
+    ) -> Dict[str, Any]:
+        """Execute and record a step (see run_step)"""
         step_name = step["name"]
         step_type = step["step_type"]
-        input_map = step["input_map"]
+        
+        async def dispatch(**kwargs):
+            if not dry_run:
+                await dispatch_message(project_id=project_id, **kwargs)
         
         # Create step run record
-        step_run_id = await StepExecutor.create_step_run(flow_run_id, step_id)
+        step_run_id = await StepExecutor.create_step_run(flow_run_id, step["id"])
+        result = {"step_run_id": step_run_id, "rendered_prompt": None, "prompt_tokens": None, "usage": None}
         
         # Dispatch start message
-        await dispatch_message(
+        await dispatch(
             template=step.get("start_message"),
             context={"step_name": step_name},
             fallback_type="start_step",
-            role="system",
-            project_id=project_id
+            role="system"
         )
         
+        usage = None
         try:
             # Extract input data from flow state based on input_map
-            input_data = StepExecutor.extract_input_data(input_map, flow_state)
+            if input_data is None:
+                input_data = StepExecutor.extract_input_data(step["input_map"], flow_state)
             # Update step run with input data
             await StepExecutor.update_step_run(step_run_id, "running", input_data)
 
@@ -242,7 +437,7 @@ class StepExecutor:
                         output_data={}
                     )
 
-                    await dispatch_message(
+                    await dispatch(
                         template="Skipping step {{step_name}} — no changes were planned for this step.",
                         context={
                             "step_name": step_name,
@@ -250,85 +445,132 @@ class StepExecutor:
                             "input_data": input_data
                         },
                         fallback_type="end_step",
-                        role="system",
-                        project_id=project_id
+                        role="system"
                     )
 
-                    return "skipped", {}
+                    result.update(status="skipped", output_data={})
+                    return result
 
                 
             rendered_prompt = None
+            prompt_tokens = None
             # Execute based on step type
-            if step_type == "ai_single":
-                status, output_data, rendered_prompt = await StepExecutor.execute_ai_single(step, input_data)
-            elif step_type == "ai_loop":
-                status, output_data, rendered_prompt = await StepExecutor.execute_ai_loop(step, input_data)
-            elif step_type == "tool_call":
-                status, output_data = await StepExecutor.execute_tool_call(step, input_data)
-            else:
-                raise ValueError(f"Unknown step type: {step_type}")
-            
+            with LLMUsage.track() as usage:
+                if step_type == "ai_single":
+                    status, output_data, rendered_prompt, prompt_tokens = await StepExecutor.execute_ai_single(step, input_data, overrides)
+                elif step_type == "ai_loop":
+                    status, output_data, rendered_prompt, prompt_tokens = await StepExecutor.execute_ai_loop(step, input_data, overrides)
+                elif step_type == "tool_call":
+                    status, output_data = await StepExecutor.execute_tool_call(step, input_data)
+                else:
+                    raise ValueError(f"Unknown step type: {step_type}")
             # Update step run with output data and rendered prompt
             await StepExecutor.update_step_run(
                 step_run_id, 
                 status,
                 input_data=input_data,
                 output_data=output_data,
-                rendered_prompt=rendered_prompt
+                rendered_prompt=rendered_prompt,
+                estimated_prompt_tokens=prompt_tokens,
+                usage=usage
             )
             
             # Dispatch complete message
-            await dispatch_message(
+            await dispatch(
                 template=step.get("complete_message"),
                 context={"step_name": step_name, "output_data": output_data, "input_data": input_data},
                 fallback_type="end_step",
-                role="system",
-                project_id=project_id
+                role="system"
             )
             
-            return status, output_data
+            result.update(
+                status=status,
+                output_data=output_data,
+                rendered_prompt=rendered_prompt,
+                prompt_tokens=prompt_tokens,
+                usage=dict(usage)
+            )
+            return result
             
         except Exception as e:
             logger.error(f"Error executing step {step_name}: {e}")
             
-            # Update step run with error
+            # Update step run with error, keeping the usage of the calls made before it
             await StepExecutor.update_step_run(
                 step_run_id,
                 "error",
-                input_data=input_data if 'input_data' in locals() else {},
-                error_message=str(e)
+                input_data=input_data if input_data is not None else {},
+                error_message=str(e),
+                usage=usage
             )
             
             # Dispatch error message
-            await dispatch_message(
+            await dispatch(
                 template=f"Error in step {step_name}: {str(e)}",
                 context={},
                 fallback_type="end_step",
-                role="error",
-                project_id=project_id
+                role="error"
             )
             
-            return "error", {"error": str(e)}
+            result.update(status="error", output_data={"error": str(e)}, error=str(e))
+            return result
     
     @staticmethod
-    async def execute_ai_single(step: Dict[str, Any], input_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any], str]:
+    async def get_assets(step: Dict[str, Any], overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Prompt, schema and one-shot example of a step, with optional overrides
+        
+        Args:
+            step: Step metadata
+            overrides: Optional prompt_template and output_schema replacing the step's
+            
+        Returns:
+            Dict with prompt_template, output_schema, one_shot_example and
+            pydantic_model_class (if available)
+        """
+        with Tracer.span("step.assets"):
+            assets = await PromptSchemaStore.get_step_assets(
+                prompt_id=step["prompt_template_id"],
+                schema_id=step["output_schema_id"],
+                one_shot_id=step.get("one_shot_id"),
+                pydantic_schema_id=step.get("pydantic_schema_id")
+            )
+        overrides = overrides or {}
+        if overrides.get("prompt_template") is not None:
+            assets["prompt_template"] = overrides["prompt_template"]
+        if overrides.get("output_schema") is not None:
+            assets["output_schema"] = overrides["output_schema"]
+            # The Pydantic model describes the step's own schema
+            assets.pop("pydantic_model_class", None)
+        return assets
+
+    @staticmethod
+    def output_schema_id(step: Dict[str, Any], overrides: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """ID of the stored output schema a step generates with, None for an overridden schema"""
+        if (overrides or {}).get("output_schema") is not None:
+            return None
+        return step.get("output_schema_id")
+
+    @staticmethod
+    async def execute_ai_single(
+        step: Dict[str, Any],
+        input_data: Dict[str, Any],
+        overrides: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, Dict[str, Any], str, int]:
         """
         Execute a single AI step
         
         Args:
             step: Step metadata
             input_data: Input data for the step
+            overrides: Optional asset and LLM overrides (see run_step)
             
         Returns:
-            Tuple of (status, output_data, rendered_prompt)
+            Tuple of (status, output_data, rendered_prompt, prompt_tokens)
         """
+        overrides = overrides or {}
         # Get step assets (prompt, schema, one-shot)
-        assets = await PromptSchemaStore.get_step_assets(
-            prompt_id=step["prompt_template_id"],
-            schema_id=step["output_schema_id"],
-            one_shot_id=step.get("one_shot_id"),
-            pydantic_schema_id=step.get("pydantic_schema_id")
-        )
+        assets = await StepExecutor.get_assets(step, overrides)
         
         # Prepare the prompt components
         prompt_template = assets["prompt_template"]
@@ -337,38 +579,51 @@ class StepExecutor:
         one_shot_example = assets.get("one_shot_example")
         pydantic_model_class = assets.get("pydantic_model_class")
         
-        # Build the full prompt with template renderer
-        full_prompt = TemplateRenderer.build_full_prompt(
-            template_text=prompt_template,
-            input_data=input_data,
-            system_message=system_message,
-            one_shot_example=one_shot_example
-        )
+        # Build the full prompt with template renderer, compacted to the step's token budget
+        with Tracer.span("prompt.build") as span:
+            full_prompt = PromptBudget.build(
+                template_text=prompt_template,
+                input_data=input_data,
+                system_message=system_message,
+                one_shot_example=one_shot_example,
+                token_budget=step.get("prompt_token_budget"),
+                layout=step.get("prompt_layout")
+            )
+            if span is not None:
+                span.set_attribute("prompt_tokens", full_prompt[2])
         # Initialize OpenAI model
-        openai_model = await StepExecutor.init_openai_model()
+        openai_model = await StepExecutor.init_openai_model(overrides.get("model"))
         
         # Run structured generation
         output = await StepExecutor.run_structured_generation(
             openai_model=openai_model,
             prompt=full_prompt[0],
             schema_json=output_schema,
-            pydantic_model_class=pydantic_model_class
+            pydantic_model_class=pydantic_model_class,
+            use_cache=overrides.get("use_cache"),
+            schema_id=StepExecutor.output_schema_id(step, overrides)
         )
         prompt_with_error = f'{full_prompt[0]}\n\n{full_prompt[1]}'
-        return "success", output, prompt_with_error
+        return "success", output, prompt_with_error, full_prompt[2]
     
     @staticmethod
-    async def execute_ai_loop(step: Dict[str, Any], input_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any], str]:
+    async def execute_ai_loop(
+        step: Dict[str, Any],
+        input_data: Dict[str, Any],
+        overrides: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, Dict[str, Any], str, int]:
         """
         Execute an AI loop step that iterates over a list in the input
         
         Args:
             step: Step metadata
             input_data: Input data for the step
+            overrides: Optional asset and LLM overrides (see run_step)
             
         Returns:
-            Tuple of (status, output_data, rendered_prompt)
+            Tuple of (status, output_data, rendered_prompt, prompt_tokens of all iterations)
         """
+        overrides = overrides or {}
         
         loop_key = step["loop_key"]
         if not loop_key or loop_key not in input_data:
@@ -378,26 +633,27 @@ class StepExecutor:
         if not isinstance(loop_items, list):
             raise ValueError(f"Loop key '{loop_key}' must point to a list")
         
+        # How much of the previous iterations each prompt sees
+        loop_context = LoopContext.parse(step.get("loop_context"))
+        
         # Get step assets once for all iterations
-        assets = await PromptSchemaStore.get_step_assets(
-            prompt_id=step["prompt_template_id"],
-            schema_id=step["output_schema_id"],
-            one_shot_id=step.get("one_shot_id"),
-            pydantic_schema_id=step.get("pydantic_schema_id")
-        )
+        assets = await StepExecutor.get_assets(step, overrides)
         
         # Initialize OpenAI model once
-        openai_model = await StepExecutor.init_openai_model()
+        openai_model = await StepExecutor.init_openai_model(overrides.get("model"))
         
         # Prepare system message and other assets
         system_message = step["system_message"]
         prompt_template = assets["prompt_template"]
         one_shot_example = assets.get("one_shot_example")
         pydantic_model_class = assets.get("pydantic_model_class")
+        schema_id = StepExecutor.output_schema_id(step, overrides)
         
         # Results will be collected here
         results = []
-        all_prompts = []
+        # Only the first and the most recent prompts are kept for storage
+        prompt_log = PromptLog()
+        prompt_tokens = 0
         
         # Process each item in the loop
         for item in loop_items:
@@ -405,33 +661,41 @@ class StepExecutor:
             item_input = input_data.copy()
             item_input["current_item"] = item
             # if previous loop runs have created an output_data, add it to the item_input
-            print(f"len(results): {len(results)}")
-            if len(results) > 0:
-                item_input["previous_loop_outputs"] = results
+            previous_outputs = LoopContext.previous_outputs(loop_context, results, item)
+            if previous_outputs is not None:
+                item_input["previous_loop_outputs"] = previous_outputs
             
-            # Build the full prompt with template renderer
-            full_prompt = TemplateRenderer.build_full_prompt(
-                template_text=prompt_template,
-                input_data=item_input,
-                system_message=system_message,
-                one_shot_example=one_shot_example
-            )
-            all_prompts.append(f'{full_prompt[0]}\n\n{full_prompt[1]}')
+            # Build the full prompt with template renderer, compacted to the step's token budget
+            with Tracer.span("prompt.build") as span:
+                full_prompt = PromptBudget.build(
+                    template_text=prompt_template,
+                    input_data=item_input,
+                    system_message=system_message,
+                    one_shot_example=one_shot_example,
+                    token_budget=step.get("prompt_token_budget"),
+                    layout=step.get("prompt_layout")
+                )
+                if span is not None:
+                    span.set_attribute("prompt_tokens", full_prompt[2])
+            prompt_log.append(f'{full_prompt[0]}\n\n{full_prompt[1]}')
+            prompt_tokens += full_prompt[2]
             
             # Run structured generation
             output = await StepExecutor.run_structured_generation(
                 openai_model=openai_model,
                 prompt=full_prompt[0],
                 schema_json=assets["output_schema"],
-                pydantic_model_class=pydantic_model_class
+                pydantic_model_class=pydantic_model_class,
+                use_cache=overrides.get("use_cache"),
+                schema_id=schema_id
             )
             
             # Add to results
             results.append(output)
         
         # Create a single combined prompt for storage
-        combined_prompt = "\n\n=== LOOP ITERATION SEPARATOR ===\n\n".join(all_prompts)
-        return "success", {"results": results}, combined_prompt
+        combined_prompt = prompt_log.combined("\n\n=== LOOP ITERATION SEPARATOR ===\n\n")
+        return "success", {"results": results}, combined_prompt, prompt_tokens
     
     @staticmethod
     async def execute_tool_call(step: Dict[str, Any], input_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
@@ -479,7 +743,8 @@ class StepExecutor:
                     logger.error(f"Error rendering tool input template: {e}")
         
         # Execute the tool with processed input
-        output = await ToolCallModule.execute_tool(tool_name, input_data)
+        with Tracer.span("tool.call", tool=tool_name):
+            output = await ToolCallModule.execute_tool(tool_name, input_data)
         return "success", output
     
     @staticmethod
@@ -504,9 +769,16 @@ class StepExecutor:
         input_data: Optional[Dict[str, Any]] = None,
         output_data: Optional[Dict[str, Any]] = None,
         error_message: Optional[str] = None,
-        rendered_prompt: Optional[str] = None
+        rendered_prompt: Optional[str] = None,
+        estimated_prompt_tokens: Optional[int] = None,
+        usage: Optional[Dict[str, Any]] = None
     ) -> None:
-        """Update a step run record"""
+        """
+        Update a step run record
+        
+        The provider-reported usage (see LLMUsage.track) is stored only if
+        the step made LLM calls; steps without calls keep NULL token counts.
+        """
         values = {"status": status}
         
         if input_data is not None:
@@ -514,7 +786,7 @@ class StepExecutor:
             try:
                 # Test if it can be serialized
                 json.dumps(input_data, cls=DateTimeEncoder)
-                values["input_data"] = input_data
+                values["input_data"] = await BlobStore.pack_json(input_data)
             except (TypeError, ValueError) as e:
                 logger.error(f"Error serializing input_data: {e}")
                 # Store what we can - convert to string representation
@@ -531,7 +803,7 @@ class StepExecutor:
 
                 # Test if it can be serialized
                 json.dumps(output_data, cls=DateTimeEncoder)
-                values["output_data"] = output_data
+                values["output_data"] = await BlobStore.pack_json(output_data)
             except (TypeError, ValueError) as e:
                 logger.error(f"Error serializing output_data: {e}")
                 # Try to create a safe copy
@@ -545,7 +817,15 @@ class StepExecutor:
             values["error_message"] = error_message
             
         if rendered_prompt is not None:
-            values["rendered_prompt"] = rendered_prompt
+            values["rendered_prompt"] = await BlobStore.pack_text(rendered_prompt)
+        
+        if estimated_prompt_tokens is not None:
+            values["estimated_prompt_tokens"] = estimated_prompt_tokens
+        
+        if usage and usage.get("calls"):
+            values["llm_calls"] = usage["calls"]
+            values.update({key: usage[key] for key in USAGE_KEYS})
+            values["cost_usd"] = usage.get("cost_usd")
         
         if status in ["success", "error", "skipped"]:
             values["ended_at"] = datetime.now(UTC)
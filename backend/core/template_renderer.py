@@ -1,11 +1,22 @@
 import jinja2
 import json
 import logging
+import os
+import time
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, date, timezone, UTC
 
+from core.metrics import Metrics
+
 logger = logging.getLogger(__name__)
 
+# Orders of the prompt parts:
+#   legacy        - system message, rendered template, one-shot example
+#   prefix_stable - system message, one-shot example, rendered template, so that
+#                   the static parts form a prefix the provider can cache
+PROMPT_LAYOUTS = ("legacy", "prefix_stable")
+
 class DateTimeEncoder(json.JSONEncoder):
     """
     Custom JSON encoder that handles datetime and date objects
@@ -21,6 +32,9 @@ class TemplateRenderer:
     Used for prompt templates in the agent workflow system.
     """
     
+    # Layout used when a step does not set one (see PROMPT_LAYOUTS)
+    default_layout: str = os.getenv("PROMPT_LAYOUT", "legacy")
+    
     @staticmethod
     def _json_filter(value):
         """
@@ -41,18 +55,25 @@ class TemplateRenderer:
         return str(value)
     
     @staticmethod
-    def render_template(template_text: str, context: Dict[str, Any]) -> str:
+    def _compact_json_filter(value):
         """
-        Render a Jinja2 template with the provided context
-        
-        Args:
-            template_text: Jinja2 template text
-            context: Dictionary of data to render the template with
-            
-        Returns:
-            Rendered template as a string
+        Filter to convert a Python object to a JSON string without indentation
+        """
+        return json.dumps(value, separators=(",", ":"), cls=DateTimeEncoder)
+    
+    @staticmethod
+    def _compact_pretty_print_filter(value):
         """
-        # Create Jinja2 environment
+        Filter to print a value based on its type, without JSON indentation
+        """
+        if isinstance(value, (dict, list)):
+            return TemplateRenderer._compact_json_filter(value)
+        return TemplateRenderer._pretty_print_filter(value)
+    
+    @staticmethod
+    @lru_cache(maxsize=2)
+    def _get_environment(compact: bool = False) -> jinja2.Environment:
+        """Jinja2 environment with the custom filters, created once"""
         env = jinja2.Environment(
             autoescape=False,
             trim_blocks=True,
@@ -60,13 +81,39 @@ class TemplateRenderer:
         )
         
         # Add custom filters
-        env.filters['json'] = TemplateRenderer._json_filter
-        env.filters['pretty'] = TemplateRenderer._pretty_print_filter
+        if compact:
+            env.filters['json'] = TemplateRenderer._compact_json_filter
+            env.filters['pretty'] = TemplateRenderer._compact_pretty_print_filter
+        else:
+            env.filters['json'] = TemplateRenderer._json_filter
+            env.filters['pretty'] = TemplateRenderer._pretty_print_filter
+        return env
+    
+    @staticmethod
+    @lru_cache(maxsize=int(os.getenv("TEMPLATE_CACHE_SIZE", "256")))
+    def _compile(template_text: str, compact: bool = False) -> jinja2.Template:
+        """Compiled template, cached by template text"""
+        return TemplateRenderer._get_environment(compact).from_string(template_text)
+    
+    @staticmethod
+    def render_template(template_text: str, context: Dict[str, Any], compact: bool = False) -> str:
+        """
+        Render a Jinja2 template with the provided context
         
-        # Parse and render the template
+        Args:
+            template_text: Jinja2 template text
+            context: Dictionary of data to render the template with
+            compact: Whether the json/pretty filters omit indentation
+            
+        Returns:
+            Rendered template as a string
+        """
+        # Parse (once per template text) and render the template
+        start = time.perf_counter()
         try:
-            template = env.from_string(template_text)
+            template = TemplateRenderer._compile(template_text, compact)
             rendered = template.render(**context)
+            Metrics.template_render.observe(time.perf_counter() - start)
             return rendered
         except jinja2.exceptions.TemplateSyntaxError as e:
             error_msg = f"Template syntax error: {str(e)}"
@@ -86,32 +133,52 @@ class TemplateRenderer:
         template_text: str,
         input_data: Dict[str, Any],
         system_message: str,
-        one_shot_example: Optional[Dict[str, Any]] = None
+        one_shot_example: Optional[Dict[str, Any]] = None,
+        compact: bool = False,
+        layout: Optional[str] = None
     ) -> Tuple[str, Optional[str]]:
         """
         Build a complete prompt using template, system message, one-shot example, and input data
         
+        Args:
+            compact: Whether JSON is rendered without indentation
+            layout: Order of the prompt parts (see PROMPT_LAYOUTS), None for PROMPT_LAYOUT
+        
         Returns:
             Tuple containing:
                 - Complete rendered prompt as a string
                 - Optional error message (None if no error)
+        
+        Raises:
+            ValueError: If the layout is unknown
         """
+        layout = layout or TemplateRenderer.default_layout
+        if layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Invalid prompt layout: {layout}")
+
+        one_shot_text = ""
+        if one_shot_example:
+            one_shot_text = f"One-Shot Example:\n\n{json.dumps(one_shot_example['output'], indent=None if compact else 2)}\n\n"
+
         # Start with system message
         full_prompt = f"{system_message}\n\n"
+        if layout == "prefix_stable":
+            # Static parts first: only the end of the prompt varies between calls
+            full_prompt += one_shot_text
 
         try:
-            rendered_template = TemplateRenderer.render_template(template_text, input_data)
-            logger.debug(f"Input data for template: {json.dumps(input_data)}")
-            logger.debug(f"Rendered template: {rendered_template}")
+            rendered_template = TemplateRenderer.render_template(template_text, input_data, compact=compact)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Input data for template: {json.dumps(input_data, cls=DateTimeEncoder)}")
+                logger.debug(f"Rendered template: {rendered_template}")
             full_prompt += rendered_template
 
-            if one_shot_example:
-                full_prompt += f"\n\nOne-Shot Example:\n"
-                full_prompt += f"\n{json.dumps(one_shot_example['output'], indent=2)}\n\n"
+            if one_shot_text and layout == "legacy":
+                full_prompt += f"\n\n{one_shot_text}"
 
             return full_prompt, None  # ✅ no error
 
         except ValueError as e:
             logger.warning(f"Template rendering failed: {str(e)}. Falling back to simple JSON prompt.")
-            fallback_prompt = f"{full_prompt}Input:\n{json.dumps(input_data, indent=2)}\n\n"
+            fallback_prompt = f"{full_prompt}Input:\n{json.dumps(input_data, indent=None if compact else 2, cls=DateTimeEncoder)}\n\n"
             return fallback_prompt, str(e)  # ✅ return fallback + error message
@@ -0,0 +1,273 @@
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+
+import jinja2
+from jinja2 import nodes
+
+from core.template_renderer import TemplateRenderer
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional, tokens are estimated from the text length otherwise
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.get_encoding(os.getenv("TOKENIZER_ENCODING", "o200k_base"))
+
+def count_tokens(text: str) -> int:
+    """
+    Number of tokens of a text. Uses tiktoken when it is installed and about
+    4 characters per token otherwise.
+    """
+    if tiktoken is not None:
+        try:
+            return len(_encoding().encode(text, disallowed_special=()))
+        except Exception as e:
+            logger.warning(f"Tokenizer failed, estimating token count: {e}")
+    return len(text) // 4 + 1
+
+# Loop variable and key of the outputs of previous iterations (see StepExecutor.execute_ai_loop)
+LOOP_OUTPUTS_KEY = "previous_loop_outputs"
+
+# Key paths of the input variables used by a template: variable -> set of paths.
+# An empty path means the whole value is used.
+_UsedPaths = Dict[str, Set[Tuple[str, ...]]]
+
+def _attribute_chain(node: nodes.Node) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """Return (variable, path) for name.a.b / name['a'] expressions, None otherwise"""
+    path: List[str] = []
+    while True:
+        if isinstance(node, nodes.Getattr):
+            path.append(node.attr)
+            node = node.node
+        elif isinstance(node, nodes.Getitem) and isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+            path.append(node.arg.value)
+            node = node.node
+        elif isinstance(node, nodes.Name):
+            return node.name, tuple(reversed(path))
+        else:
+            return None
+
+@lru_cache(maxsize=256)
+def _used_paths(template_text: str) -> Optional[_UsedPaths]:
+    """Input paths used by a template, or None if they cannot be determined"""
+    try:
+        ast = jinja2.Environment().parse(template_text)
+    except jinja2.exceptions.TemplateError:
+        return None
+    # Included and imported templates see the whole context
+    if any(True for _ in ast.find_all((nodes.Include, nodes.Import, nodes.FromImport, nodes.Extends))):
+        return None
+
+    used: _UsedPaths = {}
+    # Variables assigned in the template shadow inputs with the same name
+    assigned = {name.name for name in ast.find_all(nodes.Name) if name.ctx != "load"}
+
+    def visit(node: nodes.Node) -> None:
+        chain = _attribute_chain(node) if isinstance(node, (nodes.Getattr, nodes.Getitem, nodes.Name)) else None
+        if chain is not None:
+            name, path = chain
+            used.setdefault(name, set()).add(() if name in assigned else path)
+            return
+        for child in node.iter_child_nodes():
+            visit(child)
+
+    visit(ast)
+    return used
+
+def _prune(value: Any, paths: Set[Tuple[str, ...]]) -> Any:
+    """Keep only the parts of a value reached by the given key paths"""
+    if () in paths or not isinstance(value, dict):
+        return value
+    children: Dict[str, Set[Tuple[str, ...]]] = {}
+    for path in paths:
+        # Attributes that are not keys (e.g. .items()) need the whole dict
+        if path[0] not in value:
+            return value
+        children.setdefault(path[0], set()).add(path[1:])
+    return {key: _prune(value[key], key_paths) for key, key_paths in children.items()}
+
+def _drop_empty(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _drop_empty(v) for k, v in value.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_drop_empty(item) for item in value]
+    return value
+
+def _skeleton(value: Any, depth: int = 2) -> Any:
+    """Scalar fields of a value (e.g. ids and names), nested up to `depth` levels"""
+    if isinstance(value, dict):
+        if depth == 0:
+            return None
+        result = {}
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                item = _skeleton(item, depth - 1)
+                if item in (None, {}, []):
+                    continue
+            result[key] = item
+        return result
+    if isinstance(value, list):
+        return None
+    return value
+
+def compact_json(state: Dict[str, Any]) -> bool:
+    """Render JSON without indentation"""
+    if state["compact"]:
+        return False
+    state["compact"] = True
+    return True
+
+def prune_unused(state: Dict[str, Any]) -> bool:
+    """Drop input variables and keys the template does not reference"""
+    used = _used_paths(state["template_text"])
+    if used is None:
+        return False
+    pruned = {key: _prune(value, used[key]) for key, value in state["input_data"].items() if key in used}
+    if pruned == state["input_data"]:
+        return False
+    state["input_data"] = pruned
+    return True
+
+def drop_empty(state: Dict[str, Any]) -> bool:
+    """Remove null and empty values nested in the inputs"""
+    # Top-level variables are kept so that templates referencing them still render
+    pruned = {key: _drop_empty(value) for key, value in state["input_data"].items()}
+    if pruned == state["input_data"]:
+        return False
+    state["input_data"] = pruned
+    return True
+
+def summarize_loop_outputs(state: Dict[str, Any]) -> bool:
+    """Reduce the outputs of earlier loop iterations to their scalar fields"""
+    outputs = state["input_data"].get(LOOP_OUTPUTS_KEY)
+    keep = PromptBudget.loop_outputs_kept
+    if not isinstance(outputs, list) or len(outputs) <= keep:
+        return False
+    split = len(outputs) - keep
+    summarized = [_skeleton(output) for output in outputs[:split]] + outputs[split:]
+    if summarized == outputs:
+        return False
+    state["input_data"] = dict(state["input_data"], **{LOOP_OUTPUTS_KEY: summarized})
+    return True
+
+def drop_one_shot(state: Dict[str, Any]) -> bool:
+    """Leave out the one-shot example"""
+    if not state["one_shot_example"]:
+        return False
+    state["one_shot_example"] = None
+    return True
+
+class PromptBudget:
+    """
+    Builds step prompts within a token budget.
+
+    When the prompt built by TemplateRenderer.build_full_prompt exceeds the
+    budget of the step, the configured compaction strategies are applied in
+    order, each on top of the previous ones, until the prompt fits.
+    """
+
+    # Default token budget of a prompt; steps can override it (0 = unlimited)
+    default_budget: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "0"))
+
+    # Compaction strategies in the order they are applied
+    strategies: List[str] = [
+        name.strip() for name in os.getenv(
+            "PROMPT_COMPACTION_STRATEGIES",
+            "compact_json,prune_unused,drop_empty,summarize_loop_outputs,drop_one_shot"
+        ).split(",") if name.strip()
+    ]
+
+    # Number of most recent loop outputs kept in full by summarize_loop_outputs
+    loop_outputs_kept: int = int(os.getenv("PROMPT_LOOP_OUTPUTS_KEPT", "1"))
+
+    _strategies: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+        "compact_json": compact_json,
+        "prune_unused": prune_unused,
+        "drop_empty": drop_empty,
+        "summarize_loop_outputs": summarize_loop_outputs,
+        "drop_one_shot": drop_one_shot,
+    }
+
+    @staticmethod
+    def register_strategy(name: str, strategy: Callable[[Dict[str, Any]], bool]) -> None:
+        """
+        Add a compaction strategy that can be listed in PROMPT_COMPACTION_STRATEGIES
+
+        Args:
+            name: Name of the strategy
+            strategy: Function modifying the prompt state (template_text, input_data,
+                      one_shot_example, compact) and returning whether it changed it
+        """
+        PromptBudget._strategies[name] = strategy
+
+    @staticmethod
+    def build(
+        template_text: str,
+        input_data: Dict[str, Any],
+        system_message: str,
+        one_shot_example: Optional[Dict[str, Any]] = None,
+        token_budget: Optional[int] = None,
+        layout: Optional[str] = None
+    ) -> Tuple[str, Optional[str], int]:
+        """
+        Build a prompt and compact it if it exceeds the token budget
+
+        Args:
+            template_text: Prompt template
+            input_data: Input data for the template
+            system_message: System message of the step
+            one_shot_example: Optional one-shot example
+            token_budget: Maximum prompt tokens (None = PROMPT_TOKEN_BUDGET, 0 = unlimited)
+            layout: Order of the prompt parts (None = PROMPT_LAYOUT)
+
+        Returns:
+            Tuple of (prompt, template error or None, prompt token count)
+        """
+        budget = PromptBudget.default_budget if token_budget is None else token_budget
+        state = {
+            "template_text": template_text,
+            "input_data": input_data,
+            "one_shot_example": one_shot_example,
+            "compact": False,
+        }
+
+        prompt, error = TemplateRenderer.build_full_prompt(template_text, input_data, system_message, one_shot_example, layout=layout)
+        tokens = count_tokens(prompt)
+        if budget <= 0 or tokens <= budget:
+            return prompt, error, tokens
+
+        original_tokens = tokens
+        applied = []
+        for name in PromptBudget.strategies:
+            strategy = PromptBudget._strategies.get(name)
+            if strategy is None:
+                logger.warning(f"Unknown prompt compaction strategy: {name}")
+                continue
+            if not strategy(state):
+                continue
+            applied.append(name)
+            prompt, error = TemplateRenderer.build_full_prompt(
+                template_text,
+                state["input_data"],
+                system_message,
+                state["one_shot_example"],
+                compact=state["compact"],
+                layout=layout
+            )
+            tokens = count_tokens(prompt)
+            if tokens <= budget:
+                break
+
+        logger.info(
+            f"Compacted prompt from {original_tokens} to {tokens} tokens (budget {budget}) "
+            f"using {', '.join(applied) or 'no strategies'}"
+        )
+        if tokens > budget:
+            logger.warning(f"Prompt still exceeds the token budget after compaction: {tokens} > {budget}")
+        return prompt, error, tokens
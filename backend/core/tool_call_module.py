@@ -516,9 +516,8 @@ class ToolCallModule:
                 transformed_entity = ToolCallModule.convert_entity_to_resource(raw_entity)
                 merged_entities[entity_id] = transformed_entity
 
-        # Reorganize FK (optional)
-        merged_entities = ToolCallModule.reorganize_entities_fk(merged_entities)
-
+        # Resources reference each other by name, so their order does not
+        # matter here (reorganize_entities_fk works on the raw entity list)
         return {"merged_entities": merged_entities}
     
     @staticmethod
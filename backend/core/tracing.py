@@ -0,0 +1,220 @@
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Deque, Iterator, List, Optional
+
+from core.template_renderer import DateTimeEncoder
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """
+    A timed operation within a trace. IDs and the exported fields follow the
+    OpenTelemetry (OTLP/JSON) span model, so exported spans can be loaded by
+    OpenTelemetry tooling.
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.status = "UNSET"
+        self.status_message: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException) -> None:
+        self.status = "ERROR"
+        self.status_message = str(error)
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Duration in seconds, None while the span is open"""
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The span in the OTLP/JSON layout"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": f"STATUS_CODE_{self.status}"},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class Tracer:
+    """
+    Spans for the flow execution path: message handling, flow runs, steps,
+    asset loading, prompt building, LLM and tool calls, database queries
+    and message dispatch.
+
+    Finished spans go to the exporters listed in TRACING_EXPORTERS:
+        memory - the most recent spans are kept in process (see get_trace)
+        file   - one OTLP/JSON span per line appended to TRACING_FILE
+    Both work offline. More exporters can be added with register_exporter.
+    """
+
+    enabled: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+    exporters: List[str] = [
+        name.strip() for name in os.getenv("TRACING_EXPORTERS", "memory").split(",") if name.strip()
+    ]
+
+    # Number of finished spans kept by the memory exporter
+    memory_spans: int = int(os.getenv("TRACING_MEMORY_SPANS", "5000"))
+
+    file_path: str = os.getenv("TRACING_FILE", "traces.jsonl")
+
+    _current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+    _finished: Deque[Span] = deque(maxlen=memory_spans)
+    _file_lock = threading.Lock()
+    _custom_exporters: Dict[str, Callable[[Span], None]] = {}
+
+    @staticmethod
+    def register_exporter(name: str, exporter: Callable[[Span], None]) -> None:
+        """
+        Add an exporter that can be listed in TRACING_EXPORTERS
+
+        Args:
+            name: Name of the exporter
+            exporter: Function called with every finished span
+        """
+        Tracer._custom_exporters[name] = exporter
+
+    @staticmethod
+    @contextmanager
+    def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Open a span for the block, as a child of the current span. Without a
+        current span a new trace is started.
+
+        Yields:
+            The span, or None when tracing is disabled
+        """
+        if not Tracer.enabled:
+            yield None
+            return
+        parent = Tracer._current.get()
+        span = Span(
+            name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes
+        )
+        token = Tracer._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            Tracer._current.reset(token)
+            span.end_ns = time.time_ns()
+            Tracer._export(span)
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return Tracer._current.get()
+
+    @staticmethod
+    def current_trace_id() -> Optional[str]:
+        """ID of the current trace, None outside of a span"""
+        span = Tracer._current.get()
+        return span.trace_id if span else None
+
+    @staticmethod
+    def set_attribute(key: str, value: Any) -> None:
+        """Set an attribute on the current span, if any"""
+        span = Tracer._current.get()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    @staticmethod
+    def get_trace(trace_id: str) -> List[Dict[str, Any]]:
+        """
+        Spans of a trace kept by the memory exporter, in start order
+
+        Args:
+            trace_id: ID of the trace
+
+        Returns:
+            List of spans in the OTLP/JSON layout, with durationMs added
+        """
+        spans = sorted((span for span in list(Tracer._finished) if span.trace_id == trace_id), key=lambda span: span.start_ns)
+        return [dict(span.to_dict(), durationMs=round(span.duration * 1000, 3)) for span in spans]
+
+    @staticmethod
+    def clear() -> None:
+        """Drop the spans kept in memory"""
+        Tracer._finished.clear()
+
+    @staticmethod
+    def _export(span: Span) -> None:
+        for name in Tracer.exporters:
+            try:
+                if name == "memory":
+                    Tracer._finished.append(span)
+                elif name == "file":
+                    line = json.dumps(span.to_dict(), cls=DateTimeEncoder)
+                    with Tracer._file_lock, open(Tracer.file_path, "a", encoding="utf-8") as file:
+                        file.write(line + "\n")
+                elif name in Tracer._custom_exporters:
+                    Tracer._custom_exporters[name](span)
+                else:
+                    logger.warning(f"Unknown tracing exporter: {name}")
+            except Exception as e:
+                logger.warning(f"Error exporting span {span.name}: {e}")
+
+    @staticmethod
+    def instrument_database(database) -> None:
+        """
+        Record a span for every query of a `databases.Database` instance made
+        inside a trace
+
+        Args:
+            database: Database whose query methods are wrapped (once)
+        """
+        if getattr(database, "_tracing_instrumented", False):
+            return
+        from core.metrics import statement_label
+
+        def wrap(method):
+            @functools.wraps(method)
+            async def traced(query, *args, **kwargs):
+                if Tracer._current.get() is None:
+                    return await method(query, *args, **kwargs)
+                with Tracer.span("db.query", statement=statement_label(query)):
+                    return await method(query, *args, **kwargs)
+            return traced
+
+        for name in ("execute", "execute_many", "fetch_all", "fetch_one", "fetch_val"):
+            setattr(database, name, wrap(getattr(database, name)))
+        database._tracing_instrumented = True
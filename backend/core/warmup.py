@@ -0,0 +1,197 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+from core.flow_registry import FlowRegistry
+from core.step_executor import StepExecutor, generate_json
+from core.prompt_schema_store import PromptSchemaStore
+from core.template_renderer import TemplateRenderer
+from core.token_budget import count_tokens, _used_paths
+from core.message_dispatcher import FALLBACK_TEMPLATES
+from core.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    """
+    Startup warm-up of the definition, template and model caches.
+
+    Loads the active flows, their steps and step assets (with the Pydantic
+    model classes and their JSON schemas) into the caches, compiles the prompt
+    and message templates, loads the tokenizer and creates the model client,
+    so the first requests after a deploy do not pay for them. The API reports
+    ready (GET /ready) once the warm-up is done.
+    """
+
+    enabled: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+    # Also create the model client (imports Outlines); needs OPENAI_API_KEY
+    model: bool = os.getenv("WARMUP_MODEL", "true").lower() == "true"
+
+    # pending -> running -> complete, or failed if the flows or assets could not
+    # be loaded (or the warm-up was cancelled); "disabled" without warm-up
+    state: str = "pending"
+
+    # Phases without which the caches are not warm
+    required_phases = ("flows", "assets")
+
+    # Duration of each phase in seconds, counts and errors of the last warm-up
+    report: Dict[str, Any] = {}
+
+    _task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def ready() -> bool:
+        """Whether the warm-up has completed or is disabled"""
+        return Warmup.state in ("complete", "disabled")
+
+    @staticmethod
+    def status() -> str:
+        """Readiness status reported on GET /ready: ready, warming_up or warmup_failed"""
+        if Warmup.ready():
+            return "ready"
+        return "warmup_failed" if Warmup.state == "failed" else "warming_up"
+
+    @staticmethod
+    def start() -> None:
+        """Run the warm-up in the background of the running event loop"""
+        if not Warmup.enabled:
+            Warmup.state = "disabled"
+            return
+        Warmup._task = asyncio.create_task(Warmup.run())
+
+    @staticmethod
+    def stop() -> None:
+        """Cancel a warm-up still running at shutdown"""
+        if Warmup._task is not None and not Warmup._task.done():
+            Warmup._task.cancel()
+
+    @staticmethod
+    async def run() -> Dict[str, Any]:
+        """
+        Warm up the caches
+
+        Errors are logged and listed in the report, they do not stop the
+        warm-up: a broken step only loses its own warm-up. The warm-up fails
+        if the flows or the step assets could not be loaded at all (e.g. the
+        database is unreachable).
+
+        Returns:
+            Report with the duration of each phase, counts and errors
+        """
+        Warmup.state = "running"
+        started = time.perf_counter()
+        report: Dict[str, Any] = {"phases": {}, "errors": [], "failed_phases": []}
+        Warmup.report = report
+
+        async def phase(name: str, function, *args):
+            start = time.perf_counter()
+            try:
+                with Tracer.span(f"warmup.{name}"):
+                    result = function(*args)
+                    if asyncio.iscoroutine(result):
+                        result = await result
+                return result
+            except Exception as e:
+                logger.error(f"Warm-up phase {name} failed: {e}")
+                report["errors"].append(f"{name}: {e}")
+                report["failed_phases"].append(name)
+                return None
+            finally:
+                report["phases"][name] = time.perf_counter() - start
+
+        try:
+            steps = await phase("flows", Warmup.load_flows, report) or []
+            assets = await phase("assets", Warmup.load_assets, steps, report) or []
+            await phase("templates", Warmup.compile_templates, steps, assets, report)
+            await phase("tokenizer", asyncio.to_thread, count_tokens, "warm-up")
+            if Warmup.model:
+                await phase("model", Warmup.create_model, assets)
+            failed = any(name in Warmup.required_phases for name in report["failed_phases"])
+            Warmup.state = "failed" if failed else "complete"
+        except asyncio.CancelledError:
+            Warmup.state = "failed"
+            raise
+        finally:
+            report["duration"] = time.perf_counter() - started
+
+        phases = ", ".join(f"{name} {duration:.2f}s" for name, duration in report["phases"].items())
+        logger.info(
+            f"Warm-up {Warmup.state} in {report['duration']:.2f}s ({phases}): "
+            f"{report.get('flows', 0)} flows, {report.get('steps', 0)} steps, "
+            f"{report.get('pydantic_models', 0)} Pydantic models, {report.get('templates', 0)} templates"
+        )
+        return report
+
+    @staticmethod
+    async def load_flows(report: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Cache the active flows (by ID and by name) and their steps"""
+        flows = await FlowRegistry.get_all_flows(active_only=True)
+        steps: List[Dict[str, Any]] = []
+        for flow in flows:
+            await FlowRegistry.get_flow_by_id(flow["id"])
+            await FlowRegistry.get_flow_by_name(flow["name"])
+            flow_steps = await FlowRegistry.get_steps_by_flow_id(flow["id"])
+            steps.extend(dict(step, flow=flow) for step in flow_steps)
+        report["flows"] = len(flows)
+        report["steps"] = len(steps)
+        return steps
+
+    @staticmethod
+    async def load_assets(steps: List[Dict[str, Any]], report: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Cache the assets of the AI steps and load their Pydantic models"""
+        ai_steps = [step for step in steps if step.get("prompt_template_id")]
+        await PromptSchemaStore.preload_step_assets(ai_steps)
+        assets = []
+        for step in ai_steps:
+            try:
+                assets.append(await PromptSchemaStore.get_step_assets(
+                    prompt_id=step["prompt_template_id"],
+                    schema_id=step["output_schema_id"],
+                    one_shot_id=step.get("one_shot_id"),
+                    pydantic_schema_id=step.get("pydantic_schema_id")
+                ))
+            except ValueError as e:
+                report["errors"].append(f"assets of step {step.get('name')}: {e}")
+        report["pydantic_models"] = sum(1 for asset in assets if asset.get("pydantic_model_class"))
+        return assets
+
+    @staticmethod
+    def compile_templates(steps: List[Dict[str, Any]], assets: List[Dict[str, Any]], report: Dict[str, Any]) -> None:
+        """Compile the prompt templates and the flow and step message templates"""
+        templates = set(FALLBACK_TEMPLATES.values())
+        for step in steps:
+            templates.update(template for template in (
+                step.get("start_message"),
+                step.get("complete_message"),
+                step["flow"].get("start_message"),
+                step["flow"].get("complete_message"),
+            ) if template)
+        prompts = {asset["prompt_template"] for asset in assets if asset.get("prompt_template")}
+
+        for template in templates | prompts:
+            try:
+                TemplateRenderer._compile(template)
+            except Exception as e:
+                report["errors"].append(f"template {template[:40]!r}: {e}")
+        # Input paths used by the prompts, for the prune_unused compaction
+        for prompt in prompts:
+            _used_paths(prompt)
+        report["templates"] = len(templates | prompts)
+
+    @staticmethod
+    async def create_model(assets: List[Dict[str, Any]]) -> None:
+        """Create the model client and a structured generator (imports Outlines)"""
+        if not os.getenv("OPENAI_API_KEY"):
+            logger.info("OPENAI_API_KEY is not set, the model client is not warmed up")
+            return
+        # Importing Outlines takes seconds, keep it off the event loop
+        await asyncio.to_thread(importlib.import_module, "outlines.generate")
+        model = await StepExecutor.init_openai_model()
+        schema = next((asset["output_schema"] for asset in assets if asset.get("output_schema")), None)
+        if schema is not None:
+            await asyncio.to_thread(generate_json, model, json.dumps(schema))
@@ -3,6 +3,8 @@ from typing import Dict, List, Optional, Any
 from fastapi import WebSocket, WebSocketDisconnect
 import json
 
+from core.metrics import Metrics
+
 logger = logging.getLogger(__name__)
 
 class ConnectionManager:
@@ -59,11 +61,14 @@ class ConnectionManager:
             disconnected = []
             
             for websocket in self.active_connections[project_id]:
+                Metrics.websocket_pending.inc()
                 try:
                     await websocket.send_json(message)
                 except Exception as e:
                     logger.error(f"Error broadcasting to client: {e}")
                     disconnected.append(websocket)
+                finally:
+                    Metrics.websocket_pending.dec()
             
             # Clean up any disconnected clients
             for websocket in disconnected:
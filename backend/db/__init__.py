@@ -5,11 +5,11 @@ Database models and connection utilities for the agent system.
 from .database import database, Base, engine, init_db, close_db_connection
 from .models import (
     Project, Message, AgentFlow, AgentStep, FlowRun, StepRun,
-    AppVersion, Prompt, Schema, OneShotExample
+    AppVersion, Prompt, Schema, OneShotExample, Blob
 )
 
 __all__ = [
     "database", "Base", "engine", "init_db", "close_db_connection",
     "Project", "Message", "AgentFlow", "AgentStep", "FlowRun", 
-    "StepRun", "AppVersion", "Prompt", "Schema", "OneShotExample"
+    "StepRun", "AppVersion", "Prompt", "Schema", "OneShotExample", "Blob"
 ] 
\ No newline at end of file
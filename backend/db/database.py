@@ -1,6 +1,6 @@
 import os
 import logging
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from databases import Database
@@ -33,6 +33,7 @@ async def init_db():
         # Create tables
         Base.metadata.create_all(bind=engine)
         logger.info("Created database tables")
+        ensure_columns()
         
         # Connect to the database
         if not database.is_connected:
@@ -42,6 +43,28 @@ async def init_db():
         logger.error(f"Database initialization error: {e}")
         raise
 
+def ensure_columns():
+    """
+    Add nullable columns that were added to the models after their table was created.
+    create_all only creates missing tables, so without this older databases would
+    lack new optional columns.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.warning(f"Cannot add non-nullable column {table.name}.{column.name} to an existing table")
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            logger.info(f"Added column {table.name}.{column.name}")
+
 async def close_db_connection():
     """Close the database connection when the application shuts down"""
     if database.is_connected:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Integer, Float, Boolean, Text, DateTime, ForeignKey, JSON, LargeBinary
 from sqlalchemy.dialects.sqlite import JSON as SQLiteJSON
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -71,6 +71,9 @@ class AgentStep(Base):
     output_schema_id = Column(String, ForeignKey("schemas.id"), nullable=False)
     pydantic_schema_id = Column(String, ForeignKey("pydantic_schemas.id"), nullable=True)
     one_shot_id = Column(String, ForeignKey("one_shot_examples.id"), nullable=True)
+    prompt_token_budget = Column(Integer, nullable=True)  # max prompt tokens, None = PROMPT_TOKEN_BUDGET
+    loop_context = Column(String, nullable=True)  # previous outputs passed to ai_loop iterations, see LoopContext
+    prompt_layout = Column(String, nullable=True)  # legacy or prefix_stable, None = PROMPT_LAYOUT
     start_message = Column(Text, nullable=True)
     complete_message = Column(Text, nullable=True)
     created_at = Column(DateTime, default=func.now())
@@ -95,6 +98,13 @@ class FlowRun(Base):
     started_at = Column(DateTime, default=func.now())
     ended_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=func.now())
+    trace_id = Column(String, nullable=True)  # Trace of the run (see core.tracing)
+    # LLM usage of the step runs, summed when the run ends
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_prompt_tokens = Column(Integer, nullable=True)
+    llm_calls = Column(Integer, nullable=True)
+    cost_usd = Column(Float, nullable=True)
 
     # Relationships
     project = relationship("Project", back_populates="flow_runs")
@@ -113,6 +123,12 @@ class StepRun(Base):
     output_data = Column(SQLiteJSON, nullable=True)
     error_message = Column(Text, nullable=True)
     rendered_prompt = Column(Text, nullable=True)
+    estimated_prompt_tokens = Column(Integer, nullable=True)  # tokens of the prompt(s) sent, after compaction
+    cached_prompt_tokens = Column(Integer, nullable=True)  # prompt tokens served from the provider's prompt cache
+    prompt_tokens = Column(Integer, nullable=True)  # prompt tokens reported by the provider
+    completion_tokens = Column(Integer, nullable=True)  # completion tokens reported by the provider
+    llm_calls = Column(Integer, nullable=True)  # API calls made (responses from a cache are not counted)
+    cost_usd = Column(Float, nullable=True)  # cost of the calls (see LLMUsage.prices)
     started_at = Column(DateTime, default=func.now())
     ended_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=func.now())
@@ -128,7 +144,8 @@ class AppVersion(Base):
     project_id = Column(String, ForeignKey("projects.id"), nullable=False)
     flow_run_id = Column(String, ForeignKey("flow_runs.id"), nullable=False)
     version_number = Column(Integer, nullable=False)
-    config_json = Column(SQLiteJSON, nullable=False)
+    config_json = Column(SQLiteJSON, nullable=False)  # Full config, or a delta if base_version_id is set
+    base_version_id = Column(String, nullable=True)  # Version the config_json delta applies to
     created_at = Column(DateTime, default=func.now())
 
     # Relationships
@@ -173,4 +190,14 @@ class OneShotExample(Base):
     output_json = Column(SQLiteJSON, nullable=False)
     linked_step_id = Column(String, nullable=True)
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    hash = Column(String, primary_key=True)  # SHA-256 of the uncompressed content
+    kind = Column(String, nullable=False)  # json, text
+    codec = Column(String, nullable=False)  # zstd, zlib
+    size = Column(Integer, nullable=False)  # Uncompressed size in bytes
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=func.now())
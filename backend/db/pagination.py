@@ -0,0 +1,130 @@
+"""
+Keyset (cursor) pagination and field projection helpers for list endpoints.
+"""
+
+import base64
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Upper bound for the `limit` query parameter of paginated endpoints
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(sort_value: Any, row_id: str) -> str:
+    """
+    Encode the position of a row as an opaque cursor
+
+    Args:
+        sort_value: Value of the sort column for the row
+        row_id: ID of the row, used as a tie-breaker
+
+    Returns:
+        URL-safe cursor string
+    """
+    if hasattr(sort_value, "isoformat"):
+        sort_value = sort_value.isoformat(sep=" ")
+    payload = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """
+    Decode a cursor created by encode_cursor
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        Tuple of (sort_value, row_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    return sort_value, row_id
+
+def build_projection(
+    fields: Optional[str],
+    columns: Dict[str, str],
+    required: Iterable[str] = ("id",),
+    dependencies: Optional[Dict[str, Sequence[str]]] = None
+) -> Tuple[str, Set[str]]:
+    """
+    Build the SELECT column list for a `fields=` projection
+
+    Args:
+        fields: Comma-separated list of requested fields, or None for all fields
+        columns: Maps each selectable field to its SQL expression
+        required: Fields that are always selected and returned (e.g. the ID and
+                  sort column used to build cursors)
+        dependencies: Maps computed fields (e.g. duration) to the columns they need
+
+    Returns:
+        Tuple of (SQL column list, set of fields to include in the response)
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    dependencies = dependencies or {}
+
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(columns) - set(dependencies)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    else:
+        requested = set(columns) | set(dependencies)
+
+    output_fields = requested | set(required)
+
+    selected: List[str] = []
+    for field in columns:
+        needed = field in output_fields or any(
+            field in dependencies.get(computed, ()) for computed in output_fields
+        )
+        if needed:
+            selected.append(columns[field])
+
+    return ", ".join(selected), output_fields
+
+def keyset_condition(sort_column: str, id_column: str, descending: bool) -> str:
+    """
+    SQL condition selecting the rows after the cursor position.
+    Uses the :cursor_value and :cursor_id bind parameters.
+
+    Args:
+        sort_column: SQL expression of the sort column
+        id_column: SQL expression of the ID column (tie-breaker)
+        descending: Whether the listing is sorted in descending order
+
+    Returns:
+        SQL condition string
+    """
+    op = "<" if descending else ">"
+    return (
+        f"({sort_column} {op} :cursor_value OR "
+        f"({sort_column} = :cursor_value AND {id_column} {op} :cursor_id))"
+    )
+
+def split_page(rows: List[Dict[str, Any]], limit: Optional[int], sort_field: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Trim a result fetched with LIMIT limit + 1 and compute the next cursor
+
+    Args:
+        rows: Rows fetched from the database
+        limit: Page size, or None when the listing is not paginated
+        sort_field: Name of the sort column in the rows
+
+    Returns:
+        Tuple of (rows of this page, next cursor or None if this is the last page)
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[sort_field], last["id"])
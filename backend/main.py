@@ -1,7 +1,10 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, BackgroundTasks, WebSocket, WebSocketDisconnect, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse
+import asyncio
 import os
 from dotenv import load_dotenv
 import logging
@@ -12,7 +15,13 @@ from contextlib import asynccontextmanager
 from routers import projects, app_versions, flow_runs, flow_config, websockets, test_pydantic
 
 # Import database initialization
-from db.database import init_db
+from db.database import init_db, database
+from core.blob_store import BlobStore
+from core.preview import PreviewShell, PrecompressedStaticFiles
+from core.metrics import Metrics
+from core.tracing import Tracer
+from core.import_profile import ImportProfile
+from core.warmup import Warmup
 
 # Import migrations
 #from db.migrations.add_rendered_prompt_to_step_runs import run_migration
@@ -28,6 +37,7 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
+logger.info(f"Application modules imported in {time.perf_counter() - _import_started:.2f}s")
 
 # Check for cloud mode
 CLOUD_MODE = os.getenv("CLOUD_MODE", "false").lower() == "true"
@@ -36,6 +46,10 @@ if CLOUD_MODE:
 else:
     logger.info("Running in OPEN SOURCE MODE - authentication is bypassed")
 
+# Time database queries for /metrics and record them in traces
+Metrics.instrument_database(database)
+Tracer.instrument_database(database)
+
 # Lifespan context manager for database initialization
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -43,6 +57,27 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
     
+    # Load the preview HTML shell and compress the preview bundles once
+    try:
+        PreviewShell.load()
+        await asyncio.to_thread(preview_assets.precompress)
+    except Exception as e:
+        logger.error(f"Error preparing preview assets: {e}")
+    
+    # Move large JSON/text values of existing rows into the blob store
+    if os.getenv("BLOB_MIGRATE_ON_STARTUP", "false").lower() == "true":
+        try:
+            await BlobStore.migrate_existing_rows()
+        except Exception as e:
+            logger.error(f"Error running blob store migration: {e}")
+    
+    # Preload flows, step assets, templates and the model client; /ready
+    # reports ready once this is done
+    Warmup.start()
+    
+    # Startup diagnostic: where the cold start of a new process goes
+    ImportProfile.start()
+    
     # Run migrations
     #try:
     #    await run_migration()
@@ -53,9 +88,12 @@ async def lifespan(app: FastAPI):
     #except Exception as e:
     #    logger.error(f"Error running database migrations: {e}")
     
+    logger.info(f"Application started in {time.perf_counter() - _import_started:.2f}s")
     yield
     # Cleanup resources if needed
     logger.info("Shutting down application")
+    Warmup.stop()
+    ImportProfile.stop()
 
 
 app = FastAPI(title="AI ERP App Config Agent", lifespan=lifespan)
@@ -72,10 +110,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor of the next page for paginated list endpoints
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Mount static files for preview app
-app.mount("/preview/assets", StaticFiles(directory="previewApp/assets"), name="preview_assets")
+# Mount static files for preview app. Hashed bundles are served with immutable
+# cache headers and precompressed gzip/brotli variants.
+preview_assets = PrecompressedStaticFiles(directory="previewApp/assets")
+app.mount("/preview/assets", preview_assets, name="preview_assets")
 
 # Include routers
 app.include_router(projects.router, prefix="/projects", tags=["projects"])
@@ -94,16 +136,24 @@ async def root():
 
 @app.get("/api/preview", response_class=HTMLResponse)
 async def preview_app(id: str = ""):
-    # Return the static HTML file with the project ID as a query parameter
+    # Return the cached HTML shell with the project ID injected as a global variable
     # The frontend JS will handle extracting and using the ID
-    with open("previewApp/index.html", "r") as f:
-        html_content = f.read()
-    
-    # Inject the project ID as a global variable
-    script_tag = f'<script>window.PROJECT_ID = "{id}";</script>'
-    html_content = html_content.replace('</head>', f'{script_tag}</head>')
-    
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=PreviewShell.render(id), headers={"Cache-Control": "no-cache"})
+
+@app.get("/ready")
+async def ready():
+    # Readiness probe: the process serves requests before the warm-up is
+    # done, but should only receive traffic after it. A failed warm-up (flows
+    # or assets could not be loaded) is not ready and is retried by the probe.
+    body = {"status": Warmup.status(), "warmup": Warmup.state, "report": Warmup.report}
+    if Warmup.state == "failed":
+        Warmup.start()
+    return JSONResponse(body, status_code=200 if Warmup.ready() else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(Metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -5,11 +5,15 @@ OpenAI structured generation.
 """
 
 import os
+import hashlib
 import importlib.util
 import inspect
+import itertools
 import sys
 import logging
-from typing import Dict, Any, Optional, Type, TypeVar, Union
+import threading
+import weakref
+from typing import Dict, Any, Optional, Tuple, Type, TypeVar, Union
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -20,58 +24,163 @@ class PydanticModelLoader:
     Utility class for loading and managing Pydantic models from Python files
     """
     
+    # Loaded model classes: (absolute path, class name) -> file stat, content
+    # hash, class and module name of the version in use
+    _models: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    
+    # JSON schemas of model classes; entries go away with replaced classes
+    _json_schemas: "weakref.WeakKeyDictionary[Type[BaseModel], Dict[str, Any]]" = weakref.WeakKeyDictionary()
+    
+    # Serializes loads, so a file changed under concurrent requests is executed once
+    _lock = threading.Lock()
+    _module_ids = itertools.count(1)
+    
     @staticmethod
-    def load_model_class(file_path: str, class_name: str) -> Optional[Type[BaseModel]]:
+    def _resolve_path(file_path: str) -> str:
+        # Get absolute path - remove any duplicate 'backend' in the path
+        abs_path = os.path.abspath(file_path)
+        # Fix path if it contains duplicate backend directories
+        if '\\backend\\backend\\' in abs_path:
+            abs_path = abs_path.replace('\\backend\\backend\\', '\\backend\\')
+        return abs_path
+    
+    @staticmethod
+    def _load(abs_path: str, source: bytes, digest: str, class_name: str) -> Tuple[Optional[Type[BaseModel]], Optional[str]]:
         """
-        Dynamically load a Pydantic model class from a file path and class name
+        Execute a model file under a module name of its own and get the class
         
-        Args:
-            file_path: Path to the Python file containing the Pydantic model
-            class_name: Name of the class within the file to load
-            
         Returns:
-            Pydantic model class or None if loading fails
+            Model class and module name, or (None, None) if loading fails
         """
+        # Each loaded version gets its own entry in sys.modules, so a reload
+        # does not replace the module of classes still in use
+        stem = os.path.basename(abs_path).replace(".py", "")
+        module_name = f"_pydantic_model_{stem}_{digest[:12]}_{next(PydanticModelLoader._module_ids)}"
         try:
-            # Get absolute path - remove any duplicate 'backend' in the path
-            abs_path = os.path.abspath(file_path)
-            # Fix path if it contains duplicate backend directories
-            if '\\backend\\backend\\' in abs_path:
-                abs_path = abs_path.replace('\\backend\\backend\\', '\\backend\\')
-            
-            # Check if file exists
-            if not os.path.exists(abs_path):
-                logger.error(f"Pydantic model file not found: {abs_path}")
-                return None
-            
-            # Load the module
-            module_name = os.path.basename(file_path).replace(".py", "")
             spec = importlib.util.spec_from_file_location(module_name, abs_path)
             if spec is None or spec.loader is None:
                 logger.error(f"Failed to load spec for module: {module_name}")
-                return None
+                return None, None
             
             module = importlib.util.module_from_spec(spec)
             sys.modules[module_name] = module
-            spec.loader.exec_module(module)
+            # Execute the source that was hashed, not a later version of the file
+            exec(compile(source, abs_path, "exec"), module.__dict__)
             
             # Get the class from the module
             if not hasattr(module, class_name):
                 logger.error(f"Class {class_name} not found in {abs_path}")
-                return None
+                sys.modules.pop(module_name, None)
+                return None, None
             
             model_class = getattr(module, class_name)
             
             # Verify it's a Pydantic BaseModel
             if not inspect.isclass(model_class) or not issubclass(model_class, BaseModel):
                 logger.error(f"{class_name} in {abs_path} is not a Pydantic BaseModel")
-                return None
+                sys.modules.pop(module_name, None)
+                return None, None
             
-            return model_class
+            return model_class, module_name
             
         except Exception as e:
             logger.error(f"Error loading Pydantic model: {e}")
+            sys.modules.pop(module_name, None)
+            return None, None
+    
+    @staticmethod
+    def load_model_class(file_path: str, class_name: str) -> Optional[Type[BaseModel]]:
+        """
+        Dynamically load a Pydantic model class from a file path and class name
+        
+        The file is executed on every call; use get_model_class for the cached
+        class.
+        
+        Args:
+            file_path: Path to the Python file containing the Pydantic model
+            class_name: Name of the class within the file to load
+            
+        Returns:
+            Pydantic model class or None if loading fails
+        """
+        abs_path = PydanticModelLoader._resolve_path(file_path)
+        try:
+            with open(abs_path, "rb") as file:
+                source = file.read()
+        except OSError:
+            logger.error(f"Pydantic model file not found: {abs_path}")
+            return None
+        digest = hashlib.sha256(source).hexdigest()
+        model_class, _ = PydanticModelLoader._load(abs_path, source, digest, class_name)
+        return model_class
+    
+    @staticmethod
+    def get_model_class(file_path: str, class_name: str) -> Optional[Type[BaseModel]]:
+        """
+        Get a Pydantic model class, loading the file only when it changed
+        
+        The file is checked with a stat on every call. When its modification
+        time or size changed, the content hash decides whether the file is
+        executed again. If the new version fails to load, the previous class
+        stays in use until the file changes again.
+        
+        Args:
+            file_path: Path to the Python file containing the Pydantic model
+            class_name: Name of the class within the file to load
+            
+        Returns:
+            Pydantic model class or None if loading fails
+        """
+        abs_path = PydanticModelLoader._resolve_path(file_path)
+        key = (abs_path, class_name)
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            logger.error(f"Pydantic model file not found: {abs_path}")
             return None
+        file_stat = (stat.st_mtime_ns, stat.st_size)
+        
+        entry = PydanticModelLoader._models.get(key)
+        if entry is not None and entry["stat"] == file_stat:
+            return entry["model_class"]
+        
+        with PydanticModelLoader._lock:
+            entry = PydanticModelLoader._models.get(key)
+            if entry is not None and entry["stat"] == file_stat:
+                return entry["model_class"]
+            
+            try:
+                with open(abs_path, "rb") as file:
+                    source = file.read()
+            except OSError:
+                logger.error(f"Pydantic model file not found: {abs_path}")
+                return None
+            digest = hashlib.sha256(source).hexdigest()
+            
+            # Touched but unchanged
+            if entry is not None and entry["sha256"] == digest:
+                entry["stat"] = file_stat
+                return entry["model_class"]
+            
+            model_class, module_name = PydanticModelLoader._load(abs_path, source, digest, class_name)
+            if model_class is None:
+                if entry is None:
+                    return None
+                logger.warning(f"Keeping the previous version of {class_name} from {abs_path}")
+                entry["stat"] = file_stat
+                return entry["model_class"]
+            
+            if entry is not None:
+                logger.info(f"Reloaded Pydantic model {class_name} from {abs_path}")
+                sys.modules.pop(entry["module_name"], None)
+            
+            PydanticModelLoader._models[key] = {
+                "stat": file_stat,
+                "sha256": digest,
+                "model_class": model_class,
+                "module_name": module_name,
+            }
+            return model_class
 
     @staticmethod
     def load_model(model_name: str):
@@ -94,14 +203,23 @@ class PydanticModelLoader:
         """
         Get the JSON schema for a Pydantic model class
         
+        The schema is generated once per class and shared between callers,
+        who must not modify it. A reloaded model is a new class and gets a
+        new schema.
+        
         Args:
             model_class: Pydantic model class
             
         Returns:
             JSON schema compatible with OpenAI structured generation
         """
+        schema = PydanticModelLoader._json_schemas.get(model_class)
+        if schema is not None:
+            return schema
         try:
-            return model_class.model_json_schema()
+            schema = model_class.model_json_schema()
+            PydanticModelLoader._json_schemas[model_class] = schema
+            return schema
         except Exception as e:
             logger.error(f"Error generating JSON schema from Pydantic model: {e}")
             return {} 
\ No newline at end of file
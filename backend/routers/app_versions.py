@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, ConfigDict, Field, Json
+from pydantic import BaseModel, ConfigDict, Field
 from db.database import database
+from core.app_version_store import AppVersionStore
+from db.pagination import MAX_PAGE_SIZE, build_projection, decode_cursor, keyset_condition, split_page
 
 router = APIRouter()
 
@@ -12,25 +14,46 @@ class AppVersionResponse(BaseModel):
     project_id: str = Field(..., description="ID of the project")
     flow_run_id: str = Field(..., description="ID of the flow run that generated this version")
     version_number: int = Field(..., description="Version number")
-    config_json: Json[Any] = Field(..., description="Full app configuration")
+    config_json: Any = Field(..., description="Full app configuration")
     created_at: str = Field(..., description="Creation timestamp")
 
+class AppVersionListItem(AppVersionResponse):
+    # Fields other than id are optional so that the list endpoint can project them away
+    project_id: Optional[str] = Field(None, description="ID of the project")
+    flow_run_id: Optional[str] = Field(None, description="ID of the flow run that generated this version")
+    version_number: Optional[int] = Field(None, description="Version number")
+    config_json: Optional[Any] = Field(None, description="Full app configuration")
+    created_at: Optional[str] = Field(None, description="Creation timestamp")
+
+class AppVersionDiffResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid", exclude_none=True)
+    
+    version_id: str = Field(..., description="ID of the app version")
+    against_version_id: Optional[str] = Field(None, description="ID of the version compared with (none for the first version)")
+    changes: List[Dict[str, Any]] = Field(..., description="JSON Patch style operations (op, path, value, old_value)")
+
+APP_VERSION_COLUMNS = {
+    "id": "id",
+    "project_id": "project_id",
+    "flow_run_id": "flow_run_id",
+    "version_number": "version_number",
+    "config_json": "config_json",
+    "base_version_id": "base_version_id",
+    "created_at": "created_at",
+}
+
+# config_json may be stored as a delta, which needs the base version to reconstruct
+CONFIG_DEPENDENCIES = {"config_json": ("base_version_id",)}
+
 @router.get("/latest", response_model=AppVersionResponse)
 async def get_latest_app_version(project_id: str = Query(..., description="ID of the project")):
     """Get the latest app version for a project"""
     try:
-        query = """
-        SELECT * FROM app_versions
-        WHERE project_id = :project_id
-        ORDER BY version_number DESC
-        LIMIT 1
-        """
-        result = await database.fetch_one(query=query, values={"project_id": project_id})
+        result_dict = await AppVersionStore.get_latest_version(project_id)
         
-        if not result:
+        if not result_dict:
             raise HTTPException(status_code=404, detail="No app versions found for this project")
         
-        result_dict = dict(result)
         # Filter to only include fields defined in the response model
         filtered_result = {
             k: v for k, v in result_dict.items() 
@@ -48,16 +71,11 @@ async def get_latest_app_version(project_id: str = Query(..., description="ID of
 async def get_app_version(version_id: str):
     """Get an app version by ID"""
     try:
-        query = """
-        SELECT * FROM app_versions
-        WHERE id = :version_id
-        """
-        result = await database.fetch_one(query=query, values={"version_id": version_id})
+        result_dict = await AppVersionStore.get_version(version_id)
         
-        if not result:
+        if not result_dict:
             raise HTTPException(status_code=404, detail="App version not found")
         
-        result_dict = dict(result)
         # Filter to only include fields defined in the response model
         filtered_result = {
             k: v for k, v in result_dict.items() 
@@ -71,34 +89,74 @@ async def get_app_version(version_id: str):
         # For other exceptions, return 500
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/project/{project_id}", response_model=List[AppVersionResponse])
-async def get_project_versions(project_id: str):
-    """Get all app versions for a project"""
+@router.get("/{version_id}/diff", response_model=AppVersionDiffResponse)
+async def get_app_version_diff(
+    version_id: str,
+    against: Optional[str] = Query(None, description="ID of the version to compare with (defaults to the previous version)")
+):
+    """Get the structural diff between an app version and another version"""
     try:
-        query = """
-        SELECT * FROM app_versions
-        WHERE project_id = :project_id
-        ORDER BY version_number DESC
-        """
-        results = await database.fetch_all(query=query, values={"project_id": project_id})
+        diff = await AppVersionStore.diff_versions(version_id, against)
         
-        if not results:
-            return []
+        if not diff:
+            raise HTTPException(status_code=404, detail="App version not found")
         
-        filtered_results = []
-        for result in results:
-            result_dict = dict(result)
-            # Filter to only include fields defined in the response model
-            filtered_result = {
-                k: v for k, v in result_dict.items() 
-                if k in AppVersionResponse.model_fields
-            }
-            filtered_results.append(filtered_result)
+        return diff
+    except HTTPException as e:
+        # Re-raise HTTP exceptions
+        raise e
+    except Exception as e:
+        # For other exceptions, return 500
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/project/{project_id}", response_model=List[AppVersionListItem], response_model_exclude_unset=True)
+async def get_project_versions(
+    project_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (all versions if omitted)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return")
+):
+    """Get all app versions for a project, newest first"""
+    try:
+        try:
+            columns, output_fields = build_projection(
+                fields, APP_VERSION_COLUMNS,
+                required=("id", "version_number"),
+                dependencies=CONFIG_DEPENDENCIES
+            )
+            values: Dict[str, Any] = {"project_id": project_id}
+            where = "WHERE project_id = :project_id"
+            if cursor:
+                values["cursor_value"], values["cursor_id"] = decode_cursor(cursor)
+                where += f" AND {keyset_condition('version_number', 'id', descending=True)}"
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        return filtered_results
+        query = f"""
+        SELECT {columns} FROM app_versions
+        {where}
+        ORDER BY version_number DESC, id DESC
+        """
+        if limit is not None:
+            query += " LIMIT :limit"
+            values["limit"] = limit + 1
+        results = await database.fetch_all(query=query, values=values)
+        page, next_cursor = split_page([dict(result) for result in results], limit, "version_number")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        for result_dict in page:
+            if "config_json" in result_dict:
+                result_dict["config_json"] = await AppVersionStore.get_config(result_dict["id"], result_dict)
+        
+        # Filter to only include requested fields defined in the response model
+        return [
+            {k: v for k, v in result_dict.items() if k in output_fields and k in AppVersionListItem.model_fields}
+            for result_dict in page
+        ]
     except HTTPException as e:
         # Re-raise HTTP exceptions
         raise e
     except Exception as e:
         # For other exceptions, return 500
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
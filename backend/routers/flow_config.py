@@ -2,11 +2,13 @@ from fastapi import APIRouter, HTTPException, Depends, logger
 from typing import List, Optional, Dict, Any, Union
 from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
+import json
 import uuid
 
 from db.database import database
 from core.flow_registry import FlowRegistry
 from core.prompt_schema_store import PromptSchemaStore
+from core.definition_cache import DefinitionCache
 from db.models import AgentStep
 
 router = APIRouter()
@@ -41,6 +43,9 @@ class StepResponse(BaseModel):
     one_shot_id: Optional[str] = Field(None, description="ID of one-shot example")
     start_message: Optional[str] = Field(None, description="Template message when step starts")
     complete_message: Optional[str] = Field(None, description="Template message when step completes")
+    prompt_token_budget: Optional[int] = Field(None, description="Maximum number of prompt tokens")
+    loop_context: Optional[str] = Field(None, description="Previous outputs passed to loop iterations (all, none, last:K, digest, custom:name)")
+    prompt_layout: Optional[str] = Field(None, description="Order of the prompt parts (legacy, prefix_stable)")
     created_at: str = Field(..., description="Creation timestamp")
     updated_at: str = Field(..., description="Last update timestamp")
     
@@ -100,6 +105,9 @@ class StepUpdateRequest(BaseModel):
     oneshot_examples: Optional[List[Dict[str, Any]]] = None
     start_message: Optional[str] = None
     complete_message: Optional[str] = None
+    prompt_token_budget: Optional[int] = None
+    loop_context: Optional[str] = None
+    prompt_layout: Optional[str] = None
 
 class FlowUpdateRequest(BaseModel):
     model_config = ConfigDict(extra="forbid", exclude_none=True)
@@ -169,6 +177,55 @@ async def get_flow(flow_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _parse_json_field(value: Any, default: Any, label: str) -> Any:
+    """Parse a JSON column that may come back from the database as a string"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            print(f"Error decoding {label} JSON")
+            return default
+    return value
+
+def _attach_step_assets(step_dict: Dict[str, Any], assets: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Add prompt template, output schema, one-shot examples and Pydantic schema
+    details to a step, using rows batch-loaded by PromptSchemaStore.get_assets_by_ids
+    """
+    # Add prompt template content
+    prompt = assets["prompts"].get(step_dict.get("prompt_template_id"))
+    if prompt:
+        step_dict["prompt_template"] = prompt["template"]
+    
+    # Add output schema content
+    schema = assets["schemas"].get(step_dict.get("output_schema_id"))
+    if schema:
+        step_dict["output_schema"] = _parse_json_field(schema["schema_json"], {}, f"schema for step {step_dict['id']}")
+    
+    # Add one-shot example if available
+    one_shot = assets["one_shots"].get(step_dict.get("one_shot_id"))
+    if one_shot:
+        output_json = _parse_json_field(one_shot["output_json"], {}, f"one-shot output for step {step_dict['id']}")
+        # if output_json is not a list, make it a list
+        if not isinstance(output_json, list):
+            output_json = [output_json]
+        step_dict["oneshot_examples"] = output_json
+    
+    # Add pydantic schema path and class name
+    pydantic_schema = assets["pydantic_schemas"].get(step_dict.get("pydantic_schema_id"))
+    if pydantic_schema:
+        step_dict["pydantic_schema_file_path"] = pydantic_schema["file_path"]
+        step_dict["pydantic_schema_class_name"] = pydantic_schema["model_class_name"]
+    
+    # Make sure input_map is a dictionary
+    step_dict["input_map"] = _parse_json_field(step_dict.get("input_map"), {}, f"input_map for step {step_dict['id']}")
+    
+    # Filter to only include fields defined in the response model
+    return {
+        k: v for k, v in step_dict.items()
+        if k in StepResponse.model_fields
+    }
+
 @router.get("/flows/{flow_id}/steps", response_model=List[StepResponse])
 async def get_flow_steps(flow_id: str):
     """Get all steps for a flow with full prompt template, schema, and one-shot details"""
@@ -176,98 +233,13 @@ async def get_flow_steps(flow_id: str):
         # Get basic step information
         steps = await FlowRegistry.get_steps_by_flow_id(flow_id)
         
-        # Fetch additional data for each step
-        enhanced_steps = []
-        for step in steps:
-            step_dict = convert_datetimes_to_strings(step)
-            
-            # Add prompt template content
-            if step["prompt_template_id"]:
-                prompt_query = """
-                SELECT * FROM prompts WHERE id = :prompt_id
-                """
-                prompt_result = await database.fetch_one(
-                    query=prompt_query, 
-                    values={"prompt_id": step["prompt_template_id"]}
-                )
-                if prompt_result:
-                    prompt_data = dict(prompt_result)
-                    step_dict["prompt_template"] = prompt_data["template"]
-            
-            # Add output schema content
-            if step["output_schema_id"]:
-                schema_query = """
-                SELECT * FROM schemas WHERE id = :schema_id
-                """
-                schema_result = await database.fetch_one(
-                    query=schema_query, 
-                    values={"schema_id": step["output_schema_id"]}
-                )
-                if schema_result:
-                    schema_data = dict(schema_result)
-                    # Convert schema_json from string to dict if it's a string
-                    if isinstance(schema_data["schema_json"], str):
-                        try:
-                            import json
-                            step_dict["output_schema"] = json.loads(schema_data["schema_json"])
-                        except json.JSONDecodeError:
-                            print(f"Error decoding schema JSON for step {step['id']}")
-                            step_dict["output_schema"] = {}
-                    else:
-                        step_dict["output_schema"] = schema_data["schema_json"]
-            
-            # Add one-shot example if available
-            if step["one_shot_id"]:
-                oneshot_query = """
-                SELECT * FROM one_shot_examples WHERE id = :oneshot_id
-                """
-                oneshot_result = await database.fetch_one(
-                    query=oneshot_query, 
-                    values={"oneshot_id": step["one_shot_id"]}
-                )
-                if oneshot_result:
-                    oneshot_data = dict(oneshot_result)
-                    # Convert input_json and output_json from string to dict if needed
-                    input_json = oneshot_data["input_json"]
-                    output_json = oneshot_data["output_json"]
-                    
-                    if isinstance(input_json, str):
-                        try:
-                            import json
-                            input_json = json.loads(input_json)
-                        except json.JSONDecodeError:
-                            input_json = {}
-                            
-                    if isinstance(output_json, str):
-                        try:
-                            import json
-                            output_json = json.loads(output_json)
-                        except json.JSONDecodeError:
-                            output_json = {}
-                # if output_json is not a list, make it a list
-                if not isinstance(output_json, list):
-                    output_json = [output_json]
-                step_dict["oneshot_examples"] = output_json
-            # add pydantic schema path and class name
-            if step["pydantic_schema_id"]:
-                pydantic_query = """
-                SELECT * FROM pydantic_schemas WHERE id = :pydantic_id
-                """
-                pydantic_result = await database.fetch_one(query=pydantic_query, values={"pydantic_id": step["pydantic_schema_id"]})
-
-                if pydantic_result:
-                    pydantic_data = dict(pydantic_result)
-                    step_dict["pydantic_schema_file_path"] = pydantic_data["file_path"]
-                    step_dict["pydantic_schema_class_name"] = pydantic_data["model_class_name"]
-                
-            # Filter to only include fields defined in the response model plus our new fields
-            filtered_step = {
-                k: v for k, v in step_dict.items() 
-                if k in StepResponse.model_fields or k in ["prompt_template", "output_schema", "oneshot_examples"]
-            }
-            enhanced_steps.append(filtered_step)
-            
-        return enhanced_steps
+        # Fetch the assets of all steps with one query per asset table
+        assets = await PromptSchemaStore.preload_step_assets(steps)
+        
+        return [
+            _attach_step_assets(convert_datetimes_to_strings(step), assets)
+            for step in steps
+        ]
     except Exception as e:
         print(f"Error in get_flow_steps: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -352,95 +324,11 @@ async def get_step(step_id: str):
             raise HTTPException(status_code=404, detail="Step not found")
         
         step_dict = convert_datetimes_to_strings(dict(result))
+        assets = await PromptSchemaStore.preload_step_assets([step_dict])
         
-        # Add prompt template content
-        if step_dict["prompt_template_id"]:
-            prompt_query = """
-            SELECT * FROM prompts WHERE id = :prompt_id
-            """
-            prompt_result = await database.fetch_one(
-                query=prompt_query, 
-                values={"prompt_id": step_dict["prompt_template_id"]}
-            )
-            if prompt_result:
-                prompt_data = dict(prompt_result)
-                step_dict["prompt_template"] = prompt_data["template"]
-        
-        # Add output schema content
-        if step_dict["output_schema_id"]:
-            schema_query = """
-            SELECT * FROM schemas WHERE id = :schema_id
-            """
-            schema_result = await database.fetch_one(
-                query=schema_query, 
-                values={"schema_id": step_dict["output_schema_id"]}
-            )
-            if schema_result:
-                schema_data = dict(schema_result)
-                # Convert schema_json from string to dict if it's a string
-                schema_json = schema_data["schema_json"]
-                if isinstance(schema_json, str):
-                    try:
-                        import json
-                        step_dict["output_schema"] = json.loads(schema_json)
-                    except json.JSONDecodeError:
-                        print(f"Error decoding schema JSON for step {step_id}")
-                        step_dict["output_schema"] = {}
-                else:
-                    step_dict["output_schema"] = schema_json
-        
-        # Add one-shot example if available
-        if step_dict["one_shot_id"]:
-            oneshot_query = """
-            SELECT * FROM one_shot_examples WHERE id = :oneshot_id
-            """
-            oneshot_result = await database.fetch_one(
-                query=oneshot_query, 
-                values={"oneshot_id": step_dict["one_shot_id"]}
-            )
-            if oneshot_result:
-                oneshot_data = dict(oneshot_result)
-                # Convert input_json and output_json from string to dict if needed
-                input_json = oneshot_data["input_json"]
-                output_json = oneshot_data["output_json"]
-                
-                if isinstance(input_json, str):
-                    try:
-                        import json
-                        input_json = json.loads(input_json)
-                    except json.JSONDecodeError:
-                        print(f"Error decoding input JSON for step {step_id}")
-                        input_json = {}
-                        
-                if isinstance(output_json, str):
-                    try:
-                        import json
-                        output_json = json.loads(output_json)
-                    except json.JSONDecodeError:
-                        print(f"Error decoding output JSON for step {step_id}")
-                        output_json = {}
-                        
-                # if output_json is not a list, make it a list
-                if not isinstance(output_json, list):
-                    output_json = [output_json]
-                step_dict["oneshot_examples"] = output_json
-        
-        # Make sure input_map is a dictionary
-        if isinstance(step_dict["input_map"], str):
-            try:
-                import json
-                step_dict["input_map"] = json.loads(step_dict["input_map"])
-            except json.JSONDecodeError:
-                print(f"Error decoding input_map JSON for step {step_id}")
-                step_dict["input_map"] = {}
-        
-        # Filter to only include fields defined in the response model plus our new fields
-        filtered_step = {
-            k: v for k, v in step_dict.items() 
-            if k in StepResponse.model_fields or k in ["prompt_template", "output_schema", "oneshot_examples"]
-        }
-        
-        return filtered_step
+        return _attach_step_assets(step_dict, assets)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_step: {str(e)}")
         import traceback
@@ -529,6 +417,9 @@ async def create_or_update_step(step: StepUpdateRequest):
                 one_shot_id=oneshot_id or AgentStep.one_shot_id,
                 start_message=step.start_message,
                 complete_message=step.complete_message,
+                prompt_token_budget=step.prompt_token_budget,
+                loop_context=step.loop_context,
+                prompt_layout=step.prompt_layout,
                 updated_at=datetime.utcnow()
             )
             await database.execute(query)
@@ -552,11 +443,17 @@ async def create_or_update_step(step: StepUpdateRequest):
                 one_shot_id=oneshot_id,
                 start_message=step.start_message,
                 complete_message=step.complete_message,
+                prompt_token_budget=step.prompt_token_budget,
+                loop_context=step.loop_context,
+                prompt_layout=step.prompt_layout,
                 created_at=datetime.utcnow(),
                 updated_at=datetime.utcnow()
             )
             await database.execute(query)
         
+        # Step definitions changed, drop cached flows, steps and assets
+        DefinitionCache.invalidate()
+        
         # Get created/updated step
         query = """
         SELECT s.*, p.template as prompt_template, sch.schema_json as output_schema,
@@ -618,6 +515,9 @@ async def create_or_update_step(step: StepUpdateRequest):
             "pydantic_schema_id": step_data.get("pydantic_schema_id"),
             "start_message": step_data["start_message"],
             "complete_message": step_data["complete_message"],
+            "prompt_token_budget": step_data.get("prompt_token_budget"),
+            "loop_context": step_data.get("loop_context"),
+            "prompt_layout": step_data.get("prompt_layout"),
             "created_at": created_at,
             "updated_at": updated_at,
             # Extended fields
@@ -677,6 +577,7 @@ async def update_flow(flow_id: str, flow_data: FlowUpdateRequest):
                 "updated_at": datetime.utcnow()
             }
         )
+        DefinitionCache.invalidate()
         
         # Get updated flow
         updated_flow = await FlowRegistry.get_flow_by_id(flow_id)
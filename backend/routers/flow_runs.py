@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+import json
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Query, Response
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, ConfigDict, Field
 
 from db.database import database
 from core.step_executor import StepExecutor
+from core.flow_runner import FlowRunner
 from core.replay_engine import ReplayEngine
+from core.blob_store import BlobStore
+from core.tracing import Tracer
+from db.pagination import MAX_PAGE_SIZE, build_projection, decode_cursor, keyset_condition, split_page
 
 router = APIRouter()
 
@@ -20,6 +25,24 @@ class FlowRunResponse(BaseModel):
     created_at: str = Field(..., description="Creation timestamp")
     flow_name: Optional[str] = Field(None, description="Name of the flow")
     duration: Optional[float] = Field(None, description="Duration of the flow run in seconds")
+    trace_id: Optional[str] = Field(None, description="ID of the trace of the flow run")
+    prompt_tokens: Optional[int] = Field(None, description="Prompt tokens of the step runs, reported by the provider")
+    completion_tokens: Optional[int] = Field(None, description="Completion tokens of the step runs, reported by the provider")
+    cached_prompt_tokens: Optional[int] = Field(None, description="Prompt tokens served from the provider's prompt cache")
+    llm_calls: Optional[int] = Field(None, description="Number of LLM API calls of the step runs")
+    cost_usd: Optional[float] = Field(None, description="Cost of the LLM calls in USD")
+
+class FlowRunListItem(FlowRunResponse):
+    # Fields other than id are optional so that the list endpoint can project them away
+    project_id: Optional[str] = Field(None, description="ID of the project")
+    flow_id: Optional[str] = Field(None, description="ID of the flow")
+    status: Optional[str] = Field(None, description="Status of the flow run")
+    started_at: Optional[str] = Field(None, description="Start timestamp")
+    created_at: Optional[str] = Field(None, description="Creation timestamp")
+
+class TraceResponse(BaseModel):
+    trace_id: str = Field(..., description="ID of the trace of the flow run")
+    spans: List[Dict[str, Any]] = Field(..., description="Spans in the OTLP/JSON layout, in start order")
 
 class StepRunResponse(BaseModel):
     model_config = ConfigDict(extra="forbid", exclude_none=True)
@@ -34,16 +57,62 @@ class StepRunResponse(BaseModel):
     output_data: Optional[Dict[str, Any]] = Field(None, description="Output data from the step")
     error_message: Optional[str] = Field(None, description="Error message if status is error")
     rendered_prompt: Optional[str] = Field(None, description="Rendered prompt used for the step")
+    estimated_prompt_tokens: Optional[int] = Field(None, description="Number of prompt tokens sent for the step")
+    cached_prompt_tokens: Optional[int] = Field(None, description="Prompt tokens served from the provider's prompt cache")
+    prompt_tokens: Optional[int] = Field(None, description="Prompt tokens reported by the provider")
+    completion_tokens: Optional[int] = Field(None, description="Completion tokens reported by the provider")
+    llm_calls: Optional[int] = Field(None, description="Number of LLM API calls")
+    cost_usd: Optional[float] = Field(None, description="Cost of the LLM calls in USD")
     created_at: str = Field(..., description="Creation timestamp")
     step_name: Optional[str] = Field(None, description="Name of the step")
     duration: Optional[float] = Field(None, description="Duration of the step run in seconds")
 
+class StepRunListItem(StepRunResponse):
+    # Fields other than id are optional so that the list endpoint can project them away
+    flow_run_id: Optional[str] = Field(None, description="ID of the flow run")
+    step_id: Optional[str] = Field(None, description="ID of the step")
+    status: Optional[str] = Field(None, description="Status of the step run")
+    started_at: Optional[str] = Field(None, description="Start timestamp")
+    input_data: Optional[Dict[str, Any]] = Field(None, description="Input data for the step")
+    created_at: Optional[str] = Field(None, description="Creation timestamp")
+
+class UsageTotals(BaseModel):
+    llm_calls: Optional[int] = Field(None, description="Number of LLM API calls")
+    prompt_tokens: Optional[int] = Field(None, description="Prompt tokens reported by the provider")
+    completion_tokens: Optional[int] = Field(None, description="Completion tokens reported by the provider")
+    cached_prompt_tokens: Optional[int] = Field(None, description="Prompt tokens served from the provider's prompt cache")
+    cost_usd: Optional[float] = Field(None, description="Cost of the LLM calls in USD")
+
+class StepRunUsage(UsageTotals):
+    step_run_id: str = Field(..., description="ID of the step run")
+    step_id: str = Field(..., description="ID of the step")
+    step_name: Optional[str] = Field(None, description="Name of the step")
+    status: str = Field(..., description="Status of the step run")
+    estimated_prompt_tokens: Optional[int] = Field(None, description="Prompt tokens estimated before sending")
+
+class FlowRunUsageResponse(BaseModel):
+    flow_run_id: str = Field(..., description="ID of the flow run")
+    totals: UsageTotals = Field(..., description="Usage of all step runs of the flow run, including replays")
+    steps: List[StepRunUsage] = Field(..., description="Usage of each step run, in execution order")
+
+class GroupUsage(UsageTotals):
+    name: Optional[str] = Field(None, description="Name of the flow or step")
+    runs: int = Field(..., description="Number of runs")
+
+class ProjectUsageResponse(BaseModel):
+    project_id: str = Field(..., description="ID of the project")
+    totals: UsageTotals = Field(..., description="Usage of all step runs of the project")
+    flows: List[GroupUsage] = Field(..., description="Usage per flow, highest cost first")
+    steps: List[GroupUsage] = Field(..., description="Usage per step, highest cost first")
+
 class StepReplayRequest(BaseModel):
     model_config = ConfigDict(extra="forbid", exclude_none=True)
     
     input_data: Optional[Dict[str, Any]] = Field(None, description="Modified input data for the step")
     prompt_template: Optional[str] = Field(None, description="Modified prompt template to use")
     output_schema: Optional[Dict[str, Any]] = Field(None, description="Modified output schema to use")
+    model: Optional[str] = Field(None, description="Model to use instead of OPENAI_MODEL_NAME")
+    dry_run: bool = Field(True, description="Skip the step messages (no WebSocket dispatch or message rows)")
 
 class StepReplayResponse(BaseModel):
     model_config = ConfigDict(extra="forbid", exclude_none=True)
@@ -55,49 +124,146 @@ class StepReplayResponse(BaseModel):
     rendered_prompt: Optional[str] = Field(None, description="Rendered prompt used for the step")
     duration: float = Field(..., description="Time taken to replay the step (seconds)")
 
-@router.get("/project/{project_id}", response_model=List[FlowRunResponse])
-async def get_project_flow_runs(project_id: str):
-    """Get all flow runs for a project"""
+class ReplayVariant(BaseModel):
+    model_config = ConfigDict(extra="forbid", exclude_none=True)
+    
+    name: Optional[str] = Field(None, description="Name of the variant in the comparison")
+    prompt_template: Optional[str] = Field(None, description="Prompt template to use instead of the step's")
+    output_schema: Optional[Dict[str, Any]] = Field(None, description="Output schema to use instead of the step's")
+    model: Optional[str] = Field(None, description="Model to use instead of OPENAI_MODEL_NAME")
+
+class BatchReplayRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid", exclude_none=True)
+    
+    step_run_ids: Optional[List[str]] = Field(None, description="IDs of the step runs to replay")
+    step_id: Optional[str] = Field(None, description="Replay recent runs of this step")
+    step_name: Optional[str] = Field(None, description="Replay recent runs of steps with this name")
+    flow_id: Optional[str] = Field(None, description="Replay recent runs of steps of this flow")
+    status: Optional[str] = Field(None, description="Only replay step runs with this status")
+    limit: int = Field(20, ge=1, description="Maximum number of step runs selected by the filter")
+    variants: List[ReplayVariant] = Field(default_factory=list, description="Variants to compare (default: no changes)")
+    concurrency: Optional[int] = Field(None, ge=1, description="Number of replays running at the same time")
+    use_cache: bool = Field(False, description="Serve identical LLM requests from the response caches; when false, every replay calls the API")
+    dry_run: bool = Field(True, description="Skip the step messages (no WebSocket dispatch or message rows)")
+
+class BatchReplayResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid", exclude_none=True)
+    
+    results: List[Dict[str, Any]] = Field(..., description="One row per step run and variant")
+    summary: List[Dict[str, Any]] = Field(..., description="Latency, token usage and changed outputs per variant")
+
+FLOW_RUN_COLUMNS = {
+    "id": "fr.id",
+    "project_id": "fr.project_id",
+    "flow_id": "fr.flow_id",
+    "status": "fr.status",
+    "started_at": "fr.started_at",
+    "ended_at": "fr.ended_at",
+    "created_at": "fr.created_at",
+    "flow_name": "af.name as flow_name",
+    "trace_id": "fr.trace_id",
+    "prompt_tokens": "fr.prompt_tokens",
+    "completion_tokens": "fr.completion_tokens",
+    "cached_prompt_tokens": "fr.cached_prompt_tokens",
+    "llm_calls": "fr.llm_calls",
+    "cost_usd": "fr.cost_usd",
+}
+
+# Sums of the step run usage columns, for the usage endpoints
+USAGE_SUMS = """
+    SUM(sr.llm_calls) AS llm_calls,
+    SUM(sr.prompt_tokens) AS prompt_tokens,
+    SUM(sr.completion_tokens) AS completion_tokens,
+    SUM(sr.cached_prompt_tokens) AS cached_prompt_tokens,
+    SUM(sr.cost_usd) AS cost_usd
+"""
+
+STEP_RUN_COLUMNS = {
+    "id": "sr.id",
+    "flow_run_id": "sr.flow_run_id",
+    "step_id": "sr.step_id",
+    "status": "sr.status",
+    "started_at": "sr.started_at",
+    "ended_at": "sr.ended_at",
+    "input_data": "sr.input_data",
+    "output_data": "sr.output_data",
+    "error_message": "sr.error_message",
+    "rendered_prompt": "sr.rendered_prompt",
+    "estimated_prompt_tokens": "sr.estimated_prompt_tokens",
+    "cached_prompt_tokens": "sr.cached_prompt_tokens",
+    "prompt_tokens": "sr.prompt_tokens",
+    "completion_tokens": "sr.completion_tokens",
+    "llm_calls": "sr.llm_calls",
+    "cost_usd": "sr.cost_usd",
+    "created_at": "sr.created_at",
+    "step_name": "ast.name as step_name",
+}
+
+# Computed response fields and the columns they are derived from
+DURATION_DEPENDENCIES = {"duration": ("started_at", "ended_at")}
+
+def _calculate_duration(result_dict: Dict[str, Any]) -> None:
+    """Add the run duration in seconds if start and end times exist"""
+    if result_dict.get("ended_at") and result_dict.get("started_at"):
+        from datetime import datetime
+        try:
+            start_time = datetime.fromisoformat(str(result_dict["started_at"]).replace('Z', '+00:00'))
+            end_time = datetime.fromisoformat(str(result_dict["ended_at"]).replace('Z', '+00:00'))
+            duration_seconds = (end_time - start_time).total_seconds()
+            result_dict["duration"] = round(duration_seconds, 2)
+        except (ValueError, TypeError) as e:
+            print(f"Warning: Error calculating duration: {str(e)}")
+            # Don't set duration if calculation fails
+
+@router.get("/project/{project_id}", response_model=List[FlowRunListItem], response_model_exclude_unset=True)
+async def get_project_flow_runs(
+    project_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (all runs if omitted)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return")
+):
+    """Get all flow runs for a project, newest first"""
     try:
-        query = """
-        SELECT fr.*, af.name as flow_name 
+        try:
+            columns, output_fields = build_projection(
+                fields, FLOW_RUN_COLUMNS,
+                required=("id", "created_at"),
+                dependencies=DURATION_DEPENDENCIES
+            )
+            values: Dict[str, Any] = {"project_id": project_id}
+            where = "WHERE fr.project_id = :project_id"
+            if cursor:
+                values["cursor_value"], values["cursor_id"] = decode_cursor(cursor)
+                where += f" AND {keyset_condition('fr.created_at', 'fr.id', descending=True)}"
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        query = f"""
+        SELECT {columns}
         FROM flow_runs fr
         JOIN agent_flows af ON fr.flow_id = af.id
-        WHERE fr.project_id = :project_id
-        ORDER BY fr.created_at DESC
+        {where}
+        ORDER BY fr.created_at DESC, fr.id DESC
         """
-        results = await database.fetch_all(query=query, values={"project_id": project_id})
-        
-        if not results:
-            return []
+        if limit is not None:
+            query += " LIMIT :limit"
+            values["limit"] = limit + 1
+        results = await database.fetch_all(query=query, values=values)
+        page, next_cursor = split_page([dict(result) for result in results], limit, "created_at")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         
         # Calculate duration for each flow run
         formatted_results = []
-        for result in results:
-            result_dict = dict(result)
-            
-            # Add duration if available
-            if result_dict.get("ended_at") and result_dict.get("started_at"):
-                from datetime import datetime
-                start_time = datetime.fromisoformat(result_dict["started_at"].replace('Z', '+00:00'))
-                end_time = datetime.fromisoformat(result_dict["ended_at"].replace('Z', '+00:00'))
-                duration_seconds = (end_time - start_time).total_seconds()
-                result_dict["duration"] = round(duration_seconds, 2)
-            
-            # Filter to only include fields defined in the response model 
-            filtered_result = {}
-            for k, v in result_dict.items():
-                if k in FlowRunResponse.model_fields:
-                    filtered_result[k] = v
+        for result_dict in page:
+            _calculate_duration(result_dict)
             
-            # Add extra fields if they exist in the schema
-            if "flow_name" in FlowRunResponse.model_fields and "flow_name" in result_dict:
-                filtered_result["flow_name"] = result_dict["flow_name"]
-                
-            if "duration" in FlowRunResponse.model_fields and "duration" in result_dict:
-                filtered_result["duration"] = result_dict["duration"]
-                
-            formatted_results.append(filtered_result)
+            # Filter to only include requested fields defined in the response model 
+            formatted_results.append({
+                k: v for k, v in result_dict.items()
+                if k in output_fields and k in FlowRunListItem.model_fields
+            })
         
         return formatted_results
     except HTTPException as e:
@@ -107,6 +273,41 @@ async def get_project_flow_runs(project_id: str):
         # For other exceptions, return 500
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/project/{project_id}/usage", response_model=ProjectUsageResponse)
+async def get_project_usage(project_id: str):
+    """Get the LLM usage of a project in total, per flow and per step"""
+    values = {"project_id": project_id}
+    source = """
+    FROM step_runs sr
+    JOIN flow_runs fr ON sr.flow_run_id = fr.id
+    JOIN agent_flows af ON fr.flow_id = af.id
+    LEFT JOIN agent_steps ast ON sr.step_id = ast.id
+    WHERE fr.project_id = :project_id
+    """
+    totals = await database.fetch_one(query=f"SELECT {USAGE_SUMS} {source}", values=values)
+    flows = await database.fetch_all(
+        query=f"""
+        SELECT af.name AS name, COUNT(DISTINCT fr.id) AS runs, {USAGE_SUMS} {source}
+        GROUP BY af.name
+        ORDER BY COALESCE(SUM(sr.cost_usd), 0) DESC, COALESCE(SUM(sr.prompt_tokens), 0) DESC
+        """,
+        values=values
+    )
+    steps = await database.fetch_all(
+        query=f"""
+        SELECT ast.name AS name, COUNT(*) AS runs, {USAGE_SUMS} {source}
+        GROUP BY ast.name
+        ORDER BY COALESCE(SUM(sr.cost_usd), 0) DESC, COALESCE(SUM(sr.prompt_tokens), 0) DESC
+        """,
+        values=values
+    )
+    return {
+        "project_id": project_id,
+        "totals": dict(totals) if totals else {},
+        "flows": [dict(row) for row in flows],
+        "steps": [dict(row) for row in steps],
+    }
+
 @router.get("/{flow_run_id}", response_model=FlowRunResponse)
 async def get_flow_run(flow_run_id: str):
     """Get details of a flow run"""
@@ -130,48 +331,59 @@ async def get_flow_run(flow_run_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{flow_run_id}/steps", response_model=List[StepRunResponse])
-async def get_flow_run_steps(flow_run_id: str):
-    """Get all steps for a flow run"""
+@router.get("/{flow_run_id}/steps", response_model=List[StepRunListItem], response_model_exclude_unset=True)
+async def get_flow_run_steps(
+    flow_run_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (all step runs if omitted)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return")
+):
+    """Get all steps for a flow run, in execution order"""
     try:
         # First check if the flow run exists
         flow_query = """
-        SELECT * FROM flow_runs
+        SELECT id FROM flow_runs
         WHERE id = :flow_run_id
         """
         flow_result = await database.fetch_one(query=flow_query, values={"flow_run_id": flow_run_id})
         
         if not flow_result:
             raise HTTPException(status_code=404, detail="Flow run not found")
-            
-        # Try to get step runs with joined step names, falling back to basic query if needed
+        
         try:
-            query = """
-            SELECT sr.*, ast.name as step_name
-            FROM step_runs sr
-            LEFT JOIN agent_steps ast ON sr.step_id = ast.id
-            WHERE sr.flow_run_id = :flow_run_id
-            ORDER BY sr.started_at ASC
-            """
-            results = await database.fetch_all(query=query, values={"flow_run_id": flow_run_id})
-        except Exception as e:
-            # If the join fails, fall back to just getting step runs without the join
-            print(f"Warning: Join with agent_steps failed: {str(e)}. Falling back to basic query.")
-            query = """
-            SELECT * FROM step_runs
-            WHERE flow_run_id = :flow_run_id
-            ORDER BY started_at ASC
-            """
-            results = await database.fetch_all(query=query, values={"flow_run_id": flow_run_id})
+            columns, output_fields = build_projection(
+                fields, STEP_RUN_COLUMNS,
+                required=("id", "started_at"),
+                dependencies=DURATION_DEPENDENCIES
+            )
+            values: Dict[str, Any] = {"flow_run_id": flow_run_id}
+            where = "WHERE sr.flow_run_id = :flow_run_id"
+            if cursor:
+                values["cursor_value"], values["cursor_id"] = decode_cursor(cursor)
+                where += f" AND {keyset_condition('sr.started_at', 'sr.id', descending=False)}"
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        if not results:
-            return []
+        query = f"""
+        SELECT {columns}
+        FROM step_runs sr
+        LEFT JOIN agent_steps ast ON sr.step_id = ast.id
+        {where}
+        ORDER BY sr.started_at ASC, sr.id ASC
+        """
+        if limit is not None:
+            query += " LIMIT :limit"
+            values["limit"] = limit + 1
+        results = await database.fetch_all(query=query, values=values)
+        page, next_cursor = split_page([dict(result) for result in results], limit, "started_at")
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        await BlobStore.unpack_rows(page, json_fields=["input_data", "output_data"], text_fields=["rendered_prompt"])
         
-        # Filter to only include fields defined in the response model plus step_name
+        # Filter to only include requested fields defined in the response model
         filtered_results = []
-        for result in results:
-            result_dict = dict(result)
-            
+        for result_dict in page:
             # Process input_data and output_data to ensure they are dictionaries
             for data_field in ['input_data', 'output_data']:
                 if data_field in result_dict:
@@ -186,37 +398,12 @@ async def get_flow_run_steps(flow_run_id: str):
                     elif result_dict[data_field] is None:
                         result_dict[data_field] = {}
             
-            # Calculate duration if start and end times exist
-            if result_dict.get("ended_at") and result_dict.get("started_at"):
-                from datetime import datetime
-                try:
-                    start_time = datetime.fromisoformat(result_dict["started_at"].replace('Z', '+00:00'))
-                    end_time = datetime.fromisoformat(result_dict["ended_at"].replace('Z', '+00:00'))
-                    duration_seconds = (end_time - start_time).total_seconds()
-                    result_dict["duration"] = round(duration_seconds, 2)
-                except (ValueError, TypeError) as e:
-                    print(f"Warning: Error calculating duration: {str(e)}")
-                    # Don't set duration if calculation fails
-
-            # Add rendered prompt if available
-            if "rendered_prompt" in result_dict:
-                result_dict["rendered_prompt"] = result_dict["rendered_prompt"]
-
-            # Create filtered result with only fields in the schema
-            filtered_result = {}
-            for k, v in result_dict.items():
-                if k in StepRunResponse.model_fields:
-                    filtered_result[k] = v
+            _calculate_duration(result_dict)
             
-            # Add step_name if it exists in the schema and result
-            if "step_name" in StepRunResponse.model_fields and "step_name" in result_dict:
-                filtered_result["step_name"] = result_dict.get("step_name", "Unknown Step")
-                
-            # Add duration if it exists in the schema and result
-            if "duration" in StepRunResponse.model_fields and "duration" in result_dict:
-                filtered_result["duration"] = result_dict["duration"]
-                
-            filtered_results.append(filtered_result)
+            filtered_results.append({
+                k: v for k, v in result_dict.items()
+                if k in output_fields and k in StepRunListItem.model_fields
+            })
             
         return filtered_results
     except HTTPException as e:
@@ -227,6 +414,48 @@ async def get_flow_run_steps(flow_run_id: str):
         print(f"Error in get_flow_run_steps: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{flow_run_id}/usage", response_model=FlowRunUsageResponse)
+async def get_flow_run_usage(flow_run_id: str):
+    """Get the LLM usage of a flow run with a breakdown per step run"""
+    flow_run = await database.fetch_one(
+        query="SELECT id FROM flow_runs WHERE id = :flow_run_id",
+        values={"flow_run_id": flow_run_id}
+    )
+    if not flow_run:
+        raise HTTPException(status_code=404, detail="Flow run not found")
+    
+    steps = await database.fetch_all(
+        query="""
+        SELECT sr.id AS step_run_id, sr.step_id, ast.name AS step_name, sr.status,
+               sr.estimated_prompt_tokens, sr.llm_calls, sr.prompt_tokens,
+               sr.completion_tokens, sr.cached_prompt_tokens, sr.cost_usd
+        FROM step_runs sr
+        LEFT JOIN agent_steps ast ON sr.step_id = ast.id
+        WHERE sr.flow_run_id = :flow_run_id
+        ORDER BY sr.started_at ASC, sr.id ASC
+        """,
+        values={"flow_run_id": flow_run_id}
+    )
+    return {
+        "flow_run_id": flow_run_id,
+        "totals": await FlowRunner.summarize_usage(flow_run_id),
+        "steps": [dict(row) for row in steps],
+    }
+
+@router.get("/{flow_run_id}/trace", response_model=TraceResponse)
+async def get_flow_run_trace(flow_run_id: str):
+    """Get the spans of a flow run kept by the in-memory trace exporter"""
+    result = await database.fetch_one(
+        query="SELECT trace_id FROM flow_runs WHERE id = :flow_run_id",
+        values={"flow_run_id": flow_run_id}
+    )
+    if not result:
+        raise HTTPException(status_code=404, detail="Flow run not found")
+    trace_id = dict(result)["trace_id"]
+    if not trace_id:
+        raise HTTPException(status_code=404, detail="Flow run has no trace")
+    return {"trace_id": trace_id, "spans": Tracer.get_trace(trace_id)}
+
 @router.get("/step-runs/{step_run_id}", response_model=StepRunResponse)
 async def get_step_run(step_run_id: str):
     """Get details of a step run"""
@@ -252,7 +481,11 @@ async def get_step_run(step_run_id: str):
         if not result:
             raise HTTPException(status_code=404, detail="Step run not found")
         
-        result_dict = dict(result)
+        result_dict = await BlobStore.unpack_row(
+            dict(result),
+            json_fields=["input_data", "output_data"],
+            text_fields=["rendered_prompt"]
+        )
         
         # Process input_data and output_data to ensure they are dictionaries
         for data_field in ['input_data', 'output_data']:
@@ -303,6 +536,35 @@ async def get_step_run(step_run_id: str):
         print(f"Error in get_step_run: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/step-runs/replay-batch", response_model=BatchReplayResponse)
+async def replay_step_runs(batch_request: BatchReplayRequest):
+    """
+    Replay several step runs with one or more prompt, schema or model variants
+    
+    Step runs are given by ID or selected with a filter (step, flow, status).
+    Each replay creates a new step run record. The response compares latency,
+    token usage and differences to the original output for every variant.
+    """
+    step_run_ids = batch_request.step_run_ids
+    if not step_run_ids:
+        if not any((batch_request.step_id, batch_request.step_name, batch_request.flow_id)):
+            raise HTTPException(status_code=400, detail="Provide step_run_ids or a step_id, step_name or flow_id filter")
+        step_run_ids = await ReplayEngine.select_step_runs(
+            step_id=batch_request.step_id,
+            step_name=batch_request.step_name,
+            flow_id=batch_request.flow_id,
+            status=batch_request.status,
+            limit=batch_request.limit
+        )
+    
+    return await ReplayEngine.replay_batch(
+        step_run_ids=step_run_ids,
+        variants=[variant.model_dump(exclude_none=True) for variant in batch_request.variants],
+        concurrency=batch_request.concurrency,
+        use_cache=batch_request.use_cache,
+        dry_run=batch_request.dry_run
+    )
+
 @router.post("/step-runs/{step_run_id}/replay", response_model=StepReplayResponse)
 async def replay_step_run(step_run_id: str, replay_request: StepReplayRequest):
     """
@@ -326,30 +588,32 @@ async def replay_step_run(step_run_id: str, replay_request: StepReplayRequest):
                 step_run_id=step_run_id,
                 modified_input=replay_request.input_data,
                 modified_prompt=replay_request.prompt_template,
-                modified_schema=replay_request.output_schema
+                modified_schema=replay_request.output_schema,
+                modified_model=replay_request.model,
+                dry_run=replay_request.dry_run
             )
             
             # Process output_data to ensure it's a dictionary if it's returned as a string
-            if hasattr(result, 'output_data') and isinstance(result.output_data, str):
+            output_data = result.get("output_data")
+            if isinstance(output_data, str):
                 try:
-                    import json
-                    result.output_data = json.loads(result.output_data)
+                    output_data = json.loads(output_data)
                 except json.JSONDecodeError:
                     print(f"Warning: Failed to parse output_data as JSON in replay result")
-                    result.output_data = {}
+                    output_data = {}
             
             # Ensure we're returning a proper StepReplayResponse
             response_data = {
-                "status": result.status if hasattr(result, 'status') else "error",
-                "replay_run_id": result.replay_run_id if hasattr(result, 'replay_run_id') else None,
-                "output_data": result.output_data if hasattr(result, 'output_data') else {},
-                "error": result.error if hasattr(result, 'error') else None,
-                "duration": result.duration if hasattr(result, 'duration') else 0.0
+                "status": result.get("status", "error"),
+                "replay_run_id": result.get("replay_run_id"),
+                "output_data": output_data if output_data is not None else {},
+                "error": result.get("error"),
+                "duration": result.get("duration", 0.0)
             }
             
             # Add rendered prompt if available
-            if hasattr(result, 'rendered_prompt') and result.rendered_prompt:
-                response_data["rendered_prompt"] = result.rendered_prompt
+            if result.get("rendered_prompt"):
+                response_data["rendered_prompt"] = result["rendered_prompt"]
             
             return response_data
         except Exception as e:
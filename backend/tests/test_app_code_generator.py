@@ -0,0 +1,77 @@
+import unittest
+from unittest import mock
+
+from core.app_code_generator import AppCodeGenerator
+
+def make_config(page_count):
+    return {
+        "app": {"name": "Inventory"},
+        "pages": [
+            {
+                "id": f"page{i}",
+                "title": f"Page {i}",
+                "zones": [
+                    {"name": "main", "components": [{"type": "Table", "props": {"columns": ["name"]}}]},
+                    {"name": "side", "components": [{"type": "Card"}, {"type": "Table"}]},
+                ],
+            }
+            for i in range(page_count)
+        ],
+        "resources": {
+            "customer": {"pages": {"list": {"components": [{"type": "Form", "props": {}}]}}},
+        },
+    }
+
+class TestAppCodeGenerator(unittest.TestCase):
+    """Test cases for the AppCodeGenerator class"""
+
+    def setUp(self):
+        AppCodeGenerator._page_cache.clear()
+
+    def test_generated_files(self):
+        files = AppCodeGenerator.generate_files(make_config(2))
+
+        self.assertIn("src/config.json", files)
+        self.assertEqual(files["src/context/AppContext.tsx"], files["src/context/StaticAppContext.tsx"])
+        self.assertIn("src/pages/Page0.tsx", files)
+        self.assertIn("src/pages/CustomerList.tsx", files)
+        self.assertTrue(files["README.md"].startswith("# Inventory\n"))
+
+        page = files["src/pages/Page1.tsx"]
+        self.assertIn("export default function Page1() {", page)
+        self.assertIn('<h1 className="text-2xl font-bold mb-4">Page 1</h1>', page)
+        self.assertIn('<div className="zone-side">', page)
+        # Components used in several zones are imported once
+        self.assertEqual(page.count("import Table from '../components/Table'"), 1)
+        self.assertIn('"columns": [', page)
+
+        routes = files["src/routes.tsx"]
+        self.assertIn("import Page0 from './pages/Page0'", routes)
+        self.assertIn('{ path: "/page0", element: <Page0 /> }', routes)
+        self.assertIn('{ path: "/customer/list", element: <CustomerList /> }', routes)
+
+    def test_cached_pages_match_fresh_rendering(self):
+        config = make_config(12)
+        fresh = AppCodeGenerator.generate_files(config)
+        self.assertEqual(AppCodeGenerator.generate_files(config), fresh)
+
+    def test_unchanged_pages_are_not_rendered_again(self):
+        config = make_config(3)
+        AppCodeGenerator.generate_files(config)
+
+        config["pages"][1]["title"] = "Renamed"
+        with mock.patch.object(
+            AppCodeGenerator, "render_zone_page", wraps=AppCodeGenerator.render_zone_page
+        ) as render:
+            files = AppCodeGenerator.generate_files(config)
+
+        self.assertEqual(render.call_count, 1)
+        self.assertIn("Renamed", files["src/pages/Page1.tsx"])
+
+    def test_page_cache_is_bounded(self):
+        with mock.patch.object(AppCodeGenerator, "cache_size", 2):
+            AppCodeGenerator.generate_files(make_config(5))
+        self.assertEqual(len(AppCodeGenerator._page_cache), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import asyncio
+
+from pydantic import BaseModel
+
+from core.llm_usage import LLMUsage
+from core.step_executor import StepExecutor
+from benchmarks.fake_llm import FakeLLM, fixture_from_schema
+from benchmarks.flows import LOOP_OVERRIDES, SCHEMAS
+from benchmarks.report import percentile, summarize
+
+class Decision(BaseModel):
+    action: str
+    confidence: float
+
+class TestFakeLLM(unittest.TestCase):
+    """Test cases for the fixtures and the fake model layer of the benchmarks"""
+
+    def setUp(self):
+        FakeLLM.configure(items=2)
+
+    def tearDown(self):
+        FakeLLM.configure()
+
+    def test_fixture_from_schema(self):
+        fixture = fixture_from_schema(SCHEMAS["Entities"], items=2)
+        entities = fixture["entities"]
+        self.assertEqual(len(entities), 2)
+        # Strings are unique within lists
+        self.assertEqual([entity["entityName"] for entity in entities], ["entityName_1", "entityName_2"])
+        self.assertEqual(fixture_from_schema(SCHEMAS["Entities"], items=2), fixture)
+
+    def test_fixture_schema_features(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "kind": {"enum": ["a", "b"]},
+                "fixed": {"const": 7},
+                "optional": {"anyOf": [{"type": "null"}, {"$ref": "#/$defs/Item"}]},
+                "tags": {"type": "array", "minItems": 3, "maxItems": 5, "items": {"type": "string"}},
+            },
+            "$defs": {"Item": {"type": "object", "properties": {"count": {"type": "integer", "minimum": 2}}}},
+        }
+        self.assertEqual(fixture_from_schema(schema, items=1), {
+            "kind": "a",
+            "fixed": 7,
+            "optional": {"count": 2},
+            "tags": ["tags_1", "tags_2", "tags_3"],
+        })
+
+    def test_overrides(self):
+        FakeLLM.overrides = dict(LOOP_OVERRIDES, MainDecision={"action": "start_edit_flow"})
+        self.assertEqual(FakeLLM.respond(SCHEMAS["MainDecision"])["action"], "start_edit_flow")
+        # Loop outputs refer to the item in their prompt
+        prompt = 'Entity: {"entityName": "entityName_2", "fields": []}'
+        self.assertEqual(FakeLLM.respond(SCHEMAS["EntityAssets"], prompt)["entityName"], "entityName_2")
+
+    def test_generate_records_usage(self):
+        generate = FakeLLM.generate_json(None, '{"title": "X", "properties": {"name": {"type": "string"}}}')
+        result, calls = LLMUsage.call(lambda: generate("Hi"))
+        self.assertEqual(result, {"name": "name"})
+        self.assertEqual(len(calls), 1)
+        self.assertGreater(calls[0]["prompt_tokens"], 0)
+        self.assertGreater(calls[0]["completion_tokens"], 0)
+
+        decision, calls = LLMUsage.call(lambda: FakeLLM.generate_json(None, Decision)("Decide"))
+        self.assertIsInstance(decision, Decision)
+        self.assertEqual(len(calls), 1)
+
+    def test_installed(self):
+        original = StepExecutor.init_openai_model
+        with FakeLLM.installed():
+            model = asyncio.run(StepExecutor.init_openai_model("gpt-test"))
+            self.assertEqual(model.config.model, "gpt-test")
+        self.assertIs(StepExecutor.init_openai_model, original)
+
+class TestReport(unittest.TestCase):
+    def test_percentiles(self):
+        values = [0.4, 0.1, 0.3, 0.2]
+        self.assertAlmostEqual(percentile(values, 50), 0.25)
+        self.assertEqual(percentile(values, 100), 0.4)
+        self.assertIsNone(percentile([], 95))
+        summary = summarize(values)
+        self.assertEqual(summary["count"], 4)
+        self.assertAlmostEqual(summary["mean"], 0.25)
+        self.assertEqual(summarize([])["mean"], None)
+
+if __name__ == "__main__":
+    unittest.main()
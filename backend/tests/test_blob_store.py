@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+import hashlib
+import json
+from unittest import mock
+
+from core.blob_store import BlobStore, BLOB_REF_KEY, TEXT_REF_PREFIX
+
+class TestBlobStore(unittest.TestCase):
+    """Test cases for the BlobStore read path and codecs"""
+
+    def setUp(self):
+        BlobStore._cache.clear()
+        BlobStore._known_hashes.clear()
+
+    def _cache_blob(self, kind, text):
+        """Put a blob in the in-memory cache so no database access is needed"""
+        blob_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        BlobStore._cache_put(blob_hash, (kind, text))
+        return blob_hash
+
+    def test_codec_round_trip(self):
+        """Test that compressed data decompresses to the original bytes"""
+        data = json.dumps({"pages": [{"name": f"page {i}"} for i in range(100)]}).encode("utf-8")
+        codec, compressed = BlobStore._compress(data)
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(BlobStore._decompress(codec, compressed), data)
+
+    def test_unpack_without_refs(self):
+        """Test that rows without references are returned unchanged"""
+        rows = [{"input_data": '{"a": 1}', "rendered_prompt": "Hello"}]
+        asyncio.run(BlobStore.unpack_rows(rows, ["input_data"], ["rendered_prompt"]))
+        self.assertEqual(rows, [{"input_data": '{"a": 1}', "rendered_prompt": "Hello"}])
+
+    def test_unpack_json_and_text_refs(self):
+        """Test that references are resolved and JSON columns keep their type"""
+        config_hash = self._cache_blob("json", '{"pages":[1,2,3]}')
+        prompt_hash = self._cache_blob("text", "A long prompt")
+
+        rows = [
+            {
+                "input_data": json.dumps({"app_config": {BLOB_REF_KEY: config_hash}, "x": 1}),
+                "output_data": {"result": {BLOB_REF_KEY: config_hash}},
+                "rendered_prompt": TEXT_REF_PREFIX + prompt_hash
+            }
+        ]
+        asyncio.run(BlobStore.unpack_rows(rows, ["input_data", "output_data"], ["rendered_prompt"]))
+
+        self.assertEqual(json.loads(rows[0]["input_data"]), {"app_config": {"pages": [1, 2, 3]}, "x": 1})
+        self.assertEqual(rows[0]["output_data"], {"result": {"pages": [1, 2, 3]}})
+        self.assertEqual(rows[0]["rendered_prompt"], "A long prompt")
+
+    def test_unpacked_values_are_independent(self):
+        """Test that mutating an unpacked value does not affect later reads"""
+        config_hash = self._cache_blob("json", '{"version":1}')
+
+        first = asyncio.run(BlobStore.unpack_row({"config_json": {BLOB_REF_KEY: config_hash}}, ["config_json"]))
+        first["config_json"]["version"] = 2
+        second = asyncio.run(BlobStore.unpack_row({"config_json": {BLOB_REF_KEY: config_hash}}, ["config_json"]))
+        self.assertEqual(second["config_json"], {"version": 1})
+
+    def test_small_values_stay_inline(self):
+        """Test that values below the size threshold are not packed"""
+        value = {"a": "short", "b": [1, 2, 3]}
+        self.assertEqual(asyncio.run(BlobStore.pack_json(value)), value)
+        self.assertEqual(asyncio.run(BlobStore.pack_text("short prompt")), "short prompt")
+
+    def test_known_hashes_are_bounded(self):
+        """Test that the hashes known to be stored are kept as an LRU of limited size"""
+        database = mock.Mock(fetch_one=mock.AsyncMock(return_value={"hash": "stored"}))
+        raws = [f"blob {i}".encode("utf-8") for i in range(3)]
+        with mock.patch("core.blob_store.database", database), \
+             mock.patch.object(BlobStore, "known_hashes_size", 2):
+            first, second = [asyncio.run(BlobStore._put_raw(raw, "text")) for raw in raws[:2]]
+            # A known hash is not looked up again and becomes the most recently used
+            asyncio.run(BlobStore._put_raw(raws[0], "text"))
+            self.assertEqual(database.fetch_one.await_count, 2)
+            third = asyncio.run(BlobStore._put_raw(raws[2], "text"))
+
+        self.assertEqual(list(BlobStore._known_hashes), [first, third])
+        self.assertNotIn(second, BlobStore._known_hashes)
+
+if __name__ == "__main__":
+    unittest.main()
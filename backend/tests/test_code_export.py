@@ -0,0 +1,135 @@
+import unittest
+import asyncio
+import io
+import os
+import tempfile
+import zipfile
+from unittest import mock
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from core.code_export import CodeExporter
+from core.app_version_store import AppVersionStore
+from routers.projects import generate_code
+
+class TestCodeExporter(unittest.TestCase):
+    """Test cases for the CodeExporter class"""
+
+    def setUp(self):
+        self.base_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        for path, content in {
+            "package.json": "{}",
+            "src/main.tsx": "main",
+            "src/context/AppContext.tsx": "dynamic context",
+            "node_modules/react/index.js": "ignored",
+        }.items():
+            full_path = os.path.join(self.base_dir.name, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as f:
+                f.write(content)
+
+        self.original_paths = (CodeExporter.base_app_path, CodeExporter.cache_dir)
+        CodeExporter.base_app_path = self.base_dir.name
+        CodeExporter.cache_dir = self.cache_dir.name
+        CodeExporter._base_fingerprint = None
+
+    def tearDown(self):
+        CodeExporter.base_app_path, CodeExporter.cache_dir = self.original_paths
+        CodeExporter._base_fingerprint = None
+        self.base_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def _etag(self, version_id):
+        return asyncio.run(CodeExporter.etag(version_id))
+
+    def _export(self, etag, files):
+        async def collect():
+            return b"".join([chunk async for chunk in CodeExporter.stream_archive(etag, lambda: files)])
+        return asyncio.run(collect())
+
+    def test_archive_contents(self):
+        """Test that the archive merges baseApp and generated files"""
+        etag = self._etag("version-1")
+        data = self._export(etag, {"src/context/AppContext.tsx": "static context", "src/pages/Orders.tsx": "orders"})
+
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            ["package.json", "src/context/AppContext.tsx", "src/main.tsx", "src/pages/Orders.tsx"]
+        )
+        self.assertEqual(archive.read("src/context/AppContext.tsx"), b"static context")
+        self.assertIsNone(archive.testzip())
+
+    def test_archive_is_cached(self):
+        """Test that the streamed archive is stored in the cache"""
+        etag = self._etag("version-1")
+        self.assertIsNone(CodeExporter.get_cached(etag))
+
+        data = self._export(etag, {"README.md": "readme"})
+        with open(CodeExporter.get_cached(etag), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_etag_changes_with_base_app(self):
+        """Test that changes to the baseApp invalidate the ETag"""
+        with mock.patch.object(CodeExporter, "fingerprint_ttl", 0):
+            etag = self._etag("version-1")
+            self.assertEqual(etag, self._etag("version-1"))
+            self.assertNotEqual(etag, self._etag("version-2"))
+
+            with open(os.path.join(self.base_dir.name, "index.html"), "w") as f:
+                f.write("<html></html>")
+            self.assertNotEqual(etag, self._etag("version-1"))
+
+    def test_etag_reuses_fingerprint_within_ttl(self):
+        """Test that the baseApp tree is not scanned again for every ETag"""
+        with mock.patch.object(CodeExporter, "fingerprint_ttl", 60), \
+             mock.patch.object(CodeExporter, "_scan_base_app", wraps=CodeExporter._scan_base_app) as scan:
+            etag = self._etag("version-1")
+            self.assertEqual(etag, self._etag("version-1"))
+            self.assertEqual(scan.call_count, 1)
+
+            CodeExporter._base_checked -= 60
+            self.assertEqual(etag, self._etag("version-1"))
+            self.assertEqual(scan.call_count, 2)
+
+class TestGenerateCode(unittest.TestCase):
+    """Test cases for the generate-code endpoint"""
+
+    def setUp(self):
+        self.base_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.base_dir.name, "package.json"), "w") as f:
+            f.write("{}")
+        self.original_path = CodeExporter.base_app_path
+        CodeExporter.base_app_path = self.base_dir.name
+        CodeExporter._base_fingerprint = None
+
+    def tearDown(self):
+        CodeExporter.base_app_path = self.original_path
+        CodeExporter._base_fingerprint = None
+        self.base_dir.cleanup()
+
+    def _request(self, headers):
+        return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+    def test_not_modified_skips_config(self):
+        """Test that revalidation only needs the latest version ID"""
+        etag = asyncio.run(CodeExporter.etag("version-1"))
+        with mock.patch.object(AppVersionStore, "get_latest_version_id", mock.AsyncMock(return_value="version-1")), \
+             mock.patch.object(AppVersionStore, "get_config", mock.AsyncMock()) as get_config:
+            response = asyncio.run(generate_code("project-1", self._request({"If-None-Match": etag})))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], etag)
+        get_config.assert_not_called()
+
+    def test_missing_config(self):
+        """Test that a version without config is rejected once the archive has to be built"""
+        with mock.patch.object(AppVersionStore, "get_latest_version_id", mock.AsyncMock(return_value="version-1")), \
+             mock.patch.object(AppVersionStore, "get_config", mock.AsyncMock(return_value={})):
+            with self.assertRaises(HTTPException) as context:
+                asyncio.run(generate_code("project-1", self._request({})))
+        self.assertEqual(context.exception.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from core import config_delta
+
+class TestConfigDelta(unittest.TestCase):
+    """Test cases for the config diff and patch helpers"""
+
+    def setUp(self):
+        self.old = {
+            "app": {"name": "Shop", "version": 1},
+            "pages": [{"id": "home", "title": "Home"}, {"id": "orders", "title": "Orders"}],
+            "entities": {"order": {"fields": ["id", "total"]}},
+            "legacy": True
+        }
+        self.new = {
+            "app": {"name": "Shop", "version": 2},
+            "pages": [{"id": "home", "title": "Start"}],
+            "entities": {"order": {"fields": ["id", "total", "status"]}, "a/b~c": {}},
+        }
+
+    def test_round_trip(self):
+        """Test that applying a diff reproduces the new document"""
+        ops = config_delta.diff(self.old, self.new)
+        self.assertEqual(config_delta.apply(self.old, ops), self.new)
+
+    def test_apply_does_not_modify_input(self):
+        """Test that the original document is left untouched"""
+        ops = config_delta.diff(self.old, self.new)
+        config_delta.apply(self.old, ops)
+        self.assertEqual(self.old["app"]["version"], 1)
+        self.assertEqual(len(self.old["pages"]), 2)
+
+    def test_diff_is_structural(self):
+        """Test that only changed leaves are reported"""
+        ops = config_delta.diff(self.old, self.new, include_old=True)
+        self.assertIn({"op": "replace", "path": "/app/version", "value": 2, "old_value": 1}, ops)
+        self.assertIn({"op": "replace", "path": "/pages/0/title", "value": "Start", "old_value": "Home"}, ops)
+        self.assertIn({"op": "add", "path": "/entities/order/fields/2", "value": "status"}, ops)
+        self.assertIn({"op": "add", "path": "/entities/a~1b~0c", "value": {}}, ops)
+        self.assertIn({"op": "remove", "path": "/legacy", "old_value": True}, ops)
+        self.assertFalse(any(op["path"].startswith("/app/name") for op in ops))
+
+    def test_equal_documents(self):
+        """Test that equal documents produce no operations"""
+        self.assertEqual(config_delta.diff(self.old, dict(self.old)), [])
+
+    def test_type_change(self):
+        """Test that changing a value's type is detected"""
+        self.assertEqual(
+            config_delta.diff({"flag": 1}, {"flag": True}),
+            [{"op": "replace", "path": "/flag", "value": True}]
+        )
+
+    def test_invalid_path(self):
+        """Test that a patch that does not match the document raises ValueError"""
+        with self.assertRaises(ValueError):
+            config_delta.apply({"a": {}}, [{"op": "remove", "path": "/b/c"}])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from core.conversation_memory import ConversationMemory
+
+def make_message(index, role="user", content=None):
+    return {
+        "id": f"m{index}",
+        "project_id": "p1",
+        "role": role,
+        "content": content or f"message {index} " + "x" * 76,
+        "created_at": None
+    }
+
+class TestConversationMemory(unittest.TestCase):
+    """Test cases for the ConversationMemory class"""
+
+    def setUp(self):
+        ConversationMemory.invalidate()
+        self.original_budgets = (ConversationMemory.window_tokens, ConversationMemory.summary_tokens)
+        # Each test message is about 25 tokens
+        ConversationMemory.window_tokens = 100
+        ConversationMemory.summary_tokens = 60
+
+    def tearDown(self):
+        ConversationMemory.window_tokens, ConversationMemory.summary_tokens = self.original_budgets
+        ConversationMemory.invalidate()
+
+    def _history(self, rows, newest_id=None):
+        # Rows are returned newest first, like the database query
+        fetch_all = mock.AsyncMock(return_value=list(reversed(rows)))
+        # Newest message in the database, checked before a cached history is used
+        fetch_one = mock.AsyncMock(return_value={"id": newest_id} if newest_id else None)
+        with mock.patch("core.conversation_memory.database.fetch_all", fetch_all), \
+             mock.patch("core.conversation_memory.database.fetch_one", fetch_one):
+            history = asyncio.run(ConversationMemory.get_history("p1"))
+        return history, fetch_all.await_count
+
+    def test_short_history_is_verbatim(self):
+        rows = [make_message(1), make_message(2, "assistant")]
+        history, _ = self._history(rows)
+        self.assertEqual(history, rows)
+
+    def test_old_messages_are_summarized(self):
+        history, _ = self._history([make_message(i) for i in range(10)])
+
+        self.assertEqual(history[0]["role"], "summary")
+        self.assertIn("earlier messages omitted", history[0]["content"])
+        self.assertEqual(history[-1]["id"], "m9")
+        window_ids = [message["id"] for message in history[1:]]
+        self.assertEqual(window_ids, [f"m{i}" for i in range(10 - len(window_ids), 10)])
+        # The summary covers the messages just before the window
+        self.assertIn(f"message {9 - len(window_ids)}", history[0]["content"])
+
+    def test_incremental_updates(self):
+        _, loads = self._history([make_message(1)])
+        ConversationMemory.append(make_message(2, "assistant"))
+        ConversationMemory.append(make_message(2, "assistant"))
+        ConversationMemory.append(make_message(3, "system"))
+        history, more_loads = self._history([], newest_id="m2")
+
+        self.assertEqual(loads, 1)
+        self.assertEqual(more_loads, 0)
+        self.assertEqual([message["id"] for message in history], ["m1", "m2"])
+
+    def test_message_saved_by_another_process(self):
+        self._history([make_message(1)])
+        # m2 is inserted by another worker, without append() in this process
+        history, loads = self._history([make_message(1), make_message(2, "assistant")], newest_id="m2")
+        self.assertEqual(loads, 1)
+        self.assertEqual([message["id"] for message in history], ["m1", "m2"])
+
+        ConversationMemory.revalidate = False
+        try:
+            history, loads = self._history([], newest_id="m3")
+        finally:
+            ConversationMemory.revalidate = True
+        self.assertEqual(loads, 0)
+        self.assertEqual([message["id"] for message in history], ["m1", "m2"])
+
+    def test_append_to_uncached_project_is_ignored(self):
+        ConversationMemory.append(make_message(1))
+        history, loads = self._history([make_message(1)])
+        self.assertEqual(loads, 1)
+        self.assertEqual(len(history), 1)
+
+    def test_newest_message_is_kept_over_budget(self):
+        history, _ = self._history([make_message(1), make_message(2, content="y" * 2000)])
+        self.assertEqual(history[-1]["id"], "m2")
+        self.assertEqual(history[0]["role"], "summary")
+
+if __name__ == "__main__":
+    unittest.main()
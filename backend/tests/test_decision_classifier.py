@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from core.agent_router import AgentRouter
+from core.decision_classifier import DecisionClassifier, rules_classifier
+
+class TestDecisionClassifier(unittest.TestCase):
+    """Test cases for the DecisionClassifier class"""
+
+    def setUp(self):
+        DecisionClassifier.clear()
+        self.original_classifiers = list(DecisionClassifier._classifiers)
+
+    def tearDown(self):
+        DecisionClassifier._classifiers = self.original_classifiers
+        DecisionClassifier.clear()
+
+    def test_greeting_is_answered_without_llm(self):
+        decision = DecisionClassifier.classify("  Hello!  ", {"has_existing_app": False})
+        self.assertEqual(decision["main_decision"]["action"], "respond_with_info")
+        self.assertIn("build", decision["main_decision"]["prompt"])
+
+    def test_app_requests_go_to_main_agent(self):
+        self.assertIsNone(DecisionClassifier.classify("Build me a CRM for my sales team", {"has_existing_app": False}))
+
+    def test_low_confidence_edit_rule(self):
+        context = {"has_existing_app": True}
+        decision, confidence = rules_classifier("Add a status field to orders", context)
+        self.assertEqual(decision["action"], "start_edit_flow")
+        self.assertLess(confidence, DecisionClassifier.min_confidence)
+        self.assertIsNone(DecisionClassifier.classify("Add a status field to orders", context))
+        self.assertIsNone(rules_classifier("Add a status field to orders", {"has_existing_app": False}))
+
+    def test_registered_classifier(self):
+        def failing(message, context):
+            raise RuntimeError("model not loaded")
+
+        def model(message, context):
+            return {"action": "reject", "reason": "Off topic", "prompt": "I can only build apps."}, 0.99
+
+        DecisionClassifier.register(failing, first=True)
+        DecisionClassifier.register(model)
+        decision = DecisionClassifier.classify("What's the weather?", {"has_existing_app": False})
+        self.assertEqual(decision["main_decision"]["action"], "reject")
+
+    def test_decision_cache(self):
+        decision = {"main_decision": {"action": "start_edit_flow", "reason": "r", "prompt": "p"}}
+        DecisionClassifier.remember("p1", "v1", "Add a chart", decision)
+
+        self.assertEqual(DecisionClassifier.get_cached("p1", "v1", "add a chart."), decision)
+        self.assertIsNone(DecisionClassifier.get_cached("p1", "v2", "Add a chart"))
+        self.assertIsNone(DecisionClassifier.get_cached("p2", "v1", "Add a chart"))
+
+    def test_conversational_decisions_are_not_cached(self):
+        decision = {"main_decision": {"action": "ask_for_clarification", "reason": "r", "prompt": "Which page?"}}
+        DecisionClassifier.remember("p1", "v1", "yes", decision)
+        self.assertIsNone(DecisionClassifier.get_cached("p1", "v1", "yes"))
+
+    def test_cache_expiry(self):
+        decision = {"main_decision": {"action": "reject", "reason": "r", "prompt": "p"}}
+        with mock.patch.object(DecisionClassifier, "cache_ttl", -1):
+            DecisionClassifier.remember("p1", None, "hack the server", decision)
+        self.assertIsNone(DecisionClassifier.get_cached("p1", None, "hack the server"))
+
+    def test_main_agent_flow_runs_once_for_repeated_message(self):
+        output = {"main_decision": {"action": "start_create_flow", "reason": "r", "prompt": "p"}}
+
+        async def run():
+            with mock.patch.object(AgentRouter, "get_flow_id_by_name", mock.AsyncMock(return_value="flow")), \
+                 mock.patch.object(AgentRouter, "get_latest_app_version", mock.AsyncMock(return_value=None)), \
+                 mock.patch("core.agent_router.FlowRunner.start_flow_run", mock.AsyncMock(return_value="run")) as start, \
+                 mock.patch("core.agent_router.FlowRunner.get_flow_run",
+                            mock.AsyncMock(return_value={"status": "complete", "output": output})):
+                first = await AgentRouter.run_main_agent_flow("p1", "Build a CRM", [])
+                second = await AgentRouter.run_main_agent_flow("p1", "Build a CRM", [])
+                greeting = await AgentRouter.run_main_agent_flow("p1", "hi", [])
+                return first, second, greeting, start.await_count
+
+        first, second, greeting, calls = asyncio.run(run())
+        self.assertEqual(first, output)
+        self.assertEqual(second, output)
+        self.assertEqual(greeting["main_decision"]["action"], "respond_with_info")
+        self.assertEqual(calls, 1)
+
+if __name__ == "__main__":
+    unittest.main()
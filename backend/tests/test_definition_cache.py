@@ -0,0 +1,93 @@
+import unittest
+import asyncio
+import time
+from unittest import mock
+
+from core.definition_cache import DefinitionCache
+from core.flow_registry import FlowRegistry
+from core.prompt_schema_store import PromptSchemaStore
+
+class TestDefinitionCache(unittest.TestCase):
+    """Test cases for the DefinitionCache class"""
+    
+    def setUp(self):
+        DefinitionCache.invalidate()
+        DefinitionCache.ttl = None
+    
+    def test_get_or_load_caches_value(self):
+        """Test that the loader only runs on the first lookup"""
+        calls = []
+        
+        async def loader():
+            calls.append(1)
+            return {"id": "flow-1"}
+        
+        first = asyncio.run(DefinitionCache.get_or_load(("flow", "flow-1"), loader))
+        second = asyncio.run(DefinitionCache.get_or_load(("flow", "flow-1"), loader))
+        
+        self.assertEqual(first, {"id": "flow-1"})
+        self.assertEqual(second, {"id": "flow-1"})
+        self.assertEqual(len(calls), 1)
+    
+    def test_none_is_not_cached(self):
+        """Test that missing rows are looked up again"""
+        calls = []
+        
+        async def loader():
+            calls.append(1)
+            return None
+        
+        asyncio.run(DefinitionCache.get_or_load(("flow", "missing"), loader))
+        asyncio.run(DefinitionCache.get_or_load(("flow", "missing"), loader))
+        
+        self.assertEqual(len(calls), 2)
+    
+    def test_invalidate_drops_entries(self):
+        """Test that invalidation forces a reload"""
+        DefinitionCache.set(("flow", "flow-1"), {"name": "old"})
+        DefinitionCache.invalidate()
+        
+        hit, value = DefinitionCache.get(("flow", "flow-1"))
+        self.assertFalse(hit)
+        self.assertIsNone(value)
+    
+    def test_stale_version_is_not_stored(self):
+        """Test that values loaded before an invalidation are discarded"""
+        version = DefinitionCache.version()
+        DefinitionCache.invalidate()
+        DefinitionCache.set(("flow", "flow-1"), {"name": "stale"}, version)
+        
+        hit, _ = DefinitionCache.get(("flow", "flow-1"))
+        self.assertFalse(hit)
+    
+    def test_ttl_expiry(self):
+        """Test that entries expire after the configured TTL"""
+        DefinitionCache.ttl = 0.01
+        DefinitionCache.set(("flow", "flow-1"), {"name": "flow"})
+        time.sleep(0.02)
+        
+        hit, _ = DefinitionCache.get(("flow", "flow-1"))
+        self.assertFalse(hit)
+
+    def test_nested_values_are_not_shared(self):
+        """Test that modifying a returned step or asset does not change the cached one"""
+        rows = [{"id": "s1", "order": 1, "input_map": {"entities": "$.create.entities"}}]
+        with mock.patch("core.flow_registry.database.fetch_all", mock.AsyncMock(return_value=rows)) as fetch_all:
+            step = asyncio.run(FlowRegistry.get_steps_by_flow_id("flow-1"))[0]
+            step["input_map"]["entities"] = "$.changed"
+            step["input_map"]["extra"] = "$.extra"
+            rows[0]["input_map"]["entities"] = "$.changed by the loader's caller"
+
+            again = asyncio.run(FlowRegistry.get_steps_by_flow_id("flow-1"))[0]
+        self.assertEqual(fetch_all.await_count, 1)
+        self.assertEqual(again["input_map"], {"entities": "$.create.entities"})
+
+        schema = {"id": "o1", "schema_json": {"type": "object", "required": ["name"]}}
+        with mock.patch("core.prompt_schema_store.database.fetch_one", mock.AsyncMock(return_value=schema)):
+            first = asyncio.run(PromptSchemaStore.get_schema_by_id("o1"))
+            first["schema_json"]["required"].append("extra")
+            second = asyncio.run(PromptSchemaStore.get_schema_by_id("o1"))
+        self.assertEqual(second["schema_json"]["required"], ["name"])
+
+if __name__ == "__main__":
+    unittest.main()
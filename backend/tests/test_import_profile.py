@@ -0,0 +1,63 @@
+import unittest
+import asyncio
+import subprocess
+import threading
+from unittest import mock
+import sys
+
+import core
+from core.import_profile import ImportProfile, BACKEND_DIR
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       2500 |     sqlalchemy.sql
+import time:      1000 |       3500 |   sqlalchemy
+import time:       500 |       4000 | db.database
+"""
+
+class TestImportProfile(unittest.TestCase):
+    """Test cases for the import profile and the lazy imports"""
+
+    def test_parse_and_summarize(self):
+        entries = ImportProfile.parse(SAMPLE)
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(entries[1], {"module": "sqlalchemy.sql", "depth": 2, "self_ms": 2.0, "cumulative_ms": 2.5})
+        self.assertEqual(entries[3]["depth"], 0)
+
+        summary = ImportProfile.summarize(entries, top=2)
+        self.assertAlmostEqual(summary["total_ms"], 3.62)
+        self.assertEqual([entry["module"] for entry in summary["modules"]], ["db.database", "sqlalchemy"])
+        self.assertEqual(summary["packages"][0], {"package": "sqlalchemy", "self_ms": 3.0})
+        self.assertIn("db.database", ImportProfile.report(summary))
+
+    def test_core_exports_are_lazy(self):
+        from core.tool_call_module import ToolCallModule
+        self.assertIs(core.ToolCallModule, ToolCallModule)
+        self.assertIn("Tracer", dir(core))
+        with self.assertRaises(AttributeError):
+            core.Missing
+
+    def test_step_executor_does_not_import_outlines(self):
+        code = "import sys, core.step_executor, core.auth; print('outlines' in sys.modules, 'supabase' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True)
+        self.assertEqual(result.stdout.split(), ["False", "False"], msg=result.stderr)
+
+    def test_startup_profile_task_is_kept_and_cancelled(self):
+        release = threading.Event()
+
+        async def lifespan():
+            ImportProfile.start()
+            task = ImportProfile._task
+            await asyncio.sleep(0)
+            ImportProfile.stop()
+            release.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(ImportProfile, "on_startup", True), \
+             mock.patch.object(ImportProfile, "log_startup_profile", side_effect=lambda: release.wait(5)):
+            asyncio.run(lifespan())
+        ImportProfile._task = None
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from core.loop_context import LoopContext, PromptLog
+from core.step_executor import StepExecutor
+
+OUTPUTS = [{"entity": {"id": f"e{i}", "name": f"Entity {i}", "fields": [{"name": "title"}]}} for i in range(4)]
+
+class TestLoopContext(unittest.TestCase):
+    """Test cases for the LoopContext modes and the PromptLog"""
+
+    def tearDown(self):
+        LoopContext._reducers.clear()
+
+    def test_modes(self):
+        self.assertEqual(LoopContext.previous_outputs(LoopContext.parse("all"), OUTPUTS, None), OUTPUTS)
+        self.assertIsNone(LoopContext.previous_outputs(LoopContext.parse("none"), OUTPUTS, None))
+        self.assertEqual(LoopContext.previous_outputs(LoopContext.parse("last:2"), OUTPUTS, None), OUTPUTS[-2:])
+        self.assertIsNone(LoopContext.previous_outputs(LoopContext.parse("last:0"), OUTPUTS, None))
+        self.assertEqual(
+            LoopContext.previous_outputs(LoopContext.parse("digest"), OUTPUTS, None)[0],
+            {"entity": {"id": "e0", "name": "Entity 0"}}
+        )
+        # Nothing to pass before the first output
+        self.assertIsNone(LoopContext.previous_outputs(LoopContext.parse("all"), [], None))
+
+    def test_default_mode(self):
+        with mock.patch.object(LoopContext, "default_mode", "last:1"):
+            self.assertEqual(LoopContext.parse(None), ("last", 1))
+
+    def test_custom_reducer(self):
+        LoopContext.register_reducer("count", lambda results, item: {"done": len(results), "item": item})
+        mode = LoopContext.parse("custom:count")
+        self.assertEqual(LoopContext.previous_outputs(mode, OUTPUTS, "x"), {"done": 4, "item": "x"})
+
+    def test_invalid_modes(self):
+        for mode in ("last", "last:-1", "last:x", "custom:missing", "everything", "none:1"):
+            with self.assertRaises(ValueError, msg=mode):
+                LoopContext.parse(mode)
+
+    def test_prompt_log_is_bounded(self):
+        log = PromptLog(limit=3)
+        for i in range(10):
+            log.append(f"prompt {i}")
+        self.assertEqual(log.combined(" | "), "prompt 0 | [7 loop iterations omitted] | prompt 8 | prompt 9")
+
+        short = PromptLog(limit=3)
+        for i in range(2):
+            short.append(f"prompt {i}")
+        self.assertEqual(short.combined(" | "), "prompt 0 | prompt 1")
+
+    def test_execute_ai_loop_uses_step_mode(self):
+        step = {
+            "loop_key": "entities",
+            "loop_context": "last:1",
+            "system_message": "System",
+            "prompt_template_id": "p",
+            "output_schema_id": "s",
+        }
+        assets = {"prompt_template": "{{ current_item }} {{ previous_loop_outputs | default([]) | length }}", "output_schema": {}}
+        prompts = []
+
+        async def generate(openai_model, prompt, schema_json, pydantic_model_class=None, use_cache=None, schema_id=None):
+            prompts.append(prompt)
+            return {"id": len(prompts)}
+
+        async def run():
+            with mock.patch("core.step_executor.PromptSchemaStore.get_step_assets", mock.AsyncMock(return_value=assets)), \
+                 mock.patch.object(StepExecutor, "init_openai_model", mock.AsyncMock(return_value=None)), \
+                 mock.patch.object(StepExecutor, "run_structured_generation", side_effect=generate):
+                return await StepExecutor.execute_ai_loop(step, {"entities": ["a", "b", "c"]})
+
+        status, output, _, prompt_tokens = asyncio.run(run())
+        self.assertEqual(status, "success")
+        self.assertEqual(output, {"results": [{"id": 1}, {"id": 2}, {"id": 3}]})
+        self.assertEqual(prompts, ["System\n\na 0", "System\n\nb 1", "System\n\nc 1"])
+        self.assertGreater(prompt_tokens, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from db.models import StepRun
+from core.metrics import Metrics, Counter, Histogram, statement_label
+from core.step_executor import StepExecutor
+
+class FakeDatabase:
+    async def fetch_one(self, query, values=None):
+        return {"query": query, "values": values}
+
+    async def execute(self, query, values=None):
+        return 1
+
+    async def execute_many(self, query, values):
+        return None
+
+    async def fetch_all(self, query, values=None):
+        return []
+
+    async def fetch_val(self, query, values=None):
+        return 0
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for the metrics registry and its instrumentation"""
+
+    def test_histogram_exposition(self):
+        histogram = Histogram("test_duration_seconds", "Test durations", ("name",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, name="a")
+        histogram.observe(0.5, name="a")
+        histogram.observe(5, name='quoted "b"')
+
+        lines = histogram.render()
+        self.assertEqual(lines[:2], ["# HELP test_duration_seconds Test durations", "# TYPE test_duration_seconds histogram"])
+        self.assertIn('test_duration_seconds_bucket{name="a",le="0.1"} 1', lines)
+        self.assertIn('test_duration_seconds_bucket{name="a",le="1.0"} 2', lines)
+        self.assertIn('test_duration_seconds_bucket{name="a",le="+Inf"} 2', lines)
+        self.assertIn('test_duration_seconds_count{name="a"} 2', lines)
+        self.assertIn('test_duration_seconds_bucket{name="quoted \\"b\\"",le="+Inf"} 1', lines)
+
+    def test_counter_and_disabled_metrics(self):
+        counter = Counter("test_total", "Test counter", ("kind",))
+        counter.inc(3, kind="x")
+        with mock.patch.object(Metrics, "enabled", False):
+            counter.inc(3, kind="x")
+        self.assertEqual(counter.render()[-1], 'test_total{kind="x"} 3')
+
+    def test_statement_label(self):
+        self.assertEqual(statement_label("SELECT sr.* FROM step_runs sr JOIN agent_steps s ON 1"), "select step_runs")
+        self.assertEqual(statement_label("\n  UPDATE flow_runs SET status = 'x'"), "update flow_runs")
+        self.assertEqual(statement_label(StepRun.__table__.insert().values(id="x")), "insert step_runs")
+        self.assertEqual(statement_label(StepRun.__table__.select()), "select step_runs")
+
+    def test_instrument_database(self):
+        database = FakeDatabase()
+        Metrics.instrument_database(database)
+        Metrics.instrument_database(database)
+        before = Metrics.db_duration.count(statement="select prompts")
+
+        result = asyncio.run(database.fetch_one(query="SELECT * FROM prompts WHERE id = :id", values={"id": "p"}))
+
+        self.assertEqual(result["values"], {"id": "p"})
+        self.assertEqual(Metrics.db_duration.count(statement="select prompts"), before + 1)
+
+    def test_step_duration_is_recorded(self):
+        step = {"id": "s1", "name": "metrics_step", "step_type": "tool_call", "tool_name": "noop", "input_map": {}}
+        with mock.patch.object(StepExecutor, "create_step_run", mock.AsyncMock(return_value="r1")), \
+             mock.patch.object(StepExecutor, "update_step_run", mock.AsyncMock()), \
+             mock.patch.object(StepExecutor, "execute_tool_call", mock.AsyncMock(return_value=("success", {}))):
+            asyncio.run(StepExecutor.run_step(step, "fr1", "p1", {}, dry_run=True))
+
+        labels = {"flow": "unknown", "step": "metrics_step", "step_type": "tool_call", "status": "success"}
+        self.assertEqual(Metrics.step_duration.count(**labels), 1)
+        self.assertIn('step_duration_seconds_count{flow="unknown",step="metrics_step",step_type="tool_call",status="success"} 1',
+                      Metrics.render())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,254 @@
+import unittest
+import asyncio
+import importlib.util
+import json
+import os
+import tempfile
+from unittest import mock
+
+from core.output_validator import OutputValidator
+from core.step_executor import StepExecutor
+from core.llm_usage import LLMUsage
+from core.llm_cache import LLMResponseCache
+
+ENTITIES = {
+    "type": "object",
+    "properties": {
+        "entities": {
+            "type": "array",
+            "items": {"$ref": "#/$defs/Entity"},
+            "minItems": 1,
+        }
+    },
+    "required": ["entities"],
+    "additionalProperties": False,
+    "$defs": {
+        "Entity": {
+            "type": "object",
+            "properties": {
+                "entityName": {"type": "string"},
+                "fieldCount": {"type": "integer", "minimum": 0},
+                "weight": {"type": "number"},
+                "audited": {"type": "boolean"},
+                "kind": {"type": "string", "enum": ["master", "transaction"]},
+                "parent": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+                "label": {"type": "string", "default": ""},
+                "children": {"type": "array", "items": {"$ref": "#/$defs/Entity"}},
+            },
+            "required": ["entityName", "fieldCount", "kind", "parent", "label"],
+            "additionalProperties": False,
+        }
+    },
+}
+
+VALID = {"entities": [
+    {"entityName": "Customer", "fieldCount": 3, "kind": "master", "parent": None, "label": "Customers",
+     "children": [{"entityName": "Address", "fieldCount": 2, "kind": "master", "parent": "Customer", "label": ""}]}
+]}
+
+class TestOutputValidator(unittest.TestCase):
+    """Test cases for the structured output validation and repair"""
+
+    def setUp(self):
+        OutputValidator.clear()
+
+    def test_valid_output(self):
+        self.assertEqual(OutputValidator.validate(ENTITIES, VALID), [])
+        self.assertEqual(OutputValidator.check(ENTITIES, VALID), ("valid", VALID, []))
+
+    def test_errors_have_paths(self):
+        output = {"entities": [{"entityName": "Customer", "fieldCount": -1, "kind": "lookup", "parent": None, "label": 5}]}
+        self.assertEqual(OutputValidator.validate(ENTITIES, output), [
+            "$.entities[0].fieldCount: -1 is out of bounds (minimum 0)",
+            "$.entities[0].kind: 'lookup' is not one of ['master', 'transaction']",
+            "$.entities[0].label: expected string, got int",
+        ])
+        self.assertEqual(OutputValidator.validate(ENTITIES, {"entities": []}), ["$.entities: expected at least 1 items, got 0"])
+
+    def test_repair(self):
+        output = {"entities": [
+            {"entityName": "Customer", "fieldCount": "3", "weight": "1.5", "audited": "True", "kind": "Master", "notes": "x",
+             "children": [{"entityName": "Address", "fieldCount": 2.0, "kind": "TRANSACTION", "parent": "Customer"}]}
+        ]}
+        result, repaired, errors = OutputValidator.check(ENTITIES, output)
+
+        self.assertEqual((result, errors), ("repaired", []))
+        self.assertEqual(repaired, {"entities": [
+            {"entityName": "Customer", "fieldCount": 3, "weight": 1.5, "audited": True, "kind": "master",
+             "parent": None, "label": "",
+             "children": [{"entityName": "Address", "fieldCount": 2, "kind": "transaction", "parent": "Customer", "label": ""}]}
+        ]})
+        self.assertEqual(OutputValidator.validate(ENTITIES, repaired), [])
+        # The output itself is left unchanged
+        self.assertEqual(output["entities"][0]["fieldCount"], "3")
+
+    def test_unrepairable_output(self):
+        output = {"entities": [{"fieldCount": "many", "kind": "master", "parent": None}]}
+        result, unchanged, errors = OutputValidator.check(ENTITIES, output)
+        self.assertEqual(result, "invalid")
+        self.assertIs(unchanged, output)
+        self.assertEqual(errors, [
+            "$.entities[0].fieldCount: expected integer, got str",
+            "$.entities[0].entityName: required property is missing",
+        ])
+
+    def test_validators_are_cached_per_schema_id(self):
+        check = OutputValidator.get(ENTITIES, "entities")
+        self.assertIs(OutputValidator.get(ENTITIES, "entities"), check)
+        self.assertIs(OutputValidator.get(dict(ENTITIES), "entities"), check)
+        # A schema edited under the same ID is compiled again
+        edited = dict(ENTITIES, required=[])
+        self.assertIsNot(OutputValidator.get(edited, "entities"), check)
+        self.assertEqual(OutputValidator.validate(edited, {}, "entities"), [])
+
+    def test_schema_as_json_text(self):
+        self.assertEqual(OutputValidator.validate('{"type": "object", "required": ["a"]}', {}), ["$.a: required property is missing"])
+
+
+class TestGenerationValidation(unittest.TestCase):
+    """Test cases for the validation of run_structured_generation outputs"""
+
+    def setUp(self):
+        OutputValidator.clear()
+
+    def run_generation(self, outputs, pydantic_model_class=None):
+        calls = []
+
+        def generator(prompt):
+            calls.append(prompt)
+            return outputs[len(calls) - 1]
+
+        with mock.patch("core.step_executor.generate_json", return_value=generator), \
+             mock.patch.object(LLMUsage, "call", side_effect=lambda function: (function(), [])):
+            result = asyncio.run(StepExecutor.run_structured_generation(
+                openai_model=None, prompt="Entities", schema_json=ENTITIES,
+                pydantic_model_class=pydantic_model_class, use_cache=False, schema_id="entities"
+            ))
+        return result, len(calls)
+
+    def test_repaired_without_retry(self):
+        output = {"entities": [dict(VALID["entities"][0], fieldCount="3")]}
+        result, calls = self.run_generation([output])
+        self.assertEqual((result, calls), (VALID, 1))
+
+    def test_retry_when_repair_fails(self):
+        invalid = {"entities": [{"kind": "master"}]}
+        with mock.patch.object(OutputValidator, "retries", 1):
+            result, calls = self.run_generation([invalid, VALID])
+            self.assertEqual((result, calls), (VALID, 2))
+
+            with self.assertRaisesRegex(ValueError, "does not match the schema after 2 attempts"):
+                self.run_generation([invalid, invalid])
+
+    def test_disabled(self):
+        invalid = {"entities": [{"kind": "master"}]}
+        with mock.patch.object(OutputValidator, "enabled", False):
+            self.assertEqual(self.run_generation([invalid]), (invalid, 1))
+
+class _Response:
+    def __init__(self, content):
+        self.usage = {"prompt_tokens": 10, "completion_tokens": 5}
+        self._content = content
+
+    def model_dump(self):
+        return {"choices": [{"message": {"content": self._content}}], "usage": self.usage}
+
+class _Completions:
+    """Chat completions of a fake OpenAI client, answering with the given contents in turn"""
+
+    def __init__(self, contents):
+        self.contents = contents
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return _Response(self.contents[min(len(self.requests), len(self.contents)) - 1])
+
+class _Client:
+    def __init__(self, contents):
+        self.chat = mock.Mock(completions=_Completions(contents))
+
+class TestOutlinesCacheBypass(unittest.TestCase):
+    """Test cases for retries and uncached generations against the Outlines response cache"""
+
+    def setUp(self):
+        from outlines import caching
+        self.caching = caching
+        OutputValidator.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.environment = mock.patch.dict(os.environ, {"OUTLINES_CACHE_DIR": self.directory.name})
+        self.environment.start()
+        caching.get_cache.cache_clear()
+
+    def tearDown(self):
+        self.caching.get_cache().close()
+        self.caching.get_cache.cache_clear()
+        self.environment.stop()
+        self.directory.cleanup()
+
+    def test_retried_config_misses_the_cache(self):
+        from outlines.models.openai import OpenAI, OpenAIConfig
+        model = OpenAI(client=None, config=OpenAIConfig(model="gpt-test"))
+        calls = []
+
+        @self.caching.cache()
+        async def call_api(prompt, system_prompt, config):
+            calls.append(config)
+            return len(calls)
+
+        self.assertEqual(asyncio.run(call_api("Entities", None, model.config)), 1)
+        # The same request is answered from the cache
+        self.assertEqual(asyncio.run(call_api("Entities", None, model.config)), 1)
+        retry = StepExecutor.uncached_model(model)
+        self.assertEqual(asyncio.run(call_api("Entities", None, retry.config)), 2)
+        self.assertIsNotNone(retry.config.seed)
+        self.assertIsNone(model.config.seed)
+
+    @unittest.skipUnless(importlib.util.find_spec("openai"), "openai is not installed")
+    def test_retry_calls_the_api(self):
+        import outlines
+        from outlines.models.openai import OpenAIConfig
+        invalid = json.dumps({"entities": [{"kind": "master"}]})
+        client = _Client([invalid, json.dumps(VALID)])
+        model = LLMUsage.instrument(outlines.models.openai(client, OpenAIConfig(model="gpt-test")))
+
+        def generate():
+            return asyncio.run(StepExecutor.run_structured_generation(
+                openai_model=model, prompt="Entities", schema_json=ENTITIES, schema_id="entities"
+            ))
+
+        with mock.patch.object(OutputValidator, "retries", 1), \
+             mock.patch.object(LLMResponseCache, "enabled", False):
+            self.assertEqual(generate(), VALID)
+            requests = client.chat.completions.requests
+            self.assertEqual(len(requests), 2)
+            self.assertIsNotNone(requests[1]["seed"])
+
+            # The first attempt is served from the Outlines cache, the retry is not
+            self.assertEqual(generate(), VALID)
+            self.assertEqual(len(requests), 3)
+
+    @unittest.skipUnless(importlib.util.find_spec("openai"), "openai is not installed")
+    def test_uncached_generation_calls_the_api(self):
+        import outlines
+        from outlines.models.openai import OpenAIConfig
+        client = _Client([json.dumps(VALID)])
+        model = LLMUsage.instrument(outlines.models.openai(client, OpenAIConfig(model="gpt-test")))
+
+        def generate(use_cache):
+            return asyncio.run(StepExecutor.run_structured_generation(
+                openai_model=model, prompt="Entities", schema_json=ENTITIES, use_cache=use_cache, schema_id="entities"
+            ))
+
+        with mock.patch.object(LLMResponseCache, "enabled", False):
+            requests = client.chat.completions.requests
+            self.assertEqual(generate(None), VALID)
+            self.assertEqual(generate(None), VALID)
+            self.assertEqual(len(requests), 1)
+            # Replays without the response cache skip the Outlines cache too
+            self.assertEqual(generate(False), VALID)
+            self.assertEqual(generate(False), VALID)
+            self.assertEqual(len(requests), 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from pydantic import ValidationError
+
+from db.pagination import build_projection, decode_cursor, encode_cursor, split_page
+from routers.flow_runs import FlowRunResponse, FlowRunListItem
+
+class TestPagination(unittest.TestCase):
+    """Test cases for the keyset pagination helpers"""
+
+    def setUp(self):
+        self.columns = {
+            "id": "fr.id",
+            "status": "fr.status",
+            "started_at": "fr.started_at",
+            "ended_at": "fr.ended_at",
+            "input_data": "fr.input_data",
+        }
+        self.dependencies = {"duration": ("started_at", "ended_at")}
+
+    def test_cursor_round_trip(self):
+        """Test that a cursor decodes to the values it was built from"""
+        cursor = encode_cursor("2024-01-01 10:00:00", "abc")
+        self.assertEqual(decode_cursor(cursor), ("2024-01-01 10:00:00", "abc"))
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor raises ValueError"""
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_projection_all_fields(self):
+        """Test that all columns are selected when no fields are requested"""
+        columns, output_fields = build_projection(None, self.columns, dependencies=self.dependencies)
+        self.assertEqual(columns, "fr.id, fr.status, fr.started_at, fr.ended_at, fr.input_data")
+        self.assertIn("duration", output_fields)
+
+    def test_projection_subset(self):
+        """Test that only requested columns and their dependencies are selected"""
+        columns, output_fields = build_projection("status,duration", self.columns, dependencies=self.dependencies)
+        self.assertEqual(columns, "fr.id, fr.status, fr.started_at, fr.ended_at")
+        self.assertEqual(output_fields, {"id", "status", "duration"})
+
+    def test_projection_unknown_field(self):
+        """Test that unknown fields are rejected"""
+        with self.assertRaises(ValueError):
+            build_projection("status,secret", self.columns)
+
+    def test_split_page(self):
+        """Test that the extra row is trimmed and a cursor to the last row is returned"""
+        rows = [{"id": str(i), "started_at": f"2024-01-0{i}"} for i in range(1, 4)]
+
+        page, next_cursor = split_page(rows, 2, "started_at")
+        self.assertEqual([row["id"] for row in page], ["1", "2"])
+        self.assertEqual(decode_cursor(next_cursor), ("2024-01-02", "2"))
+
+        page, next_cursor = split_page(rows, 3, "started_at")
+        self.assertEqual(len(page), 3)
+        self.assertIsNone(next_cursor)
+
+    def test_list_items_are_partial(self):
+        """Test that projected list rows validate while detail responses stay strict"""
+        row = {"id": "run-1", "status": "completed"}
+        self.assertEqual(FlowRunListItem(**row).model_dump(exclude_unset=True), row)
+        with self.assertRaises(ValidationError):
+            FlowRunResponse(**row)
+
+if __name__ == "__main__":
+    unittest.main()
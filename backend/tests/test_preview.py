@@ -0,0 +1,141 @@
+import unittest
+import asyncio
+import gzip
+import os
+import tempfile
+
+import httpx
+from fastapi import FastAPI
+
+from core.preview import PreviewShell, PrecompressedStaticFiles, IMMUTABLE_CACHE_CONTROL, _HASHED_NAME_RE
+
+ASSETS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "previewApp", "assets")
+
+class TestPreviewShell(unittest.TestCase):
+    """Test cases for the PreviewShell class"""
+
+    def setUp(self):
+        self.index = tempfile.NamedTemporaryFile("w", suffix=".html", delete=False)
+        self.index.write("<html><head><title>Preview</title></head><body></body></html>")
+        self.index.close()
+        self.original = (PreviewShell.path, PreviewShell._parts)
+        PreviewShell.path = self.index.name
+        PreviewShell._parts = None
+
+    def tearDown(self):
+        PreviewShell.path, PreviewShell._parts = self.original
+        os.remove(self.index.name)
+
+    def test_project_id_injected_before_head_end(self):
+        html = PreviewShell.render("abc-123").decode("utf-8")
+        self.assertEqual(
+            html,
+            '<html><head><title>Preview</title><script>window.PROJECT_ID = "abc-123";</script>'
+            '</head><body></body></html>'
+        )
+
+    def test_project_id_is_escaped(self):
+        html = PreviewShell.render('"</script><script>alert(1)</script>').decode("utf-8")
+        self.assertEqual(html.count("</script>"), 1)
+        self.assertIn('\\"\\u003c/script>', html)
+
+    def test_shell_is_read_once(self):
+        PreviewShell.render("a")
+        os.remove(self.index.name)
+        self.assertIn(b"window.PROJECT_ID", PreviewShell.render("b"))
+        # Recreate the file for tearDown
+        open(self.index.name, "w").close()
+
+class TestPrecompressedStaticFiles(unittest.TestCase):
+    """Test cases for the PrecompressedStaticFiles class"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.bundle = ("console.log('preview');\n" * 200).encode("utf-8")
+        for name, content in {"index-D077x2X2.js": self.bundle, "vite.svg": b"<svg/>"}.items():
+            with open(os.path.join(self.directory.name, name), "wb") as f:
+                f.write(content)
+
+        self.static_files = PrecompressedStaticFiles(directory=self.directory.name)
+        self.static_files.precompress()
+        self.app = FastAPI()
+        self.app.mount("/assets", self.static_files)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _get(self, path, headers):
+        async def request():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get(path, headers=headers)
+        return asyncio.run(request())
+
+    def test_gzip_variant_of_hashed_bundle(self):
+        response = self._get("/assets/index-D077x2X2.js", {"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["cache-control"], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+        self.assertIn("javascript", response.headers["content-type"])
+        # httpx decodes the body
+        self.assertEqual(response.content, self.bundle)
+        self.assertLess(len(self.static_files._variants[os.path.realpath(
+            os.path.join(self.directory.name, "index-D077x2X2.js"))]["gzip"]), len(self.bundle))
+
+    def test_identity_when_compression_not_accepted(self):
+        response = self._get("/assets/index-D077x2X2.js", {"Accept-Encoding": "gzip;q=0"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, self.bundle)
+
+    def test_unhashed_asset_is_revalidated(self):
+        response = self._get("/assets/vite.svg", {"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_not_modified(self):
+        etag = self._get("/assets/index-D077x2X2.js", {}).headers["etag"]
+        response = self._get("/assets/index-D077x2X2.js", {"If-None-Match": etag, "Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["cache-control"], IMMUTABLE_CACHE_CONTROL)
+
+    def test_each_encoding_has_its_own_etag(self):
+        identity = self._get("/assets/index-D077x2X2.js", {"Accept-Encoding": "identity"}).headers["etag"]
+        encoded = self._get("/assets/index-D077x2X2.js", {"Accept-Encoding": "gzip"}).headers["etag"]
+        self.assertEqual(encoded, identity[:-1] + '-gzip"')
+
+        response = self._get("/assets/index-D077x2X2.js", {"If-None-Match": encoded, "Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], encoded)
+        # A cached gzip representation does not validate the identity one
+        response = self._get("/assets/index-D077x2X2.js", {"If-None-Match": encoded, "Accept-Encoding": "identity"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.bundle)
+
+    def test_shipped_bundles_are_immutable(self):
+        names = os.listdir(ASSETS_DIRECTORY)
+        bundles = [name for name in names if name.endswith((".js", ".css"))]
+        self.assertTrue(bundles)
+        for name in bundles:
+            self.assertIsNotNone(_HASHED_NAME_RE.search(name), name)
+
+        app = FastAPI()
+        app.mount("/assets", PrecompressedStaticFiles(directory=ASSETS_DIRECTORY))
+        self.app = app
+        for name in bundles:
+            self.assertEqual(self._get(f"/assets/{name}", {}).headers["cache-control"], IMMUTABLE_CACHE_CONTROL, name)
+
+    def test_unhashed_names(self):
+        for name in ("vite.svg", "my-component.js", "index-abcdefgh.js", "favicon.ico"):
+            self.assertIsNone(_HASHED_NAME_RE.search(name), name)
+
+    def test_prebuilt_variant_is_used(self):
+        prebuilt = gzip.compress(self.bundle, compresslevel=1)
+        with open(os.path.join(self.directory.name, "index-D077x2X2.js.gz"), "wb") as f:
+            f.write(prebuilt)
+        self.static_files.precompress()
+        variants = self.static_files._variants[os.path.realpath(os.path.join(self.directory.name, "index-D077x2X2.js"))]
+        self.assertEqual(variants["gzip"], prebuilt)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from core.template_renderer import TemplateRenderer
+from core.token_budget import PromptBudget
+from core.llm_usage import LLMUsage, UsageTrackingClient, parse_usage
+from core.step_executor import StepExecutor
+
+TEMPLATE = "Update the page.\nPage: {{ page | json }}"
+ONE_SHOT = {"input": {}, "output": {"id": "example", "zones": []}}
+
+class FakeCompletions:
+    def __init__(self, cached_tokens):
+        self.cached_tokens = cached_tokens
+
+    async def create(self, **kwargs):
+        usage = SimpleNamespace(
+            prompt_tokens=1200,
+            completion_tokens=50,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=self.cached_tokens)
+        )
+        return SimpleNamespace(usage=usage, messages=kwargs["messages"])
+
+class FakeModel:
+    def __init__(self, cached_tokens):
+        self.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(cached_tokens)), api_key="k")
+
+class TestPromptLayout(unittest.TestCase):
+    """Test cases for the prompt layouts and the cached token accounting"""
+
+    def test_legacy_layout_is_unchanged(self):
+        prompt, error = TemplateRenderer.build_full_prompt(TEMPLATE, {"page": {"id": "p1"}}, "System", ONE_SHOT, layout="legacy")
+        self.assertIsNone(error)
+        self.assertTrue(prompt.startswith("System\n\nUpdate the page."))
+        self.assertTrue(prompt.endswith('One-Shot Example:\n\n{\n  "id": "example",\n  "zones": []\n}\n\n'))
+
+    def test_prefix_stable_layout(self):
+        first, _ = TemplateRenderer.build_full_prompt(TEMPLATE, {"page": {"id": "p1"}}, "System", ONE_SHOT, layout="prefix_stable")
+        second, _ = TemplateRenderer.build_full_prompt(TEMPLATE, {"page": {"id": "p2"}}, "System", ONE_SHOT, layout="prefix_stable")
+
+        # The system message, the one-shot example and the static start of the
+        # template form the common prefix
+        prefix = first[:next(i for i, (a, b) in enumerate(zip(first, second)) if a != b)]
+        self.assertTrue(prefix.startswith("System\n\nOne-Shot Example:"))
+        self.assertIn("Update the page.\nPage:", prefix)
+        self.assertTrue(first.endswith('"p1"\n}'))
+
+    def test_default_and_invalid_layout(self):
+        with mock.patch.object(TemplateRenderer, "default_layout", "prefix_stable"):
+            prompt, _, _ = PromptBudget.build(TEMPLATE, {"page": {}}, "System", ONE_SHOT)
+        self.assertTrue(prompt.startswith("System\n\nOne-Shot Example:"))
+        with self.assertRaises(ValueError):
+            TemplateRenderer.build_full_prompt(TEMPLATE, {"page": {}}, "System", layout="random")
+
+    def test_parse_usage(self):
+        usage = {"prompt_tokens": 10, "completion_tokens": 2, "prompt_tokens_details": {"cached_tokens": 8}}
+        self.assertEqual(parse_usage(usage), {"prompt_tokens": 10, "completion_tokens": 2, "cached_prompt_tokens": 8})
+        self.assertEqual(parse_usage({"prompt_tokens": 10})["cached_prompt_tokens"], 0)
+
+    def test_structured_generation_records_usage(self):
+        model = LLMUsage.instrument(FakeModel(cached_tokens=1024))
+        self.assertIsInstance(model.client, UsageTrackingClient)
+        self.assertEqual(model.client.api_key, "k")
+        # Instrumenting twice does not wrap the client again
+        client = model.client
+        self.assertIs(LLMUsage.instrument(model).client, client)
+
+        def generate_json(openai_model, schema):
+            # Outlines runs the API call on a new event loop in the worker thread
+            return lambda prompt: asyncio.new_event_loop().run_until_complete(
+                openai_model.client.chat.completions.create(messages=[{"role": "user", "content": prompt}])
+            ) and {"ok": True}
+
+        async def run():
+            with LLMUsage.track() as usage:
+                result = await StepExecutor.run_structured_generation(model, "prompt", {})
+                await StepExecutor.run_structured_generation(model, "prompt", {})
+            return result, usage
+
+        with mock.patch("core.step_executor.generate_json", side_effect=generate_json):
+            result, usage = asyncio.run(run())
+
+        self.assertEqual(result, {"ok": True})
+        # The fake model has no price, so the calls add no cost
+        self.assertEqual(
+            usage,
+            {"calls": 2, "prompt_tokens": 2400, "completion_tokens": 100, "cached_prompt_tokens": 2048, "cost_usd": 0.0}
+        )
+
+if __name__ == "__main__":
+    unittest.main()
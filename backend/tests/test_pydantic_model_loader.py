@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+from models.pydantic.base import PydanticModelLoader
+
+MODEL_SOURCE = '''
+from pydantic import BaseModel
+
+class Decision(BaseModel):
+    {field}: str
+'''
+
+class TestPydanticModelLoader(unittest.TestCase):
+    """Test cases for the cached Pydantic model loading"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "decision.py")
+        self.write("action")
+
+    def tearDown(self):
+        for key in [key for key in PydanticModelLoader._models if key[0] == self.path]:
+            sys.modules.pop(PydanticModelLoader._models.pop(key)["module_name"], None)
+        self.directory.cleanup()
+
+    def write(self, field, mtime_ns=None):
+        with open(self.path, "w") as file:
+            file.write(MODEL_SOURCE.format(field=field))
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_class_and_schema_are_cached(self):
+        model_class = PydanticModelLoader.get_model_class(self.path, "Decision")
+        self.assertIs(PydanticModelLoader.get_model_class(self.path, "Decision"), model_class)
+
+        schema = PydanticModelLoader.get_json_schema(model_class)
+        self.assertEqual(list(schema["properties"]), ["action"])
+        self.assertIs(PydanticModelLoader.get_json_schema(model_class), schema)
+
+    def test_reload_on_change(self):
+        self.write("action", mtime_ns=1_000_000_000)
+        old_class = PydanticModelLoader.get_model_class(self.path, "Decision")
+        old_module = old_class.__module__
+
+        self.write("target", mtime_ns=2_000_000_000)
+        new_class = PydanticModelLoader.get_model_class(self.path, "Decision")
+
+        self.assertIsNot(new_class, old_class)
+        self.assertEqual(list(PydanticModelLoader.get_json_schema(new_class)["properties"]), ["target"])
+        # Every version gets a module name of its own, the replaced one is dropped
+        self.assertNotEqual(new_class.__module__, old_module)
+        self.assertIn(new_class.__module__, sys.modules)
+        self.assertNotIn(old_module, sys.modules)
+
+    def test_touch_without_change_keeps_the_class(self):
+        self.write("action", mtime_ns=1_000_000_000)
+        model_class = PydanticModelLoader.get_model_class(self.path, "Decision")
+        os.utime(self.path, ns=(3_000_000_000, 3_000_000_000))
+        self.assertIs(PydanticModelLoader.get_model_class(self.path, "Decision"), model_class)
+
+    def test_broken_version_keeps_the_previous_class(self):
+        self.write("action", mtime_ns=1_000_000_000)
+        model_class = PydanticModelLoader.get_model_class(self.path, "Decision")
+        with open(self.path, "w") as file:
+            file.write("class Decision(:\n")
+        os.utime(self.path, ns=(2_000_000_000, 2_000_000_000))
+
+        with self.assertLogs("models.pydantic.base", level="WARNING"):
+            self.assertIs(PydanticModelLoader.get_model_class(self.path, "Decision"), model_class)
+
+    def test_missing_file_or_class(self):
+        with self.assertLogs("models.pydantic.base", level="ERROR"):
+            self.assertIsNone(PydanticModelLoader.get_model_class(self.path, "Missing"))
+        with self.assertLogs("models.pydantic.base", level="ERROR"):
+            self.assertIsNone(PydanticModelLoader.get_model_class(self.path + ".missing", "Decision"))
+
+    def test_concurrent_loads_execute_the_file_once(self):
+        classes = []
+        threads = [
+            threading.Thread(target=lambda: classes.append(PydanticModelLoader.get_model_class(self.path, "Decision")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(model_class) for model_class in classes}), 1)
+
+    def test_load_model_class_uses_unique_module_names(self):
+        first = PydanticModelLoader.load_model_class(self.path, "Decision")
+        second = PydanticModelLoader.load_model_class(self.path, "Decision")
+        self.assertIsNot(first, second)
+        self.assertNotEqual(first.__module__, second.__module__)
+        for model_class in (first, second):
+            sys.modules.pop(model_class.__module__, None)
+
+if __name__ == "__main__":
+    unittest.main()
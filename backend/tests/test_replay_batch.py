@@ -0,0 +1,116 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from core.replay_engine import ReplayEngine, diff_outputs
+from core.llm_cache import LLMResponseCache
+from core.llm_usage import LLMUsage
+from core.step_executor import StepExecutor
+
+class TestReplayBatch(unittest.TestCase):
+    """Test cases for batch replays and the LLM response cache"""
+
+    def tearDown(self):
+        LLMResponseCache.clear()
+
+    def test_diff_outputs(self):
+        before = {"id": "p1", "zones": [{"name": "main"}], "title": "Old"}
+        after = {"id": "p1", "zones": [{"name": "main"}, {"name": "side"}], "subtitle": "New"}
+        self.assertEqual(diff_outputs(before, after), [
+            {"path": "$.zones[1]", "change": "added"},
+            {"path": "$.title", "change": "removed", "before": "Old"},
+            {"path": "$.subtitle", "change": "added", "after": "New"},
+        ])
+        self.assertEqual(diff_outputs(before, before), [])
+        self.assertEqual(len(diff_outputs({"a": list(range(50))}, {"a": list(range(1, 51))}, limit=5)), 5)
+
+    def test_replay_batch_compares_variants(self):
+        running = 0
+        peak = 0
+
+        async def replay_step(step_run_id, modified_prompt=None, modified_schema=None, modified_model=None, use_cache=False, dry_run=True):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            LLMUsage.add([{"prompt_tokens": 100, "completion_tokens": 10, "cached_prompt_tokens": 0}])
+            output = {"answer": modified_prompt or "original"}
+            return {"status": "success", "replay_run_id": f"r-{step_run_id}", "duration": 0.01,
+                    "output_data": output, "original_output_data": {"answer": "original"},
+                    "estimated_prompt_tokens": 90}
+
+        variants = [{"name": "baseline"}, {"name": "short", "prompt_template": "short"}]
+        with mock.patch.object(ReplayEngine, "replay_step", side_effect=replay_step):
+            report = asyncio.run(ReplayEngine.replay_batch(["a", "b", "c"], variants, concurrency=2))
+
+        self.assertEqual(len(report["results"]), 6)
+        self.assertLessEqual(peak, 2)
+        summary = {item["variant"]: item for item in report["summary"]}
+        self.assertEqual(summary["baseline"]["changed"], 0)
+        self.assertEqual(summary["short"]["changed"], 3)
+        self.assertEqual(summary["short"]["prompt_tokens"], 300)
+        self.assertEqual(summary["short"]["estimated_prompt_tokens"], 270)
+        row = next(row for row in report["results"] if row["variant"] == "short")
+        self.assertEqual(row["differences"], [{"path": "$.answer", "change": "changed", "before": "original", "after": "short"}])
+
+    def test_replay_runs_through_step_pipeline(self):
+        step = {"id": "s1", "name": "plan", "step_type": "ai_single", "input_map": {}, "system_message": "System",
+                "prompt_template_id": "p", "output_schema_id": "o"}
+        step_run = {"step_id": "s1", "flow_id": "f1", "flow_run_id": "fr1", "project_id": "pr1", "step_name": "plan",
+                    "input_data": {"x": 1}, "output_data": {"answer": "old"}}
+        prompts = []
+
+        async def execute_ai_single(step, input_data, overrides=None):
+            prompts.append(overrides["prompt_template"])
+            return "success", {"answer": "new"}, "rendered", 12
+
+        async def run(dry_run):
+            with mock.patch.object(ReplayEngine, "get_step_run_details", mock.AsyncMock(return_value=step_run)), \
+                 mock.patch("core.replay_engine.FlowRegistry.get_steps_by_flow_id", mock.AsyncMock(return_value=[step])), \
+                 mock.patch.object(StepExecutor, "create_step_run", mock.AsyncMock(return_value="replay1")), \
+                 mock.patch.object(StepExecutor, "update_step_run", mock.AsyncMock()) as update, \
+                 mock.patch.object(StepExecutor, "execute_ai_single", side_effect=execute_ai_single), \
+                 mock.patch("core.step_executor.dispatch_message", mock.AsyncMock()) as dispatch:
+                result = await ReplayEngine.replay_step("sr1", modified_prompt="New {{ x }}", dry_run=dry_run)
+            return result, update, dispatch
+
+        result, update, dispatch = asyncio.run(run(dry_run=True))
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["replay_run_id"], "replay1")
+        self.assertEqual(result["estimated_prompt_tokens"], 12)
+        self.assertEqual(result["original_output_data"], {"answer": "old"})
+        self.assertEqual(prompts, ["New {{ x }}"])
+        self.assertEqual(update.call_args.kwargs["output_data"], {"answer": "new"})
+        dispatch.assert_not_called()
+
+        _, _, dispatch = asyncio.run(run(dry_run=False))
+        self.assertEqual(dispatch.call_count, 2)
+        self.assertEqual(dispatch.call_args.kwargs["project_id"], "pr1")
+
+    def test_structured_generation_cache(self):
+        calls = []
+
+        def generate_json(openai_model, schema):
+            def generator(prompt):
+                calls.append(prompt)
+                return {"n": len(calls)}
+            return generator
+
+        async def run():
+            first = await StepExecutor.run_structured_generation(None, "prompt", {"type": "object"}, use_cache=True)
+            second = await StepExecutor.run_structured_generation(None, "prompt", {"type": "object"}, use_cache=True)
+            other = await StepExecutor.run_structured_generation(None, "other", {"type": "object"}, use_cache=True)
+            uncached = await StepExecutor.run_structured_generation(None, "prompt", {"type": "object"}, use_cache=False)
+            return first, second, other, uncached
+
+        with mock.patch("core.step_executor.generate_json", side_effect=generate_json):
+            first, second, other, uncached = asyncio.run(run())
+
+        self.assertEqual((first, second, other, uncached), ({"n": 1}, {"n": 1}, {"n": 2}, {"n": 3}))
+        # Cached results are copies
+        second["n"] = 10
+        self.assertEqual(LLMResponseCache.get(LLMResponseCache.key(None, "prompt", [{"type": "object"}, None]))[1], {"n": 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from core.template_renderer import TemplateRenderer
+from core.token_budget import PromptBudget, count_tokens, prune_unused, summarize_loop_outputs
+
+APP_CONFIG = {
+    "app": {"name": "CRM", "version": 3},
+    "entities": [{"id": f"entity{i}", "fields": [{"name": "title", "type": "string", "description": ""}]} for i in range(20)],
+    "pages": [{"id": f"page{i}", "zones": []} for i in range(20)],
+}
+
+class TestPromptBudget(unittest.TestCase):
+    """Test cases for prompt compaction with PromptBudget"""
+
+    def test_count_tokens(self):
+        self.assertGreater(count_tokens("word " * 100), count_tokens("word " * 10))
+
+    def test_no_budget_keeps_prompt(self):
+        template = "Entities: {{ app_config.entities | json }}"
+        prompt, error, tokens = PromptBudget.build(template, {"app_config": APP_CONFIG}, "System", token_budget=0)
+        expected, _ = TemplateRenderer.build_full_prompt(template, {"app_config": APP_CONFIG}, "System")
+        self.assertIsNone(error)
+        self.assertEqual(prompt, expected)
+        self.assertEqual(tokens, count_tokens(expected))
+
+    def test_compact_json_first(self):
+        template = "Entities: {{ app_config.entities | json }}"
+        full, _, full_tokens = PromptBudget.build(template, {"app_config": APP_CONFIG}, "System", token_budget=0)
+        with mock.patch.object(PromptBudget, "strategies", ["compact_json", "drop_empty"]):
+            prompt, _, tokens = PromptBudget.build(template, {"app_config": APP_CONFIG}, "System", token_budget=full_tokens - 1)
+
+        self.assertLess(tokens, full_tokens)
+        self.assertEqual(tokens, count_tokens(prompt))
+        self.assertIn('"id":"entity0"', prompt)
+
+    def test_strategies_stop_when_prompt_fits(self):
+        template = "{{ app_config.entities | json }}"
+        one_shot = {"input": {}, "output": {"example": "x" * 400}}
+        with mock.patch.object(PromptBudget, "strategies", ["compact_json", "drop_one_shot"]):
+            prompt, _, _ = PromptBudget.build(template, {"app_config": APP_CONFIG}, "System", one_shot, token_budget=100000)
+            self.assertIn("One-Shot Example", prompt)
+            prompt, _, _ = PromptBudget.build(template, {"app_config": APP_CONFIG}, "System", one_shot, token_budget=10)
+            self.assertNotIn("One-Shot Example", prompt)
+
+    def test_prune_unused(self):
+        state = {
+            "template_text": "{{ app_config.app.name }} {% for e in app_config.entities %}{{ e.id }}{% endfor %}",
+            "input_data": {"app_config": APP_CONFIG, "unused": [1, 2, 3]},
+            "one_shot_example": None,
+            "compact": False,
+        }
+        self.assertTrue(prune_unused(state))
+        self.assertEqual(set(state["input_data"]), {"app_config"})
+        self.assertEqual(set(state["input_data"]["app_config"]), {"app", "entities"})
+        self.assertEqual(state["input_data"]["app_config"]["app"], {"name": "CRM"})
+        self.assertFalse(prune_unused(state))
+
+    def test_prune_keeps_values_used_whole(self):
+        for template in (
+            "{{ app_config | json }}",
+            "{{ app_config.items() }}",
+            "{% set app_config = other %}{{ app_config.app }}",
+            "{% include 'x' %}{{ app_config.app }}",
+        ):
+            state = {"template_text": template, "input_data": {"app_config": APP_CONFIG, "other": {}},
+                     "one_shot_example": None, "compact": False}
+            prune_unused(state)
+            self.assertEqual(state["input_data"]["app_config"], APP_CONFIG, template)
+
+    def test_summarize_loop_outputs(self):
+        outputs = [{"id": f"page{i}", "zones": [{"name": "main"}], "meta": {"title": "T", "tags": ["a"]}} for i in range(3)]
+        state = {"template_text": "", "input_data": {"previous_loop_outputs": outputs}, "one_shot_example": None, "compact": False}
+
+        self.assertTrue(summarize_loop_outputs(state))
+        summarized = state["input_data"]["previous_loop_outputs"]
+        self.assertEqual(summarized[0], {"id": "page0", "meta": {"title": "T"}})
+        self.assertEqual(summarized[-1], outputs[-1])
+        # The original input is not modified
+        self.assertIn("zones", outputs[0])
+
+    def test_template_is_compiled_once(self):
+        template = "Hello {{ name }} #compile-cache-test"
+        TemplateRenderer.render_template(template, {"name": "a"})
+        hits = TemplateRenderer._compile.cache_info().hits
+        self.assertEqual(TemplateRenderer.render_template(template, {"name": "b"}), "Hello b #compile-cache-test")
+        self.assertEqual(TemplateRenderer._compile.cache_info().hits, hits + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import asyncio
+
+from core.tool_call_module import ToolCallModule
+from benchmarks.app_configs import edit_app, generate_app
+from benchmarks.tool_calls import TOOLS, build_inputs, fit_exponent
+
+class TestSyntheticAppConfigs(unittest.TestCase):
+    """Test cases for the synthetic app configs of the tool benchmarks"""
+
+    def test_generated_sizes(self):
+        app = generate_app(entities=6, fields=5, pages=4, zones=2, rows=7, components=3)
+        self.assertEqual(len(app["entities"]), 6)
+        self.assertTrue(all(len(entity["fields"]) == 5 for entity in app["entities"]))
+        self.assertTrue(all(len(asset["dataRows"]) == 7 for asset in app["entityAssets"]))
+        self.assertEqual(len(app["pageDetails"]), 4)
+        self.assertTrue(all(len(zone["components"]) == 3 for page in app["pageDetails"] for zone in page["zones"]))
+        # References point to earlier entities only
+        names = [entity["entityName"] for entity in app["entities"]]
+        for index, entity in enumerate(app["entities"]):
+            for field in entity["fields"]:
+                if field.get("reference"):
+                    self.assertIn(field["reference"], names[:index])
+        self.assertEqual(generate_app(entities=6, fields=5, pages=4, zones=2, rows=7), generate_app(
+            entities=6, fields=5, pages=4, zones=2, rows=7
+        ))
+
+    def test_edit_plan(self):
+        app = generate_app(entities=8, pages=4)
+        updated, plan = edit_app(app, 0.25)
+        self.assertEqual(plan["entities"], [
+            {"id": "Entity1", "action": "edit"},
+            {"id": "Entity5", "action": "edit"},
+            {"id": "Entity1_new1", "action": "add"},
+            {"id": "Entity5_new2", "action": "add"},
+        ])
+        self.assertEqual([page["id"] for page in updated["pageDetails"]], [edit["id"] for edit in plan["pages"]])
+
+    def test_tools_run_without_warnings(self):
+        app = generate_app(entities=8, pages=4)
+
+        async def run():
+            inputs = await build_inputs(app)
+            return {tool: await ToolCallModule.execute_tool(tool, inputs[tool]) for tool in TOOLS}
+
+        with self.assertNoLogs("core.tool_call_module", level="WARNING"):
+            results = asyncio.run(run())
+        self.assertEqual(len(results["finalize_config_output"]["final_app_config"]["resources"]), 8)
+        # 2 edited and 2 added entities
+        self.assertEqual(len(results["merge_entities"]["merged_entities"]), 10)
+        self.assertNotIn("validation_errors", results["validate_and_merge"])
+        self.assertEqual(len(results["merge_config_outputs"]["final_app_config"]["pages"]), 5)
+
+    def test_fit_exponent(self):
+        self.assertAlmostEqual(fit_exponent([1, 2, 4, 8], [3, 12, 48, 192]), 2.0)
+        self.assertAlmostEqual(fit_exponent([1, 10], [0.5, 5]), 1.0)
+        self.assertIsNone(fit_exponent([4], [1.0]))
+
+class TestMergeEntities(unittest.TestCase):
+    def test_merged_entities_are_resources(self):
+        result = asyncio.run(ToolCallModule.merge_entities({
+            "oldEntities": {"Customer": {"fields": {"name": {"type": "text", "required": True}}}},
+            "updatedEntities": [{"id": "Order", "fields": [{"fieldName": "customer", "type": "reference", "reference": "Customer"}]}],
+            "editPlanEntities": [{"id": "Order", "action": "add"}],
+        }))
+        self.assertEqual(result["merged_entities"], {
+            "Customer": {"fields": {"name": {"type": "text", "required": True}}},
+            "Order": {"fields": {"customer": {"type": "reference", "required": False, "reference": "Customer"}}},
+        })
+
+if __name__ == "__main__":
+    unittest.main()
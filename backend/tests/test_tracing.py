@@ -0,0 +1,150 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+from unittest import mock
+
+from core.tracing import Tracer
+from core.step_executor import StepExecutor
+
+class FakeDatabase:
+    async def execute(self, query, values=None):
+        return 1
+
+    async def execute_many(self, query, values):
+        return None
+
+    async def fetch_all(self, query, values=None):
+        return []
+
+    async def fetch_one(self, query, values=None):
+        return None
+
+    async def fetch_val(self, query, values=None):
+        return 0
+
+class TestTracing(unittest.TestCase):
+    """Test cases for spans, exporters and the step instrumentation"""
+
+    def setUp(self):
+        Tracer.clear()
+
+    def tearDown(self):
+        Tracer.clear()
+
+    def test_nested_spans_share_the_trace(self):
+        with Tracer.span("outer", project_id="p") as outer:
+            with Tracer.span("inner") as inner:
+                Tracer.set_attribute("tokens", 3)
+            self.assertEqual(Tracer.current_trace_id(), outer.trace_id)
+        self.assertIsNone(Tracer.current_span())
+
+        self.assertEqual(len(outer.trace_id), 32)
+        self.assertEqual(len(outer.span_id), 16)
+        self.assertEqual(inner.trace_id, outer.trace_id)
+        self.assertEqual(inner.parent_id, outer.span_id)
+
+        spans = Tracer.get_trace(outer.trace_id)
+        self.assertEqual([span["name"] for span in spans], ["outer", "inner"])
+        self.assertNotIn("parentSpanId", spans[0])
+        self.assertEqual(spans[1]["parentSpanId"], outer.span_id)
+        self.assertIn({"key": "tokens", "value": {"intValue": "3"}}, spans[1]["attributes"])
+
+        # A new root span starts a new trace
+        with Tracer.span("other") as other:
+            pass
+        self.assertNotEqual(other.trace_id, outer.trace_id)
+
+    def test_error_status(self):
+        with self.assertRaises(ValueError):
+            with Tracer.span("failing") as span:
+                raise ValueError("boom")
+        exported = Tracer.get_trace(span.trace_id)[0]
+        self.assertEqual(exported["status"], {"code": "STATUS_CODE_ERROR", "message": "boom"})
+
+    def test_concurrent_tasks_keep_their_parent(self):
+        async def child(name):
+            with Tracer.span(name) as span:
+                await asyncio.sleep(0)
+                return span
+
+        async def run():
+            with Tracer.span("root") as root:
+                children = await asyncio.gather(child("a"), child("b"))
+            return root, children
+
+        root, children = asyncio.run(run())
+        self.assertEqual({span.parent_id for span in children}, {root.span_id})
+
+    def test_file_exporter(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            with mock.patch.object(Tracer, "exporters", ["file"]), mock.patch.object(Tracer, "file_path", path):
+                with Tracer.span("outer"):
+                    with Tracer.span("inner"):
+                        pass
+            with open(path) as file:
+                spans = [json.loads(line) for line in file]
+        # Spans are written as they finish
+        self.assertEqual([span["name"] for span in spans], ["inner", "outer"])
+        self.assertEqual(spans[0]["traceId"], spans[1]["traceId"])
+        # Nothing was kept in memory
+        self.assertEqual(Tracer.get_trace(spans[0]["traceId"]), [])
+
+    def test_disabled(self):
+        with mock.patch.object(Tracer, "enabled", False):
+            with Tracer.span("ignored") as span:
+                self.assertIsNone(span)
+                self.assertIsNone(Tracer.current_trace_id())
+
+    def test_database_queries_inside_a_trace(self):
+        database = FakeDatabase()
+        Tracer.instrument_database(database)
+
+        async def run():
+            # Queries outside of a trace do not start one
+            await database.execute("UPDATE step_runs SET status = 'x'")
+            with Tracer.span("root") as root:
+                await database.fetch_all("SELECT * FROM flow_runs")
+            return root
+
+        root = asyncio.run(run())
+        spans = Tracer.get_trace(root.trace_id)
+        self.assertEqual([span["name"] for span in spans], ["root", "db.query"])
+        self.assertIn({"key": "statement", "value": {"stringValue": "select flow_runs"}}, spans[1]["attributes"])
+        self.assertEqual(len(Tracer._finished), 2)
+
+    def test_step_spans(self):
+        step = {
+            "id": "s",
+            "name": "Generate",
+            "step_type": "ai_single",
+            "input_map": {},
+            "system_message": "System",
+            "prompt_template_id": "p",
+            "output_schema_id": "o",
+        }
+        assets = {"prompt_template": "Hello", "output_schema": {}}
+
+        async def run():
+            with mock.patch("core.step_executor.PromptSchemaStore.get_step_assets", mock.AsyncMock(return_value=assets)), \
+                 mock.patch.object(StepExecutor, "init_openai_model", mock.AsyncMock(return_value=None)), \
+                 mock.patch("core.step_executor.generate_json", return_value=lambda prompt: {"ok": True}), \
+                 mock.patch.object(StepExecutor, "create_step_run", mock.AsyncMock(return_value="sr")), \
+                 mock.patch.object(StepExecutor, "update_step_run", mock.AsyncMock()):
+                with Tracer.span("flow.run") as root:
+                    result = await StepExecutor.run_step(step, "fr", None, {}, dry_run=True)
+            return root, result
+
+        root, result = asyncio.run(run())
+        self.assertEqual(result["status"], "success")
+        spans = {span["name"]: span for span in Tracer.get_trace(root.trace_id)}
+        self.assertEqual(set(spans), {"flow.run", "step.run", "step.assets", "prompt.build", "llm.generate"})
+        self.assertEqual(spans["step.run"]["parentSpanId"], root.span_id)
+        for name in ("step.assets", "prompt.build", "llm.generate"):
+            self.assertEqual(spans[name]["parentSpanId"], spans["step.run"]["spanId"], msg=name)
+        self.assertIn({"key": "status", "value": {"stringValue": "success"}}, spans["step.run"]["attributes"])
+
+if __name__ == "__main__":
+    unittest.main()
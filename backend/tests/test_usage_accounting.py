@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+from unittest import mock
+
+from core.llm_usage import LLMUsage
+from core.step_executor import StepExecutor
+
+STEP = {
+    "id": "s",
+    "name": "Generate",
+    "step_type": "ai_loop",
+    "loop_key": "items",
+    "input_map": {},
+    "system_message": "System",
+    "prompt_template_id": "p",
+    "output_schema_id": "o",
+}
+
+ASSETS = {"prompt_template": "{{ current_item }}", "output_schema": {}}
+
+class TestUsageAccounting(unittest.TestCase):
+    """Test cases for the pricing of LLM calls and the usage stored on step runs"""
+
+    def test_cost(self):
+        usage = {"prompt_tokens": 1_000_000, "completion_tokens": 100_000, "cached_prompt_tokens": 400_000}
+        with mock.patch.object(LLMUsage, "prices", {"m": (1.0, 0.25, 4.0), "m-mini": (0.5, 0.1, 2.0)}):
+            # 600k uncached + 400k cached prompt tokens and 100k completion tokens
+            self.assertAlmostEqual(LLMUsage.cost(usage, "m"), 0.6 + 0.1 + 0.4)
+            # The longest matching prefix sets the price
+            self.assertAlmostEqual(LLMUsage.cost(usage, "m-mini-2025-04-14"), 0.3 + 0.04 + 0.2)
+            self.assertIsNone(LLMUsage.cost(usage, "other"))
+            self.assertIsNone(LLMUsage.cost(usage, None))
+
+            with LLMUsage.track() as tracked:
+                LLMUsage.add([usage, usage], "m")
+                LLMUsage.add([usage], "other")
+        self.assertEqual(tracked["calls"], 3)
+        self.assertEqual(tracked["prompt_tokens"], 3_000_000)
+        self.assertAlmostEqual(tracked["cost_usd"], 2.2)
+
+    def _run_loop(self, generate):
+        update = mock.AsyncMock()
+
+        async def run():
+            with mock.patch("core.step_executor.PromptSchemaStore.get_step_assets", mock.AsyncMock(return_value=ASSETS)), \
+                 mock.patch.object(StepExecutor, "init_openai_model", mock.AsyncMock(return_value=None)), \
+                 mock.patch.object(StepExecutor, "run_structured_generation", side_effect=generate), \
+                 mock.patch.object(StepExecutor, "create_step_run", mock.AsyncMock(return_value="sr")), \
+                 mock.patch.object(StepExecutor, "update_step_run", update), \
+                 mock.patch.object(LLMUsage, "prices", {"m": (1.0, 0.5, 2.0)}):
+                return await StepExecutor.run_step(STEP, "fr", None, {}, input_data={"items": ["a", "b"]}, dry_run=True)
+
+        result = asyncio.run(run())
+        return result, update.call_args
+
+    def test_step_run_usage(self):
+        async def generate(openai_model, prompt, schema_json, pydantic_model_class=None, use_cache=None, schema_id=None):
+            LLMUsage.add([{"prompt_tokens": 1000, "completion_tokens": 100, "cached_prompt_tokens": 500}], "m")
+            return {"ok": True}
+
+        result, final_update = self._run_loop(generate)
+        self.assertEqual(result["status"], "success")
+        usage = final_update.kwargs["usage"]
+        self.assertEqual(usage["calls"], 2)
+        self.assertEqual(usage["prompt_tokens"], 2000)
+        self.assertEqual(usage["completion_tokens"], 200)
+        self.assertEqual(usage["cached_prompt_tokens"], 1000)
+        self.assertAlmostEqual(usage["cost_usd"], 2 * (500 * 1.0 + 500 * 0.5 + 100 * 2.0) / 1_000_000)
+
+    def test_failed_step_keeps_usage(self):
+        calls = []
+
+        async def generate(openai_model, prompt, schema_json, pydantic_model_class=None, use_cache=None, schema_id=None):
+            calls.append(prompt)
+            LLMUsage.add([{"prompt_tokens": 1000, "completion_tokens": 100, "cached_prompt_tokens": 0}], "m")
+            if len(calls) == 2:
+                raise RuntimeError("invalid output")
+            return {"ok": True}
+
+        result, final_update = self._run_loop(generate)
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(final_update.args[1], "error")
+        # Both calls were paid for, including the one that failed the step
+        self.assertEqual(final_update.kwargs["usage"]["calls"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
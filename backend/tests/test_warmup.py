@@ -0,0 +1,106 @@
+import unittest
+import asyncio
+import os
+from unittest import mock
+
+from pydantic import BaseModel
+
+from core.warmup import Warmup
+from core.flow_registry import FlowRegistry
+from core.prompt_schema_store import PromptSchemaStore
+from core.template_renderer import TemplateRenderer
+
+class Decision(BaseModel):
+    action: str
+
+FLOW = {"id": "f1", "name": "main_agent_flow", "start_message": "Starting {{ flow_name }} warm", "complete_message": None}
+STEPS = [
+    {
+        "id": "s1",
+        "name": "decide",
+        "step_type": "ai_single",
+        "prompt_template_id": "p1",
+        "output_schema_id": "o1",
+        "pydantic_schema_id": "ps1",
+        "start_message": "Deciding {{ step_name }} warm",
+        "complete_message": None,
+    },
+    {"id": "s2", "name": "merge", "step_type": "tool_call", "prompt_template_id": None, "output_schema_id": None},
+]
+ASSETS = {
+    "prompt_template": "Request: {{ user_request }} warm",
+    "output_schema": Decision.model_json_schema(),
+    "pydantic_model_class": Decision,
+}
+
+class TestWarmup(unittest.TestCase):
+    """Test cases for the startup warm-up"""
+
+    def setUp(self):
+        self.original = (Warmup.state, Warmup.report, Warmup.enabled)
+
+    def tearDown(self):
+        Warmup.state, Warmup.report, Warmup.enabled = self.original
+
+    def run_warmup(self, flows=None, **patches):
+        flows = flows or mock.AsyncMock(return_value=[FLOW])
+        with mock.patch.object(FlowRegistry, "get_all_flows", flows), \
+             mock.patch.object(FlowRegistry, "get_flow_by_id", mock.AsyncMock(return_value=FLOW)) as by_id, \
+             mock.patch.object(FlowRegistry, "get_flow_by_name", mock.AsyncMock(return_value=FLOW)) as by_name, \
+             mock.patch.object(FlowRegistry, "get_steps_by_flow_id", mock.AsyncMock(return_value=STEPS)), \
+             mock.patch.object(PromptSchemaStore, "preload_step_assets", mock.AsyncMock()) as preload, \
+             mock.patch.object(PromptSchemaStore, "get_step_assets", mock.AsyncMock(**patches)) as get_assets, \
+             mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            report = asyncio.run(Warmup.run())
+        return report, by_id, by_name, preload, get_assets
+
+    def test_warmup_loads_the_caches(self):
+        report, by_id, by_name, preload, get_assets = self.run_warmup(return_value=ASSETS)
+
+        self.assertEqual(Warmup.state, "complete")
+        self.assertTrue(Warmup.ready())
+        by_id.assert_awaited_once_with("f1")
+        by_name.assert_awaited_once_with("main_agent_flow")
+        # Only the AI step has assets
+        preload.assert_awaited_once_with([dict(STEPS[0], flow=FLOW)])
+        get_assets.assert_awaited_once_with(prompt_id="p1", schema_id="o1", one_shot_id=None, pydantic_schema_id="ps1")
+        self.assertEqual((report["flows"], report["steps"], report["pydantic_models"]), (1, 2, 1))
+        self.assertEqual(report["errors"], [])
+        self.assertEqual(set(report["phases"]), {"flows", "assets", "templates", "tokenizer", "model"})
+
+        # The templates are compiled
+        hits = TemplateRenderer._compile.cache_info().hits
+        TemplateRenderer._compile("Request: {{ user_request }} warm")
+        TemplateRenderer._compile("Deciding {{ step_name }} warm")
+        self.assertEqual(TemplateRenderer._compile.cache_info().hits, hits + 2)
+
+    def test_errors_do_not_stop_the_warmup(self):
+        report, *_ = self.run_warmup(side_effect=ValueError("Prompt with ID p1 not found"))
+        self.assertEqual(Warmup.state, "complete")
+        self.assertEqual(report["errors"], ["assets of step decide: Prompt with ID p1 not found"])
+        self.assertIn("tokenizer", report["phases"])
+
+    def test_unreachable_database_fails_the_warmup(self):
+        flows = mock.AsyncMock(side_effect=ConnectionError("database is unreachable"))
+        report, *_ = self.run_warmup(flows=flows, return_value=ASSETS)
+
+        self.assertEqual(Warmup.state, "failed")
+        self.assertFalse(Warmup.ready())
+        self.assertEqual(Warmup.status(), "warmup_failed")
+        self.assertEqual(report["failed_phases"], ["flows"])
+        self.assertEqual(report["errors"], ["flows: database is unreachable"])
+
+        # The next warm-up (started again by GET /ready) can succeed
+        self.run_warmup(return_value=ASSETS)
+        self.assertEqual(Warmup.status(), "ready")
+
+    def test_disabled(self):
+        Warmup.enabled = False
+        Warmup.state = "pending"
+        self.assertFalse(Warmup.ready())
+        Warmup.start()
+        self.assertEqual(Warmup.state, "disabled")
+        self.assertTrue(Warmup.ready())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import asyncio
+import socket
+import threading
+import time
+
+import uvicorn
+
+from core.websocket_manager import manager
+from benchmarks.websocket_fanout import _is_slow, parse_args, run
+from benchmarks.websocket_server import create_app
+
+class TestWebSocketFanout(unittest.TestCase):
+    """Test cases for the WebSocket fan-out load test"""
+
+    def test_slow_readers_are_spread(self):
+        slow = [index for index in range(20) if _is_slow(index, 0.25)]
+        self.assertEqual(slow, [3, 7, 11, 15, 19])
+        self.assertFalse(any(_is_slow(index, 0.0) for index in range(20)))
+
+    def test_small_run(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        # No lifespan: the database is only used when messages are saved
+        server = uvicorn.Server(uvicorn.Config(create_app(), port=port, log_level="error", lifespan="off"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.time() + 10
+        while not server.started and time.time() < deadline:
+            time.sleep(0.05)
+        try:
+            args = parse_args([
+                "--projects", "3", "--connections-per-project", "4", "--slow-fraction", "0.25",
+                "--slow-delay", "0.01", "--bursts", "2", "--burst-messages", "5", "--burst-interval", "0",
+            ])
+            results = asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+        finally:
+            server.should_exit = True
+            thread.join(10)
+
+        self.assertEqual(results["connections"]["opened"], 12)
+        self.assertEqual(results["connections"]["slow"], 3)
+        self.assertEqual(results["delivery"]["expected"], 120)
+        self.assertEqual(results["delivery"]["dropped"], 0)
+        self.assertEqual(results["dispatch"]["messages"], 30)
+        self.assertEqual(results["delivery"]["slow_reader_latency"]["count"], 30)
+        self.assertEqual(manager.active_connections, {})
+
+if __name__ == "__main__":
+    unittest.main()